@@ -100,7 +100,9 @@ from deeplabcut.pose_estimation_tensorflow import (
     analyze_videos,
     create_tracking_dataset,
     analyze_time_lapse_frames,
+    PoseEstimator,
     convert_detections2tracklets,
+    schedule_video_analysis,
     extract_maps,
     visualize_scoremaps,
     visualize_locrefs,
@@ -114,6 +116,7 @@ from deeplabcut.pose_estimation_3d import (
     calibrate_cameras,
     check_undistortion,
     triangulate,
+    triangulate_multiview,
     create_labeled_video_3d,
 )
 
@@ -14,7 +14,9 @@
 Benchmarks subclass the abstract ``Benchmark`` class and are defined by ``name``, their
 ``keypoints`` names, as well as groundtruth and metadata necessary to run evaluation.
 Right now, the metrics to compute and report for each of the multi-animal benchmarks is the
-root mean-squared-error (RMSE) and the mean average precision (mAP).
+root mean-squared-error (RMSE) and the mean average precision (mAP). Performance
+benchmarks (see ``benchmark.performance``) rather report the throughput, latency and
+peak memory of the stages of the pipeline, in the same result format.
 
 Note for contributors: If you decide to contribute a benchmark which does not fit
 into this evaluation framework, please feel free to extend the base classes
@@ -124,6 +126,9 @@ class Result:
     root_mean_squared_error: float = float("nan")
     mean_avg_precision: float = float("nan")
     benchmark_version: str = __version__
+    frames_per_second: float = float("nan")
+    latency: float = float("nan")
+    peak_memory: float = float("nan")
 
     _export_mapping = dict(
         benchmark_name="benchmark",
@@ -131,6 +136,9 @@ class Result:
         benchmark_version="version",
         root_mean_squared_error="RMSE",
         mean_avg_precision="mAP",
+        frames_per_second="fps",
+        latency="latency [s]",
+        peak_memory="peak RSS [MiB]",
     )
 
     _primary_key = ("benchmark_name", "method_name", "benchmark_version")
@@ -154,8 +162,15 @@ class Result:
 
     @classmethod
     def fromdict(cls, data: dict):
-        """Construct result object from dictionary."""
-        kwargs = {attr: data[key] for attr, key in cls._export_mapping.items()}
+        """Construct result object from dictionary.
+
+        Metrics missing from the dictionary (e.g., in caches written by
+        older versions) are set to NaN.
+        """
+        kwargs = {
+            attr: data[key] if attr in cls._primary_key else data.get(key, float("nan"))
+            for attr, key in cls._export_mapping.items()
+        }
         return cls(**kwargs)
 
     def todict(self) -> dict:
@@ -26,6 +26,11 @@ def _parse_args():
         choices=("ignore", "return", "raise"),
     )
     parser.add_argument("--nocache", action="store_true")
+    parser.add_argument(
+        "--performance",
+        action="store_true",
+        help="Benchmark the throughput of the pipeline stages rather than accuracy.",
+    )
     return parser.parse_args()
 
 
@@ -36,11 +41,20 @@ def main():
         results = deeplabcut.benchmark.loadcache()
     else:
         results = None
-    results = deeplabcut.benchmark.evaluate(
-        include_benchmarks=args.include,
-        results=results,
-        on_error=args.onerror,
-    )
+    if args.performance:
+        from deeplabcut.benchmark import performance
+
+        results = performance.evaluate(
+            include_stages=args.include,
+            results=results,
+            on_error=args.onerror,
+        )
+    else:
+        results = deeplabcut.benchmark.evaluate(
+            include_benchmarks=args.include,
+            results=results,
+            on_error=args.onerror,
+        )
     if not args.nocache:
         deeplabcut.benchmark.savecache(results)
     try:
@@ -0,0 +1,713 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+
+"""Performance benchmarks of the inference and post-processing pipeline.
+
+Every stage runs on synthetic data, generated on the fly: videos of noise, a tiny
+randomly initialized pose network, and animals whose keypoints follow random walks.
+Benchmarks therefore run on CPU, without any download, and measure the code of
+DeepLabCut rather than the quality of a model.
+
+For each stage, the throughput (frames per second), the latency (median duration
+of a full run of the stage over the synthetic video) and the peak resident memory
+are reported as ``Result`` objects, so that they can be cached and compared across
+versions like accuracy benchmarks:
+
+>>> from deeplabcut.benchmark import performance
+>>> results = performance.evaluate(include_stages=["Assembler.assemble"])
+>>> print(results.toframe())
+
+or from the command line with ``python -m deeplabcut.benchmark --performance``.
+"""
+
+import copy
+import dataclasses
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import Container
+
+import numpy as np
+import pandas as pd
+
+from deeplabcut.benchmark.base import (
+    Benchmark,
+    BenchmarkEvaluationError,
+    Result,
+    ResultCollection,
+)
+from deeplabcut.benchmark.utils import DisableOutput
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+@dataclasses.dataclass
+class Workload:
+    """Size of the synthetic data the stages are run on."""
+
+    n_frames: int = 300
+    n_animals: int = 3
+    n_bodyparts: int = 8
+    frame_width: int = 320
+    frame_height: int = 240
+    batch_size: int = 8
+    seed: int = 0
+
+    @property
+    def graph(self):
+        """Skeleton linking consecutive bodyparts."""
+        return [[i, i + 1] for i in range(self.n_bodyparts - 1)]
+
+    @property
+    def bodyparts(self):
+        return [f"bodypart{i}" for i in range(self.n_bodyparts)]
+
+    @property
+    def individuals(self):
+        return [f"animal{i}" for i in range(self.n_animals)]
+
+
+def simulate_animals(workload):
+    """Keypoint trajectories of shape (n_frames, n_animals, n_bodyparts, 2).
+
+    Animals wander randomly across the frame, their bodyparts being
+    spread along a line behind their first bodypart.
+    """
+    rng = np.random.default_rng(workload.seed)
+    size = np.array([workload.frame_width, workload.frame_height])
+    start = rng.uniform(0.2, 0.8, (workload.n_animals, 2)) * size
+    steps = rng.normal(0, 2, (workload.n_frames, workload.n_animals, 2))
+    centers = np.clip(start + np.cumsum(steps, axis=0), 0, size - 1)
+    angles = rng.uniform(0, 2 * np.pi, workload.n_animals)
+    direction = np.c_[np.cos(angles), np.sin(angles)]
+    offsets = np.arange(workload.n_bodyparts)[:, np.newaxis, np.newaxis] * 6
+    body = (offsets * direction).swapaxes(0, 1)
+    xy = (
+        centers[:, :, np.newaxis]
+        + body
+        + rng.normal(0, 0.5, (workload.n_frames,) + body.shape)
+    )
+    return np.clip(xy, 0, size - 1)
+
+
+def make_detections(workload):
+    """Raw multi-animal detections, in the format of *_full.pickle files."""
+    rng = np.random.default_rng(workload.seed)
+    xy = simulate_animals(workload)
+    graph = workload.graph
+    strwidth = int(np.ceil(np.log10(workload.n_frames)))
+    data = {
+        "metadata": {
+            "all_joints_names": workload.bodyparts,
+            "PAFgraph": graph,
+            "PAFinds": list(range(len(graph))),
+            "nframes": workload.n_frames,
+        }
+    }
+    for n in range(workload.n_frames):
+        coords, conf, owners = [], [], []
+        for j in range(workload.n_bodyparts):
+            # Some detections are missed
+            detected = np.flatnonzero(rng.random(workload.n_animals) > 0.05)
+            coords.append(xy[n, detected, j].astype(np.float32))
+            conf.append(rng.uniform(0.5, 1, (len(detected), 1)).astype(np.float32))
+            owners.append(detected)
+        costs = dict()
+        for k, (s, t) in enumerate(graph):
+            same = owners[s][:, np.newaxis] == owners[t]
+            aff = np.where(
+                same, rng.uniform(0.7, 1, same.shape), rng.uniform(0, 0.3, same.shape)
+            )
+            dist = np.linalg.norm(coords[s][:, np.newaxis] - coords[t], axis=2)
+            costs[k] = {"m1": aff.astype(np.float32), "distance": dist}
+        data["frame" + str(n).zfill(strwidth)] = {
+            "coordinates": (coords,),
+            "confidence": conf,
+            "costs": costs,
+        }
+    return data
+
+
+def make_dataframe(workload, multianimal=True):
+    """Pose predictions, as stored in *.h5 files by `analyze_videos`."""
+    rng = np.random.default_rng(workload.seed)
+    xy = simulate_animals(workload)
+    likelihood = rng.uniform(0, 1, xy.shape[:-1] + (1,))
+    data = np.concatenate((xy, likelihood), axis=-1)
+    if multianimal:
+        columns = pd.MultiIndex.from_product(
+            [
+                ["scorer"],
+                workload.individuals,
+                workload.bodyparts,
+                ["x", "y", "likelihood"],
+            ],
+            names=["scorer", "individuals", "bodyparts", "coords"],
+        )
+    else:
+        data = data[:, :1]
+        columns = pd.MultiIndex.from_product(
+            [["scorer"], workload.bodyparts, ["x", "y", "likelihood"]],
+            names=["scorer", "bodyparts", "coords"],
+        )
+    return pd.DataFrame(data.reshape((workload.n_frames, -1)), columns=columns)
+
+
+def make_video(workload, path):
+    """Write a video of noise at `path`."""
+    import cv2
+
+    rng = np.random.default_rng(workload.seed)
+    size = workload.frame_width, workload.frame_height
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 30, size)
+    for _ in range(workload.n_frames):
+        writer.write(rng.integers(0, 255, size[::-1] + (3,), dtype=np.uint8))
+    writer.release()
+    return path
+
+
+def _make_tiny_net(dlc_cfg):
+    import tf_slim as slim
+    from deeplabcut.pose_estimation_tensorflow.nnets.base import BasePoseNet
+
+    class TinyPoseNet(BasePoseNet):
+        """Four strided convolutions, followed by the usual prediction layers."""
+
+        def extract_features(self, inputs):
+            net = self.center_inputs(inputs)
+            with slim.arg_scope([slim.conv2d], padding="SAME", normalizer_fn=None):
+                for i, depth in enumerate((8, 16, 32, 32)):
+                    net = slim.conv2d(net, depth, [3, 3], stride=2, scope=f"conv{i}")
+            return net
+
+        def get_net(self, inputs):
+            return self.prediction_layers(self.extract_features(inputs))
+
+    return TinyPoseNet(dlc_cfg)
+
+
+def setup_tiny_pose_prediction(workload, gputensors=False):
+    """Randomly initialized counterpart of `predict.setup_pose_prediction`.
+
+    Returns the session, inputs and outputs, together with the test config.
+    """
+    import tensorflow as tf
+    from deeplabcut.pose_estimation_tensorflow import default_config
+
+    dlc_cfg = copy.deepcopy(default_config.cfg)
+    dlc_cfg.update(
+        num_joints=workload.n_bodyparts,
+        all_joints=[[i] for i in range(workload.n_bodyparts)],
+        all_joints_names=workload.bodyparts,
+        location_refinement=True,
+        batch_size=workload.batch_size,
+        num_outputs=1,
+    )
+    tf.compat.v1.disable_eager_execution()
+    tf.compat.v1.reset_default_graph()
+    inputs = tf.compat.v1.placeholder(
+        tf.float32, shape=[dlc_cfg["batch_size"], None, None, 3]
+    )
+    net = _make_tiny_net(dlc_cfg)
+    if gputensors:
+        outputs = [net.inference(inputs)["pose"]]
+    else:
+        heads = net.test(inputs)
+        outputs = [heads["part_prob"], heads["locref"]]
+    sess = tf.compat.v1.Session()
+    sess.run(tf.compat.v1.global_variables_initializer())
+    return sess, inputs, outputs, dlc_cfg
+
+
+# Stages are set up by functions taking the workload and a scratch folder,
+# and returning a callable that runs the stage once over all frames.
+
+
+def _setup_getpose(workload, folder, gputensors=False):
+    import cv2
+    from deeplabcut.pose_estimation_tensorflow import predict_videos
+
+    video = make_video(workload, os.path.join(folder, "video.avi"))
+    sess, inputs, outputs, dlc_cfg = setup_tiny_pose_prediction(workload, gputensors)
+    cfg = {"cropping": False}
+    getpose = predict_videos.GetPoseF_GTF if gputensors else predict_videos.GetPoseF
+
+    def run():
+        cap = cv2.VideoCapture(video)
+        getpose(
+            cfg,
+            dlc_cfg,
+            sess,
+            inputs,
+            outputs,
+            cap,
+            workload.n_frames,
+            workload.batch_size,
+        )
+        cap.release()
+
+    return run
+
+
+def _setup_getpose_gtf(workload, folder):
+    return _setup_getpose(workload, folder, gputensors=True)
+
+
+def _setup_assembler(workload, folder):
+    from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+
+    data = make_detections(workload)
+
+    def run():
+        ass = inferenceutils.Assembler(
+            data,
+            max_n_individuals=workload.n_animals,
+            n_multibodyparts=workload.n_bodyparts,
+        )
+        ass.assemble()
+
+    return run
+
+
+def _setup_peaks_and_costs(workload, folder):
+    from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
+
+    rng = np.random.default_rng(workload.seed)
+    stride = 8
+    xy = simulate_animals(workload)
+    n_frames = workload.n_frames
+    h, w = workload.frame_height // stride, workload.frame_width // stride
+    shape = workload.batch_size, h, w, workload.n_bodyparts
+    scmaps = rng.random(shape).astype(np.float32)
+    locrefs = rng.normal(size=shape + (2,)).astype(np.float32)
+    pafs = rng.normal(size=shape[:3] + (len(workload.graph), 2)).astype(np.float32)
+    # Network outputs are shared across batches, only the peaks change
+    batches = []
+    for start in range(0, n_frames, workload.batch_size):
+        frames = np.arange(start, min(start + workload.batch_size, n_frames))
+        cols, rows = (xy[frames] // stride).astype(np.int32).T
+        samples, _, bpts = np.indices(cols.T.shape)
+        peaks = np.stack(
+            [samples.ravel(), rows.T.ravel(), cols.T.ravel(), bpts.ravel()], axis=1
+        )
+        batches.append(peaks)
+
+    def run():
+        for peaks in batches:
+            predict_multianimal.compute_peaks_and_costs(
+                scmaps,
+                locrefs,
+                pafs,
+                peaks,
+                workload.graph,
+                list(range(len(workload.graph))),
+                stride,
+                n_id_channels=0,
+            )
+
+    return run
+
+
+def _setup_sort_ellipse(workload, folder, batched=False):
+    from deeplabcut.pose_estimation_tensorflow.lib import trackingutils
+
+    xy = simulate_animals(workload)
+    if batched:
+        sort = trackingutils.BatchedSORTEllipse
+    else:
+        sort = trackingutils.SORTEllipse
+
+    def run():
+        tracker = sort(1, 1, 0.6)
+        for poses in xy:
+            tracker.track(poses)
+
+    return run
+
+
+def _setup_batched_sort_ellipse(workload, folder):
+    return _setup_sort_ellipse(workload, folder, batched=True)
+
+
+def _setup_stitcher(workload, folder):
+    from deeplabcut.refine_training_dataset.stitch import Tracklet, TrackletStitcher
+
+    rng = np.random.default_rng(workload.seed)
+    xy = simulate_animals(workload)
+    inds = np.arange(workload.n_frames)
+    tracklets = []
+    for i in range(workload.n_animals):
+        data = np.concatenate(
+            (xy[:, i], np.ones((workload.n_frames, workload.n_bodyparts, 1))), axis=2
+        )
+        track = Tracklet(data, inds)
+        # Tracks are broken about every 20 frames
+        n_cuts = workload.n_frames // 20
+        cuts = np.sort(rng.choice(inds[1:], n_cuts, replace=False))
+        tracklets.extend(TrackletStitcher.split_tracklet(track, cuts))
+
+    def run():
+        stitcher = TrackletStitcher(tracklets, workload.n_animals)
+        stitcher.build_graph()
+        stitcher.stitch()
+
+    return run
+
+
+def _make_project(workload, folder):
+    """Minimal single-animal project, with a trained model and analyzed video."""
+    from deeplabcut.utils import auxiliaryfunctions
+
+    cfg, _ = auxiliaryfunctions.create_config_template()
+    cfg.update(
+        Task="benchmark",
+        scorer="dlc",
+        date="Jan1",
+        project_path=folder,
+        iteration=0,
+        TrainingFraction=[0.95],
+        snapshotindex=-1,
+        bodyparts=workload.bodyparts,
+        skeleton=[],
+    )
+    config = os.path.join(folder, "config.yaml")
+    auxiliaryfunctions.write_config(config, cfg)
+    model_folder = os.path.join(
+        folder, auxiliaryfunctions.get_model_folder(0.95, 1, cfg), "train"
+    )
+    os.makedirs(model_folder)
+    auxiliaryfunctions.write_plainconfig(
+        os.path.join(model_folder, "pose_cfg.yaml"), {"net_type": "resnet_50"}
+    )
+    open(os.path.join(model_folder, "snapshot-1000.index"), "w").close()
+    scorer, _ = auxiliaryfunctions.get_scorer_name(cfg, 1, 0.95)
+    video = os.path.join(folder, "video.avi")
+    open(video, "w").close()  # Only the analyzed data are read
+    make_dataframe(workload, multianimal=False).to_hdf(
+        os.path.join(folder, "video" + scorer + ".h5"), "df_with_missing"
+    )
+    return config, video
+
+
+def _setup_filterpredictions(workload, folder, filtertype):
+    from deeplabcut.post_processing import filterpredictions
+
+    config, video = _make_project(workload, folder)
+
+    def run():
+        for file in os.listdir(folder):
+            if file.endswith("_filtered.h5"):
+                os.remove(os.path.join(folder, file))
+        filterpredictions(
+            config, [video], videotype=".avi", filtertype=filtertype, save_as_csv=False
+        )
+
+    return run
+
+
+def _setup_filterpredictions_median(workload, folder):
+    return _setup_filterpredictions(workload, folder, "median")
+
+
+def _setup_filterpredictions_arima(workload, folder):
+    return _setup_filterpredictions(workload, folder, "arima")
+
+
+def _setup_filterpredictions_spline(workload, folder):
+    return _setup_filterpredictions(workload, folder, "spline")
+
+
+def _setup_filterpredictions_kalman(workload, folder):
+    return _setup_filterpredictions(workload, folder, "kalman")
+
+
+def _setup_create_video(workload, folder):
+    from deeplabcut.utils.make_labeled_video import CreateVideo
+    from deeplabcut.utils.video_processor import VideoProcessorCV
+
+    video = make_video(workload, os.path.join(folder, "video.avi"))
+    df = make_dataframe(workload)
+
+    def run():
+        clip = VideoProcessorCV(
+            fname=video, sname=os.path.join(folder, "labeled.mp4"), codec="mp4v"
+        )
+        CreateVideo(
+            clip,
+            df,
+            0.1,
+            5,
+            "rainbow",
+            workload.bodyparts,
+            0,
+            False,
+            0,
+            0,
+            0,
+            0,
+            [[f"bodypart{i}", f"bodypart{j}"] for i, j in workload.graph],
+            "black",
+            True,
+            False,
+            "bodypart",
+        )
+
+    return run
+
+
+def _setup_imgaug_dataset(workload, folder, rebuild=False):
+    import cv2
+    import imgaug
+    import pickle
+    from deeplabcut.pose_estimation_tensorflow import default_config
+    from deeplabcut.pose_estimation_tensorflow.datasets import ImgaugPoseDataset
+
+    # Labeled frames of the first animal, from a pool of images of noise
+    rng = np.random.default_rng(workload.seed)
+    xy = simulate_animals(workload)[:, 0]
+    shape = workload.frame_height, workload.frame_width, 3
+    n_images = min(workload.n_frames, 20)
+    for i in range(n_images):
+        image = rng.integers(0, 256, shape, dtype=np.uint8)
+        cv2.imwrite(os.path.join(folder, f"img{i}.png"), image)
+    data = [
+        dict(
+            image=(f"img{i % n_images}.png",),
+            size=np.array([3, workload.frame_height, workload.frame_width]),
+            joints=np.c_[np.arange(workload.n_bodyparts), xy[i]],
+        )
+        for i in range(workload.n_frames)
+    ]
+    with open(os.path.join(folder, "dataset.pickle"), "wb") as file:
+        pickle.dump(data, file)
+
+    cfg = copy.deepcopy(default_config.cfg)
+    cfg.update(
+        project_path=folder,
+        dataset="dataset.pickle",
+        all_joints_names=workload.bodyparts,
+        num_joints=workload.n_bodyparts,
+        batch_size=workload.batch_size,
+        location_refinement=True,
+        pos_dist_thresh=17,
+        global_scale=0.8,
+    )
+    np.random.seed(workload.seed)
+    imgaug.random.seed(workload.seed)
+    dataset = ImgaugPoseDataset(cfg)
+    if rebuild:  # As before pipelines were reused across batches
+        dataset.get_augmentation_pipeline = (
+            lambda height, width: dataset.build_augmentation_pipeline(
+                height=height, width=width, apply_prob=0.5
+            )
+        )
+
+    def run():
+        for _ in range(workload.n_frames // workload.batch_size):
+            dataset.next_batch()
+
+    return run
+
+
+def _setup_imgaug_dataset_rebuild(workload, folder):
+    return _setup_imgaug_dataset(workload, folder, rebuild=True)
+
+
+STAGES = {
+    "GetPoseF": _setup_getpose,
+    "GetPoseF_GTF": _setup_getpose_gtf,
+    "compute_peaks_and_costs": _setup_peaks_and_costs,
+    "Assembler.assemble": _setup_assembler,
+    "SORTEllipse.track": _setup_sort_ellipse,
+    "BatchedSORTEllipse.track": _setup_batched_sort_ellipse,
+    "TrackletStitcher.stitch": _setup_stitcher,
+    "filterpredictions[median]": _setup_filterpredictions_median,
+    "filterpredictions[arima]": _setup_filterpredictions_arima,
+    "filterpredictions[spline]": _setup_filterpredictions_spline,
+    "filterpredictions[kalman]": _setup_filterpredictions_kalman,
+    "CreateVideo": _setup_create_video,
+    "ImgaugPoseDataset.next_batch": _setup_imgaug_dataset,
+    "ImgaugPoseDataset.next_batch[rebuild]": _setup_imgaug_dataset_rebuild,
+}
+
+
+def _peak_rss():
+    """Peak resident memory of the current process, in MiB."""
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in kilobytes on Linux, in bytes on macOS
+    return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+
+def measure_stage(name, workload, repeat=3, verbose=False):
+    """Time a stage `repeat` times, after one warm-up run.
+
+    Returns the median duration of a run and the peak RSS of the process.
+    """
+    folder = tempfile.mkdtemp()
+    try:
+        if verbose:
+            run = STAGES[name](workload, folder)
+            run()
+        else:
+            with DisableOutput():
+                run = STAGES[name](workload, folder)
+                run()
+        durations = []
+        for _ in range(repeat):
+            if verbose:
+                start = time.perf_counter()
+                run()
+            else:
+                with DisableOutput():
+                    start = time.perf_counter()
+                    run()
+            durations.append(time.perf_counter() - start)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return statistics.median(durations), _peak_rss()
+
+
+def _measure_stage_in_child(conn, *args):
+    try:
+        conn.send(measure_stage(*args))
+    except Exception as e:
+        conn.send(e)
+    finally:
+        conn.close()
+
+
+class PerformanceBenchmark(Benchmark):
+    """Throughput, latency and peak memory of the stages of the pipeline.
+
+    Parameters
+    ----------
+    workload : Workload, optional
+        Size of the synthetic data. By default, a 300-frame, 320x240 video
+        of three animals with eight bodyparts each.
+
+    repeat : int, optional (default=3)
+        Number of timed runs of every stage; the median duration is reported.
+
+    isolate : bool, optional (default=True)
+        Whether to run every stage in a fresh process, so that the reported
+        peak memory is that of the stage alone rather than of all stages run
+        so far. Stages run in the current process otherwise.
+    """
+
+    name = "performance"
+    keypoints = ()
+    ground_truth = None
+    metadata = None
+
+    def __init__(self, workload=None, repeat=3, isolate=True):
+        super().__init__()
+        self.workload = workload or Workload()
+        self.repeat = repeat
+        self.isolate = isolate
+
+    def names(self):
+        return list(STAGES)
+
+    def get_predictions(self, name):
+        raise NotImplementedError("Performance benchmarks make no predictions.")
+
+    def measure(self, name):
+        """Median duration of a run of the stage `name`, and peak RSS in MiB."""
+        if not self.isolate:
+            return measure_stage(name, self.workload, self.repeat)
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(
+            target=_measure_stage_in_child,
+            args=(child_conn, name, self.workload, self.repeat),
+        )
+        process.start()
+        child_conn.close()
+        try:
+            out = parent_conn.recv()
+        except EOFError:
+            out = RuntimeError(f"The process running {name} died unexpectedly.")
+        process.join()
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+    def evaluate(self, name: str, on_error="raise"):
+        """Measure the performance of the stage `name`."""
+        if name not in self.names():
+            raise ValueError(
+                f"{name} is not registered. Valid names are {self.names()}"
+            )
+        if on_error not in ("ignore", "return", "raise"):
+            raise ValueError(f"on_error got an undefined value: {on_error}")
+        latency = peak_memory = float("nan")
+        try:
+            latency, peak_memory = self.measure(name)
+        except Exception as exception:
+            if on_error == "ignore":
+                return
+            elif on_error == "raise":
+                raise BenchmarkEvaluationError(
+                    f"Error during performance benchmark of {name}"
+                ) from exception
+        return Result(
+            method_name=name,
+            benchmark_name=self.name,
+            frames_per_second=self.workload.n_frames / latency,
+            latency=latency,
+            peak_memory=peak_memory,
+        )
+
+
+def evaluate(
+    include_stages: Container[str] = None,
+    results: ResultCollection = None,
+    on_error="return",
+    **kwargs,
+) -> ResultCollection:
+    """Run the performance benchmarks of all (or some) stages.
+
+    Args:
+        include_stages:
+            If ``None``, benchmark all stages in ``STAGES``; otherwise, only
+            those with the given names.
+        results:
+            Results already computed, e.g. loaded from the cache. Stages with
+            a result for the current version are not benchmarked again.
+        on_error:
+            see documentation in ``benchmark.base.Benchmark.evaluate()``
+        kwargs:
+            passed to ``PerformanceBenchmark``.
+
+    Returns:
+        The collection of results, including those passed as input.
+    """
+    if results is None:
+        results = ResultCollection()
+    benchmark = PerformanceBenchmark(**kwargs)
+    for name in benchmark.names():
+        if include_stages is not None and name not in include_stages:
+            continue
+        if Result(method_name=name, benchmark_name=benchmark.name) in results:
+            continue
+        result = benchmark.evaluate(name, on_error=on_error)
+        if result is not None:
+            results.add(result)
+    return results
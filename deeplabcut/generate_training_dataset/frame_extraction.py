@@ -416,8 +416,7 @@ def extract_frames(
                 is_valid = []
                 if opencv:
                     for index in frames2pick:
-                        cap.set_to_frame(index)  # extract a particular frame
-                        frame = cap.read_frame(crop=True)
+                        frame = cap.get_frame(index, crop=True)
                         if frame is not None:
                             image = img_as_ubyte(frame)
                             img_name = (
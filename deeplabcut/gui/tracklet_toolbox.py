@@ -786,8 +786,7 @@ class TrackletVisualizer:
 
     def on_change(self, val):
         self.curr_frame = int(val)
-        self.video.set_to_frame(self.curr_frame)
-        img = self.video.read_frame()
+        img = self.video.get_frame(self.curr_frame)
         if img is not None:
             # Automatically disable the draggable points
             if self.draggable:
@@ -839,8 +838,7 @@ class TrackletVisualizer:
             )
             index.append(os.path.join(*imagename.rsplit(os.path.sep, 3)[-3:]))
             if not os.path.isfile(imagename):
-                self.video.set_to_frame(ind)
-                frame = self.video.read_frame()
+                frame = self.video.get_frame(ind)
                 if frame is None:
                     print("Frame could not be read. Skipping...")
                     continue
@@ -31,6 +31,8 @@ def calibrate_cameras(config, cbrow=8, cbcol=6, calibrate=False, alpha=0.4):
 
     Make sure you have around 20-60 pairs of calibration images. The function should be used iteratively to select the right set of calibration images.
 
+    With more than two cameras, every camera is calibrated against the first one, as required by the multi-camera triangulation.
+
     A pair of calibration image is considered "correct", if the corners are detected correctly in both the images. It may happen that during the first run of this function,
     the extracted corners are incorrect or the order of detected corners does not align for the corresponding views (i.e. camera-1 and camera-2 images).
 
@@ -207,8 +209,8 @@ def calibrate_cameras(config, cbrow=8, cbcol=6, calibrate=False, alpha=0.4):
                 % (cam, mean_error / len(objpoints[cam]))
             )
 
-        # Compute stereo calibration for each pair of cameras
-        camera_pair = [[cam_names[0], cam_names[1]]]
+        # Compute stereo calibration of every camera with respect to the first one
+        camera_pair = [[cam_names[0], cam] for cam in cam_names[1:]]
         for pair in camera_pair:
             print("Computing stereo calibration for " % pair)
             (
@@ -342,10 +342,8 @@ def create_labeled_video_3d(
             writer = FFMpegWriter(fps=fps)
             with writer.saving(fig, videooutname, dpi=dpi):
                 for k in tqdm(frames):
-                    vid_cam1.set_to_frame(k)
-                    vid_cam2.set_to_frame(k)
-                    frame_cam1 = vid_cam1.read_frame()
-                    frame_cam2 = vid_cam2.read_frame()
+                    frame_cam1 = vid_cam1.get_frame(k)
+                    frame_cam2 = vid_cam2.get_frame(k)
                     if frame_cam1 is None or frame_cam2 is None:
                         raise IOError("A video frame is empty.")
 
@@ -10,6 +10,7 @@
 #
 
 import os
+import warnings
 from pathlib import Path
 
 import cv2
@@ -34,10 +35,13 @@ def triangulate(
     destfolder=None,
     save_as_csv=False,
     track_method="",
+    window_size=None,
 ):
     """
     This function triangulates the detected DLC-keypoints from the two camera views
     using the camera matrices (derived from calibration) to calculate 3D predictions.
+    With more than two cameras, all views are triangulated at once with
+    ``triangulate_multiview``.
 
     Parameters
     ----------
@@ -71,6 +75,12 @@ def triangulate(
     save_as_csv: bool, optional
         Saves the predictions in a .csv file. The default is ``False``
 
+    window_size: int, optional
+        In multi-animal projects, number of frames over which individuals are
+        matched across views, so that identity swaps within a view are corrected
+        (see ``auxiliaryfunctions_3d.match_individuals_across_views``). By default,
+        individuals are matched once over the entire video.
+
     Example
     -------
     Linux/MacOS
@@ -321,7 +331,20 @@ def triangulate(
                         os.path.join(destfolder, vname + DLCscorer + suffix + ".h5")
                     )
 
-        if run_triangulate:
+        if run_triangulate and len(cam_names) > 2:
+            print("Computing the triangulation from %d cameras..." % len(cam_names))
+            triangulate_multiview(
+                config,
+                dataname,
+                output_filename + ".h5",
+                window_size=window_size,
+                save_as_csv=save_as_csv,
+            )
+            print("Triangulated data for video", video_list[i])
+            print("Results are saved under: ", destfolder)
+            if destfolder == str(Path(video).parents[0]):
+                destfolder = None
+        elif run_triangulate:
             #        if len(dataname)>0:
             # undistort points for this pair
             print("Undistorting...")
@@ -399,14 +422,24 @@ def triangulate(
                         "The individuals do not match between the two DataFrames"
                     )
 
-                # Cross-view match individuals
-                _, voting = auxiliaryfunctions_3d.cross_view_match_dataframes(
-                    dataFrame_camera1_undistort, dataFrame_camera2_undistort, F
+                # Cross-view match individuals, window by window, with the
+                # algebraic epipolar residuals of the rectified points
+                (
+                    _,
+                    assignments,
+                    starts,
+                ) = auxiliaryfunctions_3d.match_individuals_across_views(
+                    dataFrame_camera1_undistort,
+                    dataFrame_camera2_undistort,
+                    F,
+                    window_size,
+                    metric="algebraic",
                 )
             else:
                 # Create a dummy variables for single-animal
                 individuals_view1 = ["indie"]
-                voting = {0: 0}
+                assignments = np.zeros((1, 1), dtype=int)
+                starts = dataFrame_camera1_undistort.index[:1].to_numpy()
 
             # Cleaner variable (since inds view1 == inds view2)
             individuals = individuals_view1
@@ -419,14 +452,19 @@ def triangulate(
                 (num_frames, len(individuals), -1, 3)
             )[..., :2]
 
+            # Individual of view 2 matched to every individual of view 1, per frame
+            matched = assignments[_windows(dataFrame_camera1_undistort.index, starts)]
+
             # Triangulate data
             triangulate = []
             for i, _ in enumerate(individuals):
                 # i is individual in view 1
-                # voting[i] is the matched individual in view 2
+                # matched[:, i] is the matched individual in view 2
 
                 pts_indv_cam1 = all_points_cam1[:, i].reshape((-1, 2)).T
-                pts_indv_cam2 = all_points_cam2[:, voting[i]].reshape((-1, 2)).T
+                pts_indv_cam2 = all_points_cam2[np.arange(num_frames), matched[:, i]]
+                pts_indv_cam2[matched[:, i] == -1] = np.nan
+                pts_indv_cam2 = pts_indv_cam2.reshape((-1, 2)).T
 
                 indv_points_3d = auxiliaryfunctions_3d.triangulatePoints(
                     P1, P2, pts_indv_cam1, pts_indv_cam2
@@ -476,10 +514,8 @@ def triangulate(
 
             # Reorder 2D dataframe in view 2 to match order of view 1
             if cfg.get("multianimalproject"):
-                df_2d_view2 = pd.read_hdf(dataname[1])
-                individuals_order = [individuals[i] for i in list(voting.values())]
-                df_2d_view2 = auxfun_multianimal.reorder_individuals_in_df(
-                    df_2d_view2, individuals_order
+                df_2d_view2 = _reorder_individuals(
+                    pd.read_hdf(dataname[1]), individuals, assignments, starts
                 )
                 df_2d_view2.to_hdf(
                     dataname[1],
@@ -583,3 +619,406 @@ def undistort_points(config, dataframe, camera_pair):
         stereo_file[camera_pair],
         path_stereo_file,
     )
+
+
+def get_camera_parameters(stereo_params, cam_names):
+    """Intrinsic and extrinsic parameters of every camera of a rig.
+
+    Every camera is expected to be calibrated against the first one
+    (see ``calibrate_cameras``), whose coordinate frame serves as world frame.
+
+    Parameters
+    ----------
+    stereo_params: dict
+        Stereo calibration, as stored in stereo_params.pickle.
+
+    cam_names: list of str
+        Names of the cameras; the first one is the reference camera.
+
+    Returns
+    -------
+    list of dict
+        Per camera, the camera matrix ("cameraMatrix"), the distortion coefficients
+        ("distCoeffs"), the (3, 4) projection matrix in normalized image coordinates
+        ("P") and the fundamental matrix with respect to the reference camera ("F",
+        None for the reference camera itself).
+    """
+    params = []
+    for i, cam in enumerate(cam_names[1:]):
+        pair = f"{cam_names[0]}-{cam}"
+        if pair not in stereo_params:
+            raise ValueError(
+                f"No stereo calibration found for the camera pair {pair}. "
+                "Please recalibrate the cameras with ``calibrate_cameras``."
+            )
+        pair_params = stereo_params[pair]
+        if i == 0:
+            params.append(
+                {
+                    "cameraMatrix": pair_params["cameraMatrix1"],
+                    "distCoeffs": pair_params["distCoeffs1"],
+                    "P": np.eye(3, 4),
+                    "F": None,
+                }
+            )
+        params.append(
+            {
+                "cameraMatrix": pair_params["cameraMatrix2"],
+                "distCoeffs": pair_params["distCoeffs2"],
+                "P": np.c_[pair_params["R"], np.ravel(pair_params["T"])],
+                "F": pair_params["F"],
+            }
+        )
+    return params
+
+
+def triangulate_points(points, projections, weights=None, min_views=2):
+    """Confidence-weighted DLT triangulation of points seen by any number of views.
+
+    All points are solved for at once: every view adds its two (weighted) DLT
+    equations to the 4x4 normal matrix of every point, whose eigenvector of smallest
+    eigenvalue is the homogeneous 3D point.
+
+    Parameters
+    ----------
+    points: array-like, shape (n_views, ..., 2)
+        Image coordinates of the points in every view. NaNs mark missing points.
+
+    projections: array-like, shape (n_views, 3, 4)
+        Projection matrices of the views.
+
+    weights: array-like, shape (n_views, ...), optional, default=None
+        Confidence of every point in every view; views with zero weight are ignored.
+        By default, all views are weighted equally.
+
+    min_views: int, optional, default=2
+        Minimal number of views a point must be seen from to be triangulated.
+
+    Returns
+    -------
+    np.ndarray, shape (..., 3)
+        3D coordinates of the points, NaN where seen from less than ``min_views`` views.
+    """
+    points = np.asarray(points, dtype=float)
+    projections = np.asarray(projections, dtype=float)
+    n_views = points.shape[0]
+    shape = points.shape[1:-1]
+    points = points.reshape((n_views, -1, 2))
+    if weights is None:
+        weights = np.ones(points.shape[:2])
+    weights = np.asarray(weights, dtype=float).reshape(points.shape[:2])
+    missing = np.isnan(points).any(axis=2) | ~(weights > 0)
+    weights = np.where(missing, 0, weights)
+    points = np.where(missing[..., None], 0, points)
+    normal = np.zeros((points.shape[1], 4, 4))
+    for xy, projection, weight in zip(points, projections, weights):
+        # x * P[2] - P[0] and y * P[2] - P[1]
+        rows = xy[..., None] * projection[2] - projection[:2]
+        rows *= weight[:, None, None]
+        normal += np.einsum("nri,nrj->nij", rows, rows)
+    _, vecs = np.linalg.eigh(normal)
+    xyzw = vecs[..., 0]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        xyz = xyzw[:, :3] / xyzw[:, 3:]
+    xyz[(weights > 0).sum(axis=0) < min_views] = np.nan
+    return xyz.reshape((*shape, 3))
+
+
+def _undistort_normalized(xy, camera_matrix, dist_coeffs):
+    pts = cv2.undistortPoints(
+        np.ascontiguousarray(xy, dtype=np.float64).reshape((-1, 1, 2)),
+        cameraMatrix=camera_matrix,
+        distCoeffs=dist_coeffs,
+    )
+    return pts.reshape(xy.shape)
+
+
+def _count_rows(filename):
+    with pd.HDFStore(filename, mode="r") as store:
+        key = store.keys()[0]
+        storer = store.get_storer(key)
+        if storer.is_table:
+            return storer.nrows
+        return len(store[key])
+
+
+def _read_chunks(filename, chunksize, n_rows):
+    """Read the first ``n_rows`` of a DataFrame stored in an h5 file, chunk-wise."""
+    with pd.HDFStore(filename, mode="r") as store:
+        key = store.keys()[0]
+        if store.get_storer(key).is_table:
+            for start in range(0, n_rows, chunksize):
+                stop = min(start + chunksize, n_rows)
+                yield store.select(key, start=start, stop=stop)
+        else:
+            df = store[key]
+            for start in range(0, n_rows, chunksize):
+                yield df.iloc[start : min(start + chunksize, n_rows)]
+
+
+def _mask_unlikely(df, pcutoff):
+    data = df.to_numpy().reshape((len(df), -1, 3))
+    data[data[..., 2] < pcutoff, :2] = np.nan
+    return pd.DataFrame(data.reshape((len(df), -1)), df.index, df.columns)
+
+
+def _as_tuple(keypoint):
+    return keypoint if isinstance(keypoint, tuple) else (keypoint,)
+
+
+def _windows(frames, starts):
+    """Index of the window of frames individuals were matched over, per frame."""
+    return np.clip(np.searchsorted(starts, frames, side="right") - 1, 0, None)
+
+
+def _reorder_individuals(df, individuals, assignments, starts):
+    """Reorder the individuals of view 2 after those of view 1 they were matched
+    to, window by window (see ``auxfun_multianimal.reorder_individuals_in_df``)."""
+    windows = _windows(df.index, starts)
+    data = df.to_numpy().copy()
+    for window, assignment in enumerate(assignments):
+        rows = windows == window
+        if rows.any():
+            order = [individuals[j] for j in assignment]
+            data[rows] = auxfun_multianimal.reorder_individuals_in_df(
+                df[rows], order
+            ).to_numpy()
+    return pd.DataFrame(data, columns=df.columns, index=df.index)
+
+
+def _swap_individuals(
+    data, frames, assignments, starts, lookup, keypoint_animals, keypoint_bodyparts
+):
+    """Reorder the keypoints of a view, frame by frame, after the animals they
+    were matched to in the reference view.
+
+    ``lookup`` holds the keypoint of every animal and bodypart; keypoints that
+    do not belong to an animal (``keypoint_animals`` of -1) are kept in place,
+    and those of animals matched to none are missing.
+    """
+    matched = assignments[_windows(frames, starts)][:, keypoint_animals]
+    is_animal = keypoint_animals >= 0
+    inds = np.where(
+        is_animal, lookup[matched, keypoint_bodyparts], np.arange(len(is_animal))
+    )
+    data = np.take_along_axis(data, inds[..., None], axis=1)
+    data[(matched == -1) & is_animal] = np.nan
+    return data
+
+
+def _match_individuals(data_files, camera_params, pcutoff, window_size):
+    """Individuals of every view matched to those of the reference view.
+
+    Returns the animals of the reference view, and per view the indices of
+    the animals matched to them in every window of frames, with the first
+    frame of every window (None for single-animal projects).
+    """
+    df_ref = pd.read_hdf(data_files[0])
+    if "individuals" not in df_ref.columns.names:
+        return None, [None] * len(data_files)
+    animals = [
+        ind
+        for ind in df_ref.columns.get_level_values("individuals").unique()
+        if ind != "single"
+    ]
+    columns = df_ref.columns.droplevel("scorer")
+    df_ref = _mask_unlikely(df_ref.loc[:, pd.IndexSlice[:, animals]], pcutoff)
+    matches = [None]
+    for filename, params in zip(data_files[1:], camera_params[1:]):
+        df = pd.read_hdf(filename)
+        if not df.columns.droplevel("scorer").equals(columns):
+            raise ValueError(
+                f"The individuals and bodyparts of {filename} and {data_files[0]} do not match."
+            )
+        df = _mask_unlikely(df.loc[:, pd.IndexSlice[:, animals]], pcutoff)
+        _, assignments, starts = auxiliaryfunctions_3d.match_individuals_across_views(
+            df_ref, df, params["F"], window_size
+        )
+        matches.append((assignments, starts))
+    return animals, matches
+
+
+def triangulate_multiview(
+    config,
+    data_files,
+    output_filename,
+    chunksize=1000,
+    min_views=2,
+    window_size=None,
+    save_as_csv=False,
+):
+    """Triangulate the 2D predictions of any number of calibrated cameras.
+
+    Keypoints are undistorted, and triangulated by confidence-weighted DLT (see
+    ``triangulate_points``) from all the views in which their likelihood is above
+    ``pcutoff``. Frames are processed and appended to the 3D h5 file in chunks, so
+    that long videos and large rigs need little memory. 3D coordinates are expressed
+    in the frame of the first camera. In multi-animal projects, the individuals of
+    every view are matched to those of the first view beforehand, over windows of
+    ``window_size`` frames (see ``auxiliaryfunctions_3d.match_individuals_across_views``).
+
+    Parameters
+    ----------
+    config : string
+        Full path of the config.yaml file of the 3D project as a string.
+
+    data_files : list of str
+        Full paths of the h5 files of 2D predictions (or tracks), one per camera,
+        in the order of ``camera_names`` of the config file.
+
+    output_filename : string
+        Full path of the 3D h5 file.
+
+    chunksize : int, optional, default=1000
+        Number of frames triangulated at once.
+
+    min_views : int, optional, default=2
+        Minimal number of views a keypoint must be detected in to be triangulated.
+
+    window_size : int, optional, default=None
+        Number of frames over which individuals are matched across views, so that
+        identity swaps within a view are corrected. By default, individuals are
+        matched once over the entire video.
+
+    save_as_csv : bool, optional, default=False
+        Saves the 3D data in a .csv file as well.
+
+    Returns
+    -------
+    dict
+        Metadata of the triangulation, also saved next to the h5 file.
+
+    Example
+    -------
+    >>> deeplabcut.triangulate_multiview(
+            config,
+            [f"/data/video1-camera-{i}DLC_resnet50.h5" for i in range(1, 7)],
+            "/data/video1_DLC_3D.h5",
+        )
+    """
+    cfg_3d = auxiliaryfunctions.read_config(config)
+    cam_names = cfg_3d["camera_names"]
+    if len(data_files) != len(cam_names):
+        raise ValueError(
+            f"Expected one data file per camera ({len(cam_names)}), got {len(data_files)}."
+        )
+    for filename in data_files:
+        if not os.path.exists(filename):
+            raise FileNotFoundError(
+                f"Dataframe path '{filename}' could not be found in the filesystem."
+            )
+    path_camera_matrix = auxiliaryfunctions_3d.Foldernames3Dproject(cfg_3d)[2]
+    path_stereo_file = os.path.join(path_camera_matrix, "stereo_params.pickle")
+    stereo_file = auxiliaryfunctions.read_pickle(path_stereo_file)
+    camera_params = get_camera_parameters(stereo_file, cam_names)
+    projections = np.stack([params["P"] for params in camera_params])
+
+    n_frames = [_count_rows(filename) for filename in data_files]
+    if len(set(n_frames)) > 1:
+        warnings.warn(
+            "The number of frames do not match across videos. Please make sure that your videos have same number of frames and then retry! Excluding the extra frames from the longer videos."
+        )
+    n_frames = min(n_frames)
+    pcutoff = cfg_3d["pcutoff"]
+    animals, matches = _match_individuals(
+        data_files, camera_params, pcutoff, window_size
+    )
+
+    if os.path.isfile(output_filename):
+        os.remove(output_filename)
+    scorer_3d = cfg_3d["scorername_3d"]
+    scorers = []
+    columns = None
+    chunks = zip(*[_read_chunks(f, chunksize, n_frames) for f in data_files])
+    with pd.HDFStore(output_filename, mode="w") as store:
+        for dfs in chunks:
+            if columns is None:
+                # Keypoints of the first view, and their columns in every view
+                keypoints = dfs[0].columns.droplevel(["scorer", "coords"]).unique()
+                order = []
+                for df in dfs:
+                    scorer = df.columns.get_level_values("scorer")[0]
+                    scorers.append(scorer)
+                    cols = [
+                        (scorer, *_as_tuple(keypoint), coord)
+                        for keypoint in keypoints
+                        for coord in ("x", "y", "likelihood")
+                    ]
+                    inds = df.columns.get_indexer(cols)
+                    if (inds == -1).any():
+                        raise ValueError("The bodyparts of the views do not match.")
+                    order.append(inds)
+                columns = pd.MultiIndex.from_tuples(
+                    [
+                        (scorer_3d, *_as_tuple(keypoint), coord)
+                        for keypoint in keypoints
+                        for coord in ("x", "y", "z")
+                    ],
+                    names=["scorer", *keypoints.names, "coords"],
+                )
+                if animals is not None:
+                    keypoint_animals = [
+                        animals.index(ind) if ind in animals else -1
+                        for ind, _ in keypoints
+                    ]
+                    bodyparts = [bpt for ind, bpt in keypoints if ind == animals[0]]
+                    keypoint_bodyparts = [
+                        bodyparts.index(bpt) if ind in animals else 0
+                        for ind, bpt in keypoints
+                    ]
+                    lookup = np.array(
+                        [
+                            [keypoints.get_loc((ind, bpt)) for bpt in bodyparts]
+                            for ind in animals
+                        ]
+                    )
+            points = []
+            weights = []
+            for df, inds, params, match in zip(dfs, order, camera_params, matches):
+                data = df.to_numpy()[:, inds].reshape((len(df), -1, 3))
+                if match is not None:
+                    data = _swap_individuals(
+                        data,
+                        dfs[0].index,
+                        *match,
+                        lookup,
+                        np.array(keypoint_animals),
+                        np.array(keypoint_bodyparts),
+                    )
+                points.append(
+                    _undistort_normalized(
+                        data[..., :2], params["cameraMatrix"], params["distCoeffs"]
+                    )
+                )
+                weights.append(np.where(data[..., 2] >= pcutoff, data[..., 2], 0))
+            xyz = triangulate_points(points, projections, weights, min_views)
+            store.append(
+                "df_with_missing",
+                pd.DataFrame(
+                    xyz.reshape((len(xyz), -1)), columns=columns, index=dfs[0].index
+                ),
+                format="table",
+            )
+
+    metadata = {
+        "stereo_matrix": stereo_file[f"{cam_names[0]}-{cam_names[1]}"],
+        "stereo_matrix_file": path_stereo_file,
+        "scorer_name": dict(zip(cam_names, scorers)),
+        "camera_names": cam_names,
+    }
+    if animals is not None:
+        # Animals of every view matched to those of the first view, per window
+        names = np.array(animals + [None], dtype=object)
+        metadata["individuals_matching"] = {
+            cam: pd.DataFrame(
+                names[assignments],
+                index=pd.Index(starts, name="start"),
+                columns=animals,
+            )
+            for cam, (assignments, starts) in zip(cam_names[1:], matches[1:])
+        }
+    output_path = os.path.splitext(output_filename)[0]
+    auxiliaryfunctions_3d.SaveMetadata3d(output_path + "_meta.pickle", metadata)
+    if save_as_csv:
+        pd.read_hdf(output_filename).to_csv(output_path + ".csv")
+    return metadata
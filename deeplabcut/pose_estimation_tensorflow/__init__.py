@@ -23,6 +23,7 @@ from deeplabcut.pose_estimation_tensorflow.export import export_model
 from deeplabcut.pose_estimation_tensorflow.models import *
 from deeplabcut.pose_estimation_tensorflow.nnets import *
 from deeplabcut.pose_estimation_tensorflow.predict_videos import *
+from deeplabcut.pose_estimation_tensorflow.scheduler import schedule_video_analysis
 from deeplabcut.pose_estimation_tensorflow.training import *
 from deeplabcut.pose_estimation_tensorflow.util import *
 from deeplabcut.pose_estimation_tensorflow.visualizemaps import *
@@ -494,6 +494,68 @@ def return_evaluate_network_data(
             return results
 
 
+class _SnapshotSession:
+    """Network set up once, into which the weights of successive snapshots are loaded."""
+
+    def __init__(self, dlc_cfg):
+        self.dlc_cfg = dlc_cfg
+        self.sess = None
+
+    def load(self, init_weights):
+        import tensorflow as tf
+        from deeplabcut.pose_estimation_tensorflow.core import predict
+
+        if self.sess is None:
+            cfg = dict(self.dlc_cfg, init_weights=init_weights)
+            self.sess, self.inputs, self.outputs = predict.setup_pose_prediction(cfg)
+            with self.sess.graph.as_default():
+                self._saver = tf.compat.v1.train.Saver()
+        else:
+            self._saver.restore(self.sess, init_weights)
+        return self.sess, self.inputs, self.outputs
+
+    def close(self):
+        import tensorflow as tf
+
+        if self.sess is not None:
+            self.sess.close()
+            self.sess = None
+        tf.compat.v1.reset_default_graph()
+
+
+def load_evaluation_images(cfg, imagenames, scale=1, memmap=False):
+    """Decode the labeled images once, to evaluate any number of snapshots on them.
+
+    If ``memmap``, decoded images are memory-mapped from a cache in the project's
+    evaluation-results folder, reused by later evaluations as long as the images
+    are not modified.
+    """
+    from deeplabcut.utils.image_cache import DecodedImageCache
+
+    paths = [os.path.join(cfg["project_path"], *imagename) for imagename in imagenames]
+    cache_path = None
+    if memmap:
+        cache_path = os.path.join(
+            cfg["project_path"], "evaluation-results", f"images_scale{scale}.cache"
+        )
+    return DecodedImageCache(paths, cache_path, scale)
+
+
+def _predict_cached_images(images, dlc_cfg, sess, inputs, outputs):
+    """Pose of every image of a DecodedImageCache, computed in batches."""
+    from deeplabcut.pose_estimation_tensorflow.core import predict
+
+    # Only the most likely location of every bodypart is evaluated
+    cfg = dict(dlc_cfg, num_outputs=1)
+    poses = np.zeros((len(images), 3 * len(dlc_cfg["all_joints_names"])))
+    with tqdm(total=len(images)) as pbar:
+        for frames, inds in images.batches(dlc_cfg["batch_size"]):
+            pose = predict.getposeNP(frames, cfg, sess, inputs, outputs)
+            poses[inds] = pose[: len(inds)]
+            pbar.update(len(inds))
+    return poses
+
+
 def evaluate_network(
     config,
     Shuffles=[1],
@@ -504,6 +566,8 @@ def evaluate_network(
     gputouse=None,
     rescale=False,
     modelprefix="",
+    batchsize=None,
+    memmap_images=False,
 ):
     """Evaluates the network.
 
@@ -557,6 +621,17 @@ def evaluate_network(
         Directory containing the deeplabcut models to use when evaluating the network.
         By default, the models are assumed to exist in the project folder.
 
+    batchsize: int or None, optional, default=None
+        Number of images processed at once by the network; images of different
+        sizes are processed in separate batches. By default, the "batch_size" of the
+        config.yaml file.
+
+    memmap_images: bool, optional, default=False
+        Labeled images are decoded only once, and shared by all evaluated shuffles
+        and snapshots. By default, decoded images are kept in memory. If True,
+        they are rather memory-mapped from a cache in the evaluation-results folder,
+        which is reused by subsequent evaluations until images are modified.
+
     Returns
     -------
     None
@@ -609,12 +684,11 @@ def evaluate_network(
             comparisonbodyparts=comparisonbodyparts,
             gputouse=gputouse,
             modelprefix=modelprefix,
+            batchsize=batchsize,
+            memmap_images=memmap_images,
         )
     else:
-        from deeplabcut.utils.auxfun_videos import imread, imresize
-        from deeplabcut.pose_estimation_tensorflow.core import predict
         from deeplabcut.pose_estimation_tensorflow.config import load_config
-        from deeplabcut.pose_estimation_tensorflow.datasets.utils import data_to_input
         from deeplabcut.utils import auxiliaryfunctions, conversioncode
         import tensorflow as tf
 
@@ -672,6 +746,7 @@ def evaluate_network(
         auxiliaryfunctions.attempttomakefolder(
             str(cfg["project_path"] + "/evaluation-results/")
         )
+        images = dict()  # Decoded images, per scale
         for shuffle in Shuffles:
             for trainFraction in TrainingFractions:
                 ##################################################
@@ -708,8 +783,8 @@ def evaluate_network(
                         % (shuffle, trainFraction)
                     )
 
-                # change batch size, if it was edited during analysis!
-                dlc_cfg["batch_size"] = 1  # in case this was edited for analysis.
+                # Images of equal size are evaluated in batches
+                dlc_cfg["batch_size"] = batchsize or cfg["batch_size"]
 
                 # Create folder structure to store results.
                 evaluationfolder = os.path.join(
@@ -756,6 +831,15 @@ def evaluate_network(
                     )
 
                 final_result = []
+                # Results are appended to the file named after the last snapshot,
+                # as soon as each snapshot is evaluated.
+                results_scorer, _ = auxiliaryfunctions.get_scorer_name(
+                    cfg,
+                    shuffle,
+                    trainFraction,
+                    Snapshots[snapindices[-1]].split("-")[-1],
+                    modelprefix=modelprefix,
+                )
 
                 ########################### RESCALING (to global scale)
                 if rescale:
@@ -777,6 +861,7 @@ def evaluate_network(
                 ##################################################
                 # Compute predictions over images
                 ##################################################
+                session = _SnapshotSession(dlc_cfg)
                 for snapindex in snapindices:
                     dlc_cfg["init_weights"] = os.path.join(
                         str(modelfolder), "train", Snapshots[snapindex]
@@ -813,40 +898,16 @@ def evaluate_network(
                     )
                     if notanalyzed:
                         # Specifying state of model (snapshot / training state)
-                        sess, inputs, outputs = predict.setup_pose_prediction(dlc_cfg)
-                        Numimages = len(Data.index)
-                        PredicteData = np.zeros(
-                            (Numimages, 3 * len(dlc_cfg["all_joints_names"]))
-                        )
-                        print("Running evaluation ...")
-                        for imageindex, imagename in tqdm(enumerate(Data.index)):
-                            image = imread(
-                                os.path.join(cfg["project_path"], *imagename),
-                                mode="skimage",
+                        sess, inputs, outputs = session.load(dlc_cfg["init_weights"])
+                        if scale not in images:
+                            images[scale] = load_evaluation_images(
+                                cfg, Data.index, scale, memmap_images
                             )
-                            if scale != 1:
-                                image = imresize(image, scale)
-
-                            image_batch = data_to_input(image)
-                            # Compute prediction with the CNN
-                            outputs_np = sess.run(
-                                outputs, feed_dict={inputs: image_batch}
-                            )
-                            scmap, locref = predict.extract_cnn_output(
-                                outputs_np, dlc_cfg
-                            )
-
-                            # Extract maximum scoring location from the heatmap, assume 1 person
-                            pose = predict.argmax_pose_predict(
-                                scmap, locref, dlc_cfg["stride"]
-                            )
-                            PredicteData[
-                                imageindex, :
-                            ] = (
-                                pose.flatten()
-                            )  # NOTE: thereby     cfg_test['all_joints_names'] should be same order as bodyparts!
-
-                        sess.close()  # closes the current tf session
+                        print("Running evaluation ...")
+                        # NOTE: thereby cfg_test['all_joints_names'] should be same order as bodyparts!
+                        PredicteData = _predict_cached_images(
+                            images[scale], dlc_cfg, sess, inputs, outputs
+                        )
 
                         index = pd.MultiIndex.from_product(
                             [
@@ -899,6 +960,7 @@ def evaluate_network(
                             np.round(testerrorpcutoff, 2),
                         ]
                         final_result.append(results)
+                        make_results_file([results], evaluationfolder, results_scorer)
 
                         if show_errors:
                             print(
@@ -950,8 +1012,6 @@ def evaluate_network(
                                 foldername,
                             )  # Rescaling coordinates to have figure in original size!
 
-                        tf.compat.v1.reset_default_graph()
-                        # print(final_result)
                     else:
                         DataMachine = pd.read_hdf(resultsfilename)
                         conversioncode.guarantee_multiindex_rows(DataMachine)
@@ -983,9 +1043,9 @@ def evaluate_network(
                                 print(
                                     "Plots already exist for this snapshot... Skipping to the next one."
                                 )
+                session.close()
 
                 if len(final_result) > 0:  # Only append if results were calculated
-                    make_results_file(final_result, evaluationfolder, DLCscorer)
                     print(
                         "The network is evaluated and the results are stored in the subdirectory 'evaluation_results'."
                     )
@@ -18,7 +18,11 @@ import pandas as pd
 from scipy.spatial import cKDTree
 from tqdm import tqdm
 
-from deeplabcut.pose_estimation_tensorflow.core.evaluate import make_results_file
+from deeplabcut.pose_estimation_tensorflow.core.evaluate import (
+    _SnapshotSession,
+    load_evaluation_images,
+    make_results_file,
+)
 from deeplabcut.pose_estimation_tensorflow.config import load_config
 from deeplabcut.pose_estimation_tensorflow.lib import crossvalutils
 from deeplabcut.utils import visualization
@@ -97,6 +101,101 @@ def _calc_train_test_error(data, metadata, pcutoff=0.3):
     return error_train, error_test, error_train_cut, error_test_cut
 
 
+def _resize(frame, pipeline):
+    """Pass an image through the resizer (a no-op if it holds no augmenter)."""
+    return pipeline(images=[frame])[0]
+
+
+def _prepare_groundtruth(GT, frame, pipeline, joints, stride):
+    """Pass the keypoints through the resizer, and format them as stored in the
+    _full.pickle files and as peak indices to slice the PAFs with.
+
+    The resized image is not kept, so that only the (possibly memory-mapped)
+    decoded images hold pixels in memory.
+    """
+    keypoints = [GT.to_numpy().reshape((-1, 2)).astype(float)]
+    _, keypoints = pipeline(images=[frame], keypoints=keypoints)
+    GT[:] = keypoints[0].flatten()
+
+    df = GT.unstack("coords").reindex(joints, level="bodyparts")
+
+    # FIXME Is having an empty array vs nan really that necessary?!
+    groundtruthidentity = list(
+        df.index.get_level_values("individuals").to_numpy().reshape((-1, 1))
+    )
+    groundtruthcoordinates = list(df.values[:, np.newaxis])
+    for i, coords in enumerate(groundtruthcoordinates):
+        if np.isnan(coords).any():
+            groundtruthcoordinates[i] = np.empty((0, 2), dtype=float)
+            groundtruthidentity[i] = np.array([], dtype=str)
+
+    # Form 2D array of shape (n_rows, 4) where the last dimension
+    # is (sample_index, peak_y, peak_x, bpt_index) to slice the PAFs.
+    temp = df.reset_index(level="bodyparts").dropna()
+    temp["bodyparts"].replace(
+        dict(zip(joints, range(len(joints)))),
+        inplace=True,
+    )
+    temp["sample"] = 0
+    peaks_gt = temp.loc[:, ["sample", "y", "x", "bodyparts"]].to_numpy()
+    peaks_gt[:, 1:3] = (peaks_gt[:, 1:3] - stride // 2) / stride
+    return GT, df, groundtruthidentity, groundtruthcoordinates, peaks_gt
+
+
+def _drop_empty_costs(costs):
+    # Images without any candidate edge have no costs at all
+    if all(not v["m1"].size for v in costs.values()):
+        return dict()
+    return costs
+
+
+def _predict_samples(samples, images, pipeline, dlc_cfg, sess, inputs, outputs):
+    """Detections and costs of every sample, computed in batches of equal-size images.
+
+    Images are read back from ``images`` and resized batch by batch.
+    Samples without any detection are mapped to None.
+    """
+    from deeplabcut.pose_estimation_tensorflow.core import (
+        predict_multianimal as predictma,
+    )
+
+    batch_size = dlc_cfg["batch_size"]
+    groups = dict()
+    for ind in samples:
+        # Images of equal size are also of equal size once resized
+        groups.setdefault(images[ind].shape, []).append(ind)
+    preds = dict()
+    for inds in groups.values():
+        shape = _resize(images[inds[0]], pipeline).shape
+        frames = np.zeros((batch_size, *shape), dtype=np.uint8)
+        for start in range(0, len(inds), batch_size):
+            batch = inds[start : start + batch_size]
+            peaks_gt = []
+            for i, ind in enumerate(batch):
+                frames[i] = _resize(images[ind], pipeline)
+                peaks = samples[ind][-1].astype(int)
+                peaks[:, 0] = i
+                peaks_gt.append(peaks)
+            frames[len(batch) :] = 0
+            pred = predictma.predict_batched_peaks_and_costs(
+                dlc_cfg,
+                frames,
+                sess,
+                inputs,
+                outputs,
+                np.concatenate(peaks_gt),
+            )
+            for i, ind in enumerate(batch):
+                if not pred or not any(map(len, pred[i]["coordinates"][0])):
+                    preds[ind] = None
+                    continue
+                for key in ("costs", "groundtruth_costs"):
+                    if key in pred[i]:
+                        pred[i][key] = _drop_empty_costs(pred[i][key])
+                preds[ind] = pred[i]
+    return preds
+
+
 def evaluate_multianimal_full(
     config,
     Shuffles=[1],
@@ -106,11 +205,9 @@ def evaluate_multianimal_full(
     comparisonbodyparts="all",
     gputouse=None,
     modelprefix="",
+    batchsize=None,
+    memmap_images=False,
 ):
-    from deeplabcut.pose_estimation_tensorflow.core import (
-        predict,
-        predict_multianimal as predictma,
-    )
     from deeplabcut.utils import (
         auxiliaryfunctions,
         auxfun_multianimal,
@@ -167,6 +264,7 @@ def evaluate_multianimal_full(
     auxiliaryfunctions.attempttomakefolder(
         str(cfg["project_path"] + "/evaluation-results/")
     )
+    images = None  # Decoded once for all shuffles and snapshots
     for shuffle in Shuffles:
         for trainFraction in TrainingFractions:
             ##################################################
@@ -209,8 +307,8 @@ def evaluate_multianimal_full(
                 width, height = pre_resize
                 pipeline.add(iaa.Resize({"height": height, "width": width}))
 
-            # TODO: IMPLEMENT for different batch sizes?
-            dlc_cfg["batch_size"] = 1  # due to differently sized images!!!
+            # Images of equal size are evaluated in batches
+            dlc_cfg["batch_size"] = batchsize or cfg["batch_size"]
 
             stride = dlc_cfg["stride"]
             # Ignore best edges possibly defined during a prior evaluation
@@ -260,9 +358,20 @@ def evaluate_multianimal_full(
                     )
 
                 final_result = []
+                # Results are appended to the file named after the last snapshot,
+                # as soon as each snapshot is evaluated.
+                results_scorer, _ = auxiliaryfunctions.get_scorer_name(
+                    cfg,
+                    shuffle,
+                    trainFraction,
+                    Snapshots[snapindices[-1]].split("-")[-1],
+                    modelprefix=modelprefix,
+                )
+                samples = None  # Resized ground truth, for this shuffle
                 ##################################################
                 # Compute predictions over images
                 ##################################################
+                session = _SnapshotSession(dlc_cfg)
                 for snapindex in snapindices:
                     dlc_cfg["init_weights"] = os.path.join(
                         str(modelfolder), "train", Snapshots[snapindex]
@@ -313,75 +422,44 @@ def evaluate_multianimal_full(
                         print("Model already evaluated.", resultsfilename)
                     else:
 
-                        (
-                            sess,
-                            inputs,
-                            outputs,
-                        ) = predict.setup_pose_prediction(dlc_cfg)
+                        sess, inputs, outputs = session.load(dlc_cfg["init_weights"])
+                        if images is None:
+                            images = load_evaluation_images(
+                                cfg, Data.index, memmap=memmap_images
+                            )
+                        if samples is None:
+                            samples = dict()
+                            for imageindex in range(len(Data)):
+                                GT = Data.iloc[imageindex].copy()
+                                if not GT.any():
+                                    continue
+                                samples[imageindex] = _prepare_groundtruth(
+                                    GT,
+                                    images[imageindex],
+                                    pipeline,
+                                    joints,
+                                    stride,
+                                )
 
                         PredicteData = {}
                         dist = np.full((len(Data), len(all_bpts)), np.nan)
                         conf = np.full_like(dist, np.nan)
                         print("Network Evaluation underway...")
+                        preds = _predict_samples(
+                            samples, images, pipeline, dlc_cfg, sess, inputs, outputs
+                        )
                         for imageindex, imagename in tqdm(enumerate(Data.index)):
                             image_path = os.path.join(cfg["project_path"], *imagename)
-                            frame = auxfun_videos.imread(image_path, mode="skimage")
-
-                            GT = Data.iloc[imageindex]
-                            if not GT.any():
+                            pred = preds.get(imageindex)
+                            if pred is None:
                                 continue
-
-                            # Pass the image and the keypoints through the resizer;
-                            # this has no effect if no augmenters were added to it.
-                            keypoints = [GT.to_numpy().reshape((-1, 2)).astype(float)]
-                            frame_, keypoints = pipeline(
-                                images=[frame], keypoints=keypoints
-                            )
-                            frame = frame_[0]
-                            GT[:] = keypoints[0].flatten()
-
-                            df = GT.unstack("coords").reindex(joints, level="bodyparts")
-
-                            # FIXME Is having an empty array vs nan really that necessary?!
-                            groundtruthidentity = list(
-                                df.index.get_level_values("individuals")
-                                .to_numpy()
-                                .reshape((-1, 1))
-                            )
-                            groundtruthcoordinates = list(df.values[:, np.newaxis])
-                            for i, coords in enumerate(groundtruthcoordinates):
-                                if np.isnan(coords).any():
-                                    groundtruthcoordinates[i] = np.empty(
-                                        (0, 2), dtype=float
-                                    )
-                                    groundtruthidentity[i] = np.array([], dtype=str)
-
-                            # Form 2D array of shape (n_rows, 4) where the last dimension
-                            # is (sample_index, peak_y, peak_x, bpt_index) to slice the PAFs.
-                            temp = df.reset_index(level="bodyparts").dropna()
-                            temp["bodyparts"].replace(
-                                dict(zip(joints, range(len(joints)))),
-                                inplace=True,
-                            )
-                            temp["sample"] = 0
-                            peaks_gt = temp.loc[
-                                :, ["sample", "y", "x", "bodyparts"]
-                            ].to_numpy()
-                            peaks_gt[:, 1:3] = (peaks_gt[:, 1:3] - stride // 2) / stride
-
-                            pred = predictma.predict_batched_peaks_and_costs(
-                                dlc_cfg,
-                                np.expand_dims(frame, axis=0),
-                                sess,
-                                inputs,
-                                outputs,
-                                peaks_gt.astype(int),
-                            )
-
-                            if not pred:
-                                continue
-                            else:
-                                pred = pred[0]
+                            (
+                                GT,
+                                df,
+                                groundtruthidentity,
+                                groundtruthcoordinates,
+                                _,
+                            ) = samples[imageindex]
 
                             PredicteData[imagename] = {}
                             PredicteData[imagename]["index"] = imageindex
@@ -424,6 +502,7 @@ def evaluate_multianimal_full(
                                 gt = temp_xy.reshape(
                                     (-1, 2, temp_xy.shape[1])
                                 ).T.swapaxes(1, 2)
+                                frame = _resize(images[imageindex], pipeline)
                                 h, w, _ = np.shape(frame)
                                 fig.set_size_inches(w / 100, h / 100)
                                 ax.set_xlim(0, w)
@@ -448,8 +527,6 @@ def evaluate_multianimal_full(
                                 )
                                 visualization.erase_artists(ax)
 
-                        sess.close()  # closes the current tf session
-
                         # Compute all distance statistics
                         df_dist = pd.DataFrame(dist, columns=df.index)
                         df_conf = pd.DataFrame(conf, columns=df.index)
@@ -495,6 +572,7 @@ def evaluate_multianimal_full(
                             np.round(error_test_cut, 2),
                         ]
                         final_result.append(results)
+                        make_results_file([results], evaluationfolder, results_scorer)
 
                         if show_errors:
                             string = (
@@ -561,8 +639,6 @@ def evaluate_multianimal_full(
                             PredicteData, metadata, resultsfilename
                         )
 
-                        tf.compat.v1.reset_default_graph()
-
                     n_multibpts = len(cfg["multianimalbodyparts"])
                     if n_multibpts == 1:
                         continue
@@ -662,7 +738,6 @@ def evaluate_multianimal_full(
                     with open(data_path.replace("_full.", "_map."), "wb") as file:
                         pickle.dump((df, paf_scores), file)
 
-                if len(final_result) > 0:  # Only append if results were calculated
-                    make_results_file(final_result, evaluationfolder, DLCscorer)
+                session.close()
 
     os.chdir(str(start_path))
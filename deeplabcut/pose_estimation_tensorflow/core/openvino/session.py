@@ -53,10 +53,12 @@ class OpenVINOSession:
         self.input_name = self.net.inputs[0].get_any_name()
         self.output_name = self.net.outputs[0].get_any_name()
         self.infer_queue = None
+        self._input_size = None
 
     def _init_model(self, inp_h, inp_w):
         # For better efficiency, model is initialized for batch_size 1 and every sample processed independently
         inp_shape = [1, inp_h, inp_w, 3]
+        self._input_size = inp_h, inp_w
         self.net.reshape({self.input_name: inp_shape})
 
         # Load network to device
@@ -81,17 +83,18 @@ class OpenVINOSession:
     def run(self, out_name, feed_dict):
         inp_name, inp = next(iter(feed_dict.items()))
 
-        if self.infer_queue is None:
+        # Sessions may be reused across videos of different sizes
+        if self.infer_queue is None or self._input_size != inp.shape[1:3]:
             self._init_model(inp.shape[1], inp.shape[2])
 
         batch_size = inp.shape[0]
         batch_output = np.zeros(
-            [batch_size] + self.net.outputs[out_name].shape, dtype=np.float32
+            [batch_size] + list(self.net.outputs[0].shape), dtype=np.float32
         )
 
         def completion_callback(request, inp_id):
             output = next(iter(request.results.values()))
-            batch_output[out_id] = output
+            batch_output[inp_id] = output
 
         self.infer_queue.set_callback(completion_callback)
 
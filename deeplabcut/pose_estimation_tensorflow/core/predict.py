@@ -12,6 +12,8 @@
 # Licensed under GNU Lesser General Public License v3.0
 #
 
+import os
+
 import numpy as np
 import tensorflow as tf
 from deeplabcut.pose_estimation_tensorflow.nnets.factory import PoseNetFactory
@@ -237,3 +239,73 @@ def extract_GPUprediction(outputs, cfg):
 def setup_openvino_pose_prediction(cfg, device):
     sess = OpenVINOSession(cfg, device)
     return sess, sess.input_name, [sess.output_name]
+
+
+_SETUP_FUNCS = {
+    "numpy": setup_pose_prediction,
+    "gpu": setup_GPUpose_prediction,
+    "openvino": setup_openvino_pose_prediction,
+}
+_session_cache = {}
+
+
+def _session_key(cfg, mode, kwargs):
+    # Weights may be overwritten in place, e.g., when retraining a shuffle
+    index_file = cfg["init_weights"] + ".index"
+    mtime = os.path.getmtime(index_file) if os.path.isfile(index_file) else None
+    return (
+        mode,
+        mtime,
+        repr(sorted((k, repr(v)) for k, v in cfg.items())),
+        repr(sorted(kwargs.items())),
+    )
+
+
+def setup_cached_pose_prediction(cfg, mode="numpy", **kwargs):
+    """Set up pose prediction, building and restoring a given network only once.
+
+    Sessions are kept alive and keyed by the test config (including the snapshot in
+    ``cfg["init_weights"]`` and the batch size), the inference mode, and the extra
+    arguments, so that repeated analyses with the same model skip graph
+    construction, checkpoint restoring, and OpenVINO model conversion.
+
+    Parameters
+    ----------
+    cfg : dict
+        Test pose config, as passed to ``setup_pose_prediction``.
+
+    mode : str, optional (default="numpy")
+        "numpy" for ``setup_pose_prediction``, "gpu" for ``setup_GPUpose_prediction``,
+        or "openvino" for ``setup_openvino_pose_prediction``.
+
+    **kwargs
+        Extra arguments of the corresponding setup function.
+
+    Returns
+    -------
+    sess, inputs, outputs
+    """
+    if mode not in _SETUP_FUNCS:
+        raise ValueError(f"Unknown mode {mode}. Must be one of {list(_SETUP_FUNCS)}.")
+    key = _session_key(cfg, mode, kwargs)
+    if key not in _session_cache:
+        _session_cache[key] = _SETUP_FUNCS[mode](cfg, **kwargs)
+        # Detach the network's graph, so that nothing else gets added to it
+        tf.compat.v1.reset_default_graph()
+    return _session_cache[key]
+
+
+def clear_session_cache(sess=None):
+    """Close sessions set up by ``setup_cached_pose_prediction``.
+
+    Parameters
+    ----------
+    sess : optional (default=None)
+        Session to close. By default, all cached sessions are closed.
+    """
+    for key, (sess_, *_) in list(_session_cache.items()):
+        if sess is None or sess_ is sess:
+            close = getattr(sess_, "close", None)
+            if close is not None:
+                close()
+            del _session_cache[key]
@@ -58,6 +58,24 @@ def extract_cnn_outputmulti(outputs_np, cfg):
     return scmap, locref, paf
 
 
+def _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts):
+    """Sort peaks by sample and bodypart, preserving their relative order.
+
+    Returns the sorting indices, and the number of peaks and the offset of the
+    first one (in sorted order) for every sample and bodypart, as
+    (n_samples, n_bodyparts) arrays. Peaks of other channels are sorted last.
+    """
+    samples = peak_inds_in_batch[:, 0]
+    bpts = peak_inds_in_batch[:, 3]
+    n_groups = n_samples * n_bodyparts
+    keys = np.where(bpts < n_bodyparts, samples * n_bodyparts + bpts, n_groups)
+    order = np.argsort(keys, kind="stable")
+    counts = np.bincount(keys, minlength=n_groups + 1)[:n_groups]
+    offsets = np.cumsum(counts) - counts
+    shape = n_samples, n_bodyparts
+    return order, counts.reshape(shape), offsets.reshape(shape)
+
+
 def compute_edge_costs(
     pafs,
     peak_inds_in_batch,
@@ -66,49 +84,89 @@ def compute_edge_costs(
     n_bodyparts,
     n_points=10,
     n_decimals=3,
+    compact=False,
 ):
+    """Compute the affinity and length of all candidate edges of a batch of images.
+
+    Parameters
+    ----------
+    pafs : np.ndarray
+        Part affinity fields of shape (n_samples, height, width, n_edges, 2).
+
+    peak_inds_in_batch : np.ndarray
+        (n_peaks, 4) array of (sample, row, column, bodypart) indices;
+        locations are clipped in place to the dimensions of the PAFs.
+
+    graph : list
+        Pairs of bodypart indices forming the edges.
+
+    paf_inds : list
+        Index of the PAF of every edge in ``graph``.
+
+    n_bodyparts : int
+        Number of bodyparts.
+
+    n_points : int, optional
+        Number of points along an edge at which the PAFs are integrated.
+
+    n_decimals : int, optional
+        Number of decimals the costs are rounded to.
+
+    compact : bool, optional
+        If True, return the flat arrays of all candidate edges rather than cost
+        matrices (see Returns).
+
+    Returns
+    -------
+    list or dict
+        By default, a list with, for every sample, a dict mapping the PAF index
+        to a dict of (n_sources, n_targets) cost matrices "m1" (affinities) and
+        "distance" (lengths). If ``compact``, a dict of arrays with one entry per
+        candidate edge: "sample", "edge" (PAF index), "peaks" (rows of
+        ``peak_inds_in_batch`` of the source and target peaks), "m1" and "distance".
+    """
     # Clip peak locations to PAFs dimensions
     h, w = pafs.shape[1:3]
     peak_inds_in_batch[:, 1] = np.clip(peak_inds_in_batch[:, 1], 0, h - 1)
     peak_inds_in_batch[:, 2] = np.clip(peak_inds_in_batch[:, 2], 0, w - 1)
 
     n_samples = pafs.shape[0]
-    sample_inds = []
-    edge_inds = []
-    all_edges = []
-    all_peaks = []
-    for i in range(n_samples):
-        samples_i = peak_inds_in_batch[:, 0] == i
-        peak_inds = peak_inds_in_batch[samples_i, 1:]
-        if not np.any(peak_inds):
-            continue
-        peaks = peak_inds[:, :2]
-        bpt_inds = peak_inds[:, 2]
-        idx = np.arange(peaks.shape[0])
-        idx_per_bpt = {j: idx[bpt_inds == j].tolist() for j in range(n_bodyparts)}
-        edges = []
-        for k, (s, t) in zip(paf_inds, graph):
-            inds_s = idx_per_bpt[s]
-            inds_t = idx_per_bpt[t]
-            if not (inds_s and inds_t):
-                continue
-            candidate_edges = ((i, j) for i in inds_s for j in inds_t)
-            edges.extend(candidate_edges)
-            edge_inds.extend([k] * len(inds_s) * len(inds_t))
-        if not edges:
-            continue
-        sample_inds.extend([i] * len(edges))
-        all_edges.extend(edges)
-        all_peaks.append(peaks[np.asarray(edges)])
-    if not all_peaks:
+    order, counts, offsets = _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts)
+    src_bpts, tgt_bpts = np.asarray(graph, dtype=int).reshape((-1, 2)).T
+    paf_inds = np.asarray(paf_inds, dtype=np.int32)
+    n_edges = len(src_bpts)
+    # Candidate edges are laid out in blocks of all (source, target) pairs of peaks,
+    # one block per sample and graph edge.
+    n_sources = counts[:, src_bpts]
+    n_targets = counts[:, tgt_bpts]
+    sizes = (n_sources * n_targets).ravel()
+    block_ends = np.cumsum(sizes)
+    block_starts = block_ends - sizes
+    n_candidates = block_ends[-1] if sizes.size else 0
+    if not n_candidates:
+        if compact:
+            empty = np.empty(0, dtype=np.float32)
+            return {
+                "sample": np.empty(0, dtype=np.int32),
+                "edge": np.empty(0, dtype=np.int32),
+                "peaks": np.empty((0, 2), dtype=int),
+                "m1": empty,
+                "distance": empty.copy(),
+            }
         return [dict() for _ in range(n_samples)]
 
-    sample_inds = np.asarray(sample_inds, dtype=np.int32)
-    edge_inds = np.asarray(edge_inds, dtype=np.int32)
-    all_edges = np.asarray(all_edges, dtype=np.int32)
-    all_peaks = np.concatenate(all_peaks)
-    vecs_s = all_peaks[:, 0]
-    vecs_t = all_peaks[:, 1]
+    blocks = np.repeat(np.arange(sizes.size), sizes)
+    pos_in_block = np.arange(n_candidates) - block_starts[blocks]
+    n_targets_ = n_targets.ravel()[blocks]
+    sample_inds, edges = np.divmod(blocks, n_edges)
+    sources = order[offsets[sample_inds, src_bpts[edges]] + pos_in_block // n_targets_]
+    targets = order[offsets[sample_inds, tgt_bpts[edges]] + pos_in_block % n_targets_]
+    sample_inds = sample_inds.astype(np.int32)
+    edge_inds = paf_inds[edges]
+
+    peaks = peak_inds_in_batch[:, 1:3]
+    vecs_s = peaks[sources]
+    vecs_t = peaks[targets]
     vecs = vecs_t - vecs_s
     lengths = np.linalg.norm(vecs, axis=1).astype(np.float32)
     lengths += np.spacing(1, dtype=np.float32)
@@ -127,20 +185,30 @@ def compute_edge_costs(
     np.round(affinities, decimals=n_decimals, out=affinities)
     np.round(lengths, decimals=n_decimals, out=lengths)
 
-    # Form cost matrices
+    if compact:
+        return {
+            "sample": sample_inds,
+            "edge": edge_inds,
+            "peaks": np.stack((sources, targets), axis=1),
+            "m1": affinities,
+            "distance": lengths,
+        }
+
+    # Slice the cost matrices out of the blocks
+    shapes = np.stack((n_sources.ravel(), n_targets.ravel()), axis=1)
+    shapes[sizes == 0] = 0
+    shapes = shapes.reshape((n_samples, n_edges, 2)).tolist()
+    block_starts = block_starts.reshape((n_samples, n_edges)).tolist()
+    block_ends = block_ends.reshape((n_samples, n_edges)).tolist()
     all_costs = []
     for i in range(n_samples):
-        samples_i_mask = sample_inds == i
         costs = dict()
-        for k in paf_inds:
-            edges_k_mask = edge_inds == k
-            idx = np.flatnonzero(samples_i_mask & edges_k_mask)
-            s, t = all_edges[idx].T
-            n_sources = np.unique(s).size
-            n_targets = np.unique(t).size
-            costs[k] = dict()
-            costs[k]["m1"] = affinities[idx].reshape((n_sources, n_targets))
-            costs[k]["distance"] = lengths[idx].reshape((n_sources, n_targets))
+        for e, k in enumerate(paf_inds.tolist()):
+            start, end = block_starts[i][e], block_ends[i][e]
+            costs[k] = {
+                "m1": affinities[start:end].reshape(shapes[i][e]),
+                "distance": lengths[start:end].reshape(shapes[i][e]),
+            }
         all_costs.append(costs)
 
     return all_costs
@@ -157,7 +225,18 @@ def compute_peaks_and_costs(
     n_id_channels,
     n_points=10,
     n_decimals=3,
+    compact=False,
 ):
+    """Compute the locations, confidence and association costs of the peaks.
+
+    If ``compact`` is False (default), return one dict per sample, with keys
+    "coordinates", "confidence", "costs" (if there is a graph) and "identity"
+    (if there are identity channels), holding per-bodypart arrays, i.e. the detections
+    of a frame as read from the ``_full.detections`` store of an analyzed video (see
+    ``DetectionStore``). Otherwise, return a single dict for the whole batch, with
+    flat arrays of one row per peak of ``peak_inds_in_batch`` ("coordinates",
+    "confidence", "identity") and the compact costs of ``compute_edge_costs``.
+    """
     n_samples, _, _, n_channels = np.shape(scmaps)
     n_bodyparts = n_channels - n_id_channels
     pos = calc_peak_locations(locrefs, peak_inds_in_batch, stride, n_decimals)
@@ -170,6 +249,7 @@ def compute_peaks_and_costs(
             n_bodyparts,
             n_points,
             n_decimals,
+            compact,
         )
     else:
         costs = None
@@ -178,24 +258,33 @@ def compute_peaks_and_costs(
     if n_id_channels:
         ids = np.round(scmaps[s, r, c, -n_id_channels:], n_decimals)
 
+    if compact:
+        dict_ = {
+            "peak_inds": peak_inds_in_batch,
+            "coordinates": pos,
+            "confidence": prob,
+        }
+        if costs is not None:
+            dict_["costs"] = costs
+        if n_id_channels:
+            dict_["identity"] = ids
+        return dict_
+
+    order, counts, _ = _group_peaks(peak_inds_in_batch, n_samples, n_bodyparts)
+    # The last split holds the peaks of non-bodypart channels, if any
+    splits = np.cumsum(counts.ravel())
+    xy = np.split(pos[order], splits)
+    p = np.split(prob[order], splits)
+    if n_id_channels:
+        id_ = np.split(ids[order], splits)
     peaks_and_costs = []
     for i in range(n_samples):
-        xy = []
-        p = []
-        id_ = []
-        samples_i_mask = peak_inds_in_batch[:, 0] == i
-        for j in range(n_bodyparts):
-            bpts_j_mask = peak_inds_in_batch[:, 3] == j
-            idx = np.flatnonzero(samples_i_mask & bpts_j_mask)
-            xy.append(pos[idx])
-            p.append(prob[idx])
-            if n_id_channels:
-                id_.append(ids[idx])
-        dict_ = {"coordinates": (xy,), "confidence": p}
+        bpts = slice(i * n_bodyparts, (i + 1) * n_bodyparts)
+        dict_ = {"coordinates": (xy[bpts],), "confidence": p[bpts]}
         if costs is not None:
             dict_["costs"] = costs[i]
         if n_id_channels:
-            dict_["identity"] = id_
+            dict_["identity"] = id_[bpts]
         peaks_and_costs.append(dict_)
 
     return peaks_and_costs
@@ -15,6 +15,7 @@
 import argparse
 import logging
 import os
+import sys
 import threading
 import warnings
 from pathlib import Path
@@ -27,6 +28,7 @@ import tf_slim as slim
 from deeplabcut.pose_estimation_tensorflow.config import load_config
 from deeplabcut.pose_estimation_tensorflow.datasets import (
     Batch,
+    ParallelBatchLoader,
     PoseDatasetFactory,
 )
 from deeplabcut.pose_estimation_tensorflow.nnets import PoseNetFactory
@@ -58,6 +60,35 @@ def get_batch_spec(cfg):
     }
 
 
+def create_dataset(cfg):
+    """Create the dataset batches are preloaded from; with ``num_preload_workers``
+    set in the pose_cfg.yaml, batches are produced by as many worker processes.
+    """
+    n_workers = cfg.get("num_preload_workers", 0)
+    if n_workers and sys.version_info < (3, 8):
+        warnings.warn(
+            "Preparing batches in a single thread, as worker processes pass them "
+            "on through shared memory, which requires Python 3.8 or later."
+        )
+        n_workers = 0
+    if n_workers:
+        if cfg.get("cache_images", False):
+            # Decode the images once, before the workers map the cache
+            PoseDatasetFactory.create(cfg)
+        return ParallelBatchLoader(
+            cfg,
+            n_workers,
+            ordered=cfg.get("preload_in_order", False),
+            seed=cfg.get("preload_seed"),
+        )
+    return PoseDatasetFactory.create(cfg)
+
+
+def close_dataset(dataset):
+    if isinstance(dataset, ParallelBatchLoader):
+        dataset.close()
+
+
 def setup_preloading(batch_spec):
     placeholders = {
         name: tf.compat.v1.placeholder(tf.float32, shape=spec)
@@ -166,7 +197,7 @@ def train(
         )
         cfg["batch_size"] = 1  # in case this was edited for analysis.-
 
-    dataset = PoseDatasetFactory.create(cfg)
+    dataset = create_dataset(cfg)
     batch_spec = get_batch_spec(cfg)
     batch, enqueue_op, placeholders = setup_preloading(batch_spec)
 
@@ -306,6 +337,7 @@ def train(
     sess.close()
     coord.request_stop()
     coord.join([thread])
+    close_dataset(dataset)
     # return to original path.
     os.chdir(str(start_path))
 
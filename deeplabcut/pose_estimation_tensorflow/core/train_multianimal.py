@@ -18,11 +18,12 @@ import tensorflow as tf
 import tf_slim as slim
 
 from deeplabcut.pose_estimation_tensorflow.config import load_config
-from deeplabcut.pose_estimation_tensorflow.datasets import PoseDatasetFactory
 from deeplabcut.pose_estimation_tensorflow.nnets import PoseNetFactory
 from deeplabcut.pose_estimation_tensorflow.nnets.utils import get_batch_spec
 from deeplabcut.pose_estimation_tensorflow.util.logging import setup_logging
 from deeplabcut.pose_estimation_tensorflow.core.train import (
+    close_dataset,
+    create_dataset,
     setup_preloading,
     start_preloading,
     get_optimizer,
@@ -60,7 +61,7 @@ def train(
         print("Activating limb prediction...")
         cfg["pairwise_predict"] = True
 
-    dataset = PoseDatasetFactory.create(cfg)
+    dataset = create_dataset(cfg)
     batch_spec = get_batch_spec(cfg)
     batch, enqueue_op, placeholders = setup_preloading(batch_spec)
 
@@ -206,6 +207,7 @@ def train(
     sess.close()
     coord.request_stop()
     coord.join([thread])
+    close_dataset(dataset)
 
     # return to original path.
     os.chdir(str(start_path))
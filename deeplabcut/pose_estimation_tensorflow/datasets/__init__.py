@@ -15,6 +15,7 @@ from .pose_scalecrop import ScalecropPoseDataset
 from .pose_imgaug import ImgaugPoseDataset
 from .pose_tensorpack import TensorpackPoseDataset
 from .pose_multianimal_imgaug import MAImgaugPoseDataset
+from .loader import ParallelBatchLoader
 from .utils import Batch
 
 
@@ -25,5 +26,6 @@ __all__ = [
     "ImgaugPoseDataset",
     "TensorpackPoseDataset",
     "MAImgaugPoseDataset",
+    "ParallelBatchLoader",
     "Batch",
 ]
@@ -0,0 +1,249 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+"""Produce training batches in worker processes, passed on through shared memory."""
+import multiprocessing
+import queue
+import random
+import traceback
+
+import numpy as np
+
+from deeplabcut.pose_estimation_tensorflow.datasets.factory import PoseDatasetFactory
+
+
+_ALIGNMENT = 64
+
+
+def _aligned(nbytes):
+    return -(-nbytes // _ALIGNMENT) * _ALIGNMENT
+
+
+def _seed(seed):
+    import imgaug
+
+    random.seed(seed)
+    np.random.seed(seed)
+    imgaug.random.seed(seed)
+
+
+def _write_batch(batch, buffer):
+    """Copy the arrays of a batch into a shared memory buffer, replaced by a larger one
+    if needed. Returns the buffer, and the key, dtype, shape and offset of every array.
+    """
+    arrays = {
+        key: np.ascontiguousarray(value)
+        for key, value in batch.items()
+        if isinstance(value, np.ndarray) and value.dtype != object
+    }
+    nbytes = sum(_aligned(array.nbytes) for array in arrays.values())
+    if buffer is None or buffer.size < nbytes:
+        from multiprocessing import shared_memory
+
+        if buffer is not None:
+            buffer.close()
+            buffer.unlink()
+        # Leave some room, as the size of batches varies with augmentation
+        size = max(int(nbytes * 1.25), _ALIGNMENT)
+        buffer = shared_memory.SharedMemory(create=True, size=size)
+    layout = []
+    offset = 0
+    for key, array in arrays.items():
+        np.ndarray(array.shape, array.dtype, buffer.buf, offset)[...] = array
+        layout.append((key, array.dtype.str, array.shape, offset))
+        offset += _aligned(array.nbytes)
+    return buffer, layout
+
+
+def _produce_batches(cfg, worker, seed, n_buffers, free, ready, stop):
+    buffers = [None] * n_buffers
+    try:
+        _seed(seed)
+        dataset = PoseDatasetFactory.create(cfg)
+        index = 0
+        while not stop.is_set():
+            try:
+                slot = free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            buffers[slot], layout = _write_batch(dataset.next_batch(), buffers[slot])
+            ready.put((worker, index, slot, buffers[slot].name, layout))
+            index += 1
+    except Exception:
+        ready.put((worker, None, None, None, traceback.format_exc()))
+    finally:
+        for buffer in buffers:
+            if buffer is not None:
+                buffer.close()
+                buffer.unlink()
+
+
+class ParallelBatchLoader:
+    """Training batches produced by several worker processes.
+
+    Every worker creates its own dataset from ``cfg`` (with its own random seed)
+    and prepares batches in advance into shared memory buffers, so that image
+    decoding, augmentation and target map generation run on as many cores.
+    It serves as a drop-in replacement of the dataset in ``train.start_preloading``.
+
+    Parameters
+    ----------
+    cfg: dict
+        Training configuration (pose_cfg.yaml).
+
+    n_workers: int
+        Number of worker processes.
+
+    ordered: bool, optional, default=False
+        If True, workers deliver batches in turn, so that the sequence of batches
+        only depends on ``seed``. By default, batches are delivered as soon as
+        they are ready.
+
+    seed: int or None, optional, default=None
+        Seed the random seeds of the workers are derived from.
+
+    n_buffers: int, optional, default=2
+        Number of batches every worker can prepare in advance.
+
+    start_method: str, optional, default="spawn"
+        Start method of the worker processes.
+
+    Shared memory requires Python 3.8 or later; ``train.create_dataset`` falls back
+    to a single-threaded dataset otherwise.
+
+    Arrays returned by :meth:`next_batch` are views into shared memory, which remain
+    valid until the next call. Entries of batches that are not numerical arrays
+    (e.g., ``Batch.data_item``) are not passed on.
+    """
+
+    def __init__(
+        self,
+        cfg,
+        n_workers,
+        ordered=False,
+        seed=None,
+        n_buffers=2,
+        start_method="spawn",
+    ):
+        self.n_workers = n_workers
+        self.ordered = ordered
+        context = multiprocessing.get_context(start_method)
+        self._stop = context.Event()
+        self._ready = context.Queue()
+        self._free = []
+        self._workers = []
+        seeds = np.random.SeedSequence(seed).spawn(n_workers)
+        for worker, seed_ in enumerate(seeds):
+            free = context.Queue()
+            for slot in range(n_buffers):
+                free.put(slot)
+            process = context.Process(
+                target=_produce_batches,
+                args=(
+                    cfg,
+                    worker,
+                    int(seed_.generate_state(1)[0]),
+                    n_buffers,
+                    free,
+                    self._ready,
+                    self._stop,
+                ),
+                daemon=True,
+            )
+            process.start()
+            self._free.append(free)
+            self._workers.append(process)
+        self._buffers = dict()  # Attached buffers, per worker and slot
+        self._stale = []  # Replaced buffers, closed once their arrays are released
+        self._pending = dict()  # Batches received ahead of their turn
+        self._n_delivered = 0
+        self._current = None
+
+    def _receive(self):
+        while True:
+            try:
+                message = self._ready.get(timeout=1)
+            except queue.Empty:
+                if not all(process.is_alive() for process in self._workers):
+                    raise RuntimeError("A batch worker exited unexpectedly.")
+                continue
+            worker, index, *_, error = message
+            if index is None:
+                raise RuntimeError(f"Batch worker {worker} failed:\n{error}")
+            return message
+
+    def _attach(self, worker, slot, name):
+        buffer = self._buffers.get((worker, slot))
+        if buffer is None or buffer.name != name:
+            from multiprocessing import shared_memory
+
+            if buffer is not None:
+                self._stale.append(buffer)
+            buffer = shared_memory.SharedMemory(name=name)
+            self._buffers[(worker, slot)] = buffer
+        return buffer
+
+    def _release(self):
+        if self._current is not None:
+            worker, slot = self._current
+            self._free[worker].put(slot)
+            self._current = None
+        stale = []
+        for buffer in self._stale:
+            try:
+                buffer.close()
+            except BufferError:  # Arrays still refer to it
+                stale.append(buffer)
+        self._stale = stale
+
+    def next_batch(self):
+        self._release()
+        if self.ordered:
+            key = (
+                self._n_delivered % self.n_workers,
+                self._n_delivered // self.n_workers,
+            )
+            while key not in self._pending:
+                message = self._receive()
+                self._pending[message[:2]] = message
+            message = self._pending.pop(key)
+        else:
+            message = self._receive()
+        self._n_delivered += 1
+        worker, _, slot, name, layout = message
+        self._current = worker, slot
+        buffer = self._attach(worker, slot, name)
+        return {
+            key: np.ndarray(shape, dtype, buffer.buf, offset)
+            for key, dtype, shape, offset in layout
+        }
+
+    def close(self):
+        """Stop the workers and release the shared memory."""
+        self._stop.set()
+        for process in self._workers:
+            process.join(timeout=10)
+            if process.is_alive():
+                process.terminate()
+        while True:
+            try:
+                self._ready.get_nowait()
+            except queue.Empty:
+                break
+        self._current = None
+        self._stale.extend(self._buffers.values())
+        self._buffers.clear()
+        self._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
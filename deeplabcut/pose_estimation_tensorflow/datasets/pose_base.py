@@ -11,13 +11,20 @@
 
 
 import abc
+import os
+
 import numpy as np
 
+from deeplabcut.utils.auxfun_videos import imread
+from deeplabcut.utils.image_cache import DecodedImageCache
+
 
 class BasePoseDataset(metaclass=abc.ABCMeta):
     # TODO Finish implementing actual abstract class
     def __init__(self, cfg):
         self.cfg = cfg
+        self._image_cache = None
+        self._cache_inds = None
 
     @abc.abstractmethod
     def load_dataset(self):
@@ -37,3 +44,35 @@ class BasePoseDataset(metaclass=abc.ABCMeta):
             )
             scale *= scale_jitter
         return scale
+
+    @property
+    def image_cache_path(self):
+        # Stored in the model folder, next to the snapshots
+        return os.path.join(
+            os.path.dirname(self.cfg["snapshot_prefix"]), "decoded_images.dat"
+        )
+
+    def cache_images(self, cache_path=None):
+        """Decode the images of the dataset once, into a file they are memory-mapped
+        from (by default, ``image_cache_path``). The cache is keyed by path and
+        modification time, so it is only updated for new or modified images, and can
+        be shared by the processes producing batches.
+        """
+        paths = [
+            os.path.join(self.cfg["project_path"], item.im_path) for item in self.data
+        ]
+        unique_paths, self._cache_inds = np.unique(paths, return_inverse=True)
+        self._image_cache = DecodedImageCache(
+            unique_paths, cache_path or self.image_cache_path
+        )
+
+    def read_image(self, ind):
+        """Image of the ``ind``-th data item, as a uint8 RGB array (read-only if
+        it comes from the cache).
+        """
+        if self._image_cache is not None:
+            return self._image_cache[self._cache_inds[ind]]
+        return imread(
+            os.path.join(self.cfg["project_path"], self.data[ind].im_path),
+            mode="skimage",
+        )
@@ -22,7 +22,6 @@ import imgaug.augmenters as iaa
 import numpy as np
 import scipy.io as sio
 from deeplabcut.pose_estimation_tensorflow.datasets import augmentation
-from deeplabcut.utils.auxfun_videos import imread
 from deeplabcut.utils.conversioncode import robust_split_path
 from .factory import PoseDatasetFactory
 from .pose_base import BasePoseDataset
@@ -38,6 +37,8 @@ class ImgaugPoseDataset(BasePoseDataset):
         self.data = self.load_dataset()
         self.batch_size = cfg.get("batch_size", 1)
         self.num_images = len(self.data)
+        if cfg.get("cache_images", False):
+            self.cache_images()
         self.max_input_sizesquare = cfg.get("max_input_size", 1500) ** 2
         self.min_input_sizesquare = cfg.get("min_input_size", 64) ** 2
 
@@ -74,6 +75,10 @@ class ImgaugPoseDataset(BasePoseDataset):
                 cfg.get("motion_blur_params", {"k": 7, "angle": (-90, 90)})
             )
 
+        # Augmentation pipelines, built once and reused across batches
+        self._base_pipeline = None
+        self._pipelines = dict()
+
         print("Batch Size is %d" % self.batch_size)
 
     def load_dataset(self):
@@ -280,17 +285,35 @@ class ImgaugPoseDataset(BasePoseDataset):
             pipeline.add(iaa.Sometimes(cfg_cnv["edgeratio"], iaa.EdgeDetect(**opt)))
 
         if height is not None and width is not None:
-            if not cfg.get("crop_by", False):
-                crop_by = 0.15
-            else:
-                crop_by = cfg.get("crop_by", False)
-            pipeline.add(
-                iaa.Sometimes(
-                    cfg.get("cropratio", 0.4),
-                    iaa.CropAndPad(percent=(-crop_by, crop_by), keep_size=False),
-                )
+            for aug in self._build_resizing(height, width):
+                pipeline.add(aug)
+        return pipeline
+
+    def _build_resizing(self, height, width):
+        crop_by = self.cfg.get("crop_by", False) or 0.15
+        return [
+            iaa.Sometimes(
+                self.cfg.get("cropratio", 0.4),
+                iaa.CropAndPad(percent=(-crop_by, crop_by), keep_size=False),
+            ),
+            iaa.Resize({"height": height, "width": width}),
+        ]
+
+    def get_augmentation_pipeline(self, height, width):
+        """Augmentation pipeline resizing images to (height, width).
+
+        The augmenters independent of the target size are built once; only the
+        cropping and resizing steps are built for every new target size.
+        """
+        key = int(height), int(width)
+        pipeline = self._pipelines.get(key)
+        if pipeline is None:
+            if self._base_pipeline is None:
+                self._base_pipeline = self.build_augmentation_pipeline(apply_prob=0.5)
+            pipeline = iaa.Sequential(
+                [self._base_pipeline, *self._build_resizing(height, width)]
             )
-            pipeline.add(iaa.Resize({"height": height, "width": width}))
+            self._pipelines[key] = pipeline
         return pipeline
 
     def get_batch(self):
@@ -332,9 +355,7 @@ class ImgaugPoseDataset(BasePoseDataset):
             im_file = data_item.im_path
 
             logging.debug("image %s", im_file)
-            image = imread(
-                os.path.join(self.cfg["project_path"], im_file), mode="skimage"
-            )
+            image = self.read_image(img_idx[i])
 
             if self.has_gt:
                 joints = data_item.joints
@@ -405,15 +426,15 @@ class ImgaugPoseDataset(BasePoseDataset):
                 target_size,
             ) = self.get_batch()
 
-            pipeline = self.build_augmentation_pipeline(
-                height=target_size[0], width=target_size[1], apply_prob=0.5
-            )
-
+            pipeline = self.get_augmentation_pipeline(*target_size)
+            # Images of equal size are augmented as a single array
+            if all(image.shape == batch_images[0].shape for image in batch_images):
+                batch_images = np.stack(batch_images)
             batch_images, batch_joints = pipeline(
                 images=batch_images, keypoints=batch_joints
             )
-
-            image_shape = np.array(batch_images).shape[1:3]
+            inputs = np.asarray(batch_images, dtype=np.float64)
+            image_shape = inputs.shape[1:3]
 
             batch_joints_valid = []
             joint_ids_valid = []
@@ -443,7 +464,7 @@ class ImgaugPoseDataset(BasePoseDataset):
             #    im = kps.draw_on_image(batch_images[i])
             #    imageio.imwrite('some_location/augmented/'+str(i)+'.png', im)
 
-            batch = {Batch.inputs: np.array(batch_images).astype(np.float64)}
+            batch = {Batch.inputs: inputs}
             if self.has_gt:
                 scmap_update = self.get_scmap_update(
                     joint_ids_valid,
@@ -23,9 +23,42 @@ from deeplabcut.pose_estimation_tensorflow.datasets.factory import PoseDatasetFa
 from deeplabcut.pose_estimation_tensorflow.datasets.pose_base import BasePoseDataset
 from deeplabcut.pose_estimation_tensorflow.datasets.utils import DataItem, Batch
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
-from deeplabcut.utils.auxfun_videos import imread
 from deeplabcut.utils.conversioncode import robust_split_path
-from math import sqrt
+
+
+def _window_pixels(mins, maxs):
+    """Pixels of the windows spanning from ``mins`` to ``maxs`` (inclusive, as x, y).
+
+    Returns the index of the window, the row and the column of every pixel.
+    """
+    heights = np.maximum(maxs[:, 1] - mins[:, 1] + 1, 0)
+    widths = np.maximum(maxs[:, 0] - mins[:, 0] + 1, 0)
+    sizes = heights * widths
+    windows = np.repeat(np.arange(len(sizes)), sizes)
+    pixels = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    rows, cols = np.divmod(pixels, widths[windows])
+    return windows, rows + mins[windows, 1], cols + mins[windows, 0]
+
+
+def _solve_interval(a, lower, upper):
+    """Bounds of the x such that ``lower <= a * x <= upper``, elementwise."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x1, x2 = lower / a, upper / a
+    x_min = np.where(a > 0, x1, x2)
+    x_max = np.where(a > 0, x2, x1)
+    # If a is zero, either any x or none satisfies the inequalities
+    zero = a == 0
+    feasible = (lower[zero] <= 0) & (upper[zero] >= 0)
+    x_min[zero] = np.where(feasible, -np.inf, np.inf)
+    x_max[zero] = np.where(feasible, np.inf, -np.inf)
+    return x_min, x_max
+
+
+def _last_occurrences(keys):
+    """Indices of the last occurrence of every key; writing only these is equivalent
+    to writing all keys in order."""
+    _, inds = np.unique(keys[::-1], return_index=True)
+    return len(keys) - 1 - inds
 
 
 @PoseDatasetFactory.register("multi-animal-imgaug")
@@ -42,6 +75,8 @@ class MAImgaugPoseDataset(BasePoseDataset):
         self._n_animals = len(animals)
         self.data = self.load_dataset()
         self.num_images = len(self.data)
+        if cfg.get("cache_images", False):
+            self.cache_images()
         self.batch_size = cfg["batch_size"]
         print("Batch Size is %d" % self.batch_size)
         self._default_size = np.array(self.cfg.get("crop_size", (400, 400)))
@@ -267,9 +302,7 @@ class MAImgaugPoseDataset(BasePoseDataset):
             im_file = data_item.im_path
 
             logging.debug("image %s", im_file)
-            image = imread(
-                os.path.join(self.cfg["project_path"], im_file), mode="skimage"
-            )
+            image = self.read_image(img_idx[i])
             if self.has_gt:
                 Joints = data_item.joints
                 kpts = np.zeros((self._n_kpts * self._n_animals, 2))
@@ -446,18 +479,20 @@ class MAImgaugPoseDataset(BasePoseDataset):
     def compute_scmap_weights(self, scmap_shape, joint_id):
         cfg = self.cfg
         if cfg["weigh_only_present_joints"]:
-            weights = np.zeros(scmap_shape)
+            weights = np.zeros(scmap_shape, dtype=np.float32)
             for k, j_id in enumerate(
                 np.concatenate(joint_id)
             ):  # looping over all animals
                 weights[:, :, j_id] = 1.0
         else:
-            weights = np.ones(scmap_shape)
+            weights = np.ones(scmap_shape, dtype=np.float32)
         return weights
 
     def compute_target_part_scoremap_numpy(
         self, joint_id, coords, data_item, size, scale
     ):
+        # Only pixels close enough to a keypoint or a limb are computed, and maps are
+        # stored in float32, the precision the network is trained in.
         stride = self.cfg["stride"]
         half_stride = stride // 2
         dist_thresh = float(self.cfg["pos_dist_thresh"] * scale)
@@ -465,25 +500,26 @@ class MAImgaugPoseDataset(BasePoseDataset):
 
         num_joints = self.cfg["num_joints"]
 
-        scmap = np.zeros((*size, num_joints + num_idchannel))
+        scmap = np.zeros((*size, num_joints + num_idchannel), dtype=np.float32)
         locref_size = *size, num_joints * 2
-        locref_map = np.zeros(locref_size)
+        locref_map = np.zeros(locref_size, dtype=np.float32)
         locref_scale = 1.0 / self.cfg["locref_stdev"]
         dist_thresh_sq = dist_thresh**2
 
-        partaffinityfield_shape = *size, self.cfg["num_limbs"] * 2
-        partaffinityfield_map = np.zeros(partaffinityfield_shape)
+        num_limbs = self.cfg["num_limbs"]
+        partaffinityfield_shape = *size, num_limbs * 2
+        partaffinityfield_map = np.zeros(partaffinityfield_shape, dtype=np.float32)
         if self.cfg["weigh_only_present_joints"]:
-            partaffinityfield_mask = np.zeros(partaffinityfield_shape)
-            locref_mask = np.zeros(locref_size)
+            partaffinityfield_mask = np.zeros(partaffinityfield_shape, dtype=np.float32)
+            locref_mask = np.zeros(locref_size, dtype=np.float32)
         else:
-            partaffinityfield_mask = np.ones(partaffinityfield_shape)
-            locref_mask = np.ones(locref_size)
+            partaffinityfield_mask = np.ones(partaffinityfield_shape, dtype=np.float32)
+            locref_mask = np.ones(locref_size, dtype=np.float32)
 
         height, width = size
-        grid = np.mgrid[:height, :width].transpose((1, 2, 0))
-        xx = np.expand_dims(grid[..., 1], axis=2)
-        yy = np.expand_dims(grid[..., 0], axis=2)
+        joint_inds = np.concatenate(joint_id).astype(int)
+        coords = np.asarray(coords)[: len(joint_inds)]
+        coords_ = coords.astype(np.float64)
 
         # Produce score maps and location refinement fields
         coords_sm = np.round((coords - half_stride) / stride).astype(int)
@@ -491,89 +527,113 @@ class MAImgaugPoseDataset(BasePoseDataset):
         maxs = np.round(
             np.minimum(coords_sm + dist_thresh + 1, [width - 1, height - 1])
         ).astype(int)
-        dx = coords[:, 0] - xx * stride - half_stride
-        dx_ = dx * locref_scale
-        dy = coords[:, 1] - yy * stride - half_stride
-        dy_ = dy * locref_scale
-        dist = dx**2 + dy**2
-        mask1 = dist <= dist_thresh_sq
-        mask2 = (xx >= mins[:, 0]) & (xx <= maxs[:, 0])
-        mask3 = (yy >= mins[:, 1]) & (yy <= maxs[:, 1])
-        mask = mask1 & mask2 & mask3
-        for n, ind in enumerate(np.concatenate(joint_id).tolist()):
-            mask_ = mask[..., n]
-            scmap[mask_, ind] = 1
-            if self.cfg["weigh_only_present_joints"]:
-                locref_mask[mask_, [ind * 2 + 0, ind * 2 + 1]] = 1.0
-            locref_map[mask_, ind * 2 + 0] = dx_[mask_, n]
-            locref_map[mask_, ind * 2 + 1] = dy_[mask_, n]
+        kpts, rows, cols = _window_pixels(mins, maxs)
+        dx = coords_[kpts, 0] - cols * stride - half_stride
+        dy = coords_[kpts, 1] - rows * stride - half_stride
+        mask = dx**2 + dy**2 <= dist_thresh_sq
+        kpts, rows, cols = kpts[mask], rows[mask], cols[mask]
+        dx, dy = dx[mask], dy[mask]
+        channels = joint_inds[kpts]
+        scmap[rows, cols, channels] = 1
+        if self.cfg["weigh_only_present_joints"]:
+            locref_mask[rows, cols, channels * 2 + 0] = 1.0
+            locref_mask[rows, cols, channels * 2 + 1] = 1.0
+        # Where keypoints of the same bodypart overlap, the last one prevails
+        last = _last_occurrences((rows * width + cols) * num_joints + channels)
+        rows_, cols_, channels_ = rows[last], cols[last], channels[last]
+        locref_map[rows_, cols_, channels_ * 2 + 0] = dx[last] * locref_scale
+        locref_map[rows_, cols_, channels_ * 2 + 1] = dy[last] * locref_scale
 
         if num_idchannel > 0:
             coordinateoffset = 0
+            id_channels = np.full(len(joint_inds), -1)
             # Find indices of individuals in joint_id
-            idx = [
-                (i, id_)
-                for i, id_ in enumerate(data_item.joints)
-                if id_ < num_idchannel
-            ]
-            for i, person_id in idx:
-                joint_ids = joint_id[i]
-                n_joints = joint_ids.size
-                if n_joints:
-                    inds = np.arange(n_joints) + coordinateoffset
-                    mask_ = mask[..., inds].any(axis=2)
-                    scmap[mask_, person_id + num_joints] = 1
-                coordinateoffset += n_joints
-
+            for i, person_id in enumerate(data_item.joints):
+                if person_id < num_idchannel:
+                    n_joints = joint_id[i].size
+                    inds = slice(coordinateoffset, coordinateoffset + n_joints)
+                    id_channels[inds] = person_id + num_joints
+                    coordinateoffset += n_joints
+            has_id = id_channels[kpts] >= 0
+            scmap[rows[has_id], cols[has_id], id_channels[kpts[has_id]]] = 1
+
+        # Find the limbs whose both ends are visible, as the first occurrences
+        # of their bodyparts in the keypoints of every individual.
+        graph = np.reshape(self.cfg["partaffinityfield_graph"], (-1, 2)).astype(int)
+        first_inds = np.full((len(joint_id), num_joints), -1)
         coordinateoffset = 0  # the offset based on
-        y, x = np.rollaxis(grid * stride + half_stride, 2)
-        for person_id in range(len(joint_id)):
-            joint_ids = joint_id[person_id].tolist()
+        for person_id, joint_ids in enumerate(joint_id):
             if len(joint_ids) >= 2:  # there is a possible edge
-                for l, (bp1, bp2) in enumerate(self.cfg["partaffinityfield_graph"]):
-                    try:
-                        ind1 = joint_ids.index(bp1)
-                    except ValueError:
-                        continue
-                    try:
-                        ind2 = joint_ids.index(bp2)
-                    except ValueError:
-                        continue
-                    j_x, j_y = coords[ind1 + coordinateoffset]
-                    linkedj_x, linkedj_y = coords[ind2 + coordinateoffset]
-                    dist = sqrt((linkedj_x - j_x) ** 2 + (linkedj_y - j_y) ** 2)
-                    if dist > 0:
-                        Dx = (linkedj_x - j_x) / dist  # x-axis UNIT VECTOR
-                        Dy = (linkedj_y - j_y) / dist
-                        d1 = [
-                            Dx * j_x + Dy * j_y,
-                            Dx * linkedj_x + Dy * linkedj_y,
-                        ]  # in-line with direct axis
-                        d1lowerboundary = min(d1)
-                        d1upperboundary = max(d1)
-                        d2mid = j_y * Dx - j_x * Dy  # orthogonal direction
-
-                        distance_along = Dx * x + Dy * y
-                        distance_across = (
-                            ((y * Dx - x * Dy) - d2mid)
-                            * 1.0
-                            / self.cfg["pafwidth"]
-                            * scale
-                        )
-
-                        mask1 = (distance_along >= d1lowerboundary) & (
-                            distance_along <= d1upperboundary
-                        )
-                        distance_across_abs = np.abs(distance_across)
-                        mask2 = distance_across_abs <= 1
-                        mask = mask1 & mask2
-                        temp = 1 - distance_across_abs[mask]
-                        if self.cfg["weigh_only_present_joints"]:
-                            partaffinityfield_mask[mask, [l * 2 + 0, l * 2 + 1]] = 1.0
-                        partaffinityfield_map[mask, l * 2 + 0] = Dx * temp
-                        partaffinityfield_map[mask, l * 2 + 1] = Dy * temp
-
+                bpts, inds = np.unique(joint_ids, return_index=True)
+                first_inds[person_id, bpts.astype(int)] = inds + coordinateoffset
             coordinateoffset += len(joint_ids)  # keeping track of the blocks
+        inds1 = first_inds[:, graph[:, 0]]
+        inds2 = first_inds[:, graph[:, 1]]
+        visible = (inds1 >= 0) & (inds2 >= 0)
+        limbs = np.nonzero(visible)[1]
+        ends1, ends2 = coords[inds1[visible]], coords[inds2[visible]]
+        vec = (ends2 - ends1).astype(np.float64)
+        dist = np.sqrt(vec[:, 0] ** 2 + vec[:, 1] ** 2)
+        mask = dist > 0
+        limbs, ends1, ends2 = limbs[mask], ends1[mask], ends2[mask]
+        Dx = vec[mask, 0] / dist[mask]  # x-axis UNIT VECTOR
+        Dy = vec[mask, 1] / dist[mask]
+        ends1_, ends2_ = ends1.astype(np.float64), ends2.astype(np.float64)
+        d1 = [
+            Dx * ends1_[:, 0] + Dy * ends1_[:, 1],
+            Dx * ends2_[:, 0] + Dy * ends2_[:, 1],
+        ]  # in-line with direct axis
+        d1lowerboundary = np.minimum(*d1)
+        d1upperboundary = np.maximum(*d1)
+        d2mid = ends1_[:, 1] * Dx - ends1_[:, 0] * Dy  # orthogonal direction
+
+        # Limbs only cover the pixels within pafwidth / scale of their segment. Each
+        # row of their bounding box is narrowed down to the columns they can cover,
+        # with one pixel of margin against rounding errors.
+        radius = self.cfg["pafwidth"] / scale
+        lower = (np.minimum(ends1_, ends2_) - radius - half_stride) / stride
+        upper = (np.maximum(ends1_, ends2_) + radius - half_stride) / stride
+        mins = np.maximum(np.floor(lower).astype(int) - 1, 0)
+        maxs = np.minimum(np.ceil(upper).astype(int) + 1, [width - 1, height - 1])
+        segs, rows, _ = _window_pixels(mins * [0, 1], maxs * [0, 1])
+        y = rows * stride + half_stride
+        across = y * Dx[segs] - d2mid[segs]
+        x_min1, x_max1 = _solve_interval(Dy[segs], across - radius, across + radius)
+        along = Dy[segs] * y
+        x_min2, x_max2 = _solve_interval(
+            Dx[segs], d1lowerboundary[segs] - along, d1upperboundary[segs] - along
+        )
+        col_min = (np.maximum(x_min1, x_min2) - half_stride) / stride
+        col_max = (np.minimum(x_max1, x_max2) - half_stride) / stride
+        col_min = np.floor(np.clip(col_min, -1, width)).astype(int) - 1
+        col_max = np.ceil(np.clip(col_max, -1, width)).astype(int) + 1
+        col_min = np.maximum(col_min, mins[segs, 0])
+        col_max = np.minimum(col_max, maxs[segs, 0])
+        spans, rows, cols = _window_pixels(np.c_[col_min, rows], np.c_[col_max, rows])
+        segs = segs[spans]
+        x = cols * stride + half_stride
+        y = rows * stride + half_stride
+        Dx, Dy = Dx[segs], Dy[segs]
+        distance_along = Dx * x + Dy * y
+        distance_across = (
+            ((y * Dx - x * Dy) - d2mid[segs]) * 1.0 / self.cfg["pafwidth"] * scale
+        )
+        distance_across_abs = np.abs(distance_across)
+        mask = (
+            (distance_along >= d1lowerboundary[segs])
+            & (distance_along <= d1upperboundary[segs])
+            & (distance_across_abs <= 1)
+        )
+        rows, cols, channels = rows[mask], cols[mask], limbs[segs[mask]]
+        temp = 1 - distance_across_abs[mask]
+        if self.cfg["weigh_only_present_joints"]:
+            partaffinityfield_mask[rows, cols, channels * 2 + 0] = 1.0
+            partaffinityfield_mask[rows, cols, channels * 2 + 1] = 1.0
+        # Where limbs of different individuals overlap, the last one prevails
+        last = _last_occurrences((rows * width + cols) * num_limbs + channels)
+        rows_, cols_, channels_ = rows[last], cols[last], channels[last]
+        partaffinityfield_map[rows_, cols_, channels_ * 2 + 0] = (Dx[mask] * temp)[last]
+        partaffinityfield_map[rows_, cols_, channels_ * 2 + 1] = (Dy[mask] * temp)[last]
 
         weights = self.compute_scmap_weights(scmap.shape, joint_id)
         return (
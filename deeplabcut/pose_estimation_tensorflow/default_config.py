@@ -38,6 +38,13 @@ cfg["crop_pad"] = 0
 cfg["scoremap_dir"] = "test"
 
 cfg["batch_size"] = 1
+# number of worker processes preparing batches during training (0: a single thread),
+# see deeplabcut/pose_estimation_tensorflow/datasets/loader.py
+cfg["num_preload_workers"] = 0
+cfg["preload_in_order"] = False
+cfg["preload_seed"] = None
+# decode training images once, into a memory-mapped file in the model folder
+cfg["cache_images"] = False
 
 # types of datasets, see factory: deeplabcut/pose_estimation_tensorflow/dataset/factory.py
 cfg["dataset_type"] = "imgaug"  # >> imagaug default as of 2.2
@@ -10,9 +10,11 @@
 #
 
 
+import multiprocessing
 import os
 import pickle
 import shutil
+import warnings
 from collections import defaultdict
 from copy import deepcopy
 from tqdm import tqdm
@@ -23,10 +25,15 @@ import pandas as pd
 from scipy.spatial import cKDTree
 from sklearn.metrics.cluster import contingency_matrix
 
+from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import DetectionStore
 from deeplabcut.pose_estimation_tensorflow.lib.inferenceutils import (
-    Assembler,
+    ArrayAssembler,
     evaluate_assembly,
+    _assemblies_from_arrays,
+    _assemblies_to_arrays,
     _parse_ground_truth_data,
+    _shared_memory_available,
+    _SharedDetections,
 )
 from deeplabcut.utils import auxfun_multianimal, auxiliaryfunctions
 
@@ -187,7 +194,22 @@ def _benchmark_paf_graphs(
     margin=0,
     symmetric_kpts=None,
     split_inds=None,
+    n_processes=1,
+    patience=None,
+    start_method=None,
 ):
+    """Assemble animals and score the assemblies for every candidate graph.
+
+    Graphs are evaluated in order of increasing size. With ``n_processes`` > 1,
+    several graphs are evaluated concurrently by worker processes, sharing a
+    single copy of the detections in shared memory; otherwise, graphs are
+    evaluated one after the other, detections and edge costs being parsed only
+    once (as is also the case before Python 3.8, lacking shared memory). With ``patience``, the search stops once that many consecutive graphs
+    failed to improve the score the best graph is selected with (fraction of
+    assembled bodyparts times purity), larger graphs being skipped; as scores
+    do not vary monotonically with the size of the graph, a larger graph may
+    then be missed.
+    """
     metadata = data.pop("metadata")
     multi_bpts_orig = auxfun_multianimal.extractindividualsandbodyparts(config)[2]
     multi_bpts = [j for j in metadata["all_joints_names"] if j in multi_bpts_orig]
@@ -195,7 +217,7 @@ def _benchmark_paf_graphs(
     data_ = {"metadata": metadata}
     for k, v in data.items():
         data_[k] = v["prediction"]
-    ass = Assembler(
+    ass = ArrayAssembler(
         data_,
         max_n_individuals=inference_cfg["topktoretain"],
         n_multibodyparts=n_multi,
@@ -240,67 +262,57 @@ def _benchmark_paf_graphs(
     # Assemble animals on the full set of detections
     paf_inds = sorted(paf_inds, key=len)
     n_graphs = len(paf_inds)
+    eval_kwargs = dict(
+        oks_sigma=oks_sigma,
+        margin=margin,
+        symmetric_kpts=symmetric_kpts,
+        greedy_matching=inference_cfg.get("greedy_oks", False),
+    )
+    if n_processes > 1 and not _shared_memory_available():
+        warnings.warn(
+            "Evaluating graphs serially, as sharing detections with worker "
+            "processes requires Python 3.8 or later."
+        )
+        n_processes = 1
+    if n_processes > 1:
+        results = _evaluate_paf_graphs_in_pool(
+            ass,
+            paf_inds,
+            (ground_truth, ass_true_dict, split_inds, eval_kwargs),
+            n_processes,
+            start_method,
+        )
+    else:
+        # Frames are parsed once, and only new edges are parsed for larger graphs
+        ass.reuse_parsed_frames()
+        results = (
+            _evaluate_paf_graph(
+                ass, paf, ground_truth, ass_true_dict, split_inds, eval_kwargs
+            )
+            for paf in paf_inds
+        )
     all_scores = []
     all_metrics = []
     all_assemblies = []
-    for j, paf in enumerate(paf_inds, start=1):
+    best_score = -np.inf
+    n_stale = 0
+    for j, (paf, assemblies, unique, oks, scores) in enumerate(results, start=1):
         print(f"Graph {j}|{n_graphs}")
-        ass.paf_inds = paf
-        ass.assemble()
-        all_assemblies.append((ass.assemblies, ass.unique, ass.metadata["imnames"]))
-        if split_inds is not None:
-            oks = []
-            for inds in split_inds:
-                ass_gt = {k: v for k, v in ass_true_dict.items() if k in inds}
-                oks.append(
-                    evaluate_assembly(
-                        ass.assemblies,
-                        ass_gt,
-                        oks_sigma,
-                        margin=margin,
-                        symmetric_kpts=symmetric_kpts,
-                        greedy_matching=inference_cfg.get("greedy_oks", False),
-                    )
-                )
-        else:
-            oks = evaluate_assembly(
-                ass.assemblies,
-                ass_true_dict,
-                oks_sigma,
-                margin=margin,
-                symmetric_kpts=symmetric_kpts,
-                greedy_matching=inference_cfg.get("greedy_oks", False),
-            )
+        all_assemblies.append((assemblies, unique, image_paths))
         all_metrics.append(oks)
-        scores = np.full((len(image_paths), 2), np.nan)
-        for i, imname in enumerate(tqdm(image_paths)):
-            gt = ground_truth[i]
-            gt = gt[~np.isnan(gt).any(axis=1)]
-            if len(np.unique(gt[:, 2])) < 2:  # Only consider frames with 2+ animals
-                continue
-
-            # Count the number of unassembled bodyparts
-            n_dets = len(gt)
-            animals = ass.assemblies.get(i)
-            if animals is None:
-                if n_dets:
-                    scores[i, 0] = 1
-            else:
-                animals = [
-                    np.c_[animal.data, np.ones(animal.data.shape[0]) * n]
-                    for n, animal in enumerate(animals)
-                ]
-                hyp = np.concatenate(animals)
-                hyp = hyp[~np.isnan(hyp).any(axis=1)]
-                scores[i, 0] = max(0, (n_dets - hyp.shape[0]) / n_dets)
-                neighbors = _find_closest_neighbors(gt[:, :2], hyp[:, :2])
-                valid = neighbors != -1
-                id_gt = gt[valid, 2]
-                id_hyp = hyp[neighbors[valid], -1]
-                mat = contingency_matrix(id_gt, id_hyp)
-                purity = mat.max(axis=0).sum() / mat.sum()
-                scores[i, 1] = purity
         all_scores.append((scores, paf))
+        score = _calc_graph_score(scores)
+        if score > best_score:
+            best_score = score
+            n_stale = 0
+        else:
+            n_stale += 1
+        if patience is not None and n_stale >= patience and j < n_graphs:
+            print(
+                f"No improvement over the last {patience} graphs; "
+                f"skipping the {n_graphs - j} larger ones."
+            )
+            break
 
     dfs = []
     for score, inds in all_scores:
@@ -312,6 +324,132 @@ def _benchmark_paf_graphs(
     return (all_scores, group.agg(["mean", "std"]).T, all_metrics, all_assemblies)
 
 
+def _calc_graph_score(scores):
+    """Fraction of assembled bodyparts times purity, averaged over images;
+    this is the criterion the best graph is selected with."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        score = (1 - np.nanmean(scores[:, 0])) * np.nanmean(scores[:, 1])
+    return -np.inf if np.isnan(score) else score
+
+
+def _score_assemblies(assemblies, ground_truth):
+    scores = np.full((len(ground_truth), 2), np.nan)
+    for i, gt in enumerate(tqdm(ground_truth)):
+        gt = gt[~np.isnan(gt).any(axis=1)]
+        if len(np.unique(gt[:, 2])) < 2:  # Only consider frames with 2+ animals
+            continue
+
+        # Count the number of unassembled bodyparts
+        n_dets = len(gt)
+        animals = assemblies.get(i)
+        if animals is None:
+            if n_dets:
+                scores[i, 0] = 1
+        else:
+            animals = [
+                np.c_[animal.data, np.ones(animal.data.shape[0]) * n]
+                for n, animal in enumerate(animals)
+            ]
+            hyp = np.concatenate(animals)
+            hyp = hyp[~np.isnan(hyp).any(axis=1)]
+            scores[i, 0] = max(0, (n_dets - hyp.shape[0]) / n_dets)
+            neighbors = _find_closest_neighbors(gt[:, :2], hyp[:, :2])
+            valid = neighbors != -1
+            id_gt = gt[valid, 2]
+            id_hyp = hyp[neighbors[valid], -1]
+            mat = contingency_matrix(id_gt, id_hyp)
+            purity = mat.max(axis=0).sum() / mat.sum()
+            scores[i, 1] = purity
+    return scores
+
+
+def _evaluate_paf_graph(
+    ass, paf, ground_truth, ass_true_dict, split_inds, eval_kwargs, chunk_size=1
+):
+    ass.paf_inds = paf
+    ass.assemble(chunk_size=chunk_size)
+    if split_inds is not None:
+        oks = []
+        for inds in split_inds:
+            inds = set(inds)
+            ass_gt = {k: v for k, v in ass_true_dict.items() if k in inds}
+            oks.append(evaluate_assembly(ass.assemblies, ass_gt, **eval_kwargs))
+    else:
+        oks = evaluate_assembly(ass.assemblies, ass_true_dict, **eval_kwargs)
+    scores = _score_assemblies(ass.assemblies, ground_truth)
+    return paf, ass.assemblies, ass.unique, oks, scores
+
+
+_worker = dict()
+
+
+def _init_paf_graph_worker(state, source, metadata, imnames, evaluation):
+    ass = ArrayAssembler.__new__(ArrayAssembler)
+    ass.__dict__.update(state)
+    shared = _SharedDetections.attach(*source)
+    _worker["shared"] = shared  # Keep the shared memory block alive
+    ass.data = DetectionStore(shared.arrays, metadata, names=imnames)
+    ass.reuse_parsed_frames()
+    _worker["assembler"] = ass
+    _worker["evaluation"] = evaluation
+
+
+def _evaluate_paf_graph_in_worker(paf):
+    ass = _worker["assembler"]
+    paf, assemblies, unique, oks, scores = _evaluate_paf_graph(
+        ass, paf, *_worker["evaluation"], chunk_size=0
+    )
+    n_frames = len(ass.metadata["imnames"])
+    arrays = _assemblies_to_arrays(
+        [(assemblies.get(i), unique.get(i)) for i in range(n_frames)],
+        ass.n_multibodyparts,
+        ass.n_uniquebodyparts,
+    )
+    return paf, arrays, oks, scores
+
+
+def _evaluate_paf_graphs_in_pool(ass, paf_inds, evaluation, n_processes, start_method):
+    """Evaluate graphs in worker processes, all reading the detections from the
+    same block of shared memory. Results are yielded in the order of `paf_inds`.
+    """
+    imnames = ass.metadata["imnames"]
+    store = DetectionStore.from_dict(ass.data, imnames)
+    detections = _SharedDetections.from_store(store)
+    state = {
+        k: v
+        for k, v in ass.__dict__.items()
+        if k not in ("data", "assemblies", "unique", "_trees", "_parsed_frames")
+    }
+    initargs = (
+        state,
+        (detections.name, detections.layout),
+        ass.data["metadata"],
+        imnames,
+        evaluation,
+    )
+    context = multiprocessing.get_context(start_method)
+    try:
+        with context.Pool(
+            min(n_processes, len(paf_inds)),
+            initializer=_init_paf_graph_worker,
+            initargs=initargs,
+        ) as pool:
+            for paf, arrays, oks, scores in pool.imap(
+                _evaluate_paf_graph_in_worker, paf_inds
+            ):
+                assemblies, unique = dict(), dict()
+                results = _assemblies_from_arrays(arrays, ass.n_multibodyparts)
+                for i, (assemblies_, unique_) in enumerate(results):
+                    if assemblies_:
+                        assemblies[i] = assemblies_
+                    if unique_ is not None:
+                        unique[i] = unique_
+                yield paf, assemblies, unique, oks, scores
+    finally:
+        detections.close()
+
+
 def _get_n_best_paf_graphs(
     data,
     metadata,
@@ -390,6 +528,8 @@ def cross_validate_paf_graphs(
     n_graphs=10,
     paf_inds=None,
     symmetric_kpts=None,
+    n_processes=1,
+    patience=None,
 ):
     cfg = auxiliaryfunctions.read_config(config)
     inf_cfg = auxiliaryfunctions.read_plainconfig(inference_config)
@@ -441,6 +581,8 @@ def cross_validate_paf_graphs(
             metadata["data"]["trainIndices"],
             metadata["data"]["testIndices"],
         ],
+        n_processes=n_processes,
+        patience=patience,
     )
     # Select optimal PAF graph
     df = results[1]
@@ -448,7 +590,7 @@ def cross_validate_paf_graphs(
     pose_config = inference_config.replace("inference_cfg", "pose_cfg")
     if not overwrite_config:
         shutil.copy(pose_config, pose_config.replace(".yaml", "_old.yaml"))
-    inds = list(paf_inds[size_opt])
+    inds = list(results[0][size_opt][1])
     auxiliaryfunctions.edit_config(
         pose_config, {"paf_best": [int(ind) for ind in inds]}
     )
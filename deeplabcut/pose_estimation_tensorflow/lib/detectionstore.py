@@ -0,0 +1,318 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+"""
+Columnar storage of the raw detections of multi-animal models.
+
+A store is a folder of flat binary columns, memory-mapped on reading:
+    - one row per frame: ``frame_inds``, ``counts`` (number of peaks per bodypart),
+      ``cost_shapes`` (shape of the cost matrices of every graph edge, or -1
+      for missing edges), and the ``peak_offsets`` and ``cost_offsets`` of the
+      frames (one extra row);
+    - one row per peak: ``xy``, ``confidence``, ``bodypart`` and ``identity``
+      (only if the network was trained with identity);
+    - one row per candidate connection: one column per cost (e.g., ``costs_m1``
+      and ``costs_distance``), the cost matrices of a frame being flattened
+      edge by edge.
+Column dtypes and shapes, together with the metadata, are kept in ``index.pickle``.
+
+The store behaves like the dict of per-frame detections saved in *_full.pickle
+files, frames being read lazily and without copy.
+"""
+import numpy as np
+import os
+import pickle
+import re
+import shutil
+from collections.abc import Mapping
+
+
+STORE_SUFFIX = "_full.detections"
+_INDEX_FILE = "index.pickle"
+_COST_PREFIX = "costs_"
+
+
+def get_store_path(dataname):
+    """Path to the detection store corresponding to a *.h5 output file."""
+    return dataname.split(".h5")[0] + STORE_SUFFIX
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, _INDEX_FILE))
+
+
+def pack_frames(frames, n_bodyparts, n_edges):
+    """Flatten an iterable of per-frame detection dicts into columns.
+
+    The offset columns are not computed; the numbers of peaks and costs
+    of every frame are returned instead.
+    """
+    counts, xy, conf, bpts, ids = [], [], [], [], []
+    cost_shapes, costs = [], dict()
+    n_costs = []
+    for data_dict in frames:
+        coordinates = data_dict["coordinates"][0]
+        counts_ = [len(coords) for coords in coordinates]
+        counts.append(counts_)
+        xy.extend(np.reshape(coords, (-1, 2)) for coords in coordinates)
+        conf.extend(np.ravel(p) for p in data_dict["confidence"])
+        bpts.append(np.repeat(np.arange(len(counts_)), counts_))
+        if "identity" in data_dict:
+            ids.extend(data_dict["identity"])
+        costs_ = data_dict.get("costs") or dict()
+        n = 0
+        for k in range(n_edges):
+            if k not in costs_:
+                cost_shapes.append((-1, -1))
+                continue
+            for key, arr in costs_[k].items():
+                costs.setdefault(key, []).append(np.ravel(arr))
+            shape = np.shape(next(iter(costs_[k].values())))
+            cost_shapes.append(shape)
+            n += shape[0] * shape[1]
+        n_costs.append(n)
+    columns = {
+        "counts": np.reshape(counts, (-1, n_bodyparts)).astype(np.int64),
+        "cost_shapes": np.reshape(cost_shapes, (-1, n_edges, 2)).astype(np.int64),
+        "xy": np.concatenate(xy) if xy else np.empty((0, 2)),
+        "confidence": np.concatenate(conf) if conf else np.empty(0),
+        "bodypart": np.concatenate(bpts).astype(np.int64),
+    }
+    if ids:
+        columns["identity"] = np.concatenate(ids)
+    for key, arrays in costs.items():
+        columns[_COST_PREFIX + key] = np.concatenate(arrays)
+    return columns, columns["counts"].sum(axis=1), np.asarray(n_costs, dtype=np.int64)
+
+
+class DetectionStore(Mapping):
+    """Read-only, dict-like access to columnar multi-animal detections.
+
+    Keys are "metadata" and the frame names, as in *_full.pickle files;
+    frames can also be accessed by row with :meth:`frame`.
+    """
+
+    def __init__(self, columns, metadata, names=None, strwidth=None, path=None):
+        self.columns = columns
+        self.metadata = metadata
+        self.path = path
+        self._names = names
+        self._strwidth = strwidth
+        self._rows = None
+
+    @classmethod
+    def open(cls, path):
+        with open(os.path.join(path, _INDEX_FILE), "rb") as file:
+            index = pickle.load(file)
+        columns = dict()
+        for name, (dtype, shape) in index["columns"].items():
+            if not np.prod(shape):  # Empty files cannot be memory-mapped
+                columns[name] = np.empty(shape, dtype=dtype)
+            else:
+                columns[name] = np.memmap(
+                    os.path.join(path, name + ".bin"),
+                    dtype=dtype,
+                    mode="r",
+                    shape=tuple(shape),
+                )
+        return cls(columns, index["metadata"], strwidth=index["strwidth"], path=path)
+
+    @classmethod
+    def from_dict(cls, data, names=None):
+        """Build an in-memory store from a dict of per-frame detections.
+
+        Frames are stored in the order of `names` if given,
+        otherwise in the order of the dict.
+        """
+        metadata = data["metadata"]
+        if names is None:
+            names = [name for name in data if name != "metadata"]
+        names = list(names)
+        columns, n_peaks, n_costs = pack_frames(
+            (data[name] for name in names),
+            len(metadata["all_joints_names"]),
+            len(metadata["PAFgraph"]),
+        )
+        columns["peak_offsets"] = np.r_[0, np.cumsum(n_peaks)]
+        columns["cost_offsets"] = np.r_[0, np.cumsum(n_costs)]
+        return cls(columns, metadata, names=names)
+
+    @property
+    def n_frames(self):
+        return len(self.columns["counts"])
+
+    @property
+    def frame_names(self):
+        if self._names is None:
+            self._names = [
+                "frame" + str(ind).zfill(self._strwidth)
+                for ind in self.columns["frame_inds"]
+            ]
+        return self._names
+
+    @property
+    def frame_indices(self):
+        """Video frame indices of the rows of the store."""
+        if "frame_inds" in self.columns:
+            return np.asarray(self.columns["frame_inds"])
+        return np.asarray([int(re.findall(r"\d+", s)[0]) for s in self.frame_names])
+
+    @property
+    def cost_keys(self):
+        return [
+            name[len(_COST_PREFIX) :]
+            for name in self.columns
+            if name.startswith(_COST_PREFIX)
+        ]
+
+    def __len__(self):
+        return self.n_frames + 1
+
+    def __iter__(self):
+        yield "metadata"
+        yield from self.frame_names
+
+    def __getitem__(self, key):
+        if key == "metadata":
+            return self.metadata
+        if self._rows is None:
+            self._rows = {name: row for row, name in enumerate(self.frame_names)}
+        return self.frame(self._rows[key])
+
+    def frame(self, row):
+        """Detections of the frame stored at `row`, as views into the columns."""
+        counts = self.columns["counts"][row]
+        bounds = self.columns["peak_offsets"][row] + np.r_[0, np.cumsum(counts)]
+        coordinates, confidence, identity = [], [], []
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            coordinates.append(self.columns["xy"][start:end])
+            confidence.append(self.columns["confidence"][start:end, np.newaxis])
+            if "identity" in self.columns:
+                identity.append(self.columns["identity"][start:end])
+        data_dict = {"coordinates": (coordinates,), "confidence": confidence}
+        if identity:
+            data_dict["identity"] = identity
+        keys = self.cost_keys
+        if keys:
+            costs = dict()
+            offset = self.columns["cost_offsets"][row]
+            for k, (n_rows, n_cols) in enumerate(self.columns["cost_shapes"][row]):
+                if n_rows < 0:
+                    continue
+                end = offset + n_rows * n_cols
+                costs[k] = {
+                    key: self.columns[_COST_PREFIX + key][offset:end].reshape(
+                        (n_rows, n_cols)
+                    )
+                    for key in keys
+                }
+                offset = end
+            data_dict["costs"] = costs
+        return data_dict
+
+    def peak_slice(self, row):
+        """Slice of the peak columns holding the detections of the frame at `row`."""
+        offsets = self.columns["peak_offsets"]
+        return slice(offsets[row], offsets[row + 1])
+
+    def close(self):
+        self.columns = dict()
+
+
+class DetectionStoreWriter:
+    """Append detections frame by frame to a columnar store.
+
+    Frames are buffered and flushed to disk by chunks of `chunksize` frames.
+    Like a dict, it accepts `writer["metadata"] = ...` and
+    `writer["frame0042"] = data_dict`. The store is only readable once
+    the writer is closed.
+    """
+
+    def __init__(self, path, chunksize=1000):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+        self.path = path
+        self.chunksize = chunksize
+        self.metadata = dict()
+        self._strwidth = None
+        self._buffer = []
+        self._inds = []
+        self._last_ind = -1
+        self._files = dict()
+        self._columns = dict()  # name -> (dtype, shape)
+        self._n_peaks = 0
+        self._n_costs = 0
+        self._write("peak_offsets", np.zeros(1, dtype=np.int64))
+        self._write("cost_offsets", np.zeros(1, dtype=np.int64))
+
+    def __setitem__(self, key, value):
+        if key == "metadata":
+            self.metadata = value
+            return
+        digits = re.findall(r"\d+", key)[0]
+        if self._strwidth is None:
+            self._strwidth = len(digits)
+        self.append(int(digits), value)
+
+    def append(self, ind, data_dict):
+        if ind <= self._last_ind:
+            raise ValueError("Frames must be appended in increasing order.")
+        self._last_ind = ind
+        self._inds.append(ind)
+        self._buffer.append(data_dict)
+        if len(self._buffer) >= self.chunksize:
+            self.flush()
+
+    def _write(self, name, arr):
+        if name not in self._files:
+            self._files[name] = open(os.path.join(self.path, name + ".bin"), "wb")
+            self._columns[name] = (arr.dtype.str, list(arr.shape))
+        else:
+            dtype, shape = self._columns[name]
+            if list(arr.shape[1:]) != shape[1:]:
+                raise ValueError(f"Inconsistent shape for column '{name}'.")
+            arr = arr.astype(dtype, copy=False)
+            shape[0] += len(arr)
+        self._files[name].write(np.ascontiguousarray(arr).tobytes())
+
+    def flush(self):
+        if not self._buffer:
+            return
+        columns, n_peaks, n_costs = pack_frames(
+            self._buffer,
+            len(self.metadata["all_joints_names"]),
+            len(self.metadata["PAFgraph"]),
+        )
+        columns["frame_inds"] = np.asarray(self._inds, dtype=np.int64)
+        columns["peak_offsets"] = self._n_peaks + np.cumsum(n_peaks)
+        columns["cost_offsets"] = self._n_costs + np.cumsum(n_costs)
+        self._n_peaks = columns["peak_offsets"][-1]
+        self._n_costs = columns["cost_offsets"][-1]
+        for name, arr in columns.items():
+            self._write(name, arr)
+        for file in self._files.values():
+            file.flush()
+        self._buffer.clear()
+        self._inds.clear()
+
+    def close(self):
+        self.flush()
+        for file in self._files.values():
+            file.close()
+        if self._strwidth is None:
+            self._strwidth = int(np.ceil(np.log10(max(self._last_ind, 1) + 1)))
+        index = {
+            "metadata": self.metadata,
+            "columns": self._columns,
+            "strwidth": self._strwidth,
+        }
+        with open(os.path.join(self.path, _INDEX_FILE), "wb") as file:
+            pickle.dump(index, file, pickle.HIGHEST_PROTOCOL)
@@ -15,6 +15,7 @@ import multiprocessing
 import networkx as nx
 import numpy as np
 import operator
+import os
 import pandas as pd
 import pickle
 import warnings
@@ -22,6 +23,8 @@ from collections import defaultdict
 from dataclasses import dataclass
 from math import sqrt, erf
 from scipy.optimize import linear_sum_assignment
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import connected_components
 from scipy.spatial import cKDTree
 from scipy.spatial.distance import pdist, cdist
 from scipy.special import softmax
@@ -29,6 +32,8 @@ from scipy.stats import gaussian_kde, chi2
 from tqdm import tqdm
 from typing import Tuple
 
+from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import DetectionStore
+
 
 def _conv_square_to_condensed_indices(ind_row, ind_col, n):
     if ind_row == ind_col:
@@ -775,36 +780,102 @@ class Assembler:
 
         return assemblies, unique
 
-    def assemble(self, chunk_size=1, n_processes=None):
+    def assemble(self, chunk_size=1, n_processes=None, start_method=None):
+        """Assemble the detections of all frames.
+
+        Parameters
+        ----------
+        chunk_size : int, optional (default=1)
+            Minimal number of consecutive frames handed over to a worker process.
+            Frames are split into contiguous ranges (one per process by default)
+            so that the temporal coherence of `window_size` is preserved within
+            each range. Pass 0 to assemble all frames in the main process.
+
+        n_processes : int, optional (default=None)
+            Number of worker processes. By default, as many as there are CPUs.
+
+        start_method : str, optional (default=None)
+            Multiprocessing start method ("fork", "spawn" or "forkserver").
+            By default, that of the platform.
+
+        With `window_size` >= 1, the temporal KD-trees of the first frames of every
+        range are rebuilt by re-assembling the preceding `10 * window_size` frames.
+        As these trees depend on the entire history of the video, the assemblies at
+        the seams between ranges approximate, rather than reproduce, those of a
+        serial pass; pass `chunk_size=0` for exactly serial results.
+        """
         self.assemblies = dict()
         self.unique = dict()
-        # Spawning (rather than forking) multiple processes does not
-        # work nicely with the GUI or interactive sessions.
-        # In that case, we fall back to the serial assembly.
-        if chunk_size == 0 or multiprocessing.get_start_method() == "spawn":
+        n_frames = len(self.metadata["imnames"])
+        n_processes = n_processes or os.cpu_count() or 1
+        if chunk_size:
+            n_processes = min(n_processes, n_frames // chunk_size)
+        imnames = self.metadata["imnames"]
+        # Stores on disk are simply memory-mapped by every worker;
+        # other detections are shared with the workers through shared memory.
+        on_disk = (
+            isinstance(self.data, DetectionStore)
+            and self.data.path is not None
+            and self.data.frame_names == imnames
+        )
+        if chunk_size and n_processes > 1 and not on_disk:
+            if not _shared_memory_available():
+                warnings.warn(
+                    "Assembling serially, as sharing detections with worker "
+                    "processes requires Python 3.8 or later."
+                )
+                n_processes = 1
+        if chunk_size == 0 or n_processes <= 1:
             for i, data_dict in enumerate(tqdm(self)):
                 assemblies, unique = self._assemble(data_dict, i)
                 if assemblies:
                     self.assemblies[i] = assemblies
                 if unique is not None:
                     self.unique[i] = unique
-        else:
-            global wrapped  # Hack to make the function pickable
-
-            def wrapped(i):
-                return i, self._assemble(self[i], i)
+            return
 
-            n_frames = len(self.metadata["imnames"])
-            with multiprocessing.Pool(n_processes) as p:
+        # Detections are shared with the workers rather than pickled, and
+        # workers return compact arrays rather than Assembly objects.
+        detections = None
+        if on_disk:
+            source = self.data.path
+        else:
+            if (
+                isinstance(self.data, DetectionStore)
+                and self.data.frame_names == imnames
+            ):
+                store = self.data
+            else:
+                store = DetectionStore.from_dict(self.data, imnames)
+            detections = _SharedDetections.from_store(store)
+            source = detections.name, detections.layout
+        state = {
+            k: v
+            for k, v in self.__dict__.items()
+            if k not in ("data", "assemblies", "unique", "_trees", "_parsed_frames")
+        }
+        bounds = np.linspace(0, n_frames, n_processes + 1).astype(int)
+        context = multiprocessing.get_context(start_method)
+        try:
+            with context.Pool(
+                n_processes,
+                initializer=_init_assembly_worker,
+                initargs=(type(self), state, source),
+            ) as p:
                 with tqdm(total=n_frames) as pbar:
-                    for i, (assemblies, unique) in p.imap_unordered(
-                        wrapped, range(n_frames), chunksize=chunk_size
+                    for start, arrays in p.imap_unordered(
+                        _assemble_frame_range, zip(bounds[:-1], bounds[1:])
                     ):
-                        if assemblies:
-                            self.assemblies[i] = assemblies
-                        if unique is not None:
-                            self.unique[i] = unique
-                        pbar.update()
+                        results = _assemblies_from_arrays(arrays, self.n_multibodyparts)
+                        for i, (assemblies, unique) in enumerate(results, start):
+                            if assemblies:
+                                self.assemblies[i] = assemblies
+                            if unique is not None:
+                                self.unique[i] = unique
+                            pbar.update()
+        finally:
+            if detections is not None:
+                detections.close()
 
     @staticmethod
     def parse_metadata(data):
@@ -855,6 +926,787 @@ class Assembler:
             pickle.dump(data, file, pickle.HIGHEST_PROTOCOL)
 
 
+def _shared_memory_available():
+    """Whether arrays can be shared with worker processes (Python 3.8+)."""
+    try:
+        from multiprocessing import shared_memory  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _SharedDetections:
+    """Columns of a detection store copied into shared memory.
+
+    Worker processes rebuild the per-frame detection dicts from views of
+    these arrays, which avoids pickling the detections for every task.
+    """
+
+    def __init__(self, shm, layout, owner=False):
+        self._shm = shm
+        self._owner = owner
+        self.layout = layout
+        self.arrays = dict()
+        for key, (offset, dtype, shape) in layout.items():
+            arr = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            arr.flags.writeable = owner
+            self.arrays[key] = arr
+
+    @property
+    def name(self):
+        return self._shm.name
+
+    @classmethod
+    def from_store(cls, store):
+        from multiprocessing import shared_memory
+
+        layout = dict()
+        size = 0
+        for key, arr in store.columns.items():
+            size = -(-size // 8) * 8  # 8-byte alignment
+            layout[key] = (size, arr.dtype.str, arr.shape)
+            size += arr.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        detections = cls(shm, layout, owner=True)
+        for key, arr in store.columns.items():
+            detections.arrays[key][...] = arr
+        return detections
+
+    @classmethod
+    def attach(cls, name, layout):
+        from multiprocessing import shared_memory
+
+        return cls(shared_memory.SharedMemory(name=name), layout)
+
+    def to_store(self, metadata=None):
+        return DetectionStore(self.arrays, metadata)
+
+    def close(self):
+        self.arrays = dict()
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+def _assemblies_to_arrays(results, n_multibodyparts, n_uniquebodyparts):
+    """Pack the assemblies and unique bodyparts of consecutive frames into arrays."""
+    n_assemblies, data, visible, affinity = [], [], [], []
+    n_idx, idx, n_links, links = [], [], [], []
+    unique = np.full((len(results), n_uniquebodyparts, 3), np.nan)
+    has_unique = np.zeros(len(results), dtype=bool)
+    for n, (assemblies, unique_) in enumerate(results):
+        assemblies = assemblies or []
+        n_assemblies.append(len(assemblies))
+        for assembly in assemblies:
+            data.append(assembly.data)
+            mask = np.zeros(n_multibodyparts, dtype=bool)
+            mask[list(assembly._visible)] = True
+            visible.append(mask)
+            affinity.append(assembly._affinity)
+            n_idx.append(len(assembly._idx))
+            idx.extend(assembly._idx)
+            n_links.append(len(assembly._links))
+            for link in assembly._links:
+                links.append(
+                    [
+                        *link.j1.pos,
+                        link.j1.confidence,
+                        link.j1.label,
+                        link.j1.idx,
+                        link.j1.group,
+                        *link.j2.pos,
+                        link.j2.confidence,
+                        link.j2.label,
+                        link.j2.idx,
+                        link.j2.group,
+                        link.affinity,
+                    ]
+                )
+        if unique_ is not None:
+            unique[n] = unique_
+            has_unique[n] = True
+    return {
+        "n_assemblies": np.asarray(n_assemblies, dtype=int),
+        "data": np.reshape(data, (-1, n_multibodyparts, 4)),
+        "visible": np.reshape(visible, (-1, n_multibodyparts)),
+        "affinity": np.asarray(affinity, dtype=float),
+        "n_idx": np.asarray(n_idx, dtype=int),
+        "idx": np.asarray(idx, dtype=int),
+        "n_links": np.asarray(n_links, dtype=int),
+        "links": np.reshape(links, (-1, 13)),
+        "unique": unique,
+        "has_unique": has_unique,
+    }
+
+
+def _assemblies_from_arrays(arrays, n_multibodyparts):
+    """Inverse of `_assemblies_to_arrays`; yield (assemblies, unique) per frame."""
+    idx = np.split(arrays["idx"], np.cumsum(arrays["n_idx"])[:-1])
+    links = np.split(arrays["links"], np.cumsum(arrays["n_links"])[:-1])
+    n = 0
+    for n_assemblies, unique, has_unique in zip(
+        arrays["n_assemblies"], arrays["unique"], arrays["has_unique"]
+    ):
+        assemblies = []
+        for _ in range(n_assemblies):
+            ass = Assembly(n_multibodyparts)
+            ass.data[:] = arrays["data"][n]
+            ass._visible.update(np.flatnonzero(arrays["visible"][n]).tolist())
+            ass._idx.update(idx[n].tolist())
+            ass._affinity = arrays["affinity"][n]
+            for row in links[n]:
+                j1 = Joint(tuple(row[:2]), row[2], int(row[3]), int(row[4]), row[5])
+                j2 = Joint(tuple(row[6:8]), row[8], int(row[9]), int(row[10]), row[11])
+                ass._links.append(Link(j1, j2, row[12]))
+            assemblies.append(ass)
+            n += 1
+        yield assemblies or None, unique if has_unique else None
+
+
+_worker = dict()
+_N_WARMUP_WINDOWS = 10
+
+
+def _init_assembly_worker(cls, state, source):
+    assembler = cls.__new__(cls)
+    assembler.__dict__.update(state)
+    assembler.data = None
+    assembler.assemblies = dict()
+    assembler.unique = dict()
+    _worker["assembler"] = assembler
+    if isinstance(source, str):
+        _worker["detections"] = DetectionStore.open(source)
+    else:
+        shared = _SharedDetections.attach(*source)
+        _worker["shared"] = shared  # Keep the shared memory block alive
+        _worker["detections"] = shared.to_store()
+
+
+def _assemble_frame_range(bounds):
+    start, stop = bounds
+    assembler = _worker["assembler"]
+    detections = _worker["detections"]
+    window_size = assembler.window_size
+    assembler._trees = dict()
+    # The temporal KD-trees of the first frames depend on the preceding ones,
+    # which are re-assembled first. This only approximates the trees of a serial
+    # pass, as these depend on the entire history of the video.
+    results = []
+    for i in range(max(0, start - _N_WARMUP_WINDOWS * window_size), stop):
+        result = assembler._assemble(detections.frame(i), i)
+        if i >= start:
+            results.append(result)
+        assembler._trees.pop(i - window_size, None)
+    arrays = _assemblies_to_arrays(
+        results, assembler.n_multibodyparts, assembler.n_uniquebodyparts
+    )
+    return start, arrays
+
+
+class _IndexedAssembly:
+    """Assembly state referring to joints and links by their row in the frame arrays.
+
+    Mirrors the semantics (and the insertion order of the underlying sets)
+    of :class:`Assembly` so that both assemblers produce identical results.
+    """
+
+    def __init__(self, size, labels, pairs, affinities):
+        self.slots = [-1] * size
+        self._labels = labels
+        self._pairs = pairs
+        self._affinities = affinities
+        self._affinity = 0
+        self._links = []
+        self._visible = set()
+        self._idx = set()
+
+    def __len__(self):
+        return len(self._visible)
+
+    def __contains__(self, assembly):
+        return bool(self._visible.intersection(assembly._visible))
+
+    def __add__(self, other):
+        if other in self:
+            raise ValueError("Assemblies contain shared joints.")
+
+        assembly = _IndexedAssembly(
+            len(self.slots), self._labels, self._pairs, self._affinities
+        )
+        for link in self._links + other._links:
+            assembly.add_link(link)
+        return assembly
+
+    def add_joint(self, idx):
+        label = self._labels[idx]
+        if label in self._visible:
+            return False
+        self.slots[label] = idx
+        self._visible.add(label)
+        self._idx.add(idx)
+        return True
+
+    def add_link(self, link):
+        i1, i2 = self._pairs[link]
+        if i1 in self._idx and i2 in self._idx:
+            self._affinity += self._affinities[link]
+            self._links.append(link)
+            return False
+        if self._labels[i1] in self._visible and self._labels[i2] in self._visible:
+            return False
+        self.add_joint(i1)
+        self.add_joint(i2)
+        self._affinity += self._affinities[link]
+        self._links.append(link)
+        return True
+
+
+class _UnionFind:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, i):
+        root = i
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[i] != root:
+            self.parent[i], i = root, self.parent[i]
+        return root
+
+    def union(self, i, j):
+        """Attach the tree of j to that of i."""
+        self.parent[self.find(j)] = self.find(i)
+
+
+class ArrayAssembler(Assembler):
+    """Array-backed counterpart of :class:`Assembler`.
+
+    Detections of a frame are flattened into a structured array of joints,
+    and candidate links are selected for all graph edges at once
+    (greedy matching is solved by iteratively keeping the locally dominant
+    links, which yields the same pairs as the sequential greedy pass).
+    Complete individuals are found from the connected components of the
+    selected links, and superfluous assemblies are fused with a union-find.
+    Joint, Link and Assembly objects are only created for the final,
+    returned assemblies, which are identical to those of :class:`Assembler`.
+
+    Calibrated assembly (see :meth:`Assembler.calibrate`), `force_fusion`,
+    `identity_only` and the trivial single-bodypart/single-animal cases are
+    delegated to the reference implementation.
+    """
+
+    joint_dtype = np.dtype(
+        [
+            ("x", np.float64),
+            ("y", np.float64),
+            ("confidence", np.float64),
+            ("label", np.int64),
+            ("group", np.int64),
+        ]
+    )
+
+    # Parsed detections and edge costs of every frame, see `reuse_parsed_frames`
+    _parsed_frames = None
+
+    def reuse_parsed_frames(self):
+        """Keep the detections and edge costs of frames once parsed, so that
+        assembling the same frames again with other `paf_inds` (e.g., when
+        comparing graphs of increasing size) only parses the new edges.
+        """
+        self._parsed_frames = dict()
+
+    @staticmethod
+    def _empty_links(n, affinity_dtype=np.float64):
+        # Affinities retain the dtype of the costs so that assembly scores
+        # accumulate exactly as they do with Link objects.
+        dtype = [("j1", np.int64), ("j2", np.int64), ("affinity", affinity_dtype)]
+        return np.empty(n, dtype=dtype)
+
+    @property
+    def _uses_reference(self):
+        return (
+            self._kde is not None
+            or self.safe_edge
+            or self.force_fusion
+            or self.identity_only
+            or self.n_multibodyparts == 1
+            or self.max_n_individuals == 1
+        )
+
+    @staticmethod
+    def _flatten_detections_to_array(data_dict):
+        """Return the frame's joints as a structured array, along with their
+        coordinates and confidences in their original dtype.
+        The row index of a joint is its `idx`."""
+        coordinates = data_dict["coordinates"][0]
+        confidence = data_dict["confidence"]
+        ids = data_dict.get("identity", None)
+        xy, conf, labels, groups = [], [], [], []
+        for i, (coords, p) in enumerate(zip(coordinates, confidence)):
+            if not np.any(coords):
+                continue
+            coords = np.asarray(coords)
+            n = len(coords)
+            xy.append(coords.reshape((n, 2)))
+            conf.append(np.asarray(p)[:n].reshape(n))
+            labels.append(np.full(n, i))
+            if ids is None:
+                groups.append(np.full(n, -1))
+            else:
+                groups.append(ids[i][:n].argmax(axis=1))
+        joints = np.empty(sum(map(len, labels)), dtype=ArrayAssembler.joint_dtype)
+        if not len(joints):
+            return joints, None, None
+        xy = np.concatenate(xy)
+        conf = np.concatenate(conf)
+        joints["x"] = xy[:, 0]
+        joints["y"] = xy[:, 1]
+        joints["confidence"] = conf
+        joints["label"] = np.concatenate(labels)
+        joints["group"] = np.concatenate(groups)
+        return joints, xy, conf
+
+    def _get_trees(self, ind_frame):
+        trees = []
+        for j in range(1, self.window_size + 1):
+            tree = self._trees.get(ind_frame - j, None)
+            if tree is not None:
+                trees.append(tree)
+        return trees
+
+    def _parse_edge(self, ind, bounds, costs):
+        """Bounds of the detections of the edge `ind` and their affinities,
+        or None if the edge cannot link any detections."""
+        s, t = self.graph[ind]
+        if s >= len(bounds) - 1 or t >= len(bounds) - 1:
+            return
+        start_s, end_s = bounds[s], bounds[s + 1]
+        start_t, end_t = bounds[t], bounds[t + 1]
+        if start_s == end_s or start_t == end_t:
+            return
+        if ind not in costs:
+            return
+        if np.isinf(costs[ind]["distance"]).all():
+            return
+        aff = costs[ind][self.method].copy()
+        aff[np.isnan(aff)] = 0
+        return start_s, end_s, start_t, end_t, aff
+
+    def _select_links(self, joints, costs, trees=None, parsed_edges=None):
+        """Vectorized equivalent of :meth:`Assembler.extract_best_links`.
+
+        Edges found in `parsed_edges` are not parsed again; newly parsed
+        edges are added to it.
+        """
+        labels = joints["label"]
+        bounds = np.searchsorted(labels, np.arange(labels[-1] + 2))
+        xy = np.c_[joints["x"], joints["y"]]
+        conf = joints["confidence"]
+
+        edges = []
+        for ind in self.paf_inds:
+            if parsed_edges is None:
+                edge = self._parse_edge(ind, bounds, costs)
+            elif ind in parsed_edges:
+                edge = parsed_edges[ind]
+            else:
+                edge = parsed_edges[ind] = self._parse_edge(ind, bounds, costs)
+            if edge is not None:
+                edges.append(edge)
+
+        if not edges:
+            return self._empty_links(0)
+
+        # Flat view over all candidate pairs of all edges, in row-major order
+        n_s = np.array([e[1] - e[0] for e in edges])
+        n_t = np.array([e[3] - e[2] for e in edges])
+        sizes = n_s * n_t
+        edge = np.repeat(np.arange(len(edges)), sizes)
+        pos = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        j1 = np.repeat([e[0] for e in edges], sizes) + pos // n_t[edge]
+        j2 = np.repeat([e[2] for e in edges], sizes) + pos % n_t[edge]
+        aff = np.concatenate([e[4].ravel() for e in edges])
+        if trees:
+            vecs = np.c_[xy[j1], xy[j2]]
+            dists = []
+            for n, tree in enumerate(trees, start=1):
+                d, _ = tree.query(vecs)
+                dists.append(np.exp(-self._gamma * n * d))
+            aff *= np.mean(dists, axis=0)
+
+        if self.greedy:
+            mask = (conf[j1] * conf[j2] >= self.pcutoff * self.pcutoff) & (
+                aff >= self.min_affinity
+            )
+            edge, pos, j1, j2, aff = (arr[mask] for arr in (edge, pos, j1, j2, aff))
+            order = np.lexsort((pos, -aff, edge))
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            # Detections are matched independently for every edge
+            n_joints = len(joints)
+            key1 = edge * n_joints + j1
+            key2 = edge * n_joints + j2
+            size = len(edges) * n_joints
+            alive = np.ones(len(rank), dtype=bool)
+            selected = np.zeros_like(alive)
+            while alive.any():
+                inds = np.flatnonzero(alive)
+                best1 = np.full(size, len(rank))
+                best2 = np.full(size, len(rank))
+                np.minimum.at(best1, key1[inds], rank[inds])
+                np.minimum.at(best2, key2[inds], rank[inds])
+                dominant = inds[
+                    (rank[inds] == best1[key1[inds]])
+                    & (rank[inds] == best2[key2[inds]])
+                ]
+                selected[dominant] = True
+                used1 = np.zeros(size, dtype=bool)
+                used2 = np.zeros(size, dtype=bool)
+                used1[key1[dominant]] = True
+                used2[key2[dominant]] = True
+                alive &= ~(used1[key1] | used2[key2])
+            inds = np.flatnonzero(selected)
+            inds = inds[np.argsort(rank[inds])]
+            # Only keep the first `max_n_individuals` links of every edge
+            _, first, counts = np.unique(
+                edge[inds], return_index=True, return_counts=True
+            )
+            nth = np.arange(len(inds)) - np.repeat(first, counts)
+            inds = inds[nth < self.max_n_individuals]
+            links = self._empty_links(len(inds), aff.dtype)
+            links["j1"] = j1[inds]
+            links["j2"] = j2[inds]
+            links["affinity"] = aff[inds]
+            return links
+
+        # Optimal keypoint pairing between the `max_n_individuals` most
+        # confident detections of every bodypart above `pcutoff`
+        order = np.lexsort((-conf, labels))
+        rank = np.arange(len(order)) - bounds[labels[order]]
+        kept = order[(rank < self.max_n_individuals) & (conf[order] >= self.pcutoff)]
+        bounds_kept = np.searchsorted(labels[kept], np.arange(labels[-1] + 2))
+        offsets = np.cumsum(sizes) - sizes
+        inds_s, inds_t = [], []
+        for n, (start_s, end_s, start_t, end_t, _) in enumerate(edges):
+            s, t = labels[start_s], labels[start_t]
+            keep_s = kept[bounds_kept[s] : bounds_kept[s + 1]]
+            keep_t = kept[bounds_kept[t] : bounds_kept[t + 1]]
+            aff_ = aff[offsets[n] : offsets[n] + sizes[n]]
+            aff_ = aff_.reshape((end_s - start_s, end_t - start_t))
+            aff_ = aff_[(keep_s - start_s)[:, None], keep_t - start_t]
+            rows, cols = linear_sum_assignment(aff_, maximize=True)
+            inds_s.append(keep_s[rows])
+            inds_t.append(keep_t[cols])
+        j1 = np.concatenate(inds_s)
+        j2 = np.concatenate(inds_t)
+        # Recover the affinities from the flat array of candidate pairs
+        edge = np.repeat(np.arange(len(edges)), [len(inds) for inds in inds_s])
+        starts_s = np.array([e[0] for e in edges])
+        starts_t = np.array([e[2] for e in edges])
+        w = aff[offsets[edge] + (j1 - starts_s[edge]) * n_t[edge] + j2 - starts_t[edge]]
+        valid = w >= self.min_affinity
+        links = self._empty_links(valid.sum(), aff.dtype)
+        links["j1"] = j1[valid]
+        links["j2"] = j2[valid]
+        links["affinity"] = w[valid]
+        return links
+
+    def _fill_indexed_assembly(self, assembly, lookup, assembled, affinities):
+        stack = []
+        visited = set()
+        counter = itertools.count()
+
+        def push_to_stack(i):
+            for j, link in lookup[i].items():
+                if j in assembly._idx:
+                    continue
+                pair = assembly._pairs[link]
+                if pair in visited:
+                    continue
+                heapq.heappush(stack, (-affinities[link], next(counter), link))
+                visited.add(pair)
+
+        for idx in assembly._idx:
+            push_to_stack(idx)
+
+        while stack and len(assembly) < self.n_multibodyparts:
+            _, _, best = heapq.heappop(stack)
+            i, j = assembly._pairs[best]
+            if i in assembly._idx:
+                new_ind = j
+            elif j in assembly._idx:
+                new_ind = i
+            else:
+                continue
+            if new_ind in assembled:
+                continue
+            assembly.add_link(best)
+            push_to_stack(new_ind)
+
+    def _build_indexed_assemblies(self, links, labels):
+        pairs = list(zip(links["j1"].tolist(), links["j2"].tolist()))
+        affinities = list(links["affinity"])
+
+        def new_assembly():
+            return _IndexedAssembly(self.n_multibodyparts, labels, pairs, affinities)
+
+        lookup = defaultdict(dict)
+        for n, (i, j) in enumerate(pairs):
+            lookup[i][j] = n
+            lookup[j][i] = n
+
+        assemblies = []
+        assembled = set()
+
+        # Fill the subsets with unambiguous, complete individuals
+        if len(links):
+            nodes = np.c_[links["j1"], links["j2"]].ravel()
+            n_nodes = len(labels)
+            adj = coo_matrix(
+                (np.ones(len(links)), (links["j1"], links["j2"])),
+                shape=(n_nodes, n_nodes),
+            )
+            _, comp = connected_components(adj, directed=False)
+            unq_nodes = np.unique(nodes)
+            sizes = np.bincount(comp[unq_nodes], minlength=n_nodes)
+            # Components are visited in order of first appearance of their nodes
+            _, first = np.unique(comp[nodes], return_index=True)
+            comps = comp[nodes[np.sort(first)]]
+            comps = comps[sizes[comps] == self.n_multibodyparts]
+            link_comp = comp[links["j1"]]
+            forward = links["j1"] < links["j2"]
+            for c in comps:
+                assembly = new_assembly()
+                for n in np.flatnonzero((link_comp == c) & forward).tolist():
+                    if assembly.add_link(n):
+                        i, j = pairs[n]
+                        lookup[i].pop(j)
+                        lookup[j].pop(i)
+                assembled.update(assembly._idx)
+                assemblies.append(assembly)
+
+        if len(assemblies) == self.max_n_individuals:
+            return assemblies, assembled
+
+        for n in np.argsort(-links["affinity"], kind="stable").tolist():
+            if any(i in assembled for i in pairs[n]):
+                continue
+            assembly = new_assembly()
+            assembly.add_link(n)
+            self._fill_indexed_assembly(assembly, lookup, assembled, affinities)
+            for link in assembly._links:
+                i, j = pairs[link]
+                lookup[i].pop(j)
+                lookup[j].pop(i)
+            assembled.update(assembly._idx)
+            assemblies.append(assembly)
+
+        # Fuse superfluous assemblies
+        if len(assemblies) > self.max_n_individuals:
+            store = dict()
+            for n, assembly in enumerate(assemblies):
+                if len(assembly) != self.n_multibodyparts:
+                    for i in assembly._idx:
+                        store[i] = n
+            uf = _UnionFind(len(assemblies))
+            used = set(link for assembly in assemblies for link in assembly._links)
+            removed = set()
+            for n, (i, j) in enumerate(pairs):
+                if n in used or i not in store or j not in store:
+                    continue
+                root_i = uf.find(store[i])
+                root_j = uf.find(store[j])
+                if assemblies[root_j] not in assemblies[root_i]:
+                    assemblies[root_i] = assemblies[root_i] + assemblies[root_j]
+                    removed.add(root_j)
+                    uf.union(root_i, root_j)
+            assemblies = [a for n, a in enumerate(assemblies) if n not in removed]
+
+        # Second pass
+        for assembly in assemblies:
+            if len(assembly) != self.n_multibodyparts:
+                self._fill_indexed_assembly(assembly, lookup, assembled, affinities)
+                assembled.update(assembly._idx)
+
+        return assemblies, assembled
+
+    def _suppress_overlapping(self, assemblies, joints):
+        """Vectorized non-maximum suppression of assemblies."""
+        xy = np.full((len(assemblies), self.n_multibodyparts, 2), np.nan)
+        for n, assembly in enumerate(assemblies):
+            for label in assembly._visible:
+                idx = assembly.slots[label]
+                xy[n, label] = joints["x"][idx], joints["y"][idx]
+        mins = np.nanmin(xy, axis=1)
+        maxs = np.nanmax(xy, axis=1)
+        ll = np.maximum(mins[:, None], mins[None])
+        ur = np.minimum(maxs[:, None], maxs[None])
+        # inside[a, b, k]: whether keypoint k of assembly a lies within the
+        # intersection of the bounding boxes of assemblies a and b.
+        inside = np.all(
+            (xy[:, None] >= ll[:, :, None]) & (xy[:, None] <= ur[:, :, None]), axis=3
+        )
+        lengths = np.array([len(assembly) for assembly in assemblies])
+        frac = inside.sum(axis=2) / lengths[:, None]
+        overlap = np.minimum(frac, frac.T)
+        overlap[np.any(ur < ll, axis=2)] = 0
+        scores = np.array([assembly._affinity for assembly in assemblies])
+        keep = []
+        suppressed = np.zeros(len(assemblies), dtype=bool)
+        for n in np.argsort(-scores, kind="stable"):
+            if suppressed[n]:
+                continue
+            keep.append(assemblies[n])
+            suppressed |= overlap[n] >= self.max_overlap
+        return keep
+
+    def _make_joint(self, idx, joints, xy, conf):
+        return Joint(
+            tuple(xy[idx]),
+            conf[idx].item(),
+            int(joints["label"][idx]),
+            idx,
+            joints["group"][idx],
+        )
+
+    def _to_assembly(self, assembly, joints, links, xy, conf):
+        ass = Assembly(self.n_multibodyparts)
+        inds = [assembly.slots[label] for label in assembly._visible]
+        data = joints[inds]
+        ass.data[list(assembly._visible)] = np.c_[
+            data["x"], data["y"], data["confidence"], data["group"]
+        ]
+        ass._visible = assembly._visible
+        ass._idx = assembly._idx
+        ass._affinity = assembly._affinity
+        cache = dict()
+
+        def get_joint(idx):
+            if idx not in cache:
+                cache[idx] = self._make_joint(idx, joints, xy, conf)
+            return cache[idx]
+
+        for n in assembly._links:
+            link = links[n]
+            ass._links.append(
+                Link(
+                    get_joint(int(link["j1"])),
+                    get_joint(int(link["j2"])),
+                    link["affinity"],
+                )
+            )
+        return ass
+
+    def _assemble(self, data_dict, ind_frame):
+        if self._uses_reference:
+            return super()._assemble(data_dict, ind_frame)
+
+        if self._parsed_frames is None:
+            joints, xy, conf = self._flatten_detections_to_array(data_dict)
+            parsed_edges = None
+        else:
+            if ind_frame not in self._parsed_frames:
+                self._parsed_frames[ind_frame] = (
+                    *self._flatten_detections_to_array(data_dict),
+                    dict(),
+                )
+            joints, xy, conf, parsed_edges = self._parsed_frames[ind_frame]
+        if not len(joints):
+            return None, None
+
+        labels = joints["label"]
+        bounds = np.searchsorted(labels, np.arange(self.n_keypoints + 1))
+        assembled = set()
+
+        if self.n_uniquebodyparts:
+            unique = np.full((self.n_uniquebodyparts, 3), np.nan)
+            for n, ind in enumerate(range(self.n_multibodyparts, self.n_keypoints)):
+                start, end = bounds[ind], bounds[ind + 1]
+                if start == end:
+                    continue
+                best = start + np.argmax(joints["confidence"][start:end])
+                # Mark the unique body parts as assembled anyway so
+                # they are not used later on to fill assemblies.
+                assembled.update(range(start, end))
+                if (
+                    joints["confidence"][best] <= self.pcutoff
+                    and not self.add_discarded
+                ):
+                    continue
+                unique[n] = joints[["x", "y", "confidence"]][best].tolist()
+            if np.isnan(unique).all():
+                unique = None
+        else:
+            unique = None
+
+        if bounds[self.n_multibodyparts] == 0:
+            return None, unique
+
+        links = self._select_links(
+            joints, data_dict["costs"], self._get_trees(ind_frame), parsed_edges
+        )
+        if self.window_size >= 1 and len(links):
+            # Store selected edges for subsequent frames
+            vecs = np.c_[xy[links["j1"]], xy[links["j2"]]]
+            self._trees[ind_frame] = cKDTree(vecs)
+
+        assemblies, assembled_ = self._build_indexed_assemblies(links, labels.tolist())
+        assembled.update(assembled_)
+
+        # Remove invalid assemblies
+        if self.add_discarded:
+            discarded = set(
+                self._make_joint(idx, joints, xy, conf)
+                for idx in range(len(joints))
+                if idx not in assembled and np.isfinite(conf[idx])
+            )
+        valid = []
+        for assembly in assemblies[::-1]:
+            if 0 < len(assembly._links) < self.min_n_links or not len(assembly):
+                if self.add_discarded:
+                    for link in assembly._links:
+                        discarded.update(
+                            self._make_joint(int(idx), joints, xy, conf)
+                            for idx in links[["j1", "j2"]][link]
+                        )
+            else:
+                valid.append(assembly)
+        assemblies = valid[::-1]
+        if 0 < self.max_overlap < 1 and assemblies:  # Non-maximum pose suppression
+            assemblies = self._suppress_overlapping(assemblies, joints)
+        if len(assemblies) > self.max_n_individuals:
+            assemblies = sorted(assemblies, key=len, reverse=True)
+            if self.add_discarded:
+                for assembly in assemblies[self.max_n_individuals :]:
+                    for link in assembly._links:
+                        discarded.update(
+                            self._make_joint(int(idx), joints, xy, conf)
+                            for idx in links[["j1", "j2"]][link]
+                        )
+            assemblies = assemblies[: self.max_n_individuals]
+
+        assemblies = [
+            self._to_assembly(assembly, joints, links, xy, conf)
+            for assembly in assemblies
+        ]
+        if self.add_discarded and discarded:
+            # Fill assemblies with unconnected body parts
+            for joint in sorted(discarded, key=lambda x: x.confidence, reverse=True):
+                dists = []
+                for i, assembly in enumerate(assemblies):
+                    if joint.label in assembly._visible:
+                        continue
+                    d = cdist(assembly.xy, np.atleast_2d(joint.pos))
+                    dists.append((i, np.nanmin(d)))
+                if not dists:
+                    continue
+                min_ = sorted(dists, key=lambda x: x[1])
+                ind, _ = min_[0]
+                assemblies[ind].add_joint(joint)
+
+        return assemblies, unique
+
+
 def calc_object_keypoint_similarity(
     xy_pred,
     xy_true,
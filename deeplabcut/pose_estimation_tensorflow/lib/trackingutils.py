@@ -156,6 +156,26 @@ class Ellipse:
             ax.add_artist(minor)
 
 
+def calc_similarity_matrix(ellipses, ellipses_ref):
+    """Similarities between all pairs of ellipses, as in `Ellipse.calc_similarity_with`.
+
+    Ellipses are given as arrays of parameters of shape (n_ellipses, 5).
+    """
+    ellipses = np.asarray(ellipses, dtype=np.float64)[:, np.newaxis]
+    ellipses_ref = np.asarray(ellipses_ref, dtype=np.float64)[np.newaxis]
+    max_dist = np.maximum(
+        np.maximum(ellipses[..., 2], ellipses[..., 3]),
+        np.maximum(ellipses_ref[..., 2], ellipses_ref[..., 3]),
+    )
+    dist = np.sqrt(
+        (ellipses[..., 0] - ellipses_ref[..., 0]) ** 2
+        + (ellipses[..., 1] - ellipses_ref[..., 1]) ** 2
+    )
+    cost1 = 1 - np.minimum(dist / max_dist, 1)
+    cost2 = np.abs(np.cos(ellipses[..., 4] - ellipses_ref[..., 4]))
+    return 0.8 * cost1 + 0.2 * cost2 * cost1
+
+
 class EllipseFitter:
     def __init__(self, sd=2):
         self.sd = sd
@@ -190,6 +210,50 @@ class EllipseFitter:
             return el
         return None
 
+    def fit_batch(self, poses):
+        """Fit the ellipses of several poses at once.
+
+        Parameters
+        ----------
+        poses : array-like
+            Keypoint coordinates of shape (n_poses, n_keypoints, 2).
+
+        Returns
+        -------
+        Ellipse parameters (x, y, width, height, theta) of shape (n_poses, 5);
+        rows are NaN wherever `fit` would return None.
+        """
+        poses = np.asarray(poses, dtype=np.float64)
+        params = np.full((len(poses), 5), np.nan)
+        if not self.sd:  # Least-squares fits are not batched
+            for i, pose in enumerate(poses):
+                el = self.fit(pose)
+                if el is not None:
+                    params[i] = el.parameters
+            return params
+        visible = np.isfinite(poses).all(axis=2)
+        n_visible = visible.sum(axis=1)
+        fitted = n_visible >= 3
+        if not fitted.any():
+            return params
+        visible = visible[fitted, :, np.newaxis]
+        n_visible = n_visible[fitted, np.newaxis]
+        xy = np.where(visible, poses[fitted], 0)
+        centers = xy.sum(axis=1) / n_visible
+        xy_demean = np.where(visible, xy - centers[:, np.newaxis], 0)
+        cov = np.einsum("nki,nkj->nij", xy_demean, xy_demean)
+        cov /= (n_visible - 1)[..., np.newaxis]
+        E, V = np.linalg.eigh(cov)  # Eigenvalues in ascending order
+        with np.errstate(invalid="ignore"):
+            axes = 2 * self.sd * np.sqrt(E)
+        rotation = np.arctan2(V[:, 1, 1], V[:, 0, 1]) % np.pi
+        params[fitted, :2] = centers
+        params[fitted, 2] = axes[:, 1]
+        params[fitted, 3] = axes[:, 0]
+        params[fitted, 4] = rotation
+        params[np.isnan(params).any(axis=1)] = np.nan
+        return params
+
     @staticmethod
     @jit(nopython=True)
     def _fit(x, y):
@@ -288,13 +352,17 @@ class EllipseFitter:
 class EllipseTracker(BaseTracker):
     def __init__(self, params):
         super().__init__(dim=5, dim_z=5)
-        self.kf.R[2:, 2:] *= 10.0
-        # High uncertainty to the unobservable initial velocities
-        self.kf.P[5:, 5:] *= 1000.0
-        self.kf.P *= 10.0
-        self.kf.Q[5:, 5:] *= 0.01
+        self.configure_filter(self.kf)
         self.state = params
 
+    @staticmethod
+    def configure_filter(kf):
+        kf.R[2:, 2:] *= 10.0
+        # High uncertainty to the unobservable initial velocities
+        kf.P[5:, 5:] *= 1000.0
+        kf.P *= 10.0
+        kf.Q[5:, 5:] *= 0.01
+
     @BaseTracker.state.setter
     def state(self, params):
         state = np.asarray(params).reshape((-1, 1))
@@ -304,9 +372,13 @@ class EllipseTracker(BaseTracker):
 class SkeletonTracker(BaseTracker):
     def __init__(self, n_bodyparts):
         super().__init__(dim=n_bodyparts * 2, dim_z=n_bodyparts)
-        self.kf.Q[self.kf.dim_z :, self.kf.dim_z :] *= 10
-        self.kf.R[self.kf.dim_z :, self.kf.dim_z :] *= 0.01
-        self.kf.P[self.kf.dim_z :, self.kf.dim_z :] *= 1000
+        self.configure_filter(self.kf)
+
+    @staticmethod
+    def configure_filter(kf):
+        kf.Q[kf.dim_z :, kf.dim_z :] *= 10
+        kf.R[kf.dim_z :, kf.dim_z :] *= 0.01
+        kf.P[kf.dim_z :, kf.dim_z :] *= 1000
 
     def update(self, pose):
         flat = pose.reshape((-1, 1))
@@ -756,6 +828,282 @@ class SORTBox(SORTBase):
         return matches, np.array(unmatched_detections), np.array(unmatched_trackers)
 
 
+class StackedKalmanFilter:
+    """Constant-velocity Kalman filters of several objects, stacked into arrays.
+
+    All filters share the same model (`F`, `H`, `Q`, `R`) and initial covariance,
+    taken from a filterpy `KalmanFilter`, so that predicting and updating all
+    objects are single batched matrix operations.
+    """
+
+    def __init__(self, kf):
+        self.F = kf.F
+        self.H = kf.H
+        self.Q = kf.Q
+        self.R = kf.R
+        self.P0 = kf.P
+        self.dim_z = kf.dim_z
+        self.x = np.empty((0, kf.dim_x))
+        self.P = np.empty((0, kf.dim_x, kf.dim_x))
+
+    def __len__(self):
+        return len(self.x)
+
+    @property
+    def states(self):
+        return self.x[:, : self.dim_z]
+
+    def add(self, states):
+        x = np.zeros((len(states), self.x.shape[1]))
+        x[:, : self.dim_z] = states
+        self.x = np.concatenate((self.x, x))
+        self.P = np.concatenate((self.P, np.repeat(self.P0[None], len(states), 0)))
+
+    def keep(self, mask):
+        self.x = self.x[mask]
+        self.P = self.P[mask]
+
+    def predict(self, inds=slice(None)):
+        self.x[inds] = self.x[inds] @ self.F.T
+        self.P[inds] = self.F @ self.P[inds] @ self.F.T + self.Q
+
+    def update(self, inds, z, observed=None):
+        """Update the filters at `inds` with the measurements `z`.
+
+        Measurements flagged as unobserved by the boolean array `observed`
+        are ignored, as if the corresponding rows of `H` were zero.
+        """
+        x = self.x[inds]
+        P = self.P[inds]
+        H = np.broadcast_to(self.H, (len(x),) + self.H.shape)
+        if observed is not None:
+            H = H * observed[..., np.newaxis]
+            z = np.where(observed, z, 0)
+        HT = H.swapaxes(1, 2)
+        y = z - np.einsum("nij,nj->ni", H, x)
+        PHT = P @ HT
+        S = H @ PHT + self.R
+        K = PHT @ np.linalg.inv(S)
+        self.x[inds] = x + np.einsum("nij,nj->ni", K, y)
+        I_KH = np.eye(x.shape[1]) - K @ H
+        self.P[inds] = I_KH @ P @ I_KH.swapaxes(1, 2) + K @ self.R @ K.swapaxes(1, 2)
+
+
+def _mode(values):
+    vals, counts = np.unique(np.ravel(values), return_counts=True)
+    return vals[np.argmax(counts)]
+
+
+class BatchedSORTBase(SORTBase):
+    """SORT trackers whose Kalman filters and counters are held in stacked arrays,
+    rather than in one tracker object per animal."""
+
+    def __init__(self, kf):
+        super().__init__()
+        self.kf = StackedKalmanFilter(kf)
+        self.ids = np.empty(0, dtype=int)
+        self.age = np.empty(0, dtype=int)
+        self.hits = np.empty(0, dtype=int)
+        self.hit_streak = np.empty(0, dtype=int)
+        self.time_since_update = np.empty(0, dtype=int)
+        self._n_trackers = 0
+
+    def __len__(self):
+        return len(self.kf)
+
+    def _add_trackers(self, states):
+        n = len(states)
+        if not n:
+            return
+        self.kf.add(states)
+        new_ids = self._n_trackers + np.arange(n)
+        self.ids = np.concatenate((self.ids, new_ids))
+        self._n_trackers += n
+        for name in ("age", "hits", "hit_streak", "time_since_update"):
+            counts = np.concatenate((getattr(self, name), np.zeros(n, dtype=int)))
+            setattr(self, name, counts)
+
+    def _keep_trackers(self, mask):
+        self.kf.keep(mask)
+        for name in ("ids", "age", "hits", "hit_streak", "time_since_update"):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def _predict(self, inds=slice(None)):
+        self.kf.predict(inds)
+        self.age[inds] += 1
+        self.hit_streak[inds] *= self.time_since_update[inds] == 0
+        self.time_since_update[inds] += 1
+        return self.kf.states[inds]
+
+    def _count_hits(self, inds):
+        self.time_since_update[inds] = 0
+        self.hits[inds] += 1
+        self.hit_streak[inds] += 1
+
+    def _update(self, inds, z):
+        self._count_hits(inds)
+        self.kf.update(inds, z)
+
+
+class BatchedSORTEllipse(BatchedSORTBase):
+    """Vectorized counterpart of `SORTEllipse`, yielding the same tracks.
+
+    Ellipses of a frame are fitted at once, their similarities to the
+    predicted tracks computed as a matrix, and all Kalman filters
+    predicted and updated together.
+    """
+
+    def __init__(self, max_age, min_hits, iou_threshold, sd=2):
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.iou_threshold = iou_threshold
+        self.fitter = EllipseFitter(sd)
+        kf = kinematic_kf(5, 1, dim_z=5, order_by_dim=False)
+        EllipseTracker.configure_filter(kf)
+        super().__init__(kf)
+        self.identities = np.empty(0)
+
+    def _keep_trackers(self, mask):
+        super()._keep_trackers(mask)
+        self.identities = self.identities[mask]
+
+    def track(self, poses, identities=None):
+        self.n_frames += 1
+
+        trackers = self._predict()
+        empty = np.isnan(trackers).any(axis=1)
+        if empty.any():
+            self._keep_trackers(~empty)
+            trackers = trackers[~empty]
+
+        params = self.fitter.fit_batch(poses)
+        fitted = np.flatnonzero(~np.isnan(params).any(axis=1))
+        ellipses = params[fitted]
+        n_ellipses = len(ellipses)
+        if identities is not None:
+            pred_ids = np.array([_mode(identities[i]) for i in fitted])
+        matched = np.full(len(trackers), -1)
+        if not len(trackers):
+            unmatched_detections = np.arange(n_ellipses)
+        else:
+            cost_matrix = calc_similarity_matrix(ellipses, trackers)
+            if identities is not None:
+                same = pred_ids[:, np.newaxis] == self.identities
+                cost_matrix = cost_matrix * np.where(same, 2, 1)
+            rows, cols = linear_sum_assignment(cost_matrix, maximize=True)
+            keep = cost_matrix[rows, cols] >= self.iou_threshold
+            unassigned = np.ones(n_ellipses, dtype=bool)
+            unassigned[rows] = False
+            unmatched_detections = np.concatenate(
+                (np.flatnonzero(unassigned), rows[~keep])
+            )
+            matched[cols[keep]] = rows[keep]
+
+        updated = np.flatnonzero(matched != -1)
+        if len(updated):
+            self._update(updated, ellipses[matched[updated]])
+
+        unmatched_detections = unmatched_detections.astype(int)
+        self._add_trackers(ellipses[unmatched_detections])
+        if identities is not None:
+            # As in SORTEllipse, identities are here indexed by fitted ellipse
+            new_ids = [_mode(identities[i]) for i in unmatched_detections]
+        else:
+            new_ids = np.full(len(unmatched_detections), np.nan)
+        self.identities = np.concatenate((self.identities, new_ids))
+        animalindex = np.concatenate((matched, unmatched_detections))
+
+        rev = slice(None, None, -1)
+        reported = (self.time_since_update[rev] < 1) & (
+            (self.hit_streak[rev] >= self.min_hits) | (self.n_frames <= self.min_hits)
+        )
+        ret = np.column_stack((self.kf.states, self.ids, animalindex))[rev][reported]
+        self._keep_trackers(self.time_since_update <= self.max_age)
+        return ret
+
+
+class BatchedSORTSkeleton(BatchedSORTBase):
+    """Vectorized counterpart of `SORTSkeleton`, yielding the same tracks.
+
+    Hausdorff distances between all detected and predicted poses are computed
+    at once, and all Kalman filters are predicted and updated together.
+    """
+
+    def __init__(self, n_bodyparts, max_age=20, min_hits=3, oks_threshold=0.5):
+        self.n_bodyparts = n_bodyparts
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.oks_threshold = oks_threshold
+        kf = kinematic_kf(n_bodyparts * 2, 1, dim_z=n_bodyparts, order_by_dim=False)
+        SkeletonTracker.configure_filter(kf)
+        super().__init__(kf)
+
+    @staticmethod
+    def calc_pairwise_hausdorff_dist(poses, poses_ref):
+        """Directed Hausdorff distances between all pairs of poses,
+        ignoring missing keypoints as in `SORTSkeleton.weighted_hausdorff`."""
+        poses = np.asarray(poses, dtype=np.float64)[:, np.newaxis, :, np.newaxis]
+        poses_ref = np.asarray(poses_ref, dtype=np.float64)[np.newaxis, :, np.newaxis]
+        d = (poses[..., 0] - poses_ref[..., 0]) ** 2 + (
+            poses[..., 1] - poses_ref[..., 1]
+        ) ** 2
+        d = np.where(np.isnan(d), np.inf, d)
+        cmin = d.min(axis=3)
+        cmin[np.isinf(cmin)] = 0
+        return np.sqrt(cmin.max(axis=2, initial=0))
+
+    def _add_poses(self, poses):
+        poses = np.array(poses, dtype=np.float64).reshape((-1, self.n_bodyparts, 2))
+        empty = np.isnan(poses).all(axis=2)
+        if empty.any():
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", category=RuntimeWarning)
+                fill = np.nanmean(poses, axis=1, keepdims=True)
+            poses = np.where(empty[..., np.newaxis], fill, poses)
+        self._add_trackers(poses.reshape((-1, self.n_bodyparts * 2)))
+
+    def track(self, poses):
+        self.n_frames += 1
+
+        if not len(self):
+            self._add_poses(poses)
+
+        poses_ref = self._predict().reshape((len(self), -1, 2))
+        mat = self.calc_pairwise_hausdorff_dist(poses, poses_ref)
+        rows, cols = linear_sum_assignment(mat, maximize=False)
+        matched = np.full(len(self), -1)
+        matched[cols] = rows
+        if len(rows):
+            z = np.reshape(poses, (len(poses), -1))[rows]
+            observed = ~np.isnan(z)
+            self.kf.update(cols, z, observed)
+            # As in SkeletonTracker, incomplete poses do not count as hits
+            self._count_hits(cols[observed.all(axis=1)])
+
+        unassigned = np.ones(len(poses), dtype=bool)
+        unassigned[rows] = False
+        unmatched_poses = np.flatnonzero(unassigned)
+        self._add_poses(np.asarray(poses)[unmatched_poses])
+        animalindex = np.concatenate((matched, unmatched_poses))
+
+        # As in SORTSkeleton, stale trackers are popped from the end of the list
+        n_trackers = len(self)
+        remaining = n_trackers
+        reported = []
+        for i in reversed(range(n_trackers)):
+            if self.time_since_update[i] > self.max_age:
+                remaining -= 1
+            else:
+                reported.append(i)
+        reported = np.asarray(reported, dtype=int)
+        states = self._predict(reported)
+        ids = self.ids[reported]
+        self._keep_trackers(np.arange(n_trackers) < remaining)
+        if len(reported):
+            return np.column_stack((states, ids, animalindex[reported]))
+        return np.empty((0, self.n_bodyparts * 2 + 2))
+
+
 def fill_tracklets(tracklets, trackers, animals, imname):
     for content in trackers:
         tracklet_id, pred_id = content[-2:].astype(np.int)
@@ -808,12 +1156,14 @@ def _track_individuals(
         raise ValueError(f"Unknown {track_method} tracker.")
 
     if track_method == "ellipse":
-        tracker = SORTEllipse(max_age, min_hits, similarity_threshold)
+        tracker = BatchedSORTEllipse(max_age, min_hits, similarity_threshold)
     elif track_method == "box":
         tracker = SORTBox(max_age, min_hits, similarity_threshold)
     else:
         n_bodyparts = individuals[0][0].shape[0]
-        tracker = SORTSkeleton(n_bodyparts, max_age, min_hits, similarity_threshold)
+        tracker = BatchedSORTSkeleton(
+            n_bodyparts, max_age, min_hits, similarity_threshold
+        )
 
     tracklets = defaultdict(dict)
     all_hyps = dict()
@@ -21,6 +21,12 @@ from skimage.util import img_as_ubyte
 from tqdm import tqdm
 
 from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal as predict
+from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import (
+    DetectionStoreWriter,
+    STORE_SUFFIX,
+    get_store_path,
+    is_store,
+)
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
 from deeplabcut.utils.auxfun_videos import VideoWriter
 import pickle
@@ -129,7 +135,9 @@ def AnalyzeMultiAnimalVideo(
     auxiliaryfunctions.attempttomakefolder(destfolder)
     dataname = os.path.join(destfolder, vname + DLCscorer + ".h5")
 
-    if os.path.isfile(dataname.split(".h5")[0] + "_full.pickle"):
+    if os.path.isfile(dataname.split(".h5")[0] + "_full.pickle") or is_store(
+        get_store_path(dataname)
+    ):
         print("Video already analyzed!", dataname)
     else:
         print("Loading ", video)
@@ -167,7 +175,7 @@ def AnalyzeMultiAnimalVideo(
         if use_shelve:
             shelf_path = dataname.split(".h5")[0] + "_full.pickle"
         else:
-            shelf_path = ""
+            shelf_path = get_store_path(dataname)
         if int(dlc_cfg["batch_size"]) > 1:
             PredicteData, nframes = GetPoseandCostsF(
                 cfg,
@@ -217,14 +225,9 @@ def AnalyzeMultiAnimalVideo(
         metadata = {"data": dictionary}
         print("Video Analyzed. Saving results in %s..." % (destfolder))
 
-        if use_shelve:
-            metadata_path = dataname.split(".h5")[0] + "_meta.pickle"
-            with open(metadata_path, "wb") as f:
-                pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
-        else:
-            _ = auxfun_multianimal.SaveFullMultiAnimalData(
-                PredicteData, metadata, dataname
-            )
+        metadata_path = dataname.split(".h5")[0] + "_meta.pickle"
+        with open(metadata_path, "wb") as f:
+            pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
 
 
 def _get_features_dict(raw_coords, features, stride):
@@ -365,6 +368,15 @@ def GetPoseandCostsF_from_assemblies(
     return PredicteData, nframes
 
 
+def _open_detections_db(path):
+    """Container for the raw detections: a columnar store, a shelf, or a dict."""
+    if not path:
+        return dict()
+    if path.endswith(STORE_SUFFIX):
+        return DetectionStoreWriter(path)
+    return shelve.open(path, protocol=pickle.DEFAULT_PROTOCOL)
+
+
 def GetPoseandCostsF(
     cfg,
     dlc_cfg,
@@ -391,13 +403,7 @@ def GetPoseandCostsF(
     counter = 0
     inds = []
 
-    if shelf_path:
-        db = shelve.open(
-            shelf_path,
-            protocol=pickle.DEFAULT_PROTOCOL,
-        )
-    else:
-        db = dict()
+    db = _open_detections_db(shelf_path)
     db["metadata"] = {
         "nms radius": dlc_cfg["nmsradius"],
         "minimal confidence": dlc_cfg["minconfidence"],
@@ -471,13 +477,7 @@ def GetPoseandCostsS(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, shelf_pa
     if cfg["cropping"]:
         cap.set_bbox(cfg["x1"], cfg["x2"], cfg["y1"], cfg["y2"])
 
-    if shelf_path:
-        db = shelve.open(
-            shelf_path,
-            protocol=pickle.DEFAULT_PROTOCOL,
-        )
-    else:
-        db = dict()
+    db = _open_detections_db(shelf_path)
     db["metadata"] = {
         "nms radius": dlc_cfg["nmsradius"],
         "minimal confidence": dlc_cfg["minconfidence"],
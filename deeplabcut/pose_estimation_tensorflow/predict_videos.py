@@ -32,11 +32,11 @@ from skimage.util import img_as_ubyte
 from tqdm import tqdm
 
 from deeplabcut.pose_estimation_tensorflow.config import load_config
-from deeplabcut.pose_estimation_tensorflow.core import predict
+from deeplabcut.pose_estimation_tensorflow.core import predict, predict_multianimal
 from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils, trackingutils
 
 from deeplabcut.refine_training_dataset.stitch import stitch_tracklets
-from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
+from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal, auxfun_videos
 from deeplabcut.pose_estimation_tensorflow.core.openvino.session import (
     GetPoseF_OV,
     is_openvino_available,
@@ -265,6 +265,75 @@ def create_tracking_dataset(
         return DLCscorer
 
 
+def _load_test_config(cfg, shuffle, trainFraction, modelprefix=""):
+    """Load the test pose config of a shuffle, pointing to the snapshot to use."""
+    iteration = cfg["iteration"]
+    modelfolder = os.path.join(
+        cfg["project_path"],
+        str(
+            auxiliaryfunctions.get_model_folder(
+                trainFraction, shuffle, cfg, modelprefix=modelprefix
+            )
+        ),
+    )
+    path_test_config = Path(modelfolder) / "test" / "pose_cfg.yaml"
+    try:
+        dlc_cfg = load_config(str(path_test_config))
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            "It seems the model for iteration %s and shuffle %s and trainFraction %s does not exist."
+            % (iteration, shuffle, trainFraction)
+        )
+
+    # Check which snapshots are available and sort them by # iterations
+    try:
+        Snapshots = np.array(
+            [
+                fn.split(".")[0]
+                for fn in os.listdir(os.path.join(modelfolder, "train"))
+                if "index" in fn
+            ]
+        )
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            "Snapshots not found! It seems the dataset for shuffle %s has not been trained/does not exist.\n Be sure you also have the intended iteration number set.\n Please train it before using it to analyze videos.\n Use the function 'train_network' to train the network for shuffle %s."
+            % (shuffle, shuffle)
+        )
+
+    if cfg["snapshotindex"] == "all":
+        print(
+            "Snapshotindex is set to 'all' in the config.yaml file. Running video analysis with all snapshots is very costly! Use the function 'evaluate_network' to choose the best the snapshot. For now, changing snapshot index to -1!"
+        )
+        snapshotindex = -1
+    else:
+        snapshotindex = cfg["snapshotindex"]
+
+    increasing_indices = np.argsort([int(m.split("-")[1]) for m in Snapshots])
+    Snapshots = Snapshots[increasing_indices]
+
+    print("Using %s" % Snapshots[snapshotindex], "for model", modelfolder)
+
+    dlc_cfg["init_weights"] = os.path.join(
+        modelfolder, "train", Snapshots[snapshotindex]
+    )
+    return dlc_cfg
+
+
+def _session_mode(TFGPUinference, use_openvino, allow_growth):
+    """Return the setup mode of a network and its arguments, as cached by ``predict``."""
+    if use_openvino:
+        return "openvino", {"device": use_openvino}
+    return ("gpu" if TFGPUinference else "numpy"), {"allow_growth": allow_growth}
+
+
+def _predict_batch(frames, dlc_cfg, sess, inputs, outputs, mode):
+    """Predict the poses of a batch of frames with a network set up in ``mode``."""
+    if mode == "numpy":
+        return predict.getposeNP(frames, dlc_cfg, sess, inputs, outputs)
+    pose = sess.run(outputs[0], feed_dict={inputs: frames})
+    return pose[:, [1, 0, 2]].reshape((len(frames), -1))
+
+
 def analyze_videos(
     config,
     videos,
@@ -288,6 +357,10 @@ def analyze_videos(
     calibrate=False,
     identity_only=False,
     use_openvino="CPU" if is_openvino_available else None,
+    prefetch_size=2,
+    n_decoders=1,
+    stream_chunksize=None,
+    cache_session=False,
 ):
     """Makes prediction based on a trained network.
 
@@ -371,10 +444,11 @@ def analyze_videos(
         See issue: https://forum.image.sc/t/how-to-stop-running-out-of-vram/30551/2
 
     use_shelve: bool, optional, default=False
-        By default, data are dumped in a pickle file at the end of the video analysis.
-        Otherwise, data are written to disk on the fly using a "shelf"; i.e., a
-        pickle-based, persistent, database-like object by default, resulting in
-        constant memory footprint.
+        By default, raw detections of multi-animal models are written to disk on
+        the fly, by chunks, into a columnar *_full.detections store that is
+        memory-mapped when read back, resulting in constant memory footprint.
+        Otherwise, data are written using a "shelf"; i.e., a pickle-based,
+        persistent, database-like object.
 
     The following parameters are only relevant for multi-animal projects:
 
@@ -406,6 +480,31 @@ def analyze_videos(
     use_openvino: str, optional
         Use "CPU" for inference if OpenVINO is available in the Python environment.
 
+    cache_session: bool, optional, default=False
+        If True, the network is built and its weights restored (or converted, with
+        OpenVINO) only once per process, and reused by subsequent calls with the same
+        model and inference settings. See also :class:`PoseEstimator`.
+
+    The following parameters are only relevant for single-animal projects:
+
+    prefetch_size: int, optional, default=2
+        Number of batches of frames decoded in the background ahead of inference,
+        so that video decoding overlaps with the network's forward passes.
+        If 0, frames are decoded in the main thread, in between inference steps.
+
+    n_decoders: int, optional, default=1
+        Number of decoder threads. With more than one, each thread opens the video
+        and decodes a contiguous range of frames; this relies on accurate frame
+        seeking, which is not guaranteed for all codecs.
+
+    stream_chunksize: int or None, optional, default=None
+        By default, predictions are kept in memory and saved at the end of the
+        analysis. If an integer, predictions are instead appended (as float32)
+        to the h5 file in chunks of ``stream_chunksize`` frames as soon as they are
+        computed, resulting in constant memory footprint. Chunks are written to a
+        temporary ``.h5.part`` file, renamed once the video is fully analyzed;
+        an interrupted analysis resumes from the last frame written to disk.
+
     Returns
     -------
     pandas array
@@ -486,7 +585,6 @@ def analyze_videos(
 
     cfg = auxiliaryfunctions.read_config(config)
     trainFraction = cfg["TrainingFraction"][trainingsetindex]
-    iteration = cfg["iteration"]
 
     if cropping is not None:
         cfg["cropping"] = True
@@ -494,59 +592,7 @@ def analyze_videos(
         print("Overwriting cropping parameters:", cropping)
         print("These are used for all videos, but won't be save to the cfg file.")
 
-    modelfolder = os.path.join(
-        cfg["project_path"],
-        str(
-            auxiliaryfunctions.get_model_folder(
-                trainFraction, shuffle, cfg, modelprefix=modelprefix
-            )
-        ),
-    )
-    path_test_config = Path(modelfolder) / "test" / "pose_cfg.yaml"
-    try:
-        dlc_cfg = load_config(str(path_test_config))
-    except FileNotFoundError:
-        raise FileNotFoundError(
-            "It seems the model for iteration %s and shuffle %s and trainFraction %s does not exist."
-            % (iteration, shuffle, trainFraction)
-        )
-
-    # Check which snapshots are available and sort them by # iterations
-    try:
-        Snapshots = np.array(
-            [
-                fn.split(".")[0]
-                for fn in os.listdir(os.path.join(modelfolder, "train"))
-                if "index" in fn
-            ]
-        )
-    except FileNotFoundError:
-        raise FileNotFoundError(
-            "Snapshots not found! It seems the dataset for shuffle %s has not been trained/does not exist.\n Be sure you also have the intended iteration number set.\n Please train it before using it to analyze videos.\n Use the function 'train_network' to train the network for shuffle %s."
-            % (shuffle, shuffle)
-        )
-
-    if cfg["snapshotindex"] == "all":
-        print(
-            "Snapshotindex is set to 'all' in the config.yaml file. Running video analysis with all snapshots is very costly! Use the function 'evaluate_network' to choose the best the snapshot. For now, changing snapshot index to -1!"
-        )
-        snapshotindex = -1
-    else:
-        snapshotindex = cfg["snapshotindex"]
-
-    increasing_indices = np.argsort([int(m.split("-")[1]) for m in Snapshots])
-    Snapshots = Snapshots[increasing_indices]
-
-    print("Using %s" % Snapshots[snapshotindex], "for model", modelfolder)
-
-    ##################################################
-    # Load and setup CNN part detector
-    ##################################################
-
-    # Check if data already was generated:
-    dlc_cfg["init_weights"] = os.path.join(
-        modelfolder, "train", Snapshots[snapshotindex]
-    )
+    dlc_cfg = _load_test_config(cfg, shuffle, trainFraction, modelprefix)
     trainingsiterations = (dlc_cfg["init_weights"].split(os.sep)[-1]).split("-")[-1]
     # Update number of output and batchsize
     dlc_cfg["num_outputs"] = cfg.get("num_outputs", dlc_cfg.get("num_outputs", 1))
@@ -594,7 +640,12 @@ def analyze_videos(
     else:
         xyz_labs = ["x", "y", "likelihood"]
 
-    if use_openvino:
+    if cache_session:
+        mode, kwargs = _session_mode(TFGPUinference, use_openvino, allow_growth)
+        sess, inputs, outputs = predict.setup_cached_pose_prediction(
+            dlc_cfg, mode, **kwargs
+        )
+    elif use_openvino:
         sess, inputs, outputs = predict.setup_openvino_pose_prediction(
             dlc_cfg, device=use_openvino
         )
@@ -677,6 +728,9 @@ def analyze_videos(
                     TFGPUinference,
                     dynamic,
                     use_openvino,
+                    prefetch_size,
+                    n_decoders,
+                    stream_chunksize,
                 )
 
         os.chdir(str(start_path))
@@ -723,189 +777,187 @@ def checkcropping(cfg, cap):
     return int(ny), int(nx)
 
 
-def GetPoseF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
-    """Batchwise prediction of pose"""
-    PredictedData = np.zeros(
-        (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
-    )
-    batch_ind = 0  # keeps track of which image within a batch should be written to
-    batch_num = 0  # keeps track of which batch you are at
+def _prefetch_batches(
+    cfg, cap, nframes, batchsize, prefetch_size, n_decoders, video, start=0
+):
+    """Set up background decoding of the frames of cap into batches."""
     ny, nx = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)), int(
         cap.get(cv2.CAP_PROP_FRAME_WIDTH)
     )
+    crop = None
     if cfg["cropping"]:
         ny, nx = checkcropping(cfg, cap)
+        crop = cfg["x1"], cfg["x2"], cfg["y1"], cfg["y2"]
+    captures = [cap]
+    if n_decoders > 1:
+        if video is None:
+            raise ValueError("The video path is required to use several decoders.")
+        captures += [cv2.VideoCapture(video) for _ in range(n_decoders - 1)]
+    return auxfun_videos.BatchPrefetcher(
+        captures, nframes, batchsize, (ny, nx), crop, prefetch_size, start
+    )
 
-    frames = np.empty(
-        (batchsize, ny, nx, 3), dtype="ubyte"
-    )  # this keeps all frames in a batch
-    pbar = tqdm(total=nframes)
-    counter = 0
-    step = max(10, int(nframes / 100))
-    inds = []
-    while cap.isOpened():
-        if counter != 0 and counter % step == 0:
-            pbar.update(step)
-        ret, frame = cap.read()
-        if ret:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            if cfg["cropping"]:
-                frames[batch_ind] = img_as_ubyte(
-                    frame[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"]]
-                )
-            else:
-                frames[batch_ind] = img_as_ubyte(frame)
-            inds.append(counter)
-            if batch_ind == batchsize - 1:
-                pose = predict.getposeNP(frames, dlc_cfg, sess, inputs, outputs)
-                PredictedData[inds] = pose
-                batch_ind = 0
-                inds.clear()
-                batch_num += 1
-            else:
-                batch_ind += 1
-        elif counter >= nframes:
-            if batch_ind > 0:
-                pose = predict.getposeNP(
-                    frames, dlc_cfg, sess, inputs, outputs
-                )  # process the whole batch (some frames might be from previous batch!)
-                PredictedData[inds[:batch_ind]] = pose[:batch_ind]
-            break
-        counter += 1
+
+def _release_decoders(prefetcher):
+    for cap in prefetcher.captures[1:]:
+        cap.release()
+
+
+def GetPoseF(
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    batchsize,
+    prefetch_size=2,
+    n_decoders=1,
+    video=None,
+    output=None,
+    start=0,
+):
+    """Batchwise prediction of pose"""
+    PredictedData = output
+    if PredictedData is None:
+        PredictedData = np.zeros(
+            (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+        )
+    prefetcher = _prefetch_batches(
+        cfg, cap, nframes, batchsize, prefetch_size, n_decoders, video, start
+    )
+    pbar = tqdm(total=nframes, initial=start)
+    try:
+        for frames, inds in prefetcher:
+            # the last batch may still hold frames from the previous one
+            pose = predict.getposeNP(frames, dlc_cfg, sess, inputs, outputs)
+            PredictedData[inds] = pose[: len(inds)]
+            pbar.update(len(inds))
+    finally:
+        _release_decoders(prefetcher)
 
     pbar.close()
     return PredictedData, nframes
 
 
-def GetPoseS(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes):
+def GetPoseS(
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    prefetch_size=2,
+    n_decoders=1,
+    video=None,
+    output=None,
+    start=0,
+):
     """Non batch wise pose estimation for video cap."""
-    if cfg["cropping"]:
-        ny, nx = checkcropping(cfg, cap)
-
-    PredictedData = np.zeros(
-        (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+    PredictedData = output
+    if PredictedData is None:
+        PredictedData = np.zeros(
+            (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+        )
+    prefetcher = _prefetch_batches(
+        cfg, cap, nframes, 1, prefetch_size, n_decoders, video, start
     )
-    pbar = tqdm(total=nframes)
-    counter = 0
-    step = max(10, int(nframes / 100))
-    while cap.isOpened():
-        if counter != 0 and counter % step == 0:
-            pbar.update(step)
-
-        ret, frame = cap.read()
-        if ret:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            if cfg["cropping"]:
-                frame = img_as_ubyte(
-                    frame[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"]]
-                )
-            else:
-                frame = img_as_ubyte(frame)
-            pose = predict.getpose(frame, dlc_cfg, sess, inputs, outputs)
-            PredictedData[
-                counter, :
-            ] = (
-                pose.flatten()
+    pbar = tqdm(total=nframes, initial=start)
+    try:
+        for frames, inds in prefetcher:
+            pose = predict.getpose(frames[0], dlc_cfg, sess, inputs, outputs)
+            PredictedData[inds] = pose.reshape(
+                (1, -1)
             )  # NOTE: thereby cfg['all_joints_names'] should be same order as bodyparts!
-        elif counter >= nframes:
-            break
-        counter += 1
+            pbar.update(1)
+    finally:
+        _release_decoders(prefetcher)
 
     pbar.close()
     return PredictedData, nframes
 
 
-def GetPoseS_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes):
+def GetPoseS_GTF(
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    prefetch_size=2,
+    n_decoders=1,
+    video=None,
+    output=None,
+    start=0,
+):
     """Non batch wise pose estimation for video cap."""
-    if cfg["cropping"]:
-        ny, nx = checkcropping(cfg, cap)
-
     pose_tensor = predict.extract_GPUprediction(
         outputs, dlc_cfg
     )  # extract_output_tensor(outputs, dlc_cfg)
-    PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
-    pbar = tqdm(total=nframes)
-    counter = 0
-    step = max(10, int(nframes / 100))
-    while cap.isOpened():
-        if counter != 0 and counter % step == 0:
-            pbar.update(step)
-
-        ret, frame = cap.read()
-        if ret:
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            if cfg["cropping"]:
-                frame = img_as_ubyte(
-                    frame[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"]]
-                )
-            else:
-                frame = img_as_ubyte(frame)
-
+    PredictedData = output
+    if PredictedData is None:
+        PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
+    prefetcher = _prefetch_batches(
+        cfg, cap, nframes, 1, prefetch_size, n_decoders, video, start
+    )
+    pbar = tqdm(total=nframes, initial=start)
+    try:
+        for frames, inds in prefetcher:
             pose = sess.run(
                 pose_tensor,
-                feed_dict={inputs: np.expand_dims(frame, axis=0).astype(float)},
+                feed_dict={inputs: frames.astype(float)},
             )
             pose[:, [0, 1, 2]] = pose[:, [1, 0, 2]]
-            # pose = predict.getpose(frame, dlc_cfg, sess, inputs, outputs)
-            PredictedData[
-                counter, :
-            ] = (
-                pose.flatten()
+            PredictedData[inds] = pose.reshape(
+                (1, -1)
             )  # NOTE: thereby cfg['all_joints_names'] should be same order as bodyparts!
-        elif counter >= nframes:
-            break
-        counter += 1
+            pbar.update(1)
+    finally:
+        _release_decoders(prefetcher)
 
     pbar.close()
     return PredictedData, nframes
 
 
-def GetPoseF_GTF(cfg, dlc_cfg, sess, inputs, outputs, cap, nframes, batchsize):
+def GetPoseF_GTF(
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    cap,
+    nframes,
+    batchsize,
+    prefetch_size=2,
+    n_decoders=1,
+    video=None,
+    output=None,
+    start=0,
+):
     """Batchwise prediction of pose"""
-    PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
-    batch_ind = 0  # keeps track of which image within a batch should be written to
-    batch_num = 0  # keeps track of which batch you are at
-    ny = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    nx = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    if cfg["cropping"]:
-        ny, nx = checkcropping(cfg, cap)
+    PredictedData = output
+    if PredictedData is None:
+        PredictedData = np.zeros((nframes, 3 * len(dlc_cfg["all_joints_names"])))
+    prefetcher = _prefetch_batches(
+        cfg, cap, nframes, batchsize, prefetch_size, n_decoders, video, start
+    )
 
-    # Flip x, y, confidence and reshape
     pose_tensor = predict.extract_GPUprediction(outputs, dlc_cfg)
-    pose_tensor = tf.gather(pose_tensor, [1, 0, 2], axis=1)
-    pose_tensor = tf.reshape(pose_tensor, (batchsize, -1))
-
-    frames = np.empty((batchsize, ny, nx, 3), dtype="ubyte")
-    pbar = tqdm(total=nframes)
-    counter = -1
-    inds = []
-    while cap.isOpened() and counter < nframes - 1:
-        ret, frame = cap.read()
-        counter += 1
-        if not ret:
-            warnings.warn(f"Could not decode frame #{counter}.")
-            continue
 
-        if cfg["cropping"]:
-            frame = img_as_ubyte(frame[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"]])
-        else:
-            frame = img_as_ubyte(frame)
-        frames[batch_ind] = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        inds.append(counter)
-        if batch_ind == batchsize - 1:
+    pbar = tqdm(total=nframes, initial=start)
+    try:
+        for frames, inds in prefetcher:
             pose = sess.run(pose_tensor, feed_dict={inputs: frames})
-            PredictedData[inds] = pose
-            batch_ind = 0
-            batch_num += 1
-            inds.clear()
-            pbar.update(batchsize)
-        else:
-            batch_ind += 1
-
-    if batch_ind > 0:
-        pose = sess.run(pose_tensor, feed_dict={inputs: frames})
-        PredictedData[inds[:batch_ind]] = pose[:batch_ind]
-        pbar.update(batch_ind)
+            # Flip x, y, confidence and reshape; done in numpy rather than in
+            # the graph, so that (possibly cached) sessions are left untouched.
+            pose = pose[:, [1, 0, 2]].reshape((batchsize, -1))
+            PredictedData[inds] = pose[: len(inds)]
+            pbar.update(len(inds))
+    finally:
+        _release_decoders(prefetcher)
 
     pbar.close()
     return PredictedData, nframes
@@ -1008,6 +1060,9 @@ def AnalyzeVideo(
     TFGPUinference=True,
     dynamic=(False, 0.5, 10),
     use_openvino="CPU" if is_openvino_available else None,
+    prefetch_size=2,
+    n_decoders=1,
+    stream_chunksize=None,
 ):
     """Helper function for analyzing a video."""
     print("Starting to analyze % ", video)
@@ -1050,6 +1105,24 @@ def AnalyzeVideo(
         )
 
         dynamic_analysis_state, detectiontreshold, margin = dynamic
+        dataname = os.path.join(destfolder, vname + DLCscorer + ".h5")
+        writer = None
+        batched_openvino = use_openvino and int(dlc_cfg["batch_size"]) > 1
+        if stream_chunksize and (dynamic_analysis_state or batched_openvino):
+            warnings.warn(
+                "Streaming the results to disk is not supported with dynamic "
+                "cropping or OpenVINO; data are saved at the end of the analysis."
+            )
+        elif stream_chunksize:
+            writer = auxiliaryfunctions.StreamingDataWriter(
+                dataname, pdindex, nframes, stream_chunksize
+            )
+            if writer.start:
+                print(f"Resuming the analysis from frame {writer.start}...")
+            if n_decoders > 1:
+                print("Frames are decoded by a single thread when streaming.")
+                n_decoders = 1
+
         start = time.time()
         print("Starting to extract posture")
         if dynamic_analysis_state:
@@ -1079,19 +1152,25 @@ def AnalyzeVideo(
                 )
                 if use_openvino:
                     PredictedData, nframes = GetPoseF_OV(*args)
-                elif TFGPUinference:
-                    PredictedData, nframes = GetPoseF_GTF(*args)
                 else:
-                    PredictedData, nframes = GetPoseF(*args)
+                    func = GetPoseF_GTF if TFGPUinference else GetPoseF
             else:
-                if TFGPUinference:
-                    PredictedData, nframes = GetPoseS_GTF(
-                        cfg, dlc_cfg, sess, inputs, outputs, cap, nframes
-                    )
-                else:
-                    PredictedData, nframes = GetPoseS(
-                        cfg, dlc_cfg, sess, inputs, outputs, cap, nframes
+                args = cfg, dlc_cfg, sess, inputs, outputs, cap, nframes
+                func = GetPoseS_GTF if TFGPUinference else GetPoseS
+            if not batched_openvino:
+                try:
+                    PredictedData, nframes = func(
+                        *args,
+                        prefetch_size=prefetch_size,
+                        n_decoders=n_decoders,
+                        video=video,
+                        output=writer,
+                        start=writer.start if writer is not None else 0,
                     )
+                except BaseException:
+                    if writer is not None:  # Keep completed frames to resume later
+                        writer.close(complete=False)
+                    raise
 
         stop = time.time()
         if cfg["cropping"] == True:
@@ -1118,27 +1197,40 @@ def AnalyzeVideo(
         metadata = {"data": dictionary}
 
         print(f"Saving results in {destfolder}...")
-        dataname = os.path.join(destfolder, vname + DLCscorer + ".h5")
-        auxiliaryfunctions.save_data(
-            PredictedData[:nframes, :],
-            metadata,
-            dataname,
-            pdindex,
-            range(nframes),
-            save_as_csv,
-        )
-    finally:
-        return DLCscorer
+        if writer is not None:
+            writer.save(metadata, save_as_csv)
+        else:
+            auxiliaryfunctions.save_data(
+                PredictedData[:nframes, :],
+                metadata,
+                dataname,
+                pdindex,
+                range(nframes),
+                save_as_csv,
+            )
+    return DLCscorer
 
 
 def GetPosesofFrames(
-    cfg, dlc_cfg, sess, inputs, outputs, directory, framelist, nframes, batchsize
+    cfg,
+    dlc_cfg,
+    sess,
+    inputs,
+    outputs,
+    directory,
+    framelist,
+    nframes,
+    batchsize,
+    prefetch_size=2,
+    n_decoders=4,
+    output=None,
+    start=0,
+    mode="numpy",
 ):
     """Batchwise prediction of pose for frame list in directory"""
-    from deeplabcut.utils.auxfun_videos import imread
-
     print("Starting to extract posture")
-    im = imread(os.path.join(directory, framelist[0]), mode="skimage")
+    image_paths = [os.path.join(directory, framename) for framename in framelist]
+    im = auxfun_videos.read_image_rgb(image_paths[0])
 
     ny, nx, nc = np.shape(im)
     print(
@@ -1149,11 +1241,12 @@ def GetPosesofFrames(
         ny,
     )
 
-    PredictedData = np.zeros(
-        (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
-    )
-    batch_ind = 0  # keeps track of which image within a batch should be written to
-    batch_num = 0  # keeps track of which batch you are at
+    PredictedData = output
+    if PredictedData is None:
+        PredictedData = np.zeros(
+            (nframes, dlc_cfg["num_outputs"] * 3 * len(dlc_cfg["all_joints_names"]))
+        )
+    crop = None
     if cfg["cropping"]:
         print(
             "Cropping based on the x1 = %s x2 = %s y1 = %s y2 = %s. You can adjust the cropping coordinates in the config.yaml file."
@@ -1173,63 +1266,31 @@ def GetPosesofFrames(
             pass  # good cropping box
         else:
             raise Exception("Please check the boundary of cropping!")
-
-    pbar = tqdm(total=nframes)
-    counter = 0
-    step = max(10, int(nframes / 100))
-
-    if batchsize == 1:
-        for counter, framename in enumerate(framelist):
-            im = imread(os.path.join(directory, framename), mode="skimage")
-
-            if counter != 0 and counter % step == 0:
-                pbar.update(step)
-
-            if cfg["cropping"]:
-                frame = img_as_ubyte(
-                    im[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"], :]
-                )
-            else:
-                frame = img_as_ubyte(im)
-
-            pose = predict.getpose(frame, dlc_cfg, sess, inputs, outputs)
-            PredictedData[counter, :] = pose.flatten()
-    else:
-        frames = np.empty(
-            (batchsize, ny, nx, 3), dtype="ubyte"
-        )  # this keeps all the frames of a batch
-        for counter, framename in enumerate(framelist):
-            im = imread(os.path.join(directory, framename), mode="skimage")
-
-            if counter != 0 and counter % step == 0:
-                pbar.update(step)
-
-            if cfg["cropping"]:
-                frames[batch_ind] = img_as_ubyte(
-                    im[cfg["y1"] : cfg["y2"], cfg["x1"] : cfg["x2"], :]
-                )
-            else:
-                frames[batch_ind] = img_as_ubyte(im)
-
-            if batch_ind == batchsize - 1:
-                pose = predict.getposeNP(frames, dlc_cfg, sess, inputs, outputs)
-                PredictedData[
-                    batch_num * batchsize : (batch_num + 1) * batchsize, :
-                ] = pose
-                batch_ind = 0
-                batch_num += 1
-            else:
-                batch_ind += 1
-
-        if (
-            batch_ind > 0
-        ):  # take care of the last frames (the batch that might have been processed)
-            pose = predict.getposeNP(
-                frames, dlc_cfg, sess, inputs, outputs
-            )  # process the whole batch (some frames might be from previous batch!)
-            PredictedData[
-                batch_num * batchsize : batch_num * batchsize + batch_ind, :
-            ] = pose[:batch_ind, :]
+        crop = cfg["x1"], cfg["x2"], cfg["y1"], cfg["y2"]
+
+    # When streaming, batches must not straddle the chunks written to disk
+    window = None
+    if isinstance(output, auxiliaryfunctions.StreamingDataWriter):
+        window = output.chunksize
+    loader = auxfun_videos.ImageBatchLoader(
+        image_paths[:nframes],
+        batchsize,
+        crop,
+        n_decoders,
+        prefetch_size,
+        window,
+        start,
+    )
+    pbar = tqdm(total=nframes, initial=start)
+    for frames, inds in loader:
+        if batchsize == 1 and mode == "numpy":
+            pose = predict.getpose(frames[0], dlc_cfg, sess, inputs, outputs)
+            PredictedData[inds] = pose.reshape((1, -1))
+        else:
+            # the last batches may still hold frames from previous ones
+            pose = _predict_batch(frames, dlc_cfg, sess, inputs, outputs, mode)
+            PredictedData[inds] = pose[: len(inds)]
+        pbar.update(len(inds))
 
     pbar.close()
     return PredictedData, nframes, nx, ny
@@ -1244,6 +1305,14 @@ def analyze_time_lapse_frames(
     gputouse=None,
     save_as_csv=False,
     modelprefix="",
+    cache_session=False,
+    prefetch_size=2,
+    n_decoders=4,
+    stream_chunksize=None,
+    batchsize=None,
+    TFGPUinference=False,
+    use_openvino=None,
+    allow_growth=False,
 ):
     """
     Analyzed all images (of type = frametype) in a folder and stores the output in one file.
@@ -1278,6 +1347,43 @@ def analyze_time_lapse_frames(
     save_as_csv: bool, optional
         Saves the predictions in a .csv file. The default is ``False``; if provided it must be either ``True`` or ``False``
 
+    cache_session: bool, optional
+        If True, the network is set up only once per process and reused by subsequent calls
+        with the same model (see ``analyze_videos``). The default is ``False``.
+
+    prefetch_size: int, optional
+        Number of batches of images decoded in the background ahead of inference.
+        The default is 2.
+
+    n_decoders: int, optional
+        Number of threads decoding images concurrently. If 0, images are decoded in
+        the main thread, in between inference steps. The default is 4.
+
+    stream_chunksize: int or None, optional
+        If an integer, predictions are appended to the h5 file in chunks of
+        ``stream_chunksize`` images as soon as they are computed, rather than kept in
+        memory until the end of the analysis (see ``analyze_videos``). The default
+        is ``None``.
+
+    batchsize: int or None, optional
+        Change batch size for inference; if given, overwrites value in ``pose_cfg.yaml``.
+        The default is ``None``, i.e. the batch size of ``config.yaml``.
+
+    TFGPUinference: bool, optional
+        Perform the pose estimation (readout of the score maps) on the GPU, as in
+        ``analyze_videos``. Ignored for multiple outputs per body part. The default
+        is ``False``.
+
+    use_openvino: str or None, optional
+        Use OpenVINO to run the network on the given device (e.g. "CPU", "GPU").
+        The default is ``None``.
+
+    allow_growth: bool, optional
+        Allocate GPU memory as needed, rather than reserving all of it (see
+        ``analyze_videos``). The default is ``False``.
+
+    Images of different sizes are analyzed in separate batches.
+
     Examples
     --------
     If you want to analyze all frames in /analysis/project/timelapseexperiment1
@@ -1293,66 +1399,18 @@ def analyze_time_lapse_frames(
         os.environ["CUDA_VISIBLE_DEVICES"] = str(gputouse)
 
     tf.compat.v1.reset_default_graph()
-    start_path = os.getcwd()  # record cwd to return to this directory in the end
 
     cfg = auxiliaryfunctions.read_config(config)
     trainFraction = cfg["TrainingFraction"][trainingsetindex]
-    modelfolder = os.path.join(
-        cfg["project_path"],
-        str(
-            auxiliaryfunctions.get_model_folder(
-                trainFraction, shuffle, cfg, modelprefix=modelprefix
-            )
-        ),
-    )
-    path_test_config = Path(modelfolder) / "test" / "pose_cfg.yaml"
-    try:
-        dlc_cfg = load_config(str(path_test_config))
-    except FileNotFoundError:
-        raise FileNotFoundError(
-            "It seems the model for shuffle %s and trainFraction %s does not exist."
-            % (shuffle, trainFraction)
-        )
-    # Check which snapshots are available and sort them by # iterations
-    try:
-        Snapshots = np.array(
-            [
-                fn.split(".")[0]
-                for fn in os.listdir(os.path.join(modelfolder, "train"))
-                if "index" in fn
-            ]
-        )
-    except FileNotFoundError:
-        raise FileNotFoundError(
-            "Snapshots not found! It seems the dataset for shuffle %s has not been trained/does not exist.\n Please train it before using it to analyze videos.\n Use the function 'train_network' to train the network for shuffle %s."
-            % (shuffle, shuffle)
-        )
-
-    if cfg["snapshotindex"] == "all":
-        print(
-            "Snapshotindex is set to 'all' in the config.yaml file. Running video analysis with all snapshots is very costly! Use the function 'evaluate_network' to choose the best the snapshot. For now, changing snapshot index to -1!"
-        )
-        snapshotindex = -1
-    else:
-        snapshotindex = cfg["snapshotindex"]
-
-    increasing_indices = np.argsort([int(m.split("-")[1]) for m in Snapshots])
-    Snapshots = Snapshots[increasing_indices]
-
-    print("Using %s" % Snapshots[snapshotindex], "for model", modelfolder)
-
-    ##################################################
-    # Load and setup CNN part detector
-    ##################################################
-
-    # Check if data already was generated:
-    dlc_cfg["init_weights"] = os.path.join(
-        modelfolder, "train", Snapshots[snapshotindex]
-    )
+    dlc_cfg = _load_test_config(cfg, shuffle, trainFraction, modelprefix)
     trainingsiterations = (dlc_cfg["init_weights"].split(os.sep)[-1]).split("-")[-1]
 
     # update batchsize (based on parameters in config.yaml)
-    dlc_cfg["batch_size"] = cfg["batch_size"]
+    dlc_cfg["batch_size"] = batchsize or cfg["batch_size"]
+    # update number of outputs and adjust pandas indices
+    dlc_cfg["num_outputs"] = cfg.get("num_outputs", dlc_cfg.get("num_outputs", 1))
+    if "multi-animal" in dlc_cfg["dataset_type"] or dlc_cfg["num_outputs"] > 1:
+        TFGPUinference = False
 
     # Name for scorer:
     DLCscorer, DLCscorerlegacy = auxiliaryfunctions.get_scorer_name(
@@ -1362,10 +1420,23 @@ def analyze_time_lapse_frames(
         trainingsiterations=trainingsiterations,
         modelprefix=modelprefix,
     )
-    sess, inputs, outputs = predict.setup_pose_prediction(dlc_cfg)
-
-    # update number of outputs and adjust pandas indices
-    dlc_cfg["num_outputs"] = cfg.get("num_outputs", 1)
+    mode, kwargs = _session_mode(TFGPUinference, use_openvino, allow_growth)
+    if cache_session:
+        sess, inputs, outputs = predict.setup_cached_pose_prediction(
+            dlc_cfg, mode, **kwargs
+        )
+    elif use_openvino:
+        sess, inputs, outputs = predict.setup_openvino_pose_prediction(
+            dlc_cfg, device=use_openvino
+        )
+    elif TFGPUinference:
+        sess, inputs, outputs = predict.setup_GPUpose_prediction(
+            dlc_cfg, allow_growth=allow_growth
+        )
+    else:
+        sess, inputs, outputs = predict.setup_pose_prediction(
+            dlc_cfg, allow_growth=allow_growth
+        )
 
     xyz_labs_orig = ["x", "y", "likelihood"]
     suffix = [str(s + 1) for s in range(dlc_cfg["num_outputs"])]
@@ -1389,8 +1460,7 @@ def analyze_time_lapse_frames(
         Analyzes all the frames in the directory.
         """
         print("Analyzing all frames in the directory: ", directory)
-        os.chdir(directory)
-        framelist = np.sort([fn for fn in os.listdir(os.curdir) if (frametype in fn)])
+        framelist = np.sort([fn for fn in os.listdir(directory) if (frametype in fn)])
         vname = Path(directory).stem
         notanalyzed, dataname, DLCscorer = auxiliaryfunctions.check_if_not_analyzed(
             directory, vname, DLCscorer, DLCscorerlegacy, flag="framestack"
@@ -1398,19 +1468,36 @@ def analyze_time_lapse_frames(
         if notanalyzed:
             nframes = len(framelist)
             if nframes > 0:
+                writer = None
+                if stream_chunksize:
+                    writer = auxiliaryfunctions.StreamingDataWriter(
+                        dataname, pdindex, nframes, stream_chunksize, index=framelist
+                    )
+                    if writer.start:
+                        print(f"Resuming the analysis from frame {writer.start}...")
                 start = time.time()
 
-                PredictedData, nframes, nx, ny = GetPosesofFrames(
-                    cfg,
-                    dlc_cfg,
-                    sess,
-                    inputs,
-                    outputs,
-                    directory,
-                    framelist,
-                    nframes,
-                    dlc_cfg["batch_size"],
-                )
+                try:
+                    PredictedData, nframes, nx, ny = GetPosesofFrames(
+                        cfg,
+                        dlc_cfg,
+                        sess,
+                        inputs,
+                        outputs,
+                        directory,
+                        framelist,
+                        nframes,
+                        dlc_cfg["batch_size"],
+                        prefetch_size=prefetch_size,
+                        n_decoders=n_decoders,
+                        output=writer,
+                        start=writer.start if writer is not None else 0,
+                        mode=mode,
+                    )
+                except BaseException:
+                    if writer is not None:  # Keep completed frames to resume later
+                        writer.close(complete=False)
+                    raise
                 stop = time.time()
 
                 if cfg["cropping"] == True:
@@ -1434,15 +1521,17 @@ def analyze_time_lapse_frames(
                 metadata = {"data": dictionary}
 
                 print("Saving results in %s..." % (directory))
-
-                auxiliaryfunctions.save_data(
-                    PredictedData[:nframes, :],
-                    metadata,
-                    dataname,
-                    pdindex,
-                    framelist,
-                    save_as_csv,
-                )
+                if writer is not None:
+                    writer.save(metadata, save_as_csv)
+                else:
+                    auxiliaryfunctions.save_data(
+                        PredictedData[:nframes, :],
+                        metadata,
+                        dataname,
+                        pdindex,
+                        framelist,
+                        save_as_csv,
+                    )
                 print("The folder was analyzed. Now your research can truly start!")
                 print(
                     "If the tracking is not satisfactory for some frame, consider expanding the training set."
@@ -1452,7 +1541,162 @@ def analyze_time_lapse_frames(
                     "No frames were found. Consider changing the path or the frametype."
                 )
 
-    os.chdir(str(start_path))
+
+class PoseEstimator:
+    """Set up a trained network once, to serve many analyses.
+
+    With short clips, setting up the network (building its graph, restoring its
+    weights or converting it for OpenVINO) typically takes longer than the analysis
+    itself. A PoseEstimator sets it up on creation and keeps it alive across calls to
+    :meth:`analyze_videos`, :meth:`analyze_time_lapse_frames` and :meth:`predict`.
+
+    Parameters
+    ----------
+    config: str
+        Full path of the config.yaml file.
+
+    shuffle: int, optional, default=1
+        An integer specifying the shuffle index of the training dataset used for
+        training the network.
+
+    trainingsetindex: int, optional, default=0
+        Integer specifying which TrainingsetFraction to use.
+
+    modelprefix: str, optional, default=""
+        Directory containing the deeplabcut models to use.
+
+    batchsize: int or None, optional, default=None
+        Batch size for inference. By default, that of the config.yaml file.
+
+    TFGPUinference: bool, optional, default=True
+        Perform inference on GPU with TensorFlow code (single-animal projects only;
+        see ``analyze_videos``).
+
+    use_openvino: str or None, optional
+        Use "CPU" for inference if OpenVINO is available in the Python environment.
+
+    allow_growth: bool, optional, default=False
+        See ``analyze_videos``.
+
+    Examples
+    --------
+    >>> estimator = deeplabcut.PoseEstimator(
+            '/analysis/project/reaching-task/config.yaml', shuffle=2
+        )
+    >>> for clip in clips:
+            estimator.analyze_videos([clip], save_as_csv=True)
+    >>> poses = estimator.predict(frames)  # (n_frames, height, width, 3) RGB array
+    >>> estimator.close()
+    """
+
+    def __init__(
+        self,
+        config,
+        shuffle=1,
+        trainingsetindex=0,
+        modelprefix="",
+        batchsize=None,
+        TFGPUinference=True,
+        use_openvino="CPU" if is_openvino_available else None,
+        allow_growth=False,
+    ):
+        self.config = config
+        self.shuffle = shuffle
+        self.trainingsetindex = trainingsetindex
+        self.modelprefix = modelprefix
+        self.allow_growth = allow_growth
+        self.use_openvino = use_openvino
+        # Mirror the adjustments of analyze_videos, so that it finds the session
+        cfg = auxiliaryfunctions.read_config(config)
+        trainFraction = cfg["TrainingFraction"][trainingsetindex]
+        self.dlc_cfg = _load_test_config(cfg, shuffle, trainFraction, modelprefix)
+        self.dlc_cfg["num_outputs"] = cfg.get(
+            "num_outputs", self.dlc_cfg.get("num_outputs", 1)
+        )
+        self.batchsize = batchsize or cfg["batch_size"]
+        self.dlc_cfg["batch_size"] = self.batchsize
+        self.multianimal = "multi-animal" in self.dlc_cfg["dataset_type"]
+        if self.multianimal or self.dlc_cfg["num_outputs"] > 1:
+            TFGPUinference = False
+        self.TFGPUinference = TFGPUinference
+        self.mode, kwargs = _session_mode(TFGPUinference, use_openvino, allow_growth)
+        self.sess, self.inputs, self.outputs = predict.setup_cached_pose_prediction(
+            self.dlc_cfg, self.mode, **kwargs
+        )
+
+    def _common_kwargs(self, kwargs):
+        # Defaults matching the setup of the network, so that its session is reused
+        kwargs.setdefault("batchsize", self.batchsize)
+        kwargs.setdefault("TFGPUinference", self.TFGPUinference)
+        kwargs.setdefault("use_openvino", self.use_openvino)
+        kwargs.setdefault("allow_growth", self.allow_growth)
+        return dict(
+            shuffle=self.shuffle,
+            trainingsetindex=self.trainingsetindex,
+            modelprefix=self.modelprefix,
+            cache_session=True,
+            **kwargs,
+        )
+
+    def analyze_videos(self, videos, **kwargs):
+        """Analyze videos with the loaded network; see ``analyze_videos``."""
+        return analyze_videos(self.config, videos, **self._common_kwargs(kwargs))
+
+    def analyze_time_lapse_frames(self, directory, **kwargs):
+        """Analyze a folder of frames with the loaded network; see ``analyze_time_lapse_frames``."""
+        return analyze_time_lapse_frames(
+            self.config, directory, **self._common_kwargs(kwargs)
+        )
+
+    def predict(self, frames):
+        """Predict poses in in-memory frames.
+
+        Parameters
+        ----------
+        frames: np.ndarray
+            (n_frames, height, width, 3) array of RGB frames, or a single frame.
+
+        Returns
+        -------
+        np.ndarray or list
+            For single-animal projects, a (n_frames, n_bodyparts * 3) array of
+            x, y coordinates and likelihoods (times ``num_outputs``), as stored
+            by ``analyze_videos``. For multi-animal projects, the detections of
+            every frame (or None, if nothing was detected), as read from the
+            ``_full.detections`` stores written by ``analyze_videos``.
+        """
+        frames = np.asarray(frames)
+        if frames.ndim == 3:
+            frames = frames[np.newaxis]
+        batch = np.zeros((self.batchsize, *frames.shape[1:]), dtype=frames.dtype)
+        preds = []
+        for start in range(0, len(frames), self.batchsize):
+            n = min(self.batchsize, len(frames) - start)
+            # Only the first n frames of the last batch are meaningful
+            batch[:n] = frames[start : start + n]
+            if self.multianimal:
+                detections = predict_multianimal.predict_batched_peaks_and_costs(
+                    self.dlc_cfg, batch, self.sess, self.inputs, self.outputs
+                )
+                preds.extend(detections[:n] if detections else [None] * n)
+            else:
+                pose = _predict_batch(
+                    batch, self.dlc_cfg, self.sess, self.inputs, self.outputs, self.mode
+                )
+                preds.append(pose[:n])
+        if self.multianimal:
+            return preds
+        return np.concatenate(preds)
+
+    def close(self):
+        """Release the network; it will be set up again if needed."""
+        predict.clear_session_cache(self.sess)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 def _convert_detections_to_tracklets(
@@ -1481,21 +1725,21 @@ def _convert_detections_to_tracklets(
             inference_cfg.get("oks_threshold", 0.3),
         )
     elif track_method == "skeleton":
-        mot_tracker = trackingutils.SORTSkeleton(
+        mot_tracker = trackingutils.BatchedSORTSkeleton(
             len(joints),
             inference_cfg["max_age"],
             inference_cfg["min_hits"],
             inference_cfg.get("oks_threshold", 0.5),
         )
     else:
-        mot_tracker = trackingutils.SORTEllipse(
+        mot_tracker = trackingutils.BatchedSORTEllipse(
             inference_cfg.get("max_age", 1),
             inference_cfg.get("min_hits", 1),
             inference_cfg.get("iou_threshold", 0.6),
         )
     tracklets = {}
 
-    ass = inferenceutils.Assembler(
+    ass = inferenceutils.ArrayAssembler(
         data,
         max_n_individuals=inference_cfg["topktoretain"],
         n_multibodyparts=len(cfg["multianimalbodyparts"]),
@@ -1784,21 +2028,21 @@ def convert_detections2tracklets(
                         inferencecfg.get("oks_threshold", 0.3),
                     )
                 elif track_method == "skeleton":
-                    mot_tracker = trackingutils.SORTSkeleton(
+                    mot_tracker = trackingutils.BatchedSORTSkeleton(
                         numjoints,
                         inferencecfg["max_age"],
                         inferencecfg["min_hits"],
                         inferencecfg.get("oks_threshold", 0.5),
                     )
                 else:
-                    mot_tracker = trackingutils.SORTEllipse(
+                    mot_tracker = trackingutils.BatchedSORTEllipse(
                         inferencecfg.get("max_age", 1),
                         inferencecfg.get("min_hits", 1),
                         inferencecfg.get("iou_threshold", 0.6),
                     )
                 tracklets = {}
                 multi_bpts = cfg["multianimalbodyparts"]
-                ass = inferenceutils.Assembler(
+                ass = inferenceutils.ArrayAssembler(
                     data,
                     max_n_individuals=inferencecfg["topktoretain"],
                     n_multibodyparts=len(multi_bpts),
@@ -0,0 +1,321 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+"""Analyze many videos concurrently, with one network per worker process."""
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+from pathlib import Path
+
+import cv2
+import pandas as pd
+from tqdm import tqdm
+
+from deeplabcut.utils import auxiliaryfunctions
+
+
+TASKS = ("analyze_videos", "convert_detections2tracklets")
+# Files written by every task, after the video name and the scorer
+_OUTPUT_SUFFIXES = {
+    "analyze_videos": (".h5", "_full.pickle", "_full.detections"),
+    "convert_detections2tracklets": ("_el.pickle", "_bx.pickle", "_sk.pickle"),
+}
+_ESTIMATOR_KWARGS = ("batchsize", "TFGPUinference", "use_openvino", "allow_growth")
+# State of the current worker; the network is only set up on its first video
+_worker = dict()
+
+
+def status_file(status_folder, video, task="analyze_videos"):
+    """Path of the file recording the status of ``task`` on ``video``."""
+    key = hashlib.md5(os.path.abspath(video).encode()).hexdigest()[:8]
+    return os.path.join(status_folder, f"{Path(video).stem}-{key}.{task}.json")
+
+
+def read_status(path):
+    """Read a status file; returns None if it is missing or unreadable."""
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return
+
+
+def _write_status(path, status):
+    # Written atomically, so that a killed worker never leaves a truncated file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as file:
+        json.dump(status, file)
+    os.replace(temp_path, path)
+
+
+def _find_output(video, task="analyze_videos", destfolder=None, scorer=None):
+    """Path of the output of ``task`` on ``video``; None if there is none.
+
+    Any scorer is accepted, unless ``scorer`` is given.
+    """
+    folder = destfolder or os.path.dirname(video)
+    pattern = glob.escape(os.path.join(folder, Path(video).stem))
+    pattern += glob.escape(scorer) if scorer else "DLC*"
+    for suffix in _OUTPUT_SUFFIXES[task]:
+        paths = sorted(glob.glob(pattern + suffix))
+        if paths:
+            return paths[0]
+
+
+def _count_frames(video):
+    cap = cv2.VideoCapture(video)
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return max(n_frames, 0)
+
+
+def _init_worker(
+    config, task, status_folder, common_kwargs, estimator_kwargs, kwargs, gpus=None
+):
+    if gpus is not None:
+        os.environ["CUDA_VISIBLE_DEVICES"] = str(gpus.get())
+    _worker.update(
+        config=config,
+        task=task,
+        status_folder=status_folder,
+        common_kwargs=common_kwargs,
+        estimator_kwargs=estimator_kwargs,
+        kwargs=kwargs,
+        estimator=None,
+    )
+
+
+def _close_worker():
+    if _worker.get("estimator") is not None:
+        _worker["estimator"].close()
+    _worker.clear()
+
+
+def _run_job(video):
+    from deeplabcut.pose_estimation_tensorflow import predict_videos
+
+    task = _worker["task"]
+    path = status_file(_worker["status_folder"], video, task)
+    status = dict(video=video, task=task, pid=os.getpid(), started=time.time())
+    _write_status(path, dict(status, status="running"))
+    try:
+        if task == "analyze_videos":
+            if _worker["estimator"] is None:
+                _worker["estimator"] = predict_videos.PoseEstimator(
+                    _worker["config"],
+                    **_worker["common_kwargs"],
+                    **_worker["estimator_kwargs"],
+                )
+            scorer = _worker["estimator"].analyze_videos([video], **_worker["kwargs"])
+        else:
+            scorer = None
+            predict_videos.convert_detections2tracklets(
+                _worker["config"],
+                [video],
+                **_worker["common_kwargs"],
+                **_worker["kwargs"],
+            )
+        # Only videos whose results were actually written are done
+        output = _find_output(video, task, _worker["kwargs"].get("destfolder"), scorer)
+        if output is None:
+            raise FileNotFoundError(f"{task} wrote no output for {video}.")
+        status.update(status="done", error=None, output=output)
+    except Exception as e:
+        status.update(status="failed", error=f"{type(e).__name__}: {e}")
+    status["finished"] = time.time()
+    status["duration"] = status["finished"] - status["started"]
+    status["n_frames"] = _count_frames(video)
+    status["fps"] = status["n_frames"] / status["duration"]
+    _write_status(path, status)
+    return status
+
+
+def schedule_video_analysis(
+    config,
+    videos,
+    videotype="",
+    task="analyze_videos",
+    n_processes=None,
+    status_folder=None,
+    shuffle=1,
+    trainingsetindex=0,
+    modelprefix="",
+    gputouse=None,
+    start_method="spawn",
+    **kwargs,
+):
+    """Run ``analyze_videos`` or ``convert_detections2tracklets`` over many videos
+    concurrently.
+
+    Each worker process sets up its own network once and analyzes videos one at a
+    time, largest first, so that short videos fill the gaps at the end of the batch.
+    The progress of every video is recorded in a status file; videos already done (and
+    whose output still exists) are skipped, so that a killed batch resumes where it
+    stopped when run again. A video is only done once its output file was found.
+
+    Parameters
+    ----------
+    config: str
+        Full path of the config.yaml file.
+
+    videos: list[str]
+        A list of strings containing the full paths to videos for analysis or a path
+        to the directory, where all the videos with same extension are stored.
+
+    videotype: str, optional, default=""
+        Checks for the extension of the video in case the input to the video is a
+        directory. Only videos with this extension are analyzed. If left unspecified,
+        videos with common extensions ('avi', 'mp4', 'mov', 'mpeg', 'mkv') are kept.
+
+    task: str, optional, default="analyze_videos"
+        Either "analyze_videos" or "convert_detections2tracklets".
+
+    n_processes: int or None, optional, default=None
+        Number of worker processes, each with its own TensorFlow session. By default,
+        one per GPU of ``gputouse``, or a single one; never more than the number of
+        videos. With a single process, videos are analyzed in the current process.
+
+    status_folder: str or None, optional, default=None
+        Folder the status files and the final report are written to. By default,
+        ``analysis-status`` in the project folder.
+
+    shuffle: int, optional, default=1
+        An integer specifying the shuffle index of the training dataset used for
+        training the network.
+
+    trainingsetindex: int, optional, default=0
+        Integer specifying which TrainingsetFraction to use.
+
+    modelprefix: str, optional, default=""
+        Directory containing the deeplabcut models to use.
+
+    gputouse: int or list of int or None, optional, default=None
+        GPU(s) to run on. With several GPUs, workers are spread across them in turn.
+
+    start_method: str, optional, default="spawn"
+        Start method of the worker processes; TensorFlow is not fork-safe.
+
+    kwargs:
+        Passed to ``analyze_videos`` (including ``batchsize``, ``TFGPUinference``,
+        ``use_openvino`` and ``allow_growth``, used to set up the network of every
+        worker) or ``convert_detections2tracklets``.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per video, with its status ("done" or "failed"), its output file,
+        the process that handled it, its start and end times, duration, number of frames, throughput
+        (frames per second) and error message, if any. It is also saved as
+        ``report_<task>.csv`` in ``status_folder``.
+
+    Examples
+    --------
+    Analyze a folder of videos with 8 workers, spread over 2 GPUs
+
+    >>> report = deeplabcut.schedule_video_analysis(
+            '/analysis/project/reaching-task/config.yaml',
+            ['/analysis/project/videos'],
+            videotype='.mp4',
+            n_processes=8,
+            gputouse=[0, 1],
+            batchsize=16,
+        )
+    """
+    if task not in TASKS:
+        raise ValueError(f"Unknown task {task}. Valid tasks are {TASKS}.")
+
+    cfg = auxiliaryfunctions.read_config(config)
+    videos = auxiliaryfunctions.get_list_of_videos(
+        videos, videotype, in_random_order=False
+    )
+    if status_folder is None:
+        status_folder = os.path.join(cfg["project_path"], "analysis-status")
+    os.makedirs(status_folder, exist_ok=True)
+
+    records = dict()
+    jobs = []
+    for video in videos:
+        status = read_status(status_file(status_folder, video, task))
+        if (
+            status is not None
+            and status["status"] == "done"
+            and os.path.exists(status.get("output", ""))
+        ):
+            records[video] = status
+        else:
+            jobs.append(video)
+    jobs.sort(key=os.path.getsize, reverse=True)
+    if len(jobs) < len(videos):
+        print(f"Skipping {len(videos) - len(jobs)} videos already done.")
+
+    common_kwargs = dict(
+        shuffle=shuffle, trainingsetindex=trainingsetindex, modelprefix=modelprefix
+    )
+    estimator_kwargs = dict()
+    if task == "analyze_videos":
+        for key in _ESTIMATOR_KWARGS:
+            if key in kwargs:
+                estimator_kwargs[key] = kwargs.pop(key)
+    if isinstance(gputouse, int):
+        gputouse = [gputouse]
+    initargs = (config, task, status_folder, common_kwargs, estimator_kwargs, kwargs)
+    if n_processes is None:
+        # Several sessions per GPU would compete for its memory
+        n_processes = len(gputouse) if gputouse else 1
+    n_processes = max(1, min(n_processes, len(jobs)))
+
+    start = time.time()
+    n_frames = 0
+    pbar = tqdm(total=len(jobs), desc=task)
+    if n_processes == 1:
+        if gputouse:
+            os.environ["CUDA_VISIBLE_DEVICES"] = str(gputouse[0])
+        _init_worker(*initargs)
+        try:
+            for status in map(_run_job, jobs):
+                records[status["video"]] = status
+                n_frames += status["n_frames"]
+                pbar.update()
+                pbar.set_postfix(fps=n_frames / (time.time() - start))
+        finally:
+            _close_worker()
+    else:
+        context = multiprocessing.get_context(start_method)
+        gpus = None
+        if gputouse:
+            gpus = context.Queue()
+            for i in range(n_processes):
+                gpus.put(gputouse[i % len(gputouse)])
+        with context.Pool(
+            n_processes, initializer=_init_worker, initargs=(*initargs, gpus)
+        ) as pool:
+            # chunksize=1 keeps the largest-first order of assignment
+            for status in pool.imap_unordered(_run_job, jobs, chunksize=1):
+                records[status["video"]] = status
+                n_frames += status["n_frames"]
+                pbar.update()
+                pbar.set_postfix(fps=n_frames / (time.time() - start))
+    pbar.close()
+    elapsed = time.time() - start
+
+    report = pd.DataFrame.from_records([records[video] for video in videos])
+    if not report.empty:
+        report = report.set_index("video")
+        report.to_csv(os.path.join(status_folder, f"report_{task}.csv"))
+        n_failed = (report["status"] == "failed").sum()
+        print(
+            f"{len(jobs)} videos processed in {elapsed:.1f} s by {n_processes} "
+            f"processes ({n_frames / max(elapsed, 1e-9):.1f} frames/s); "
+            f"{n_failed} failed."
+        )
+    return report
@@ -25,10 +25,12 @@ inference_factory = {"dlc_transreid": dlc_base_kpt_TransReID}
 
 
 class DLCTrans:
-    def __init__(self, checkpoint):
+    def __init__(self, checkpoint, device="cuda", batch_size=256):
         self.checkpoint = checkpoint
+        self.device = default_device(device)
+        self.batch_size = batch_size
 
-        ckpt_dict = torch.load(self.checkpoint)
+        ckpt_dict = torch.load(self.checkpoint, map_location=self.device)
 
         self.model = build_dlc_transformer(
             cfg, ckpt_dict["feature_dim"], ckpt_dict["num_kpts"], inference_factory
@@ -39,9 +41,15 @@ class DLCTrans:
         print("loading params")
         self._load_params(ckpt_dict["state_dict"])
 
-        self.model.double()
+        self.model.float()
+        self.model.to(self.device)
         self.model.eval()
 
+        # Embeddings of the keypoint features of an animal (and their unit-norm
+        # counterparts), keyed by frame and animal coordinates
+        self._cache = dict()
+        self._unit_cache = dict()
+
     def _load_params(self, params):
 
         self.model.load_state_dict(params)
@@ -59,30 +67,111 @@ class DLCTrans:
 
         return vec_a, vec_b
 
-    def __call__(self, inp_a, inp_b, zfill_width, feature_dict, return_features=False):
-        # tracklets
-        device = default_device("cuda")
-
-        _tuple = self._get_vec(inp_a, inp_b, zfill_width, feature_dict)
-        if _tuple is None:
-            return None
-        vec_a, vec_b = _tuple
+    def embed(self, vecs):
+        """Embed keypoint features in batches.
 
-        vec_a = np.expand_dims(vec_a, axis=0)
-        vec_b = np.expand_dims(vec_b, axis=0)
-
-        vec_a = torch.from_numpy(vec_a).double()
-        vec_b = torch.from_numpy(vec_b).double()
+        Parameters
+        ----------
+        vecs : array-like
+            Features of shape (n_animals, num_kpts, feature_dim).
 
+        Returns
+        -------
+        Embeddings as a float32 array of shape (n_animals, embed_dim).
+        """
+        vecs = np.asarray(vecs, dtype=np.float32)
+        embeddings = []
         with torch.no_grad():
-            vec_a.to(device)
-            vec_b.to(device)
-
-            vec_a = self.model(vec_a)
-            vec_b = self.model(vec_b)
+            for start in range(0, len(vecs), self.batch_size):
+                batch = torch.from_numpy(vecs[start : start + self.batch_size])
+                embeddings.append(self.model(batch.to(self.device)).cpu().numpy())
+        if not embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(embeddings)
+
+    def embed_keypoints(self, queries, zfill_width, feature_dict, normalize=False):
+        """Embed the features of animals given their frame and coordinates.
+
+        Features are read once per frame from `feature_dict`, and embeddings
+        are computed in batches and cached for subsequent queries.
+
+        Parameters
+        ----------
+        queries : list
+            List of (coordinates, frame index) tuples, as passed to `__call__`.
+
+        zfill_width : int
+            Number of digits of the frame keys of `feature_dict`.
+
+        feature_dict : dict-like
+            Keypoint features and coordinates per frame,
+            e.g., the shelf written by `transformer_reID`.
+
+        normalize : bool, optional (default=False)
+            Return unit-norm embeddings, whose dot products are cosine similarities.
+
+        Returns
+        -------
+        Embeddings as a float32 array of shape (len(queries), embed_dim).
+        """
+        keys = [
+            (int(ind), np.asarray(coords, dtype=np.float64).tobytes())
+            for coords, ind in queries
+        ]
+        missing = dict()
+        for key, (coords, ind) in zip(keys, queries):
+            if key not in self._cache and key not in missing:
+                missing[key] = (coords, int(ind))
+        if missing:
+            vecs = []
+            frame, data = None, dict()
+            for coords, ind in sorted(missing.values(), key=lambda q: q[1]):
+                if ind != frame:
+                    frame = ind
+                    frame_id = "frame" + str(ind).zfill(zfill_width)
+                    data = {frame_id: feature_dict[frame_id]}  # Read once per frame
+                vecs.append(query_feature_by_coord_in_img_space(data, frame_id, coords))
+            keys_missing = sorted(missing, key=lambda key: missing[key][1])
+            embeddings = self.embed(vecs)
+            self._cache.update(zip(keys_missing, embeddings))
+            self._unit_cache.update(zip(keys_missing, self._normalize(embeddings)))
+        if not keys:
+            return self.embed([])
+        cache = self._unit_cache if normalize else self._cache
+        return np.stack([cache[key] for key in keys])
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._unit_cache.clear()
+
+    def _normalize(self, embeddings):
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, self.cos.eps)
+
+    def similarity(self, embeddings_a, embeddings_b, normalized=False):
+        """Cosine similarities between all pairs of embeddings, as a float32 matrix.
+
+        Embeddings already of unit norm (e.g., from `embed_keypoints` with
+        `normalize=True`) are only multiplied if `normalized` is True.
+        """
+        if normalized:
+            embeddings_a = np.asarray(embeddings_a, dtype=np.float32)
+            embeddings_b = np.asarray(embeddings_b, dtype=np.float32)
+        else:
+            embeddings_a = self._normalize(embeddings_a)
+            embeddings_b = self._normalize(embeddings_b)
+        return embeddings_a @ embeddings_b.T
 
-            dist = self.cos(vec_a, vec_b)
-            if return_features:
-                return dist, vec_a, vec_b
-            else:
-                return dist
+    def __call__(self, inp_a, inp_b, zfill_width, feature_dict, return_features=False):
+        # tracklets
+        vec_a, vec_b = self.embed_keypoints([inp_a, inp_b], zfill_width, feature_dict)
+        vec_a = vec_a[np.newaxis]
+        vec_b = vec_b[np.newaxis]
+        dist = torch.from_numpy(self.similarity(vec_a, vec_b)[0])
+        vec_a = torch.from_numpy(vec_a)
+        vec_b = torch.from_numpy(vec_b)
+        if return_features:
+            return dist, vec_a, vec_b
+        else:
+            return dist
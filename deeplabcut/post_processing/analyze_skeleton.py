@@ -19,7 +19,6 @@ from pathlib import Path
 import os
 import numpy as np
 import pandas as pd
-from scipy.spatial import distance
 
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
 
@@ -56,8 +55,7 @@ def calc_distance_between_points_two_vectors_2d(v1, v2):
         raise ValueError("Error: input arrays should have the same length")
 
     # Calculate distance
-    dist = [distance.euclidean(p1, p2) for p1, p2 in zip(v1, v2)]
-    return dist
+    return np.sqrt(np.sum((v1 - v2) ** 2, axis=1))
 
 
 def angle_between_points_2d_anticlockwise(p1, p2):
@@ -131,13 +129,96 @@ def calc_angle_between_vectors_of_points_2d(v1, v2):
         raise ValueError("Invalid shape for input arrays: ", v1.shape, v2.shape)
 
     # Calculate
-    n_points = v1.shape[1]
-    angs = np.zeros(n_points)
-    for i in range(v1.shape[1]):
-        p1, p2 = v1[:, i], v2[:, i]
-        angs[i] = angle_between_points_2d_anticlockwise(p1, p2)
+    return _orientation(v2 - v1, axis=0)
 
-    return angs
+
+def _orientation(vec, axis=-1):
+    """Anticlockwise angle (in degrees, within [0, 360)) of 2D vectors along *axis*."""
+    dx, dy = np.moveaxis(vec, axis, 0)
+    ang = np.degrees(np.arctan2(dy, dx))
+    return np.where(ang < 0, ang + 360, ang)
+
+
+def find_joints(bones):
+    """Find the pairs of bones sharing a body part.
+
+    Parameters
+    ----------
+    bones : list
+        Pairs of body parts (names or indices) linked by a bone.
+
+    Returns
+    -------
+    list
+        Triplets of body parts forming a joint, the shared body part
+        (the vertex of the joint angle) in the middle.
+    """
+    joints = []
+    for i, (a, b) in enumerate(bones):
+        for c, d in bones[i + 1 :]:
+            if {a, b} == {c, d}:
+                continue
+            for vertex in {a, b} & {c, d}:
+                joints.append(
+                    (a if b == vertex else b, vertex, c if d == vertex else d)
+                )
+    return joints
+
+
+def compute_bone_metrics(data, bones, angular_velocity=False, joints=None):
+    """Compute the metrics of all bones at once.
+
+    Parameters
+    ----------
+    data : np.ndarray
+        (n_frames, n_bodyparts, 3) array of x, y coordinates and likelihoods.
+        With multiple animals, their body parts are simply laid end to end.
+
+    bones : array-like
+        (n_bones, 2) indices of the body parts each bone links.
+
+    angular_velocity : bool, optional (default=False)
+        Whether to also compute the angular velocity of the bones, in degrees/frame.
+        Rotations are unwrapped so that crossing 0/360 degrees is not mistaken
+        for a full turn; the velocity is undefined (NaN) at the first frame.
+
+    joints : array-like, optional (default=None)
+        (n_joints, 3) indices of the body parts forming joints (see
+        :func:`find_joints`), whose angle (in degrees, within [0, 180])
+        at the middle body part is computed.
+
+    Returns
+    -------
+    dict
+        (n_frames, n_bones) arrays "length", "orientation" and "likelihood" (the
+        smallest of the two body parts'), optionally "angular_velocity", as well as
+        (n_frames, n_joints) arrays "joint_angle" and "joint_likelihood" if joints are given.
+    """
+    data = np.asarray(data, dtype=float)
+    bones = np.asarray(bones, dtype=int).reshape((-1, 2))
+    xy = data[..., :2]
+    prob = data[..., 2]
+    vec = xy[:, bones[:, 1]] - xy[:, bones[:, 0]]
+    metrics = {
+        "length": np.sqrt(np.sum(vec**2, axis=-1)),
+        "orientation": _orientation(vec),
+        "likelihood": np.minimum(prob[:, bones[:, 0]], prob[:, bones[:, 1]]),
+    }
+    if angular_velocity:
+        velocity = np.full_like(metrics["orientation"], np.nan)
+        diff = np.diff(metrics["orientation"], axis=0)
+        velocity[1:] = (diff + 180) % 360 - 180
+        metrics["angular_velocity"] = velocity
+    if joints is not None:
+        joints = np.asarray(joints, dtype=int).reshape((-1, 3))
+        vec1 = xy[:, joints[:, 0]] - xy[:, joints[:, 1]]
+        vec2 = xy[:, joints[:, 2]] - xy[:, joints[:, 1]]
+        # Robust to nearly collinear vectors, unlike the arccos of the dot product
+        cross = vec1[..., 0] * vec2[..., 1] - vec1[..., 1] * vec2[..., 0]
+        dot = np.sum(vec1 * vec2, axis=-1)
+        metrics["joint_angle"] = np.degrees(np.arctan2(np.abs(cross), dot))
+        metrics["joint_likelihood"] = prob[:, joints].min(axis=-1)
+    return metrics
 
 
 # Process single bone
@@ -148,24 +229,60 @@ def analyzebone(bp1, bp2):
         bp1 {[type]} -- [description]
         bp2 {[type]} -- [description]
     """
-    bp1_pos = np.vstack([bp1.x.values, bp1.y.values]).T
-    bp2_pos = np.vstack([bp2.x.values, bp2.y.values]).T
-
-    # get bone length and orientation
-    bone_length = calc_distance_between_points_two_vectors_2d(bp1_pos, bp2_pos)
-    bone_orientation = calc_angle_between_vectors_of_points_2d(bp1_pos.T, bp2_pos.T)
-
-    # keep the smallest of the two likelihoods
-    likelihoods = np.vstack([bp2.likelihood.values, bp2.likelihood.values]).T
-    likelihood = np.min(likelihoods, 1)
-
-    # Create dataframe and return
-    df = pd.DataFrame.from_dict(
-        dict(length=bone_length, orientation=bone_orientation, likelihood=likelihood)
+    data = np.stack(
+        [bp[["x", "y", "likelihood"]].to_numpy(dtype=float) for bp in (bp1, bp2)],
+        axis=1,
     )
-    # df.index.name=name
-
-    return df
+    metrics = compute_bone_metrics(data, [[0, 1]])
+    return pd.DataFrame({k: v[:, 0] for k, v in metrics.items()})
+
+
+def _analyze_skeleton_data(df, skeleton, angular_velocity=False, joint_angles=False):
+    """Compute the metrics of all bones (and joints) of all animals in one pass."""
+    bodyparts = df.columns.droplevel(["scorer", "coords"])[::3]
+    data = df.to_numpy(dtype=float).reshape((len(df), -1, 3))
+    if "individuals" in df.columns.names:
+        # Animals in alphabetical order, as formerly grouped by pandas
+        animals = sorted(set(bodyparts.get_level_values("individuals")) - {"single"})
+        prefixes = [f"{animal}_" for animal in animals]
+    else:
+        animals = [None]
+        prefixes = [""]
+    lookup = {key: i for i, key in enumerate(bodyparts)}
+
+    def index(animal, bodypart):
+        return lookup[bodypart if animal is None else (animal, bodypart)]
+
+    bones = [
+        [index(animal, bp1), index(animal, bp2)]
+        for animal in animals
+        for bp1, bp2 in skeleton
+    ]
+    names = [f"{prefix}{bp1}_{bp2}" for prefix in prefixes for bp1, bp2 in skeleton]
+    joints = []
+    if joint_angles:
+        joint_names = find_joints([tuple(bone) for bone in skeleton])
+        joints = [
+            [index(animal, bp) for bp in joint]
+            for animal in animals
+            for joint in joint_names
+        ]
+        names += [
+            f"{prefix}{'_'.join(joint)}" for prefix in prefixes for joint in joint_names
+        ]
+    metrics = compute_bone_metrics(data, bones, angular_velocity, joints or None)
+    columns = ["length", "orientation", "likelihood"]
+    if angular_velocity:
+        columns.append("angular_velocity")
+    skeleton_data = {
+        (name, col): metrics[col][:, i]
+        for i, name in enumerate(names[: len(bones)])
+        for col in columns
+    }
+    for i, name in enumerate(names[len(bones) :]):
+        skeleton_data[(name, "angle")] = metrics["joint_angle"][:, i]
+        skeleton_data[(name, "likelihood")] = metrics["joint_likelihood"][:, i]
+    return pd.DataFrame(skeleton_data)
 
 
 # MAIN FUNC
@@ -180,6 +297,8 @@ def analyzeskeleton(
     destfolder=None,
     modelprefix="",
     track_method="",
+    angular_velocity=False,
+    joint_angles=False,
 ):
     """Extracts length and orientation of each "bone" of the skeleton.
 
@@ -231,6 +350,13 @@ def analyzeskeleton(
         For multiple animals, must be either 'box', 'skeleton', or 'ellipse' and will
         be taken from the config.yaml file if none is given.
 
+    angular_velocity: bool, optional, default=False
+        If True, the angular velocity (in degrees/frame) of every bone is also computed.
+
+    joint_angles: bool, optional, default=False
+        If True, the angles (in degrees) between every two bones sharing a body part
+        are also computed, and stored under the names "<bp1>_<joint>_<bp2>".
+
     Returns
     -------
     None
@@ -264,20 +390,9 @@ def analyzeskeleton(
                 print(f"Skeleton in video {vname} already processed. Skipping...")
                 continue
 
-            bones = {}
-            if "individuals" in df.columns.names:
-                for animal_name, df_ in df.groupby(level="individuals", axis=1):
-                    temp = df_.droplevel(["scorer", "individuals"], axis=1)
-                    if animal_name != "single":
-                        for bp1, bp2 in cfg["skeleton"]:
-                            name = "{}_{}_{}".format(animal_name, bp1, bp2)
-                            bones[name] = analyzebone(temp[bp1], temp[bp2])
-            else:
-                for bp1, bp2 in cfg["skeleton"]:
-                    name = "{}_{}".format(bp1, bp2)
-                    bones[name] = analyzebone(df[scorer][bp1], df[scorer][bp2])
-
-            skeleton = pd.concat(bones, axis=1)
+            skeleton = _analyze_skeleton_data(
+                df, cfg["skeleton"], angular_velocity, joint_angles
+            )
             skeleton.to_hdf(output_name, "df_with_missing", format="table", mode="w")
             if save_as_csv:
                 skeleton.to_csv(output_name.replace(".h5", ".csv"))
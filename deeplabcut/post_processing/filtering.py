@@ -17,7 +17,7 @@ import pandas as pd
 from scipy import signal
 from scipy.interpolate import CubicSpline
 
-from deeplabcut.refine_training_dataset.outlier_frames import FitSARIMAXModel
+from deeplabcut.refine_training_dataset.outlier_frames import fit_sarimax_models
 from deeplabcut.utils import auxiliaryfunctions, auxfun_multianimal
 
 
@@ -44,28 +44,120 @@ def columnwise_spline_interp(data, max_gap=0):
     temp = data.copy()
     valid = ~np.isnan(temp)
     x = np.arange(nrows)
-    for i in range(ncols):
-        mask = valid[:, i]
-        if (
-            np.sum(mask) > 3
-        ):  # Make sure there are enough points to fit the cubic spline
-            spl = CubicSpline(x[mask], temp[mask, i])
-            y = spl(x)
-            if max_gap > 0:
-                inds = np.flatnonzero(np.r_[True, np.diff(mask), True])
-                count = np.diff(inds)
-                inds = inds[:-1]
-                to_fill = np.ones_like(mask)
-                for ind, n, is_nan in zip(inds, count, ~mask[inds]):
-                    if is_nan and n > max_gap:
-                        to_fill[ind : ind + n] = False
-                y[~to_fill] = np.nan
-            # Get rid of the interpolation beyond the spline knots
-            y[y == 0] = np.nan
-            temp[:, i] = y
+    # Make sure there are enough points to fit the cubic spline
+    cols = np.flatnonzero(valid.sum(axis=0) > 3)
+    if not cols.size:
+        return temp
+    if max_gap > 0:
+        # Flag gaps longer than max_gap; columns are laid end to end, separated
+        # by valid sentinels so that gaps never span two columns.
+        padded = np.ones((ncols, nrows + 2), dtype=bool)
+        padded[:, 1:-1] = valid.T
+        edges = np.flatnonzero(np.diff(padded.ravel())) + 1
+        starts, stops = edges[::2], edges[1::2]
+        long_gaps = stops - starts > max_gap
+        bounds = np.zeros(padded.size + 1, dtype=int)
+        bounds[starts[long_gaps]] = 1
+        bounds[stops[long_gaps]] = -1
+        unfilled = np.cumsum(bounds[:-1]).reshape(padded.shape)[:, 1:-1].T > 0
+    # Columns sharing the same missing data (e.g., x and y coordinates
+    # of a keypoint) are interpolated with a single spline.
+    groups = dict()
+    for col, key in zip(cols, np.packbits(valid[:, cols], axis=0).T):
+        groups.setdefault(key.tobytes(), []).append(col)
+    for group in groups.values():
+        mask = valid[:, group[0]]
+        spl = CubicSpline(x[mask], temp[:, group][mask])
+        y = spl(x)
+        if max_gap > 0:
+            y[unfilled[:, group]] = np.nan
+        # Get rid of the interpolation beyond the spline knots
+        y[y == 0] = np.nan
+        temp[:, group] = y
     return temp
 
 
+def columnwise_kalman_smooth(data, process_noise=1.0, measurement_noise=5.0):
+    """
+    Smooth the columns of *data* with a constant-velocity Kalman filter,
+    followed by a Rauch-Tung-Striebel smoother.
+    Missing values are filled, except before the first and after the last
+    observation of each column. All columns are processed at once in closed form,
+    which makes this a fast alternative to fitting one ARIMA model per column.
+
+    Parameters
+    ----------
+    data : array_like
+        2D matrix of data, with NaNs as missing values.
+    process_noise : float, optional
+        Standard deviation of the random acceleration, in units per frame squared.
+    measurement_noise : float, optional
+        Standard deviation of the measurement noise, in units.
+
+    Returns
+    -------
+    smoothed data with same shape as *data*
+    """
+    if np.ndim(data) < 2:
+        data = np.expand_dims(data, axis=1)
+    data = np.asarray(data, dtype=float)
+    nrows, ncols = data.shape
+    observed = ~np.isnan(data)
+    q = process_noise**2
+    r = measurement_noise**2
+    # The symmetric 2x2 covariance matrices are stored as (p00, p01, p11)
+    mean = np.zeros((2, ncols))
+    cov = np.zeros((3, ncols))
+    cov[[0, 2]] = 1e8  # Diffuse prior
+    means_pred = np.empty((nrows, 2, ncols))
+    covs_pred = np.empty((nrows, 3, ncols))
+    means_filt = np.empty((nrows, 2, ncols))
+    covs_filt = np.empty((nrows, 3, ncols))
+    for t in range(nrows):
+        # Predict, with transition matrix [[1, 1], [0, 1]]
+        m0, m1 = mean[0] + mean[1], mean[1]
+        p00, p01, p11 = cov
+        p00, p01, p11 = (
+            p00 + 2 * p01 + p11 + q / 4,
+            p01 + p11 + q / 2,
+            p11 + q,
+        )
+        means_pred[t] = m0, m1
+        covs_pred[t] = p00, p01, p11
+        # Update the position, wherever it is observed
+        obs = observed[t]
+        k0 = np.where(obs, p00 / (p00 + r), 0)
+        k1 = np.where(obs, p01 / (p00 + r), 0)
+        innovation = np.where(obs, data[t] - m0, 0)
+        mean = np.stack((m0 + k0 * innovation, m1 + k1 * innovation))
+        cov = np.stack((p00 - k0 * p00, p01 - k0 * p01, p11 - k1 * p01))
+        means_filt[t] = mean
+        covs_filt[t] = cov
+
+    smoothed = np.empty_like(data)
+    smoothed[-1] = means_filt[-1, 0]
+    mean = means_filt[-1]
+    for t in range(nrows - 2, -1, -1):
+        # Smoother gain G = P_filt F^T P_pred^-1
+        a, b, c = covs_filt[t]
+        p00, p01, p11 = covs_pred[t + 1]
+        det = p00 * p11 - p01**2
+        u00, u01, u10, u11 = a + b, b, b + c, c
+        g00 = (u00 * p11 - u01 * p01) / det
+        g01 = (u01 * p00 - u00 * p01) / det
+        g10 = (u10 * p11 - u11 * p01) / det
+        g11 = (u11 * p00 - u10 * p01) / det
+        d0, d1 = mean - means_pred[t + 1]
+        mean = means_filt[t] + np.stack((g00 * d0 + g01 * d1, g10 * d0 + g11 * d1))
+        smoothed[t] = mean[0]
+
+    # Do not extrapolate beyond the observations
+    seen = np.maximum.accumulate(observed, axis=0)
+    seen &= np.maximum.accumulate(observed[::-1], axis=0)[::-1]
+    smoothed[~seen] = np.nan
+    return smoothed
+
+
 def filterpredictions(
     config,
     video,
@@ -82,10 +174,15 @@ def filterpredictions(
     destfolder=None,
     modelprefix="",
     track_method="",
+    n_processes=None,
+    window_size=None,
+    process_noise=1.0,
+    measurement_noise=5.0,
 ):
     """Fits frame-by-frame pose predictions.
 
-    The pose predictions are fitted with ARIMA model (filtertype='arima') or median
+    The pose predictions are fitted with ARIMA model (filtertype='arima'), Kalman
+    smoother (filtertype='kalman'), spline (filtertype='spline') or median
     filter (default).
 
     Parameters
@@ -106,7 +203,9 @@ def filterpredictions(
         Note that TrainingFraction is a list in config.yaml.
 
     filtertype: string, optional, default="median".
-        The filter type - 'arima', 'median' or 'spline'.
+        The filter type - 'arima', 'kalman', 'median' or 'spline'.
+        'kalman' is a fast alternative to 'arima', smoothing all body parts at once
+        with a constant-velocity model.
 
     windowlength: int, optional, default=5
         For filtertype='median' filters the input array using a local window-size given
@@ -116,7 +215,7 @@ def filterpredictions(
         If filtertype='spline', windowlength is the maximal gap size to fill.
 
     p_bound: float between 0 and 1, optional, default=0.001
-        For filtertype 'arima' this parameter defines the likelihood below,
+        For filtertype 'arima' and 'kalman' this parameter defines the likelihood below,
         below which a body part will be consided as missing data for filtering purposes.
 
     ARdegree: int, optional, default=3
@@ -148,6 +247,24 @@ def filterpredictions(
         For multiple animals, must be either 'box', 'skeleton', or 'ellipse' and will
         be taken from the config.yaml file if none is given.
 
+    n_processes: int, optional, default=None
+        For filtertype 'arima', number of processes across which the models of
+        the individual coordinates are fitted. By default, as many as there are CPUs.
+
+    window_size: int, optional, default=None
+        For filtertype 'arima', long recordings are cut into windows of that many
+        frames that are fitted independently (and in parallel).
+        By default, models are fitted to entire recordings.
+
+    process_noise: float, optional, default=1.0
+        For filtertype 'kalman', standard deviation (in pixels/frame^2) of the
+        random acceleration of the body parts. Larger values follow fast movements
+        more closely, at the expense of smoothness.
+
+    measurement_noise: float, optional, default=5.0
+        For filtertype 'kalman', standard deviation (in pixels) of the localization
+        error of the predictions.
+
     Returns
     -------
     None
@@ -227,22 +344,35 @@ def filterpredictions(
                 if filtertype == "arima":
                     temp = df.values.reshape((nrows, -1, 3))
                     placeholder = np.empty_like(temp)
-                    for i in range(temp.shape[1]):
-                        x, y, p = temp[:, i].T
-                        meanx, _ = FitSARIMAXModel(
-                            x, p, p_bound, alpha, ARdegree, MAdegree, False
-                        )
-                        meany, _ = FitSARIMAXModel(
-                            y, p, p_bound, alpha, ARdegree, MAdegree, False
-                        )
-                        meanx[0] = x[0]
-                        meany[0] = y[0]
-                        placeholder[:, i] = np.c_[meanx, meany, p]
+                    p = np.repeat(temp[..., 2:], 2, axis=2).reshape((nrows, -1))
+                    means, _ = fit_sarimax_models(
+                        temp[..., :2].reshape((nrows, -1)),
+                        p,
+                        p_bound,
+                        alpha,
+                        ARdegree,
+                        MAdegree,
+                        window_size=window_size,
+                        n_processes=n_processes,
+                    )
+                    means[0] = temp[0, :, :2].ravel()
+                    placeholder[..., :2] = means.reshape((nrows, -1, 2))
+                    placeholder[..., 2] = temp[..., 2]
                     data = pd.DataFrame(
                         placeholder.reshape((nrows, -1)),
                         columns=df.columns,
                         index=df.index,
                     )
+                elif filtertype == "kalman":
+                    temp = df.values.reshape((nrows, -1, 3))
+                    xy = temp[..., :2].copy()
+                    xy[temp[..., 2] < p_bound] = np.nan
+                    xy = columnwise_kalman_smooth(
+                        xy.reshape((nrows, -1)), process_noise, measurement_noise
+                    )
+                    data = df.copy()
+                    mask = data.columns.get_level_values("coords") != "likelihood"
+                    data.loc[:, mask] = xy
                 elif filtertype == "median":
                     data = df.copy()
                     mask = data.columns.get_level_values("coords") != "likelihood"
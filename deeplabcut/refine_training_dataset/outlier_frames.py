@@ -11,6 +11,7 @@
 
 
 import argparse
+import multiprocessing
 import os
 import pickle
 import re
@@ -23,6 +24,10 @@ import statsmodels.api as sm
 from skimage.util import img_as_ubyte
 
 from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import (
+    DetectionStore,
+    STORE_SUFFIX,
+)
 from deeplabcut.utils import (
     auxiliaryfunctions,
     auxfun_multianimal,
@@ -52,7 +57,7 @@ def find_outliers_in_raw_data(
         Absolute path to the project config.yaml.
 
     pickled_file : str
-        Path to a *_full.pickle or *_assemblies.pickle.
+        Path to a *_full.pickle, *_full.detections store or *_assemblies.pickle.
 
     video_file : str
         Path to the corresponding video file for frame extraction.
@@ -85,9 +90,12 @@ def find_outliers_in_raw_data(
     if not pickle_name.startswith(video_name):
         raise ValueError("Video and pickle files do not match.")
 
-    with open(pickle_file, "rb") as file:
-        data = pickle.load(file)
-    if pickle_file.endswith("_full.pickle"):
+    if pickle_file.rstrip(os.sep).endswith(STORE_SUFFIX):
+        data = DetectionStore.open(pickle_file)
+    else:
+        with open(pickle_file, "rb") as file:
+            data = pickle.load(file)
+    if isinstance(data, DetectionStore) or pickle_file.endswith("_full.pickle"):
         inds, data = find_outliers_in_raw_detections(data, threshold=pcutoff)
         with_annotations = False
     elif pickle_file.endswith("_assemblies.pickle"):
@@ -127,8 +135,9 @@ def find_outliers_in_raw_detections(
 
     Parameter
     ----------
-    pickled_data : dict
-        Data in the *_full.pickle file obtained after `analyze_videos`.
+    pickled_data : dict or DetectionStore
+        Data in the *_full.detections store (or a *_full.pickle file)
+        obtained after `analyze_videos`.
 
     algo : string, optional (default="uncertain")
         Outlier detection algorithm. Currently, only 'uncertain' is supported
@@ -150,6 +159,9 @@ def find_outliers_in_raw_detections(
     if algo != "uncertain":
         raise ValueError(f"Only method 'uncertain' is currently supported.")
 
+    if isinstance(pickled_data, DetectionStore):
+        return _find_outliers_in_store(pickled_data, threshold, kept_keypoints)
+
     try:
         _ = pickled_data.pop("metadata")
     except KeyError:
@@ -175,6 +187,33 @@ def find_outliers_in_raw_detections(
     return candidates, data
 
 
+def _find_outliers_in_store(store, threshold, kept_keypoints):
+    # Vectorized equivalent of the above, operating on whole columns at once
+    n_peaks = np.diff(store.columns["peak_offsets"])
+    rows = np.repeat(np.arange(store.n_frames), n_peaks)
+    inds = np.arange(len(rows))
+    if kept_keypoints is not None:
+        # Peaks are reordered frame by frame following `kept_keypoints`
+        rank = np.full(store.columns["counts"].shape[1], -1)
+        rank[kept_keypoints] = np.arange(len(kept_keypoints))
+        peak_rank = rank[store.columns["bodypart"]]
+        inds = np.lexsort((peak_rank, rows))
+        inds = inds[peak_rank[inds] >= 0]
+        rows = rows[inds]
+    conf = np.asarray(store.columns["confidence"])[inds]
+    temp = np.c_[np.asarray(store.columns["xy"])[inds], conf]
+    frame_inds = store.frame_indices
+    bounds = np.searchsorted(rows, np.arange(1, store.n_frames))
+    data = {
+        ind: arr.squeeze()
+        for ind, arr in zip(frame_inds.tolist(), np.split(temp, bounds))
+    }
+    mask = np.zeros(store.n_frames, dtype=bool)
+    mask[rows[conf < threshold]] = True
+    candidates = frame_inds[mask].tolist()
+    return candidates, data
+
+
 def extract_outlier_frames(
     config,
     videos,
@@ -542,21 +581,136 @@ def FitSARIMAXModel(x, p, pcutoff, alpha, ARdegree, MAdegree, nforecast=0, disp=
         return np.nan * np.zeros(len(Y)), np.nan * np.zeros((len(Y), 2))
 
 
+def _fit_sarimax_window(args):
+    x, p, pcutoff, alpha, ARdegree, MAdegree = args
+    return FitSARIMAXModel(x, p, pcutoff, alpha, ARdegree, MAdegree)
+
+
+def fit_sarimax_models(
+    series,
+    p,
+    pcutoff,
+    alpha,
+    ARdegree,
+    MAdegree,
+    window_size=None,
+    n_processes=None,
+    start_method=None,
+):
+    """Fit independent SARIMAX models to the columns of *series*, in parallel.
+
+    Parameters
+    ----------
+    series : np.ndarray
+        (n_frames, n_series) array of coordinates.
+
+    p : np.ndarray
+        (n_frames, n_series) array of likelihoods; values below *pcutoff*
+        are modeled as missing data.
+
+    pcutoff, alpha, ARdegree, MAdegree
+        See :func:`FitSARIMAXModel`.
+
+    window_size : int, optional (default=None)
+        If given, long series are cut into windows of that many frames that are
+        fitted independently. Each window is fitted together with the last tenth
+        of the previous one, which is then discarded, so that predictions do not
+        restart from scratch at window boundaries. By default, whole series are fitted.
+
+    n_processes : int, optional (default=None)
+        Number of worker processes. By default, as many as there are CPUs.
+
+    start_method : str, optional (default=None)
+        Multiprocessing start method ("fork", "spawn" or "forkserver").
+        By default, that of the platform.
+
+    Returns
+    -------
+    mean : np.ndarray
+        (n_frames, n_series) predicted means.
+
+    conf_int : np.ndarray
+        (n_frames, n_series, 2) lower and upper confidence bounds.
+    """
+    series = np.asarray(series, dtype=float)
+    if series.ndim == 1:
+        series = series[:, np.newaxis]
+    p = np.asarray(p).reshape(series.shape)
+    n_frames, n_series = series.shape
+    if not window_size or window_size >= n_frames:
+        window_size = n_frames
+    starts = np.arange(0, n_frames, window_size)
+    stops = np.minimum(starts + window_size, n_frames)
+    # Windows are extended backward to provide some history to the model
+    fit_starts = np.maximum(starts - window_size // 10, 0)
+    jobs = [
+        (col, start, stop, fit_start)
+        for col in range(n_series)
+        for start, stop, fit_start in zip(starts, stops, fit_starts)
+    ]
+    args = (
+        (
+            series[fit_start:stop, col],
+            p[fit_start:stop, col],
+            pcutoff,
+            alpha,
+            ARdegree,
+            MAdegree,
+        )
+        for col, _, stop, fit_start in jobs
+    )
+    n_processes = min(n_processes or os.cpu_count() or 1, len(jobs))
+    mean = np.full_like(series, np.nan)
+    conf_int = np.full((n_frames, n_series, 2), np.nan)
+    if n_processes <= 1:
+        results = map(_fit_sarimax_window, args)
+        pool = None
+    else:
+        context = multiprocessing.get_context(start_method)
+        pool = context.Pool(n_processes)
+        results = pool.imap(_fit_sarimax_window, args)
+    try:
+        for (col, start, stop, fit_start), (mean_, conf_int_) in zip(jobs, results):
+            mean[start:stop, col] = mean_[start - fit_start :]
+            conf_int[start:stop, col] = conf_int_[start - fit_start :]
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return mean, conf_int
+
+
 def compute_deviations(
-    Dataframe, dataname, p_bound, alpha, ARdegree, MAdegree, storeoutput=None
+    Dataframe,
+    dataname,
+    p_bound,
+    alpha,
+    ARdegree,
+    MAdegree,
+    storeoutput=None,
+    n_processes=None,
 ):
     """Fits Seasonal AutoRegressive Integrated Moving Average with eXogenous regressors model to data and computes confidence interval
-    as well as mean fit."""
+    as well as mean fit. The models of all coordinates are fitted in parallel,
+    across *n_processes* processes (see :func:`fit_sarimax_models`)."""
 
     print("Fitting state-space models with parameters:", ARdegree, MAdegree)
     df_x, df_y, df_likelihood = Dataframe.values.reshape((Dataframe.shape[0], -1, 3)).T
+    means, CIs = fit_sarimax_models(
+        np.concatenate((df_x, df_y)).T,
+        np.concatenate((df_likelihood, df_likelihood)).T,
+        p_bound,
+        alpha,
+        ARdegree,
+        MAdegree,
+        n_processes=n_processes,
+    )
+    n_bodyparts = len(df_x)
     preds = []
-    for row in range(len(df_x)):
+    for row in range(n_bodyparts):
         x = df_x[row]
         y = df_y[row]
-        p = df_likelihood[row]
-        meanx, CIx = FitSARIMAXModel(x, p, p_bound, alpha, ARdegree, MAdegree)
-        meany, CIy = FitSARIMAXModel(y, p, p_bound, alpha, ARdegree, MAdegree)
+        meanx, CIx = means[:, row], CIs[:, row]
+        meany, CIy = means[:, row + n_bodyparts], CIs[:, row + n_bodyparts]
         distance = np.sqrt((x - meanx) ** 2 + (y - meany) ** 2)
         significant = (
             (x < CIx[:, 0]) + (x > CIx[:, 1]) + (y < CIy[:, 0]) + (y > CIy[:, 1])
@@ -948,8 +1102,7 @@ def PlottingSingleFramecv2(
         os.path.join(tmpfolder, "img" + str(index).zfill(strwidth) + ".png")
     ):
         plt.axis("off")
-        cap.set_to_frame(index)
-        frame = cap.read_frame(crop=True)
+        frame = cap.get_frame(index, crop=True)
         if frame is None:
             print("Frame could not be read.")
             return
@@ -9,6 +9,7 @@
 # Licensed under GNU Lesser General Public License v3.0
 #
 import matplotlib.pyplot as plt
+import multiprocessing
 import networkx as nx
 import numpy as np
 import os
@@ -18,7 +19,7 @@ import re
 import scipy.linalg.interpolative as sli
 import shelve
 import warnings
-from collections import defaultdict
+from collections import defaultdict, deque, namedtuple
 
 import deeplabcut
 from deeplabcut.utils.auxfun_videos import VideoWriter
@@ -32,9 +33,11 @@ from itertools import combinations, cycle
 from networkx.algorithms.flow import preflow_push
 from pathlib import Path
 from scipy.linalg import hankel
+from scipy.optimize import linear_sum_assignment, linprog
+from scipy.sparse import csr_matrix
 from scipy.spatial.distance import directed_hausdorff
 from scipy.stats import mode
-from tqdm import trange
+from tqdm import tqdm, trange
 
 
 class Tracklet:
@@ -60,8 +63,7 @@ class Tracklet:
 
         self.data = data.astype(np.float64)
         self.inds = np.array(inds)
-        monotonically_increasing = all(a < b for a, b in zip(inds, inds[1:]))
-        if not monotonically_increasing:
+        if np.any(np.diff(self.inds) <= 0):
             idx = np.argsort(inds, kind="mergesort")  # For stable sort with duplicates
             self.inds = self.inds[idx]
             self.data = self.data[idx]
@@ -438,6 +440,7 @@ class TrackletStitcher:
         min_length=10,
         split_tracklets=True,
         prestitch_residuals=True,
+        backend="sparse",
     ):
         if n_tracks < 1:
             raise ValueError("There must at least be one track to reconstruct.")
@@ -445,11 +448,16 @@ class TrackletStitcher:
         if min_length < 3:
             raise ValueError("A tracklet must have a minimal length of 3.")
 
+        if backend not in ("sparse", "networkx"):
+            raise ValueError(f"Unknown backend {backend}.")
+
         self.min_length = min_length
         self.filename = ""
         self.header = None
         self.single = None
         self.n_tracks = n_tracks
+        self.backend = backend
+        self._network = None
         self.G = None
         self.paths = None
         self.tracks = None
@@ -495,12 +503,21 @@ class TrackletStitcher:
             label: k for k, v in self._mapping.items() for label in v.values()
         }
 
-        # Store tracklets and corresponding negatives (those that overlap in time)
+        # Store tracklets and corresponding negatives (those that overlap in time).
+        # Only pairs whose time spans intersect can share frames.
+        starts = np.array([t.start for t in self])
+        ends = np.array([t.end for t in self])
+        inds1, inds2 = _pairs_starting_before(
+            starts, np.searchsorted(starts, ends, side="right")
+        )
+        overlap = [
+            (i, j)
+            for i, j in zip(inds1.tolist(), inds2.tolist())
+            if (self[i].is_continuous and self[j].is_continuous) or self[j] in self[i]
+        ]
         self._lu_overlap = defaultdict(list)
-        for tracklet1, tracklet2 in combinations(self, 2):
-            if tracklet2 in tracklet1:
-                self._lu_overlap[tracklet1].append(tracklet2)
-                self._lu_overlap[tracklet2].append(tracklet1)
+        for i, j in sorted(overlap + [(j, i) for i, j in overlap]):
+            self._lu_overlap[self[i]].append(self[j])
 
     def __getitem__(self, item):
         return self.tracklets[item]
@@ -516,11 +533,17 @@ class TrackletStitcher:
         min_length=10,
         split_tracklets=True,
         prestitch_residuals=True,
+        backend="sparse",
     ):
         with open(pickle_file, "rb") as file:
             tracklets = pickle.load(file)
         class_ = cls.from_dict_of_dict(
-            tracklets, n_tracks, min_length, split_tracklets, prestitch_residuals
+            tracklets,
+            n_tracks,
+            min_length,
+            split_tracklets,
+            prestitch_residuals,
+            backend,
         )
         class_.filename = pickle_file
         return class_
@@ -533,6 +556,7 @@ class TrackletStitcher:
         min_length=10,
         split_tracklets=True,
         prestitch_residuals=True,
+        backend="sparse",
     ):
         tracklets = []
         header = dict_of_dict.pop("header", None)
@@ -552,7 +576,12 @@ class TrackletStitcher:
             else:
                 tracklets.append(Tracklet(data, inds))
         class_ = cls(
-            tracklets, n_tracks, min_length, split_tracklets, prestitch_residuals
+            tracklets,
+            n_tracks,
+            min_length,
+            split_tracklets,
+            prestitch_residuals,
+            backend,
         )
         class_.header = header
         class_.single = single
@@ -582,9 +611,19 @@ class TrackletStitcher:
     def n_frames(self):
         return self._last_frame - self._first_frame + 1
 
-    # TODO Avoid looping over all pairs of tracklets
     @staticmethod
     def compute_max_gap(tracklets):
+        starts = np.array([t.start for t in tracklets])
+        if np.all(np.diff(starts) >= 0):
+            # Tracklets sorted in time: the smallest positive gap following
+            # a tracklet is that to the first tracklet starting after its end.
+            ends = np.array([t.end for t in tracklets])
+            next_ = np.searchsorted(starts, ends, side="right")
+            valid = next_ < len(starts)
+            if not valid.any():
+                return 0
+            return int((starts[next_[valid]] - ends[valid]).max())
+
         gap = defaultdict(list)
         for tracklet1, tracklet2 in combinations(tracklets, 2):
             gap[tracklet1].append(tracklet1.time_gap_to(tracklet2))
@@ -635,6 +674,10 @@ class TrackletStitcher:
         if not max_gap:
             max_gap = int(1.5 * self.compute_max_gap(nodes))
 
+        if self.backend == "sparse":
+            self._build_network(nodes, max_gap, weight_func)
+            return
+
         self.G = nx.DiGraph()
         self.G.add_node("source", demand=-self.n_tracks)
         self.G.add_node("sink", demand=self.n_tracks)
@@ -658,8 +701,11 @@ class TrackletStitcher:
                 if gap > max_gap:
                     break
                 elif gap > 0:
+                    w = weight_func(node_i, node_j)
+                    if np.isnan(w):
+                        raise ValueError(_nan_weight_message(node_i, node_j))
                     # The algorithm works better with integer weights
-                    w = int(100 * weight_func(node_i, node_j))
+                    w = int(100 * w)
                     self.G.add_edge(
                         self._mapping[node_i]["out"],
                         self._mapping[node_j]["in"],
@@ -667,6 +713,109 @@ class TrackletStitcher:
                         capacity=1,
                     )
 
+    def _build_network(self, nodes, max_gap, weight_func):
+        """Array-based counterpart of the graph built with networkx.
+
+        Candidate pairs of tracklets are found from their sorted start times,
+        and the default weights (distances between the tail and head
+        of consecutive tracklets) are computed at once.
+        """
+        nodes_ = set(nodes)
+        mapping = [v for k, v in self._mapping.items() if k in nodes_]
+        names = ["source", "sink"]
+        names += [v["in"] for v in mapping] + [v["out"] for v in mapping]
+        index = {name: i for i, name in enumerate(names)}
+        n_nodes = len(mapping)
+        inds_in = np.arange(2, n_nodes + 2)
+        inds_out = inds_in + n_nodes
+
+        starts = np.array([t.start for t in nodes])
+        ends = np.array([t.end for t in nodes])
+        inds1, inds2 = _pairs_starting_before(
+            starts, np.searchsorted(starts, ends + max_gap, side="right")
+        )
+        mask = starts[inds2] > ends[inds1]
+        inds1 = inds1[mask]
+        inds2 = inds2[mask]
+        if weight_func is None and (
+            type(self).calculate_edge_weight is TrackletStitcher.calculate_edge_weight
+        ):
+            heads = np.array([t.centroid[-1] for t in nodes])
+            tails = np.array([t.centroid[0] for t in nodes])
+            weights = np.sqrt(np.sum((heads[inds1] - tails[inds2]) ** 2, axis=1))
+        else:
+            if weight_func is None:
+                weight_func = self.calculate_edge_weight
+            weights = np.array(
+                [weight_func(nodes[i], nodes[j]) for i, j in zip(tqdm(inds1), inds2)],
+                dtype=float,
+            )
+        isnan = np.isnan(weights)
+        if isnan.any():
+            k = np.flatnonzero(isnan)[0]
+            raise ValueError(_nan_weight_message(nodes[inds1[k]], nodes[inds2[k]]))
+        # The algorithm works better with integer weights
+        weights = np.trunc(100 * weights).astype(int)
+        node_inds = np.array([index[self._mapping[t]["in"]] for t in nodes])
+        n_edges = len(inds1)
+        self.G = None
+        self._network = _FlowNetwork(
+            nodes=names,
+            tails=np.r_[
+                inds_in, np.zeros(n_nodes, int), inds_out, node_inds[inds1] + n_nodes
+            ],
+            heads=np.r_[inds_out, inds_in, np.ones(n_nodes, int), node_inds[inds2]],
+            capacity=np.ones(3 * n_nodes + n_edges, dtype=int),
+            weight=np.r_[np.zeros(3 * n_nodes, dtype=int), weights],
+            has_weight=np.r_[
+                np.zeros(3 * n_nodes, dtype=bool), np.ones(n_edges, dtype=bool)
+            ],
+            demand=np.r_[
+                -self.n_tracks,
+                self.n_tracks,
+                np.ones(n_nodes, int),
+                -np.ones(n_nodes, int),
+            ],
+        )
+
+    @property
+    def G(self):
+        # The networkx graph is only built from the arrays when needed
+        if self._G is None and self._network is not None:
+            self._G = self._network.to_graph()
+        return self._G
+
+    @G.setter
+    def G(self, graph):
+        self._G = graph
+        self._network = None
+
+    def _solve_flow(self):
+        network = None
+        if self.backend == "sparse":
+            if self._G is None:
+                network = self._network
+            else:
+                network = _FlowNetwork.from_graph(self._G)
+            flow = _min_cost_flow(
+                len(network.nodes),
+                network.tails,
+                network.heads,
+                network.capacity,
+                network.weight,
+                network.demand,
+            )
+            if flow is None:
+                network = None
+        if network is None:
+            _, self.flow = nx.capacity_scaling(self.G)
+            return
+        self.flow = {node: dict() for node in network.nodes}
+        for i, j, f in zip(
+            network.tails.tolist(), network.heads.tolist(), flow.tolist()
+        ):
+            self.flow[network.nodes[i]][network.nodes[j]] = f
+
     def _update_edge_weights(self, weight_func):
         if self.G is None:
             raise ValueError("Inexistent graph. Call `build_graph` first")
@@ -677,11 +826,11 @@ class TrackletStitcher:
                 self.G.edges[(node1, node2)]["weight"] = w
 
     def stitch(self, add_back_residuals=True):
-        if self.G is None:
+        if self._G is None and self._network is None:
             raise ValueError("Inexistent graph. Call `build_graph` first")
 
         try:
-            _, self.flow = nx.capacity_scaling(self.G)
+            self._solve_flow()
             self.paths = self.reconstruct_paths()
         except nx.exception.NetworkXUnfeasible:
             warnings.warn("No optimal solution found. Employing black magic...")
@@ -752,7 +901,7 @@ class TrackletStitcher:
                 self.build_graph(list(remaining_nodes), max_gap=np.inf)
                 self.G.nodes["source"]["demand"] = -incomplete_tracks
                 self.G.nodes["sink"]["demand"] = incomplete_tracks
-                _, self.flow = nx.capacity_scaling(self.G)
+                self._solve_flow()
                 paths += self.reconstruct_paths()
             self.paths = paths
             if len(self.paths) != self.n_tracks:
@@ -768,6 +917,136 @@ class TrackletStitcher:
             if add_back_residuals:
                 _ = self._finalize_tracks()
 
+    def stitch_windowed(
+        self,
+        window_length,
+        overlap=None,
+        max_gap=None,
+        weight_func=None,
+        add_back_residuals=True,
+        n_processes=1,
+        start_method=None,
+    ):
+        """Stitch tracklets in overlapping temporal windows.
+
+        Every window is solved as an independent (and much smaller) flow problem,
+        so that memory and runtime scale with the window rather than the video
+        length. Track identities are then reconciled across consecutive windows
+        by matching the tracks that agree the most over their overlap; tracks
+        with no counterpart are matched to the closest track left over.
+        Each window finally contributes its tracks up to the middle of the overlap.
+
+        Parameters
+        ----------
+        window_length : int
+            Number of frames of a window.
+
+        overlap : int, optional
+            Number of frames shared by consecutive windows.
+            By default, a quarter of the window length.
+
+        max_gap : int, optional
+            Maximal temporal gap to allow between a pair of tracklets.
+            By default, determined from all tracklets as in `build_graph`,
+            so that all windows share the same temporal constraint.
+
+        weight_func : callable, optional
+            See `build_graph`.
+
+        add_back_residuals : bool, optional
+            Whether residuals are added back to the tracks of every window.
+
+        n_processes : int, optional (default=1)
+            Number of worker processes stitching windows in parallel.
+
+        start_method : str, optional (default=None)
+            Multiprocessing start method ("fork", "spawn" or "forkserver").
+            By default, that of the platform. Unless processes are forked,
+            `weight_func` is pickled to be passed on to the workers; windows are
+            stitched serially if it cannot be.
+
+        Windows that cannot be stitched are left empty, with a warning.
+        """
+        if overlap is None:
+            overlap = window_length // 4
+        if not 0 < overlap < window_length:
+            raise ValueError("The overlap must be positive and shorter than a window.")
+
+        if not max_gap:
+            max_gap = int(1.5 * self.compute_max_gap(self.tracklets))
+
+        # Residuals are only added back to the tracks, as in `stitch`
+        tracklets = self.tracklets + self.residuals
+        n_tracklets = len(self.tracklets)
+        starts = np.array([t.start for t in tracklets])
+        ends = np.array([t.end for t in tracklets])
+        step = window_length - overlap
+        bounds = [self._first_frame]
+        while bounds[-1] + window_length <= self._last_frame:
+            bounds.append(bounds[-1] + step)
+        # Each window owns its frames up to the middle of the following overlap
+        cuts = [bound + overlap // 2 for bound in bounds[1:]]
+        cuts = [self._first_frame] + cuts + [self._last_frame + 1]
+
+        def windows():
+            for start in bounds:
+                stop = start + window_length
+                window = ([], [])
+                for i in np.flatnonzero((starts < stop) & (ends >= start)).tolist():
+                    tracklet = _crop_tracklet(tracklets[i], start, stop)
+                    if tracklet is not None:
+                        window[i >= n_tracklets].append(tracklet)
+                yield window
+
+        config = {
+            "n_tracks": self.n_tracks,
+            "min_length": self.min_length,
+            "backend": self.backend,
+            "max_gap": max_gap,
+            "weight_func": weight_func,
+            "add_back_residuals": add_back_residuals,
+        }
+        if n_processes > 1 and not _can_pass_to_workers(weight_func, start_method):
+            warnings.warn(
+                "`weight_func` cannot be pickled to be passed on to worker "
+                "processes; windows are stitched serially."
+            )
+            n_processes = 1
+        if n_processes <= 1:
+            _init_window_worker(config)
+            results = map(_stitch_window, windows())
+            pool = None
+        else:
+            context = multiprocessing.get_context(start_method)
+            pool = context.Pool(
+                n_processes, initializer=_init_window_worker, initargs=(config,)
+            )
+            # Only a few windows are queued at once to keep memory bounded
+            results = _imap_bounded(pool, _stitch_window, windows(), 2 * n_processes)
+
+        pieces = [[] for _ in range(self.n_tracks)]
+        prev_tracks = [None] * self.n_tracks
+        try:
+            for n, (tracks, error) in enumerate(tqdm(results, total=len(bounds))):
+                if error is not None:
+                    warnings.warn(
+                        f"Frames {bounds[n]} to {bounds[n] + window_length - 1} "
+                        f"could not be stitched ({error}); they are left empty."
+                    )
+                ids = _match_window_tracks(prev_tracks, tracks, bounds[n])
+                for id_, track in zip(ids, tracks):
+                    prev_tracks[id_] = track
+                    piece = _crop_tracklet(track, cuts[n], cuts[n + 1])
+                    if piece is not None:
+                        pieces[id_].append(piece)
+        finally:
+            if pool is not None:
+                pool.terminate()
+        self.paths = [path for path in pieces if path]
+        if len(self.paths) != self.n_tracks:
+            warnings.warn(f"Only {len(self.paths)} tracks could be reconstructed.")
+        self.tracks = np.asarray([sum(path) for path in self.paths])
+
     def _finalize_tracks(self):
         residuals = [res for res in sorted(self.residuals, key=len) if len(res) > 1]
         # Cycle through the residuals and incorporate back those
@@ -1000,6 +1279,220 @@ class TrackletStitcher:
                 return path
 
 
+def _crop_tracklet(tracklet, start, stop):
+    """Part of a tracklet lying within frames [start, stop), or None if empty."""
+    i, j = np.searchsorted(tracklet.inds, [start, stop])
+    if i == j:
+        return None
+    if i == 0 and j == len(tracklet):
+        return tracklet
+    return Tracklet(tracklet.data[i:j], tracklet.inds[i:j])
+
+
+_window_worker = dict()
+
+
+def _imap_bounded(pool, func, iterable, max_pending):
+    """Ordered `pool.imap` consuming `iterable` lazily."""
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def _can_pass_to_workers(func, start_method=None):
+    """Whether `func` reaches worker processes; it must be pickled unless forked."""
+    if (start_method or multiprocessing.get_start_method()) == "fork":
+        return True
+    try:
+        pickle.dumps(func)
+    except Exception:
+        return False
+    return True
+
+
+def _init_window_worker(config):
+    _window_worker.update(config)
+
+
+def _stitch_window(window):
+    """Tracks of a window, and the reason it could not be stitched (or None)."""
+    tracklets, residuals = window
+    config = _window_worker
+    try:
+        stitcher = TrackletStitcher(
+            tracklets,
+            config["n_tracks"],
+            config["min_length"],
+            split_tracklets=False,
+            prestitch_residuals=False,
+            backend=config["backend"],
+        )
+    except IOError:  # No tracklet long enough in this window
+        return [], None
+    stitcher.residuals.extend(residuals)
+    stitcher.build_graph(max_gap=config["max_gap"], weight_func=config["weight_func"])
+    try:
+        stitcher.stitch(add_back_residuals=config["add_back_residuals"])
+    except ValueError as e:
+        return [], str(e)
+    return list(stitcher.tracks), None
+
+
+def _nan_weight_message(tracklet1, tracklet2):
+    return (
+        f"The edge weight between the tracklets ending at frame {tracklet1.end} "
+        f"and starting at frame {tracklet2.start} is NaN; "
+        "check that the tracklet centroids contain no NaN "
+        "(e.g., due to frames with zero likelihood)."
+    )
+
+
+def _identity_weight_func(t1, t2):
+    w = 0.01 if t1.identity == t2.identity else 1
+    return w * TrackletStitcher.calculate_edge_weight(t1, t2)
+
+
+def _match_window_tracks(prev_tracks, tracks, start):
+    """Assign the tracks of a window to the identities of the previous one.
+
+    Tracks are first matched to those sharing the most detections from
+    `start` onwards (the overlap of the windows), and the remaining ones
+    to the identities whose last position is the closest.
+    """
+    n_ids = len(prev_tracks)
+    agreement = np.zeros((n_ids, len(tracks)))
+    distance = np.full((n_ids, len(tracks)), np.inf)
+    for i, prev in enumerate(prev_tracks):
+        if prev is None:
+            continue
+        prev_overlap = _crop_tracklet(prev, start, prev.end + 1)
+        for j, track in enumerate(tracks):
+            distance[i, j] = np.linalg.norm(track.centroid[0] - prev.centroid[-1])
+            if prev_overlap is None:
+                continue
+            _, inds1, inds2 = np.intersect1d(
+                prev_overlap.inds, track.inds, return_indices=True
+            )
+            xy = prev_overlap.xy[inds1]
+            same = (xy == track.xy[inds2]) | np.isnan(xy)
+            agreement[i, j] = np.all(same, axis=(1, 2)).sum()
+    rows, cols = linear_sum_assignment(agreement, maximize=True)
+    ids = [None] * len(tracks)
+    for i, j in zip(rows, cols):
+        if agreement[i, j] > 0:
+            ids[j] = i
+    free_ids = [i for i in range(n_ids) if i not in ids]
+    free_tracks = [j for j, id_ in enumerate(ids) if id_ is None]
+    if free_tracks:
+        distance = distance[np.ix_(free_ids, free_tracks)]
+        finite = np.isfinite(distance)
+        distance[~finite] = distance[finite].max(initial=0) + 1
+        rows, cols = linear_sum_assignment(distance)
+        for i, j in zip(rows, cols):
+            ids[free_tracks[j]] = free_ids[i]
+    return ids
+
+
+def _pairs_starting_before(starts, stops):
+    """Pairs (i, j), i < j, of tracklets sorted by start time such that j < stops[i]."""
+    n = len(starts)
+    lo = np.arange(1, n + 1)
+    counts = np.maximum(stops, lo) - lo
+    inds1 = np.repeat(np.arange(n), counts)
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    inds2 = np.arange(counts.sum()) - offsets + np.repeat(lo, counts)
+    return inds1, inds2
+
+
+class _FlowNetwork(
+    namedtuple(
+        "_FlowNetwork",
+        ["nodes", "tails", "heads", "capacity", "weight", "has_weight", "demand"],
+    )
+):
+    """Flow network stored as arrays of edges, indexing into the list of nodes."""
+
+    @classmethod
+    def from_graph(cls, G):
+        nodes = list(G)
+        index = {node: i for i, node in enumerate(nodes)}
+        demand = np.array([G.nodes[node].get("demand", 0) for node in nodes])
+        max_flow = max(demand[demand > 0].sum(), 1)
+        tails, heads, capacity, weight, has_weight = [], [], [], [], []
+        for u, v, attrs in G.edges(data=True):
+            tails.append(index[u])
+            heads.append(index[v])
+            capacity.append(min(attrs.get("capacity", max_flow), max_flow))
+            weight.append(attrs.get("weight", 0))
+            has_weight.append("weight" in attrs)
+        return cls(
+            nodes,
+            np.array(tails, dtype=int),
+            np.array(heads, dtype=int),
+            np.array(capacity, dtype=int),
+            np.array(weight),
+            np.array(has_weight, dtype=bool),
+            demand,
+        )
+
+    def to_graph(self):
+        G = nx.DiGraph()
+        for node, demand in zip(self.nodes, self.demand.tolist()):
+            G.add_node(node, demand=demand)
+        for i, j, capacity, weight, has_weight in zip(
+            self.tails.tolist(),
+            self.heads.tolist(),
+            self.capacity.tolist(),
+            self.weight.tolist(),
+            self.has_weight.tolist(),
+        ):
+            if has_weight:
+                G.add_edge(
+                    self.nodes[i], self.nodes[j], weight=weight, capacity=capacity
+                )
+            else:
+                G.add_edge(self.nodes[i], self.nodes[j], capacity=capacity)
+        return G
+
+
+def _min_cost_flow(n_nodes, tails, heads, capacity, weight, demand):
+    """
+    Solve a min-cost flow problem (with networkx's conventions for node demands)
+    as a linear program with the HiGHS dual simplex solver.
+    The node-edge incidence matrix being totally unimodular,
+    the optimal basic solution is integral.
+
+    Returns the flow along every edge, or None if the solution is not integral.
+    """
+    n_edges = len(tails)
+    incidence = csr_matrix(
+        (
+            np.r_[-np.ones(n_edges), np.ones(n_edges)],
+            (np.r_[tails, heads], np.r_[np.arange(n_edges), np.arange(n_edges)]),
+        ),
+        shape=(n_nodes, n_edges),
+    )
+    res = linprog(
+        weight,
+        A_eq=incidence,
+        b_eq=demand,
+        bounds=np.c_[np.zeros(n_edges), capacity],
+        method="highs-ds",
+    )
+    if res.status == 2:
+        raise nx.NetworkXUnfeasible("No flow satisfying all demands.")
+    if res.status != 0:
+        return None
+    flow = np.round(res.x).astype(int)
+    if not np.array_equal(incidence @ flow, demand):
+        return None
+    return flow
+
+
 def stitch_tracklets(
     config_path,
     videos,
@@ -1018,6 +1511,9 @@ def stitch_tracklets(
     output_name="",
     transformer_checkpoint="",
     save_as_csv=False,
+    window_length=None,
+    window_overlap=None,
+    n_processes=1,
 ):
     """
     Stitch sparse tracklets into full tracks via a graph-based,
@@ -1099,6 +1595,21 @@ def stitch_tracklets(
     save_as_csv: bool, optional
         Whether to write the tracks to a CSV file too (False by default).
 
+    window_length: int, optional
+        If given, tracklets are stitched in overlapping windows of `window_length`
+        frames rather than all at once, and track identities are reconciled
+        across windows. Memory and runtime then scale with the window length
+        rather than the video length, which is recommended for long recordings.
+        Windows should span several typical occlusions (e.g., a few thousand frames).
+
+    window_overlap: int, optional
+        Number of frames shared by consecutive windows; a quarter of
+        `window_length` by default.
+
+    n_processes: int, optional
+        Number of processes stitching windows in parallel (1 by default).
+        Only used if `window_length` is given.
+
     Returns
     -------
     A TrackletStitcher object
@@ -1142,7 +1653,11 @@ def stitch_tracklets(
         t1 = (coord1, ind_img1)
         t2 = (coord2, ind_img2)
 
-        dist = dlctrans(t1, t2, zfill_width, feature_dict)
+        # Embeddings are looked up from the cache filled before building the graph
+        vec1, vec2 = dlctrans.embed_keypoints(
+            [t1, t2], zfill_width, feature_dict, normalize=True
+        )
+        dist = float(vec1 @ vec2)
         dist = (dist + 1) / 2
 
         return -dist
@@ -1180,21 +1695,33 @@ def stitch_tracklets(
             with_id = any(tracklet.identity != -1 for tracklet in stitcher)
             if with_id and weight_func is None:
                 # Add in identity weighing before building the graph
-                def weight_func(t1, t2):
-                    w = 0.01 if t1.identity == t2.identity else 1
-                    return w * stitcher.calculate_edge_weight(t1, t2)
+                weight_func = _identity_weight_func
 
             if transformer_checkpoint:
-                stitcher.build_graph(
+                # Embed all tracklet endpoints at once, in batches
+                dlctrans.clear_cache()
+                endpoints = []
+                for tracklet in stitcher:
+                    endpoints.append((tracklet.data[0][:, :2], tracklet.inds[0]))
+                    endpoints.append((tracklet.data[-1][:, :2], tracklet.inds[-1]))
+                dlctrans.embed_keypoints(
+                    endpoints, int(np.ceil(np.log10(nframe))), feature_dict
+                )
+                weight_func = partial(
+                    trans_weight_func, nframe=nframe, feature_dict=feature_dict
+                )
+
+            if window_length:
+                stitcher.stitch_windowed(
+                    window_length,
+                    window_overlap,
                     max_gap=max_gap,
-                    weight_func=partial(
-                        trans_weight_func, nframe=nframe, feature_dict=feature_dict
-                    ),
+                    weight_func=weight_func,
+                    n_processes=n_processes,
                 )
             else:
                 stitcher.build_graph(max_gap=max_gap, weight_func=weight_func)
-
-            stitcher.stitch()
+                stitcher.stitch()
             if transformer_checkpoint:
                 stitcher.write_tracks(
                     output_name=output_name,
@@ -33,6 +33,7 @@ import pandas as pd
 
 from deeplabcut.utils import auxiliaryfunctions, conversioncode
 from deeplabcut.generate_training_dataset import trainingsetmanipulation
+from deeplabcut.pose_estimation_tensorflow.lib import detectionstore
 from deeplabcut.pose_estimation_tensorflow.lib.trackingutils import TRACK_METHODS
 
 
@@ -211,14 +212,22 @@ def SaveFullMultiAnimalData(data, metadata, dataname, suffix="_full"):
 
 
 def LoadFullMultiAnimalData(dataname):
-    """Save predicted data as h5 file and metadata as pickle file; created by predict_videos.py"""
+    """Load the raw detections and metadata created by predict_videos.py.
+
+    Detections are read from the columnar store if it exists,
+    falling back to the *_full.pickle file (or shelf) otherwise.
+    """
+    store_path = detectionstore.get_store_path(dataname)
     data_file = dataname.split(".h5")[0] + "_full.pickle"
-    try:
-        with open(data_file, "rb") as handle:
-            data = pickle.load(handle)
-    except (pickle.UnpicklingError, FileNotFoundError):
-        data = shelve.open(data_file, flag="r")
-    with open(data_file.replace("_full.", "_meta."), "rb") as handle:
+    if detectionstore.is_store(store_path):
+        data = detectionstore.DetectionStore.open(store_path)
+    else:
+        try:
+            with open(data_file, "rb") as handle:
+                data = pickle.load(handle)
+        except (pickle.UnpicklingError, FileNotFoundError):
+            data = shelve.open(data_file, flag="r")
+    with open(dataname.split(".h5")[0] + "_meta.pickle", "rb") as handle:
         metadata = pickle.load(handle)
     return data, metadata
 
@@ -26,8 +26,12 @@ import cv2
 import datetime
 import numpy as np
 import os
+import queue
 import subprocess
+import threading
 import warnings
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 
 # more videos are in principle covered, as OpenCV is used and allows many formats.
@@ -35,7 +39,25 @@ SUPPORTED_VIDEOS = "avi", "mp4", "mov", "mpeg", "mpg", "mpv", "mkv", "flv", "qt"
 
 
 class VideoReader:
-    def __init__(self, video_path):
+    """Read frames from a video, sequentially or at random.
+
+    Parameters
+    ----------
+    video_path: str
+        Full path to the video.
+
+    cache_size: float, optional, default=256
+        Memory budget (in MB) of the cache of decoded frames used by
+        :meth:`get_frames`. Least recently accessed frames are evicted first;
+        set to 0 to disable caching.
+
+    Random access goes through a keyframe index, built once (without decoding)
+    on first use and persisted next to the video as ``<video_name>.frameindex.npz``.
+    It allows requests to be served by decoding each group of pictures (GOP) at
+    most once, rather than seeking back to the nearest keyframe for every frame.
+    """
+
+    def __init__(self, video_path, cache_size=256):
         if not os.path.isfile(video_path):
             raise ValueError(f'Video path "{video_path}" does not point to a file.')
         self.video_path = video_path
@@ -45,6 +67,10 @@ class VideoReader:
         self.parse_metadata()
         self._bbox = 0, 1, 0, 1
         self._n_frames_robust = None
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_nbytes = 0
+        self._keyframes = None
 
     def __repr__(self):
         string = "Video (duration={:0.2f}, fps={}, dimensions={}x{})"
@@ -135,7 +161,158 @@ class VideoReader:
         success, frame = self.video.read()
         if not success:
             return
-        frame = frame[..., ::-1]  # return RGB rather than BGR!
+        return self._process_frame(frame[..., ::-1], shrink, crop)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.directory, f"{self.name}.frameindex.npz")
+
+    def _scan_keyframes(self):
+        """Locate keyframes from the packets' flags, without decoding frames."""
+        cap = cv2.VideoCapture(
+            self.video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1]
+        )
+        try:
+            if not cap.isOpened():
+                return
+            keyframes, pts = [], []
+            while cap.grab():
+                keyframes.append(bool(cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME)))
+                pts.append(cap.get(cv2.CAP_PROP_PTS))
+        finally:
+            cap.release()
+        if not any(keyframes):
+            return
+        return np.flatnonzero(keyframes), np.asarray(pts)
+
+    def build_index(self, overwrite=False):
+        """Build (or load) the keyframe index of the video.
+
+        Parameters
+        ----------
+        overwrite: bool, optional, default=False
+            If True, the index is rebuilt even though a valid one already
+            exists next to the video.
+
+        Returns
+        -------
+        keyframes: np.ndarray
+            Sorted indices of the keyframes. If keyframes cannot be determined
+            (e.g., OpenCV was built without FFmpeg), every frame is considered
+            a keyframe, i.e., seeking is assumed to be accurate and cheap.
+        """
+        stat = os.stat(self.video_path)
+        signature = np.asarray([stat.st_size, stat.st_mtime_ns])
+        if not overwrite and os.path.isfile(self.index_path):
+            try:
+                with np.load(self.index_path) as data:
+                    if np.array_equal(data["signature"], signature):
+                        self._keyframes = data["keyframes"]
+                        return self._keyframes
+            except (OSError, KeyError, ValueError):
+                pass
+        index = self._scan_keyframes()
+        if index is None:
+            self._keyframes = np.arange(len(self))
+            return self._keyframes
+        self._keyframes, pts = index
+        try:
+            np.savez(
+                self.index_path,
+                keyframes=self._keyframes,
+                pts=pts,
+                signature=signature,
+            )
+        except OSError:  # E.g., read-only video folder
+            pass
+        return self._keyframes
+
+    def _cache_frame(self, ind, frame):
+        budget = self.cache_size * 1e6
+        if frame.nbytes > budget:
+            return
+        self._cache[ind] = frame
+        self._cache_nbytes += frame.nbytes
+        while self._cache_nbytes > budget:
+            _, evicted = self._cache.popitem(last=False)
+            self._cache_nbytes -= evicted.nbytes
+
+    def clear_cache(self):
+        self._cache.clear()
+        self._cache_nbytes = 0
+
+    def _decode(self, inds):
+        """Decode frames at the given sorted, unique indices, each GOP at most once."""
+        keyframes = self._keyframes
+        if keyframes is None:
+            keyframes = self.build_index()
+        pos = int(self.video.get(cv2.CAP_PROP_POS_FRAMES))
+        frames = {}
+        for ind in inds:
+            gop_start = keyframes[max(np.searchsorted(keyframes, ind, "right") - 1, 0)]
+            # Keep decoding forward, unless a keyframe lies in between
+            if not gop_start <= pos <= ind:
+                self.video.set(cv2.CAP_PROP_POS_FRAMES, ind)
+                pos = ind
+            while pos < ind and self.video.grab():
+                pos += 1
+            success, frame = self.video.read()
+            if not success:
+                pos = -1  # Force seeking for the next request
+                continue
+            pos += 1
+            frame = frame[..., ::-1]
+            frame.flags.writeable = False  # Shared with the cache
+            frames[ind] = frame
+        return frames
+
+    def get_frames(self, indices, shrink=1, crop=False):
+        """Return the frames at arbitrary indices.
+
+        Requests are sorted and decoded in a single forward pass per GOP;
+        frames already in the cache are not decoded again. The position of the
+        sequential reader (see :meth:`read_frame`) is left undetermined.
+
+        Parameters
+        ----------
+        indices: list of int
+            Frame indices, in any order and possibly with repeats.
+
+        shrink: int, optional, default=1
+            Integer factor by which frames are downsampled.
+
+        crop: bool, optional, default=False
+            Whether to crop frames to the bounding box.
+
+        Returns
+        -------
+        list of np.ndarray
+            Read-only RGB frames in the order of ``indices``;
+            None for frames that could not be decoded.
+        """
+        indices = [int(ind) for ind in indices]
+        if any(ind < 0 for ind in indices):
+            raise ValueError("Index must be a positive integer.")
+        missing = sorted(set(indices).difference(self._cache))
+        frames = self._decode(missing) if missing else {}
+        for ind, frame in frames.items():
+            self._cache_frame(ind, frame)
+        out = []
+        for ind in indices:
+            frame = frames.get(ind)
+            if frame is None:
+                frame = self._cache.get(ind)
+                if frame is None:
+                    out.append(None)
+                    continue
+                self._cache.move_to_end(ind)
+            out.append(self._process_frame(frame, shrink, crop))
+        return out
+
+    def get_frame(self, ind, shrink=1, crop=False):
+        return self.get_frames([ind], shrink, crop)[0]
+
+    def _process_frame(self, frame, shrink=1, crop=False):
         if crop:
             x1, x2, y1, y2 = self.get_bbox(relative=False)
             frame = frame[y1:y2, x1:x2]
@@ -358,23 +535,340 @@ class VideoWriter(VideoReader):
         return os.path.join(dest_folder, f"{self.name}{suffix}{self.format}")
 
 
+class BatchPrefetcher:
+    """Decode video frames into preallocated batches ahead of inference.
+
+    Frames are read, cropped and converted to RGB by background threads,
+    so that the next batches are ready by the time the network has processed
+    the current one. Batches are written into a fixed pool of
+    ``queue_size + n_decoders + 1`` preallocated arrays that are recycled
+    once consumed, which bounds memory regardless of the video length.
+
+    Parameters
+    ----------
+    captures: list of cv2.VideoCapture
+        One opened capture per decoder thread. With several captures, the video is
+        split into contiguous frame ranges, each decoded independently after seeking
+        (this relies on accurate frame seeking of the underlying codec).
+
+    n_frames: int
+        Number of frames to decode.
+
+    batch_size: int
+        Number of frames per batch.
+
+    frame_shape: tuple
+        (height, width) of the frames after cropping.
+
+    crop: tuple or None, optional, default=None
+        Cropping coordinates as (x1, x2, y1, y2).
+
+    queue_size: int, optional, default=2
+        Number of ready batches buffered ahead of the consumer.
+        If 0, frames are decoded synchronously in the calling thread.
+
+    start: int, optional, default=0
+        Index of the first frame to decode.
+
+    Iterating over the object yields tuples (frames, inds), where ``frames``
+    is a (batch_size, height, width, 3) uint8 array and ``inds`` the list of frame
+    indices it holds; only the first ``len(inds)`` frames are valid. The array is
+    only valid until the next batch is requested.
+    """
+
+    def __init__(
+        self,
+        captures,
+        n_frames,
+        batch_size,
+        frame_shape,
+        crop=None,
+        queue_size=2,
+        start=0,
+    ):
+        if not captures:
+            raise ValueError("At least one video capture is required.")
+        if batch_size < 1:
+            raise ValueError("Batch size must be a positive integer.")
+        self.captures = list(captures)
+        self.n_frames = n_frames
+        self.batch_size = batch_size
+        self.frame_shape = tuple(frame_shape)
+        self.crop = crop
+        self.queue_size = max(0, int(queue_size))
+        self.start = start
+
+    @property
+    def n_decoders(self):
+        return len(self.captures)
+
+    def _split_ranges(self):
+        bounds = np.linspace(self.start, self.n_frames, self.n_decoders + 1)
+        bounds = bounds.astype(int)
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _read(self, cap, ind):
+        ret, frame = cap.read()
+        if not ret:
+            warnings.warn(f"Could not decode frame #{ind}.")
+            return
+        if self.crop is not None:
+            x1, x2, y1, y2 = self.crop
+            frame = frame[y1:y2, x1:x2]
+        return frame
+
+    def _batches(self, cap, start, stop, get_buffer):
+        """Yield (buffer_index, frame_indices) as batches get filled."""
+        if start > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+        buffer, inds = None, []
+        for ind in range(start, stop):
+            frame = self._read(cap, ind)
+            if frame is None:
+                continue
+            if buffer is None:
+                buffer = get_buffer()
+                if buffer is None:  # Iteration was interrupted
+                    return
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._buffers[buffer][len(inds)])
+            inds.append(ind)
+            if len(inds) == self.batch_size:
+                yield buffer, inds
+                buffer, inds = None, []
+        if inds:
+            yield buffer, inds
+
+    def _allocate(self, n_buffers):
+        self._buffers = [
+            np.empty((self.batch_size, *self.frame_shape, 3), dtype=np.uint8)
+            for _ in range(n_buffers)
+        ]
+
+    def _iter_sync(self):
+        self._allocate(1)
+        for cap, (start, stop) in zip(self.captures, self._split_ranges()):
+            for buffer, inds in self._batches(cap, start, stop, lambda: 0):
+                yield self._buffers[buffer], inds
+
+    def _iter_async(self):
+        n_buffers = self.queue_size + self.n_decoders + 1
+        self._allocate(n_buffers)
+        free = queue.Queue()
+        for i in range(n_buffers):
+            free.put(i)
+        ready = queue.Queue()
+        stop_event = threading.Event()
+
+        def get_buffer():
+            while not stop_event.is_set():
+                try:
+                    return free.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+
+        def decode(cap, start, stop):
+            try:
+                for buffer, inds in self._batches(cap, start, stop, get_buffer):
+                    ready.put((buffer, inds))
+            except Exception as e:
+                ready.put(e)
+            finally:
+                ready.put(None)
+
+        threads = [
+            threading.Thread(target=decode, args=(cap, start, stop), daemon=True)
+            for cap, (start, stop) in zip(self.captures, self._split_ranges())
+        ]
+        for thread in threads:
+            thread.start()
+        n_running = len(threads)
+        try:
+            while n_running:
+                item = ready.get()
+                if item is None:
+                    n_running -= 1
+                    continue
+                if isinstance(item, Exception):
+                    raise item
+                buffer, inds = item
+                yield self._buffers[buffer], inds
+                free.put(buffer)
+        finally:
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+
+    def __iter__(self):
+        if self.queue_size == 0:
+            return self._iter_sync()
+        return self._iter_async()
+
+
+def imap_threaded(func, items, n_workers=4, n_ahead=None):
+    """Lazily apply func to items with a pool of threads, yielding results in order.
+
+    At most ``n_ahead`` items (by default, twice the number of workers) are
+    processed ahead of the consumer, which bounds memory. If ``n_workers`` is 0,
+    items are processed in the calling thread.
+    """
+    if n_workers == 0:
+        yield from map(func, items)
+        return
+    n_ahead = n_ahead or 2 * n_workers
+    executor = ThreadPoolExecutor(n_workers)
+    pending = deque()
+    try:
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= n_ahead:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+
+def read_image_rgb(image_path):
+    """Read an image as uint8 RGB, as ``imread(image_path, mode="skimage")`` does.
+
+    Images are decoded with OpenCV (which releases the GIL, so that several images
+    can be decoded concurrently by threads), falling back to skimage for formats
+    OpenCV cannot read.
+    """
+    image = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
+    if image is None:
+        return imread(image_path, mode="skimage")
+    if image.ndim == 3 and image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    elif image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_BGRA2RGBA)
+    return _to_rgb_ubyte(image)
+
+
+class ImageBatchLoader:
+    """Decode image files with a pool of threads into batches of same-size frames.
+
+    Images are decoded ahead of inference by ``n_workers`` threads, and copied into
+    preallocated batches, one per image size, so that folders of images with mixed
+    resolutions are still processed in full batches. Images are grouped by size
+    within consecutive windows of ``window`` images; batches that are only
+    partially filled are released at the end of each window.
+
+    Parameters
+    ----------
+    image_paths: list of str
+        Full paths of the images.
+
+    batch_size: int
+        Number of frames per batch.
+
+    crop: tuple or None, optional, default=None
+        Cropping coordinates as (x1, x2, y1, y2).
+
+    n_workers: int, optional, default=4
+        Number of decoder threads. If 0, images are decoded in the calling thread.
+
+    queue_size: int, optional, default=2
+        Number of batches worth of images decoded ahead of the consumer.
+
+    window: int or None, optional, default=None
+        Number of consecutive images within which frames are grouped by size.
+        By default, frames are grouped across all images. Batches never hold frames
+        from different windows, so that a window can be completed (e.g., written
+        to disk) before the next one starts.
+
+    start: int, optional, default=0
+        Index of the first image to decode.
+
+    Iterating over the object yields tuples (frames, inds), where ``frames``
+    is a (batch_size, height, width, 3) uint8 array and ``inds`` the list of
+    image indices it holds, in increasing order; only the first ``len(inds)``
+    frames are valid. The array is only valid until the next batch is requested.
+    Images that cannot be read are skipped with a warning.
+    """
+
+    def __init__(
+        self,
+        image_paths,
+        batch_size,
+        crop=None,
+        n_workers=4,
+        queue_size=2,
+        window=None,
+        start=0,
+    ):
+        if batch_size < 1:
+            raise ValueError("Batch size must be a positive integer.")
+        self.image_paths = list(image_paths)
+        self.batch_size = batch_size
+        self.crop = crop
+        self.n_workers = max(0, int(n_workers))
+        self.queue_size = max(0, int(queue_size))
+        self.window = window
+        self.start = start
+
+    def _load(self, ind):
+        try:
+            image = read_image_rgb(self.image_paths[ind])
+        except (OSError, ValueError):
+            warnings.warn(f"Could not read image {self.image_paths[ind]}.")
+            return
+        if self.crop is not None:
+            x1, x2, y1, y2 = self.crop
+            image = image[y1:y2, x1:x2]
+        return image
+
+    def _images(self):
+        """Yield (index, image) in order, with images decoded by the pool."""
+        inds = range(self.start, len(self.image_paths))
+        n_ahead = max(1, self.queue_size) * self.batch_size + self.n_workers
+        images = imap_threaded(self._load, inds, self.n_workers, n_ahead)
+        return zip(inds, images)
+
+    def __iter__(self):
+        batches = dict()  # Frame shape -> (frames, indices)
+        n_images = len(self.image_paths)
+        for ind, image in self._images():
+            if image is not None:
+                frames, inds = batches.get(image.shape, (None, []))
+                if frames is None:
+                    frames = np.empty((self.batch_size, *image.shape), dtype=np.uint8)
+                frames[len(inds)] = image
+                inds.append(ind)
+                batches[image.shape] = frames, inds
+                if len(inds) == self.batch_size:
+                    yield frames, inds
+                    batches[image.shape] = frames, []
+            end_of_window = self.window and (ind + 1 - self.start) % self.window == 0
+            if end_of_window or ind == n_images - 1:
+                # Release partial batches in order of their first frame
+                for frames, inds in sorted(batches.values(), key=lambda b: b[1][:1]):
+                    if inds:
+                        yield frames, inds
+                batches.clear()
+
+
 def check_video_integrity(video_path):
     vid = VideoReader(video_path)
     vid.check_integrity()
     vid.check_integrity_robust()
 
 
+def _to_rgb_ubyte(image):
+    if image.ndim == 2 or image.shape[-1] == 1:
+        image = skimage.color.gray2rgb(image)
+    elif image.shape[-1] == 4:
+        image = skimage.color.rgba2rgb(image)
+    return img_as_ubyte(image)
+
+
 def imread(image_path, mode="skimage"):
     """Read image either with skimage or cv2.
     Returns frame in uint with 3 color channels."""
     if mode == "skimage":
-        image = io.imread(image_path)
-        if image.ndim == 2 or image.shape[-1] == 1:
-            image = skimage.color.gray2rgb(image)
-        elif image.shape[-1] == 4:
-            image = skimage.color.rgba2rgb(image)
-
-        return img_as_ubyte(image)
+        return _to_rgb_ubyte(io.imread(image_path))
 
     elif mode == "cv2":
         return cv2.imread(image_path, cv2.IMREAD_UNCHANGED)[
@@ -405,6 +405,106 @@ def save_data(PredicteData, metadata, dataname, pdindex, imagenames, save_as_csv
         pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
 
 
+class StreamingDataWriter:
+    """Append predictions to an h5 file chunk by chunk, as they become available.
+
+    Rows are stored as float32 in a partial file (``dataname + ".part"``); every
+    chunk of ``chunksize`` frames is appended to the HDF table and flushed to disk,
+    so that completed chunks survive a crash. Reopening a writer on the same
+    ``dataname`` resumes after the last committed frame (see ``start``).
+    The partial file is renamed to ``dataname`` once all frames are written.
+
+    Frames must be written in increasing order: ``writer[inds] = data``.
+    Frames that are never written (e.g., because they could not be decoded)
+    are filled with zeros. Rows are labeled with the frame indices, unless
+    ``index`` (e.g., a list of image names) is given.
+    """
+
+    key = "df_with_missing"
+
+    def __init__(self, dataname, pdindex, nframes, chunksize=10000, index=None):
+        self.dataname = dataname
+        self.partname = dataname + ".part"
+        self.pdindex = pdindex
+        self.nframes = nframes
+        self.chunksize = chunksize
+        self.index = index
+        self._min_itemsize = None
+        if index is not None:
+            if len(index) != nframes:
+                raise ValueError("There must be one index label per frame.")
+            self._min_itemsize = {"index": max(len(str(label)) for label in index)}
+        self.store = pd.HDFStore(self.partname, mode="a")
+        self.start = 0
+        if self.key in self.store:
+            columns = self.store.select(self.key, start=0, stop=0).columns
+            if columns.equals(pdindex):
+                self.start = self.store.get_storer(self.key).nrows
+            else:
+                warnings.warn(
+                    f"{self.partname} was written by a different model; starting over."
+                )
+                self.store.remove(self.key)
+        self._chunk = np.zeros((chunksize, len(pdindex)), dtype=np.float32)
+        self._chunk_start = self.start
+        self._stop = self.start  # One past the last frame written so far
+
+    def __setitem__(self, inds, data):
+        inds = np.asarray(inds)
+        data = np.asarray(data)
+        if inds.size and inds.min() < self._chunk_start:
+            raise ValueError("Frames must be written in increasing order.")
+        if inds.size:
+            self._stop = max(self._stop, inds.max() + 1)
+        while inds.size:
+            mask = inds < self._chunk_start + len(self._chunk)
+            self._chunk[inds[mask] - self._chunk_start] = data[mask]
+            inds, data = inds[~mask], data[~mask]
+            if inds.size:
+                self._flush(len(self._chunk))
+
+    def _flush(self, n_rows):
+        n_rows = min(n_rows, self.nframes - self._chunk_start)
+        if n_rows <= 0:
+            return
+        index = range(self._chunk_start, self._chunk_start + n_rows)
+        if self.index is not None:
+            index = self.index[index.start : index.stop]
+        df = pd.DataFrame(self._chunk[:n_rows], columns=self.pdindex, index=index)
+        self.store.append(self.key, df, format="table", min_itemsize=self._min_itemsize)
+        self.store.flush(fsync=True)
+        self._chunk_start += n_rows
+        self._chunk[:] = 0
+
+    def close(self, complete=True):
+        """Commit the remaining frames and move the data to their final location.
+
+        If ``complete`` is False (e.g., the analysis was interrupted), only the
+        frames written so far are committed, and the partial file is kept so that
+        the analysis can be resumed later.
+        """
+        if complete:
+            while self._chunk_start < self.nframes:
+                self._flush(len(self._chunk))
+        else:
+            self._flush(self._stop - self._chunk_start)
+        self.store.close()
+        if complete:
+            os.replace(self.partname, self.dataname)
+
+    def save(self, metadata, save_as_csv=False):
+        """Finalize the h5 file and save metadata as in ``save_data``."""
+        self.close()
+        if save_as_csv:
+            print("Saving csv poses!")
+            csvname = self.dataname.split(".h5")[0] + ".csv"
+            chunksize = len(self._chunk)
+            for n, df in enumerate(pd.read_hdf(self.dataname, chunksize=chunksize)):
+                df.to_csv(csvname, mode="a" if n else "w", header=not n)
+        with open(self.dataname.split(".h5")[0] + "_meta.pickle", "wb") as f:
+            pickle.dump(metadata, f, pickle.HIGHEST_PROTOCOL)
+
+
 def save_metadata(metadatafilename, data, trainIndices, testIndices, trainFraction):
     with open(metadatafilename, "wb") as f:
         # Pickle the 'labeled-data' dictionary using the highest protocol available.
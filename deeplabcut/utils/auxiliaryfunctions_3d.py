@@ -121,6 +121,8 @@ def get_camerawise_videos(path, cam_names, videotype):
     e.g. if cam_names = ['camera-1','camera-2']
 
     then it will return [['somename-camera-1-othername.avi', 'somename-camera-2-othername.avi']]
+
+    With more cameras, every list holds one video per camera, in the order of cam_names.
     """
     import glob
     from pathlib import Path
@@ -154,23 +156,23 @@ def get_camerawise_videos(path, cam_names, videotype):
             ending = Path(vid[0][k]).suffix
             pref = str(Path(vid[0][k]).stem).split(cam)[0]
             suf = str(Path(vid[0][k]).stem).split(cam)[1]
-            if pref == "":
-                if suf == "":
-                    print("Strange naming convention on your part. Respect.")
-                else:
-                    putativecam2name = os.path.join(path, cam_names[1] + suf + ending)
-            else:
-                if suf == "":
-                    putativecam2name = os.path.join(path, pref + cam_names[1] + ending)
+            if pref == "" and suf == "":
+                print("Strange naming convention on your part. Respect.")
+                continue
+            # Videos of the other cameras share the prefix and suffix
+            names = []
+            for other_cam in cam_names[1:]:
+                if pref == "":
+                    name = other_cam + suf + ending
+                elif suf == "":
+                    name = pref + other_cam + ending
                 else:
-                    putativecam2name = os.path.join(
-                        path, pref + cam_names[1] + suf + ending
-                    )
-            # print([os.path.join(path,pref+cam+suf+ending),putativecam2name])
-            if os.path.isfile(putativecam2name):
-                # found a pair!!!
+                    name = pref + other_cam + suf + ending
+                names.append(os.path.join(path, name))
+            if all(os.path.isfile(name) for name in names):
+                # found a group!!!
                 video_list.append(
-                    [os.path.join(path, pref + cam + suf + ending), putativecam2name]
+                    [os.path.join(path, pref + cam + suf + ending)] + names
                 )
     return video_list
 
@@ -277,63 +279,111 @@ def LoadMetadata3d(metadatafilename):
         return metadata
 
 
-def _reconstruct_tracks_as_tracklets(df):
+def _epipolar_costs(xy1, xy2, F, chunksize=1000, metric="distance"):
     """
+    Epipolar cost of every pair of individuals of two views, in every frame.
+
     Parameters:
     -----------
-    df: DataFrame
-        loaded from an .h5 tracks file (obtained from `stitch_tracklets()`)
+    xy1/2: nd.array
+        Coordinates of shape (n_frames, n_individuals1/2, n_bodyparts, 2),
+        aligned in time; NaNs mark missing detections.
+    F: nd.array
+        Fundamental matrix between cam1 and cam2, such that x2.T @ F @ x1 = 0
+    metric: str, optional
+        "distance" (default), the mean distance of the bodyparts of an individual
+        in view 2 to the epipolar lines of the same bodyparts of an individual in
+        view 1; or "algebraic", the mean absolute algebraic residual x1.T @ F @ x2
+        of their bodyparts, as formerly used by ``triangulate``.
+
+    Returns an array of shape (n_frames, n_individuals1, n_individuals2),
+    NaN where two individuals have no bodypart detected in common.
     """
-    from deeplabcut.refine_training_dataset.stitch import Tracklet
-
-    tracklets = []
-    for _, group in df.groupby("individuals", axis=1):
-        temp = group.dropna(how="all")
-        inds = temp.index.to_numpy()
-        track = Tracklet(temp.to_numpy().reshape((len(temp), -1, 3)), inds)
-        track = track.interpolate(max_gap=len(group))
-        tracklets.append(track)
-    return tracklets
-
-
-def _associate_paired_view_tracks(tracklets1, tracklets2, F):
+    if metric not in ("distance", "algebraic"):
+        raise ValueError(f"Unknown metric {metric}. Must be 'distance' or 'algebraic'.")
+    costs = np.empty((xy1.shape[0], xy1.shape[1], xy2.shape[1]))
+    for start in range(0, xy1.shape[0], chunksize):
+        sl = slice(start, start + chunksize)
+        pts1 = np.c_[xy1[sl], np.ones((*xy1[sl].shape[:-1], 1))]
+        pts2 = np.c_[xy2[sl], np.ones((*xy2[sl].shape[:-1], 1))]
+        if metric == "algebraic":
+            residuals = np.abs(np.einsum("fibk,fjbk->fijb", pts1 @ F, pts2))
+        else:
+            # Epipolar lines in view 2, normalized so that residuals are distances
+            lines = pts1 @ F.T
+            lines /= np.linalg.norm(lines[..., :2], axis=-1, keepdims=True)
+            residuals = np.abs(np.einsum("fibk,fjbk->fijb", lines, pts2))
+        valid = ~np.isnan(residuals)
+        n_valid = valid.sum(axis=3)
+        with np.errstate(invalid="ignore"):
+            costs[sl] = np.where(valid, residuals, 0).sum(axis=3) / n_valid
+    return costs
+
+
+def match_individuals_across_views(df1, df2, F, window_size=None, metric="distance"):
     """
-    Computes the optimal matching between tracks in two cameras
+    Matches the individuals of two camera views over windows of frames,
     using the xFx'=0 epipolar constraint equation.
 
+    Frames are aligned on the index of the DataFrames. Within every window, the
+    cost of a pair of individuals is their epipolar cost averaged over frames (by
+    default, the distance of their bodyparts to the corresponding epipolar lines),
+    and individuals are matched by the Hungarian algorithm. Matching windows of frames rather than entire videos allows
+    identities to be swapped midway in a view. Windows in which two individuals are
+    never detected together fall back to their cost over the entire video.
+
     Parameters:
     -----------
-    tracklets1/2: Tracklet() object (defined in stitch.py)
+    df1/2: DataFrame
+        Data read from .h5 track files, with animal bodyparts only
     F: nd.array
-        Fundamental matrix between cam1 and cam2
+        Fundamental matrix from OpenCV, such that x2.T @ F @ x1 = 0
+    window_size: int, optional
+        Number of frames individuals are matched over.
+        By default, they are matched over the entire video.
+    metric: str, optional
+        Epipolar cost of a pair of individuals in a frame, "distance" (default)
+        or "algebraic" (see ``_epipolar_costs``).
+
+    Returns:
+    --------
+    costs: nd.array of shape (n_windows, n_individuals1, n_individuals2)
+    assignments: nd.array of shape (n_windows, n_individuals1)
+        Individual of view 2 matched to every individual of view 1 (-1 if none)
+    starts: nd.array
+        Index of the first frame of every window
     """
     from scipy.optimize import linear_sum_assignment
 
-    # Initialize costs matrix
-    costs = np.zeros([len(tracklets1), len(tracklets2)])
-
-    for i, t1 in enumerate(tracklets1):
-        for j, t2 in enumerate(tracklets2):
-            # get common bodypart detections in track pair
-            _t1 = t1.xy[np.isin(t1.inds, t2.inds)]
-            _t2 = t2.xy[np.isin(t2.inds, t1.inds)]
-
-            # add 3rd dim to the points
-            _t1 = np.c_[_t1, np.ones((*_t1.shape[:2], 1))]
-            _t2 = np.c_[_t2, np.ones((*_t2.shape[:2], 1))]
-
-            # cost for any point in time of t1 being the same
-            # any point in time of t2
-            cost = np.abs(np.nansum(np.matmul(_t1, F) * _t2, axis=2))
-
-            # Get average cost of the entire track
-            cost = cost.mean()
-            costs[i, j] = cost
-
-    match_inds = linear_sum_assignment(np.abs(costs))
-    voting = dict(zip(*match_inds))
-
-    return costs, voting
+    df1, df2 = df1.align(df2, join="inner", axis=0)
+    n_frames = len(df1)
+    n_inds1 = len(df1.columns.get_level_values("individuals").unique())
+    n_inds2 = len(df2.columns.get_level_values("individuals").unique())
+    xy1 = df1.to_numpy().reshape((n_frames, n_inds1, -1, 3))[..., :2]
+    xy2 = df2.to_numpy().reshape((n_frames, n_inds2, -1, 3))[..., :2]
+    costs = _epipolar_costs(xy1, xy2, F, metric=metric)
+
+    if not n_frames:
+        costs = np.zeros((1, n_inds1, n_inds2))
+        return costs, np.full((1, n_inds1), -1), np.zeros(1, dtype=int)
+    if window_size is None:
+        window_size = n_frames
+    starts = np.arange(0, n_frames, window_size)
+    valid = ~np.isnan(costs)
+    costs = np.where(valid, costs, 0)
+    n_valid = np.add.reduceat(valid, starts, axis=0)
+    with np.errstate(invalid="ignore"):
+        overall = costs.sum(axis=0) / valid.sum(axis=0)
+        costs = np.add.reduceat(costs, starts, axis=0) / n_valid
+    costs = np.where(n_valid > 0, costs, overall)
+    # Individuals never seen together are matched last
+    costs[np.isnan(costs)] = np.nanmax(costs, initial=0) + 1
+
+    assignments = np.full((len(costs), n_inds1), -1)
+    for window, cost in enumerate(costs):
+        rows, cols = linear_sum_assignment(cost)
+        assignments[window, rows] = cols
+    return costs, assignments, df1.index.to_numpy()[starts]
 
 
 def cross_view_match_dataframes(df1, df2, F):
@@ -345,8 +395,7 @@ def cross_view_match_dataframes(df1, df2, F):
     F: fundamental matrix from OpenCV
     """
 
-    tracks1 = _reconstruct_tracks_as_tracklets(df1)
-    tracks2 = _reconstruct_tracks_as_tracklets(df2)
-    costs, voting = _associate_paired_view_tracks(tracks1, tracks2, F)
+    costs, assignments, _ = match_individuals_across_views(df1, df2, F)
+    voting = {i: j for i, j in enumerate(assignments[0]) if j != -1}
 
-    return costs, voting
+    return costs[0], voting
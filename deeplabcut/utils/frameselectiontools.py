@@ -269,8 +269,7 @@ def KmeansbasedFrameselectioncv2(
             print("Extracting and downsampling...", nframes, " frames from the video.")
             if color:
                 for counter, index in tqdm(enumerate(Index)):
-                    cap.set_to_frame(index)  # extract a particular frame
-                    frame = cap.read_frame(crop=True)
+                    frame = cap.get_frame(index, crop=True)
                     if frame is not None:
                         image = img_as_ubyte(
                             cv2.resize(
@@ -293,8 +292,7 @@ def KmeansbasedFrameselectioncv2(
                         )
             else:
                 for counter, index in tqdm(enumerate(Index)):
-                    cap.set_to_frame(index)  # extract a particular frame
-                    frame = cap.read_frame(crop=True)
+                    frame = cap.get_frame(index, crop=True)
                     if frame is not None:
                         image = img_as_ubyte(
                             cv2.resize(
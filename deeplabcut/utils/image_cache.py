@@ -0,0 +1,185 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import os
+from collections import defaultdict
+
+import numpy as np
+from tqdm import tqdm
+
+from deeplabcut.utils.auxfun_videos import imap_threaded, imresize, read_image_rgb
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class DecodedImageCache:
+    """Images decoded once, and kept in memory or in a memory-mapped file.
+
+    Images are decoded (and optionally rescaled) by a pool of threads. With a
+    ``cache_path``, decoded pixels are stored contiguously in that file, alongside an
+    index (``cache_path + ".index.npz"``) recording the path, size and modification
+    time of every image. Reopening the cache only decodes the images that were added
+    or modified since, so that it can be shared across runs and processes.
+
+    Parameters
+    ----------
+    image_paths: list of str
+        Full paths of the images.
+
+    cache_path: str or None, optional, default=None
+        File the decoded images are memory-mapped from. By default, images are kept
+        in memory.
+
+    scale: float, optional, default=1
+        Factor images are resized by (see ``auxfun_videos.imresize``).
+
+    n_workers: int, optional, default=4
+        Number of decoder threads.
+
+    Indexing the cache returns read-only (height, width, 3) uint8 RGB arrays.
+    """
+
+    def __init__(self, image_paths, cache_path=None, scale=1, n_workers=4):
+        self.image_paths = [str(path) for path in image_paths]
+        self.cache_path = cache_path
+        self.scale = scale
+        self.n_workers = n_workers
+        if cache_path is None or not self.image_paths:
+            self._images = self._decode_all()
+        else:
+            self._images = self._load_or_build()
+
+    @property
+    def index_path(self):
+        return self.cache_path + ".index.npz"
+
+    @property
+    def shapes(self):
+        return [image.shape for image in self._images]
+
+    def __len__(self):
+        return len(self._images)
+
+    def __getitem__(self, ind):
+        return self._images[ind]
+
+    def _read(self, path):
+        image = read_image_rgb(path)
+        if self.scale != 1:
+            image = imresize(image, self.scale)
+        return image
+
+    def _decode(self, paths):
+        images = imap_threaded(self._read, paths, self.n_workers)
+        return tqdm(images, total=len(paths), desc="Decoding images", leave=False)
+
+    def _decode_all(self):
+        images = []
+        for image in self._decode(self.image_paths):
+            image.flags.writeable = False
+            images.append(image)
+        return images
+
+    def _read_index(self):
+        try:
+            with np.load(self.index_path) as index:
+                if index["scale"] != self.scale:
+                    return
+                return {
+                    key: (tuple(sig), tuple(shape), offset)
+                    for key, sig, shape, offset in zip(
+                        index["paths"].tolist(),
+                        index["signatures"],
+                        index["shapes"],
+                        index["offsets"],
+                    )
+                }
+        except (OSError, KeyError, ValueError):
+            return
+
+    def _load_or_build(self):
+        signatures = [_file_signature(path) for path in self.image_paths]
+        entries = None
+        if os.path.isfile(self.cache_path):
+            entries = self._read_index()
+        entries = entries or dict()
+        # Images that changed since they were cached are decoded again
+        fresh = [
+            entries.get(path, (None,))[0] == sig
+            for path, sig in zip(self.image_paths, signatures)
+        ]
+        if not all(fresh) or len(entries) != len(self.image_paths):
+            self._build(entries, fresh, signatures)
+        data = np.memmap(self.cache_path, dtype=np.uint8, mode="r")
+        entries = self._read_index()
+        images = []
+        for path in self.image_paths:
+            _, shape, offset = entries[path]
+            size = int(np.prod(shape))
+            images.append(data[offset : offset + size].reshape(shape))
+        return images
+
+    def _build(self, entries, fresh, signatures):
+        old = None
+        if any(fresh):
+            old = np.memmap(self.cache_path, dtype=np.uint8, mode="r")
+        temp_path = self.cache_path + ".part"
+        stale = [path for path, ok in zip(self.image_paths, fresh) if not ok]
+        decoded = iter(self._decode(stale))
+        shapes, offsets = [], []
+        offset = 0
+        with open(temp_path, "wb") as file:
+            for path, ok in zip(self.image_paths, fresh):
+                if ok:
+                    _, shape, start = entries[path]
+                    pixels = old[start : start + int(np.prod(shape))]
+                else:
+                    pixels = next(decoded)
+                    shape = pixels.shape
+                file.write(np.ascontiguousarray(pixels).tobytes())
+                shapes.append(shape)
+                offsets.append(offset)
+                offset += int(np.prod(shape))
+        del old
+        os.replace(temp_path, self.cache_path)
+        np.savez(
+            self.index_path,
+            paths=np.array(self.image_paths),
+            signatures=np.array(signatures, dtype=np.int64),
+            shapes=np.array(shapes, dtype=np.int64).reshape((-1, 3)),
+            offsets=np.array(offsets, dtype=np.int64),
+            scale=self.scale,
+        )
+
+    def batches(self, batch_size, inds=None):
+        """Group images of equal size into batches.
+
+        Yields tuples (frames, inds), where ``frames`` is a (batch_size, height,
+        width, 3) uint8 array holding the images ``inds``, in the order they
+        appear in the cache (or in ``inds``); only the first ``len(inds)`` frames are
+        valid, the remaining ones are zeros. ``frames`` is reused across batches of
+        equal size, so it must be consumed (or copied) before the next one.
+        """
+        if inds is None:
+            inds = range(len(self))
+        groups = defaultdict(list)
+        for ind in inds:
+            groups[self._images[ind].shape].append(ind)
+        for shape, group in groups.items():
+            frames = np.zeros((batch_size, *shape), dtype=np.uint8)
+            for start in range(0, len(group), batch_size):
+                batch = group[start : start + batch_size]
+                for i, ind in enumerate(batch):
+                    frames[i] = self._images[ind]
+                frames[len(batch) :] = 0
+                yield frames, batch
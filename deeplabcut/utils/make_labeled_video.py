@@ -22,7 +22,11 @@ You can find the directory for your ffmpeg bindings by: "find / | grep ffmpeg" a
 """
 
 import argparse
+import copy
+import multiprocessing
 import os
+import shutil
+import subprocess
 
 ####################################################
 # Dependencies
@@ -65,6 +69,190 @@ def get_segment_indices(bodyparts2connect, all_bpts):
     return bpts2connect
 
 
+class _LabelDrawer:
+    """Vectorized drawing of keypoints, their trails and skeleton segments.
+
+    Visibility and pixel coordinates are computed for all frames at once;
+    disks are then stamped for all points of a frame in a single assignment,
+    reproducing exactly the pixels and drawing order of `skimage.draw.disk`.
+    """
+
+    def __init__(
+        self,
+        x,
+        y,
+        likelihood,
+        pcutoff,
+        points,
+        colors,
+        dotsize,
+        trailpoints,
+        shape,
+        segments=None,
+        segment_color=None,
+        offset=0,
+    ):
+        self.x = x
+        self.y = y
+        self.points = np.asarray(points, dtype=int)
+        self.colors = np.asarray(colors, dtype=np.uint8).reshape((-1, 3))
+        self.dotsize = dotsize
+        self.trailpoints = trailpoints
+        self.shape = shape
+        self.segment_color = segment_color
+        self.offset = offset
+        with np.errstate(invalid="ignore"):
+            self.visible = likelihood > pcutoff
+        self.segments = np.asarray(segments or [], dtype=int).reshape((-1, 2))
+        if len(self.segments):
+            ny, nx = shape
+            inds = self.segments.T
+            self.segment_visible = np.all(self.visible[inds], axis=0) & ~np.any(
+                np.isnan(x[inds]) | np.isnan(y[inds]), axis=0
+            )
+            with np.errstate(invalid="ignore"):
+                self.segment_ends = np.stack(
+                    [
+                        np.clip(y[inds[0]], 0, ny - 1),
+                        np.clip(x[inds[0]], 0, nx - 1),
+                        np.clip(y[inds[1]], 1, ny - 1),
+                        np.clip(x[inds[1]], 1, nx - 1),
+                    ]
+                )
+            self.segment_ends = np.nan_to_num(self.segment_ends).astype(int)
+        # Pixel offsets spanning the bounding box of any disk
+        self._span = np.arange(2 * int(np.ceil(dotsize)) + 2)
+
+    def subset(self, start, stop):
+        """Drawer restricted to frames [start, stop), trails included."""
+        first = max(0, start - self.trailpoints)
+        drawer = copy.copy(self)
+        drawer.offset = first
+        for name in ("x", "y", "visible", "segment_visible"):
+            if hasattr(self, name):
+                setattr(drawer, name, getattr(self, name)[:, first:stop])
+        if hasattr(self, "segment_ends"):
+            drawer.segment_ends = self.segment_ends[..., first:stop]
+        return drawer
+
+    def _disks(self, rows, cols):
+        """Pixels of disks centered on (rows, cols), and the disks they belong to."""
+        ny, nx = self.shape
+        radius = self.dotsize
+        with np.errstate(invalid="ignore"):
+            top = np.maximum(np.ceil(rows - radius), 0)
+            left = np.maximum(np.ceil(cols - radius), 0)
+            # Same arithmetic as skimage.draw.ellipse for identical boundaries
+            dr = ((self._span - (rows - top)[:, np.newaxis]) / radius) ** 2
+            dc = ((self._span - (cols - left)[:, np.newaxis]) / radius) ** 2
+            inside = dr[:, :, np.newaxis] + dc[:, np.newaxis] < 1
+        rr = top[:, np.newaxis] + self._span
+        cc = left[:, np.newaxis] + self._span
+        inside &= (rr < ny)[:, :, np.newaxis] & (cc < nx)[:, np.newaxis]
+        n, i, j = np.nonzero(inside)
+        return rr[n, i].astype(int), cc[n, j].astype(int), n
+
+    def draw(self, image, index):
+        """Draw the labels of frame `index` onto `image` in place."""
+        ind = index - self.offset
+        if len(self.segments):
+            rr, cc = [], []
+            for r1, c1, r2, c2 in self.segment_ends[
+                :, self.segment_visible[:, ind], ind
+            ].T:
+                rr_, cc_, _ = line_aa(r1, c1, r2, c2)
+                rr.append(rr_)
+                cc.append(cc_)
+            if rr:
+                image[np.concatenate(rr), np.concatenate(cc)] = self.segment_color
+
+        visible = np.flatnonzero(self.visible[self.points, ind])
+        if not visible.size:
+            return image
+        # Trail points first, from the most recent, then the current position
+        n_trail = max(min(self.trailpoints, index + 1) - 1, 0)
+        frames = ind - np.r_[np.arange(1, n_trail + 1), 0]
+        points = self.points[visible]
+        rr, cc, n = self._disks(
+            self.y[points][:, frames].ravel(), self.x[points][:, frames].ravel()
+        )
+        image[rr, cc] = self.colors[visible][n // len(frames)]
+        return image
+
+
+def _render_frames(drawer, clip, start, stop, bbox=None):
+    for index in trange(start, stop):
+        image = clip.load_frame()
+        if bbox is not None:
+            x1, x2, y1, y2 = bbox
+            image = image[y1:y2, x1:x2]
+        clip.save_frame(drawer.draw(image, index))
+
+
+def _render_frame_range(drawer, video, output, codec, fps, sw, sh, bbox, start, stop):
+    clip = vp(fname=video, sname=output, codec=codec, sw=sw, sh=sh, fps=fps)
+    if start:
+        clip.seek(start)
+    _render_frames(drawer, clip, start, stop, bbox)
+    clip.close()
+    return output
+
+
+def _render_video_in_parallel(
+    drawer, clip, n_frames, bbox, n_processes, start_method=None
+):
+    """Render contiguous frame ranges in worker processes, then concatenate
+    the resulting parts without re-encoding with ffmpeg's concat demuxer."""
+    root, ext = os.path.splitext(clip.sname)
+    bounds = np.linspace(0, n_frames, n_processes + 1).astype(int)
+    parts = [f"{root}_part{i}{ext}" for i in range(n_processes)]
+    tasks = [
+        (
+            drawer.subset(start, stop),
+            clip.fname,
+            part,
+            clip.codec,
+            clip.fps(),
+            clip.sw,
+            clip.sh,
+            bbox,
+            start,
+            stop,
+        )
+        for part, start, stop in zip(parts, bounds[:-1], bounds[1:])
+    ]
+    list_file = root + "_parts.txt"
+    try:
+        context = multiprocessing.get_context(start_method)
+        with context.Pool(n_processes) as pool:
+            pool.starmap(_render_frame_range, tasks)
+        with open(list_file, "w") as file:
+            for part in parts:
+                file.write(f"file '{os.path.abspath(part)}'\n")
+        subprocess.run(
+            [
+                "ffmpeg",
+                "-y",
+                "-v",
+                "error",
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_file,
+                "-c",
+                "copy",
+                clip.sname,
+            ],
+            check=True,
+        )
+    finally:
+        for file in parts + [list_file]:
+            if os.path.isfile(file):
+                os.remove(file)
+
+
 def CreateVideo(
     clip,
     Dataframe,
@@ -83,10 +271,17 @@ def CreateVideo(
     draw_skeleton,
     displaycropped,
     color_by,
+    n_processes=1,
 ):
-    """Creating individual frames with labeled body parts and making a video"""
+    """Creating individual frames with labeled body parts and making a video
+
+    If `n_processes` > 1 and ffmpeg is available, frame ranges are rendered
+    in parallel into separate files, which are then losslessly concatenated.
+    """
     bpts = Dataframe.columns.get_level_values("bodyparts")
     all_bpts = bpts.values[::3]
+    color_for_skeleton = None
+    bpts2connect = None
     if draw_skeleton:
         color_for_skeleton = (
             np.array(mcolors.to_rgba(skeleton_color))[:3] * 255
@@ -140,57 +335,37 @@ def CreateVideo(
         for i, j in enumerate(nbpts_per_ind):
             map2id.extend([i] * j)
     keep = np.flatnonzero(np.isin(all_bpts, bodyparts2plot))
-    bpts2color = [(ind, map2bp[ind], map2id[ind]) for ind in keep]
 
     if color_by == "bodypart":
         C = colorclass.to_rgba(np.linspace(0, 1, nbodyparts))
+        color_inds = [map2bp[ind] for ind in keep]
     else:
         C = colorclass.to_rgba(np.linspace(0, 1, nindividuals))
+        color_inds = [map2id[ind] for ind in keep]
     colors = (C[:, :3] * 255).astype(np.uint8)
 
-    with np.errstate(invalid="ignore"):
-        for index in trange(min(nframes, len(Dataframe))):
-            image = clip.load_frame()
-            if displaycropped:
-                image = image[y1:y2, x1:x2]
-
-            # Draw the skeleton for specific bodyparts to be connected as
-            # specified in the config file
-            if draw_skeleton:
-                for bpt1, bpt2 in bpts2connect:
-                    if np.all(df_likelihood[[bpt1, bpt2], index] > pcutoff) and not (
-                        np.any(np.isnan(df_x[[bpt1, bpt2], index]))
-                        or np.any(np.isnan(df_y[[bpt1, bpt2], index]))
-                    ):
-                        rr, cc, val = line_aa(
-                            int(np.clip(df_y[bpt1, index], 0, ny - 1)),
-                            int(np.clip(df_x[bpt1, index], 0, nx - 1)),
-                            int(np.clip(df_y[bpt2, index], 1, ny - 1)),
-                            int(np.clip(df_x[bpt2, index], 1, nx - 1)),
-                        )
-                        image[rr, cc] = color_for_skeleton
-
-            for ind, num_bp, num_ind in bpts2color:
-                if df_likelihood[ind, index] > pcutoff:
-                    if color_by == "bodypart":
-                        color = colors[num_bp]
-                    else:
-                        color = colors[num_ind]
-                    if trailpoints > 0:
-                        for k in range(1, min(trailpoints, index + 1)):
-                            rr, cc = disk(
-                                (df_y[ind, index - k], df_x[ind, index - k]),
-                                dotsize,
-                                shape=(ny, nx),
-                            )
-                            image[rr, cc] = color
-                    rr, cc = disk(
-                        (df_y[ind, index], df_x[ind, index]), dotsize, shape=(ny, nx)
-                    )
-                    image[rr, cc] = color
-
-            clip.save_frame(image)
-    clip.close()
+    drawer = _LabelDrawer(
+        df_x,
+        df_y,
+        df_likelihood,
+        pcutoff,
+        keep,
+        colors[color_inds],
+        dotsize,
+        trailpoints,
+        (ny, nx),
+        bpts2connect,
+        color_for_skeleton,
+    )
+    bbox = (x1, x2, y1, y2) if displaycropped else None
+    n_frames = min(nframes, len(Dataframe))
+    n_processes = min(n_processes, n_frames // 100)  # At least 100 frames per process
+    if n_processes > 1 and clip.sname and shutil.which("ffmpeg"):
+        clip.close()
+        _render_video_in_parallel(drawer, clip, n_frames, bbox, n_processes)
+    else:
+        _render_frames(drawer, clip, 0, n_frames, bbox)
+        clip.close()
 
 
 def CreateVideoSlow(
@@ -374,6 +549,7 @@ def create_labeled_video(
     color_by="bodypart",
     modelprefix="",
     track_method="",
+    n_processes=None,
 ):
     """Labels the bodyparts in a video.
 
@@ -482,6 +658,13 @@ def create_labeled_video(
         For multiple animals, must be either 'box', 'skeleton', or 'ellipse' and will
         be taken from the config.yaml file if none is given.
 
+    n_processes: int, optional, default=None
+        Number of processes used to render the videos; defaults to the number of CPUs.
+        Videos are rendered concurrently; if there are fewer videos than processes,
+        they are instead rendered one after the other, each split into frame ranges
+        rendered in parallel, provided that ffmpeg is available to join the ranges,
+        ``fastmode`` is True and every video has at least 200 frames.
+
     Returns
     -------
         results : list[bool]
@@ -587,13 +770,30 @@ def create_labeled_video(
         keypoints_only,
     )
 
-    with Pool(min(os.cpu_count(), len(Videos))) as pool:
-        results = pool.map(func, Videos)
+    if n_processes is None:
+        n_processes = os.cpu_count()
+    if len(Videos) < n_processes and _splits_frames(
+        Videos, n_processes, fastmode and not keypoints_only
+    ):
+        # Rather parallelize over the frames of each video
+        results = [func(video, n_processes=n_processes) for video in Videos]
+    else:
+        with Pool(min(n_processes, len(Videos))) as pool:
+            results = pool.map(func, Videos)
 
     os.chdir(start_path)
     return results
 
 
+def _splits_frames(videos, n_processes, fastmode):
+    """Whether every video would be split into frame ranges rendered in parallel
+    (see `CreateVideo`): this requires ffmpeg, and at least 100 frames per process.
+    """
+    if not fastmode or n_processes <= 1 or not shutil.which("ffmpeg"):
+        return False
+    return all(VideoWriter(video).get_n_frames() >= 200 for video in videos)
+
+
 def proc_video(
     videos,
     destfolder,
@@ -617,6 +817,7 @@ def proc_video(
     fastmode,
     keypoints_only,
     video,
+    n_processes=1,
 ):
     """Helper function for create_videos
 
@@ -751,6 +952,7 @@ def proc_video(
                     skeleton_color=skeleton_color,
                     trailpoints=trailpoints,
                     fps=outputframerate,
+                    n_processes=n_processes,
                 )
             return True
 
@@ -775,6 +977,7 @@ def _create_labeled_video(
     codec="mp4v",
     fps=None,
     output_path="",
+    n_processes=1,
 ):
     if color_by not in ("bodypart", "individual"):
         raise ValueError("`color_by` should be either 'bodypart' or 'individual'.")
@@ -830,6 +1033,7 @@ def _create_labeled_video(
         bool(skeleton_edges),
         display_cropped,
         color_by,
+        n_processes,
     )
 
 
@@ -924,7 +1128,7 @@ def create_video_with_all_detections(
     modelprefix="",
 ):
     """
-    Create a video labeled with all the detections stored in a '*_full.pickle' file.
+    Create a video labeled with all the raw detections stored after `analyze_videos`.
 
     Parameters
     ----------
@@ -954,8 +1158,7 @@ def create_video_with_all_detections(
         Specifies the destination folder that was used for storing analysis data (default is the path of the video).
 
     """
-    from deeplabcut.pose_estimation_tensorflow.lib.inferenceutils import Assembler
-    import re
+    from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import DetectionStore
 
     cfg = auxiliaryfunctions.read_config(config)
     trainFraction = cfg["TrainingFraction"][trainingsetindex]
@@ -986,11 +1189,10 @@ def create_video_with_all_detections(
             print("Creating labeled video for ", str(Path(video).stem))
             h5file = full_pickle.replace("_full.pickle", ".h5")
             data, _ = auxfun_multianimal.LoadFullMultiAnimalData(h5file)
-            data = dict(
-                data
-            )  # Cast to dict (making a copy) so items can safely be popped
+            if not isinstance(data, DetectionStore):
+                data = DetectionStore.from_dict(data)
 
-            header = data.pop("metadata")
+            header = data.metadata
             all_jointnames = header["all_joints_names"]
 
             if displayedbodyparts == "all":
@@ -1003,8 +1205,12 @@ def create_video_with_all_detections(
                         bpts.append(bptindex)
                 numjoints = len(bpts)
 
-            frame_names = list(data)
-            frames = [int(re.findall(r"\d+", name)[0]) for name in frame_names]
+            rows = dict(zip(data.frame_indices.tolist(), range(data.n_frames)))
+            xy = data.columns["xy"]
+            conf = data.columns["confidence"]
+            labels = data.columns["bodypart"]
+            color_inds = np.full(len(all_jointnames), -1)
+            color_inds[list(bpts)] = np.arange(numjoints)
             colorclass = plt.cm.ScalarMappable(cmap=cfg["colormap"])
             C = colorclass.to_rgba(np.linspace(0, 1, numjoints))
             colors = (C[:, :3] * 255).astype(np.uint8)
@@ -1018,18 +1224,16 @@ def create_video_with_all_detections(
                 frame = clip.load_frame()
                 if frame is None:
                     continue
-                try:
-                    ind = frames.index(n)
-                    dets = Assembler._flatten_detections(data[frame_names[ind]])
-                    for det in dets:
-                        if det.label not in bpts or det.confidence < pcutoff:
-                            continue
-                        x, y = det.pos
-                        rr, cc = disk((y, x), dotsize, shape=(ny, nx))
-                        frame[rr, cc] = colors[bpts.index(det.label)]
-                except ValueError:  # No data stored for that particular frame
+                row = rows.get(n)
+                if row is None:  # No data stored for that particular frame
                     print(n, "no data")
-                    pass
+                else:
+                    sl = data.peak_slice(row)
+                    inds = color_inds[labels[sl]]
+                    mask = (inds != -1) & (conf[sl] >= pcutoff)
+                    for (x, y), ind in zip(xy[sl][mask], inds[mask]):
+                        rr, cc = disk((y, x), dotsize, shape=(ny, nx))
+                        frame[rr, cc] = colors[ind]
                 try:
                     clip.save_frame(frame)
                 except:
@@ -1062,10 +1266,9 @@ def _create_video_from_tracks(video, tracks, destfolder, output_name, pcutoff, s
     im = ax.imshow(np.zeros((ny, nx)))
     markers = sum([ax.plot([], [], ".", c=c) for c in cc], [])
     for index in tqdm(range(nframes)):
-        vid.set_to_frame(index)
         imname = "frame" + str(index).zfill(strwidth)
         image_output = os.path.join(destfolder, imname + ".png")
-        frame = vid.read_frame()
+        frame = vid.get_frame(index)
         if frame is not None and not os.path.isfile(image_output):
             im.set_data(frame[:, X1:X2])
             for n, trackid in enumerate(trackids):
@@ -110,6 +110,12 @@ class VideoProcessor(object):
         """
         pass
 
+    def seek(self, index):
+        """
+        implement your own
+        """
+        pass
+
     def save_frame(self, frame):
         """
         implement your own
@@ -155,6 +161,16 @@ class VideoProcessorCV(VideoProcessor):
             return frame
         return np.flip(frame, 2)
 
+    def seek(self, index):
+        """Position the reader so that the next frame loaded is frame `index`."""
+        self.vid.set(cv2.CAP_PROP_POS_FRAMES, index)
+        if int(self.vid.get(cv2.CAP_PROP_POS_FRAMES)) != index:
+            # Inaccurate seeking with some codecs; decode from the start instead
+            self.vid.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            for _ in range(index):
+                self.vid.grab()
+        self.i = index
+
     def save_frame(self, frame):
         if frame is not None:
             self.svid.write(np.flip(frame, 2))
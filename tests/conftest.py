@@ -96,6 +96,38 @@ def real_assemblies_montblanc():
     return inferenceutils._parse_ground_truth_data(data), single
 
 
+@pytest.fixture(scope="function")
+def synthetic_detections():
+    rng = np.random.default_rng(0)
+    n_bpts, n_multi, n_animals = 5, 4, 3
+    graph = [[i, j] for i in range(n_multi) for j in range(i + 1, n_multi)]
+    data = {
+        "metadata": {
+            "all_joints_names": list(map(str, range(n_bpts))),
+            "PAFgraph": graph,
+            "PAFinds": list(range(len(graph))),
+        }
+    }
+    for n in range(40):
+        coords, conf, owners = [], [], []
+        for _ in range(n_bpts):
+            n_dets = rng.integers(0, n_animals + 2)
+            coords.append((rng.random((n_dets, 2)) * 100).astype(np.float32))
+            conf.append(rng.random((n_dets, 1)).astype(np.float32))
+            owners.append(rng.integers(0, n_animals, n_dets))
+        costs = dict()
+        for k, (s, t) in enumerate(graph):
+            aff = rng.random((len(coords[s]), len(coords[t]))).astype(np.float32)
+            aff += owners[s][:, None] == owners[t]
+            costs[k] = {"m1": np.round(aff / 2, 1), "distance": aff}
+        data[f"img{n}.png"] = {
+            "coordinates": (coords,),
+            "confidence": conf,
+            "costs": costs,
+        }
+    return data, dict(max_n_individuals=n_animals, n_multibodyparts=n_multi)
+
+
 @pytest.fixture(scope="function")
 def real_tracklets():
     with open(os.path.join(TEST_DATA_DIR, "trimouse_tracklets.pickle"), "rb") as file:
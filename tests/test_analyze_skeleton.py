@@ -0,0 +1,130 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import numpy as np
+import pandas as pd
+import pytest
+from deeplabcut.post_processing import analyze_skeleton
+
+
+BODYPARTS = ["head", "neck", "tail", "paw"]
+SKELETON = [["head", "neck"], ["neck", "tail"], ["paw", "neck"]]
+
+
+def make_dataframe(individuals=None, n_frames=50, seed=0):
+    rng = np.random.default_rng(seed)
+    if individuals is None:
+        columns = pd.MultiIndex.from_product(
+            [["scorer"], BODYPARTS, ["x", "y", "likelihood"]],
+            names=["scorer", "bodyparts", "coords"],
+        )
+    else:
+        columns = pd.MultiIndex.from_product(
+            [["scorer"], individuals, BODYPARTS, ["x", "y", "likelihood"]],
+            names=["scorer", "individuals", "bodyparts", "coords"],
+        )
+    data = rng.uniform(0, 100, (n_frames, len(columns)))
+    data[:, 2::3] /= 100
+    data[rng.random(data.shape) < 0.05] = np.nan
+    return pd.DataFrame(data, columns=columns)
+
+
+def analyze_bone_per_frame(bp1, bp2):
+    # Reference implementation, one frame at a time
+    rows = []
+    for p1, p2 in zip(
+        bp1[["x", "y", "likelihood"]].values, bp2[["x", "y", "likelihood"]].values
+    ):
+        rows.append(
+            {
+                "length": np.linalg.norm(p2[:2] - p1[:2]),
+                "orientation": analyze_skeleton.angle_between_points_2d_anticlockwise(
+                    p1, p2
+                ),
+                "likelihood": np.minimum(p1[2], p2[2]),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def test_compute_bone_metrics():
+    df = make_dataframe()
+    data = df.to_numpy().reshape((len(df), -1, 3))
+    metrics = analyze_skeleton.compute_bone_metrics(data, [[0, 1], [3, 1]])
+    for n, (i, j) in enumerate([(0, 1), (3, 1)]):
+        for frame, (p1, p2) in enumerate(zip(data[:, i], data[:, j])):
+            np.testing.assert_allclose(
+                metrics["length"][frame, n], np.linalg.norm(p2[:2] - p1[:2])
+            )
+            np.testing.assert_allclose(
+                metrics["orientation"][frame, n],
+                analyze_skeleton.angle_between_points_2d_anticlockwise(p1, p2),
+            )
+            np.testing.assert_allclose(
+                metrics["likelihood"][frame, n], np.minimum(p1[2], p2[2])
+            )
+
+
+def test_angular_velocity_and_joint_angles():
+    # A bone rotating anticlockwise by 30 degrees per frame about its origin
+    n_frames = 20
+    angles = np.radians(30 * np.arange(n_frames))
+    data = np.ones((n_frames, 3, 3))
+    data[:, 0, :2] = 0
+    data[:, 1, 0] = np.cos(angles)
+    data[:, 1, 1] = np.sin(angles)
+    data[:, 2, :2] = [-2, 0]
+    metrics = analyze_skeleton.compute_bone_metrics(
+        data, [[0, 1], [0, 2]], angular_velocity=True, joints=[[1, 0, 2]]
+    )
+    velocity = metrics["angular_velocity"]
+    assert np.isnan(velocity[0]).all()
+    np.testing.assert_allclose(velocity[1:, 0], 30, atol=1e-9)
+    np.testing.assert_allclose(velocity[1:, 1], 0, atol=1e-9)
+    expected = np.abs((30 * np.arange(n_frames)) % 360 - 180)
+    np.testing.assert_allclose(metrics["joint_angle"][:, 0], expected, atol=1e-9)
+
+
+def test_find_joints():
+    joints = analyze_skeleton.find_joints([tuple(bone) for bone in SKELETON])
+    assert sorted(joints) == [
+        ("head", "neck", "paw"),
+        ("head", "neck", "tail"),
+        ("tail", "neck", "paw"),
+    ]
+
+
+@pytest.mark.parametrize("individuals", [None, ["mouse2", "mouse1", "single"]])
+def test_analyze_skeleton_data(individuals):
+    df = make_dataframe(individuals)
+    skeleton = analyze_skeleton._analyze_skeleton_data(df, SKELETON)
+    # Same layout and values as when analyzing one bone and one frame at a time
+    bones = {}
+    if individuals is None:
+        for bp1, bp2 in SKELETON:
+            bones[f"{bp1}_{bp2}"] = analyze_bone_per_frame(
+                df["scorer"][bp1], df["scorer"][bp2]
+            )
+    else:
+        for animal in sorted(individuals[:-1]):
+            for bp1, bp2 in SKELETON:
+                temp = df["scorer"][animal]
+                bones[f"{animal}_{bp1}_{bp2}"] = analyze_bone_per_frame(
+                    temp[bp1], temp[bp2]
+                )
+    pd.testing.assert_frame_equal(skeleton, pd.concat(bones, axis=1))
+
+    skeleton = analyze_skeleton._analyze_skeleton_data(
+        df, SKELETON, angular_velocity=True, joint_angles=True
+    )
+    n_animals = 1 if individuals is None else 2
+    assert skeleton.shape[1] == n_animals * (len(SKELETON) * 4 + 3 * 2)
+    assert "angular_velocity" in skeleton.columns.get_level_values(1)
+    assert "angle" in skeleton.columns.get_level_values(1)
@@ -119,3 +119,56 @@ def test_get_list_of_videos(tmpdir_factory):
             videotype=ext,
         )
         assert len(videos) == 1
+
+
+def test_streaming_data_writer(tmp_path):
+    import numpy as np
+    import os
+    import pandas as pd
+    import pytest
+
+    nframes = 23
+    pdindex = pd.MultiIndex.from_product(
+        [["scorer"], ["nose", "tail"], ["x", "y", "likelihood"]],
+        names=["scorer", "bodyparts", "coords"],
+    )
+    data = np.random.rand(nframes, len(pdindex))
+    dataname = str(tmp_path / "videoDLC.h5")
+
+    writer = auxiliaryfunctions.StreamingDataWriter(dataname, pdindex, nframes, 5)
+    assert writer.start == 0
+    writer[[0, 1, 2, 3]] = data[:4]
+    writer[[4, 5, 6, 7, 8, 9, 10, 11]] = data[4:12]
+    with pytest.raises(ValueError):
+        writer[[3]] = data[3:4]
+    writer.close(complete=False)  # Simulate an interrupted analysis
+    assert not os.path.isfile(dataname)
+
+    writer = auxiliaryfunctions.StreamingDataWriter(dataname, pdindex, nframes, 5)
+    assert writer.start == 12
+    inds = [i for i in range(writer.start, nframes) if i != 15]  # Missing frame
+    writer[inds] = data[inds]
+    writer.save({"data": {}}, save_as_csv=True)
+
+    df = pd.read_hdf(dataname)
+    assert df.columns.equals(pdindex)
+    assert df.index.equals(pd.RangeIndex(nframes))
+    expected = data.astype(np.float32)
+    expected[15] = 0
+    np.testing.assert_array_equal(df.to_numpy(), expected)
+    assert (
+        len(pd.read_csv(dataname.replace(".h5", ".csv"), header=[0, 1, 2])) == nframes
+    )
+    assert os.path.isfile(dataname.replace(".h5", "_meta.pickle"))
+
+    # Rows labeled with image names
+    imagenames = [f"img{i}.png" for i in range(nframes)]
+    dataname = str(tmp_path / "imagesDLC.h5")
+    writer = auxiliaryfunctions.StreamingDataWriter(
+        dataname, pdindex, nframes, 5, index=imagenames
+    )
+    writer[range(nframes)] = data
+    writer.save({"data": {}})
+    df = pd.read_hdf(dataname)
+    assert list(df.index) == imagenames
+    np.testing.assert_array_equal(df.to_numpy(), data.astype(np.float32))
@@ -0,0 +1,128 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+from deeplabcut.utils import auxiliaryfunctions_3d
+
+
+CAMERA_MATRIX = np.array([[800.0, 0, 320], [0, 800, 240], [0, 0, 1]])
+
+
+def _make_views(n_frames, n_animals, n_bodyparts, seed=0, p_missing=0.2):
+    rng = np.random.default_rng(seed)
+    R, _ = cv2.Rodrigues(np.array([0, np.pi / 3, 0]))
+    T = (np.eye(3) - R) @ np.array([0, 0, 10.0])
+    E = np.cross(np.eye(3), T) @ R
+    F = np.linalg.inv(CAMERA_MATRIX).T @ E @ np.linalg.inv(CAMERA_MATRIX)
+    xyz = rng.normal(0, 0.2, (n_frames, n_animals, n_bodyparts, 3))
+    xyz += rng.uniform([-3, -3, 8], [3, 3, 12], (n_animals, 3))[:, None]
+    dfs = []
+    for projection in (np.eye(3, 4), np.c_[R, T]):
+        xy = xyz @ projection[:, :3].T + projection[:, 3]
+        xy = xy @ CAMERA_MATRIX.T
+        xy = xy[..., :2] / xy[..., 2:]
+        data = np.concatenate((xy, np.ones((*xy.shape[:-1], 1))), axis=-1)
+        data[rng.random(data.shape[:-1]) < p_missing] = np.nan
+        columns = pd.MultiIndex.from_product(
+            [
+                ["DLC"],
+                [f"mus{i}" for i in range(n_animals)],
+                [f"bpt{i}" for i in range(n_bodyparts)],
+                ["x", "y", "likelihood"],
+            ],
+            names=["scorer", "individuals", "bodyparts", "coords"],
+        )
+        dfs.append(pd.DataFrame(data.reshape((n_frames, -1)), columns=columns))
+    return dfs, F
+
+
+def test_epipolar_costs():
+    (df1, df2), F = _make_views(20, 3, 5)
+    xy1 = df1.to_numpy().reshape((20, 3, 5, 3))[..., :2]
+    xy2 = df2.to_numpy().reshape((20, 3, 5, 3))[..., :2]
+    costs = auxiliaryfunctions_3d._epipolar_costs(xy1, xy2, F, chunksize=7)
+    assert costs.shape == (20, 3, 3)
+    for frame in range(20):
+        for i in range(3):
+            for j in range(3):
+                x1 = np.c_[xy1[frame, i], np.ones(5)]
+                x2 = np.c_[xy2[frame, j], np.ones(5)]
+                lines = x1 @ F.T
+                dists = np.abs((lines * x2).sum(axis=1))
+                dists /= np.linalg.norm(lines[:, :2], axis=1)
+                np.testing.assert_allclose(
+                    costs[frame, i, j], np.nanmean(dists), atol=1e-9
+                )
+    # Same individual: points lie on their epipolar lines
+    assert np.allclose(np.diagonal(costs, axis1=1, axis2=2), 0, atol=1e-6)
+
+
+@pytest.mark.parametrize("window_size", [None, 10])
+def test_match_individuals_across_views(window_size):
+    (df1, df2), F = _make_views(40, 4, 6)
+    order = [2, 0, 3, 1]
+    swap = [1, 0, 2, 3]
+    data = df2.to_numpy().reshape((40, 4, -1))
+    data = data[:, order]
+    if window_size:
+        data[20:] = data[20:, swap]
+    df2 = pd.DataFrame(data.reshape((40, -1)), columns=df2.columns)
+    df2 = df2.iloc[3:]  # Frames are aligned on the index
+    costs, assignments, starts = auxiliaryfunctions_3d.match_individuals_across_views(
+        df1, df2, F, window_size
+    )
+    n_windows = 4 if window_size else 1
+    assert costs.shape == (n_windows, 4, 4)
+    assert assignments.shape == (n_windows, 4)
+    expected = np.argsort(order)
+    np.testing.assert_array_equal(assignments[0], expected)
+    if window_size:
+        np.testing.assert_array_equal(starts, [3, 13, 23, 33])
+        # The window straddling the swap follows the majority of its frames
+        np.testing.assert_array_equal(assignments[1], expected)
+        swapped = np.argsort(np.array(order)[swap])
+        np.testing.assert_array_equal(assignments[2:], [swapped, swapped])
+    else:
+        np.testing.assert_array_equal(starts, [3])
+        _, voting = auxiliaryfunctions_3d.cross_view_match_dataframes(df1, df2, F)
+        assert voting == dict(enumerate(expected))
+
+
+def test_match_individuals_algebraic_as_before():
+    from scipy.optimize import linear_sum_assignment
+
+    (df1, df2), F = _make_views(30, 4, 6, p_missing=0)
+    order = [3, 1, 0, 2]
+    data = df2.to_numpy().reshape((30, 4, -1))[:, order]
+    df2 = pd.DataFrame(data.reshape((30, -1)), columns=df2.columns)
+    # Cost formerly used by triangulate: mean absolute algebraic residual
+    # x1.T @ F @ x2 over the frames and bodyparts of two tracks
+    tracks1 = df1.to_numpy().reshape((30, 4, 6, 3))
+    tracks2 = df2.to_numpy().reshape((30, 4, 6, 3))
+    tracks1[..., 2] = tracks2[..., 2] = 1
+    expected = np.zeros((4, 4))
+    for i in range(4):
+        for j in range(4):
+            cost = np.abs(np.nansum((tracks1[:, i] @ F) * tracks2[:, j], axis=2))
+            expected[i, j] = cost.mean()
+    voting = dict(zip(*linear_sum_assignment(expected)))
+
+    costs, assignments, _ = auxiliaryfunctions_3d.match_individuals_across_views(
+        df1, df2, F, metric="algebraic"
+    )
+    np.testing.assert_allclose(costs[0], expected)
+    assert dict(enumerate(assignments[0])) == voting
+    with pytest.raises(ValueError):
+        auxiliaryfunctions_3d.match_individuals_across_views(
+            df1, df2, F, metric="sampson"
+        )
@@ -0,0 +1,71 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import numpy as np
+import pytest
+from deeplabcut.benchmark import performance
+from deeplabcut.benchmark.base import Result, ResultCollection
+
+
+WORKLOAD = performance.Workload(n_frames=40, n_animals=2, n_bodyparts=4)
+
+
+def test_result_fromdict_legacy():
+    # Caches written before performance metrics existed
+    data = {
+        "benchmark": "trimouse",
+        "method": "dlcrnet",
+        "version": "2.2.0",
+        "RMSE": 3.2,
+        "mAP": 0.9,
+    }
+    result = Result.fromdict(data)
+    assert result.root_mean_squared_error == 3.2
+    assert np.isnan(result.frames_per_second)
+    assert np.isnan(result.peak_memory)
+
+
+def test_simulate_animals():
+    xy = performance.simulate_animals(WORKLOAD)
+    assert xy.shape == (40, 2, 4, 2)
+    assert np.all(xy >= 0)
+    assert np.all(xy[..., 0] < WORKLOAD.frame_width)
+    assert np.all(xy[..., 1] < WORKLOAD.frame_height)
+
+
+def test_performance_evaluate():
+    stages = ["SORTEllipse.track", "TrackletStitcher.stitch"]
+    results = performance.evaluate(
+        include_stages=stages,
+        on_error="raise",
+        workload=WORKLOAD,
+        repeat=1,
+        isolate=False,
+    )
+    assert len(results) == 2
+    for result in results.results.values():
+        assert result.benchmark_name == "performance"
+        assert result.method_name in stages
+        assert result.frames_per_second > 0
+        assert result.latency > 0
+        assert result.frames_per_second == pytest.approx(
+            WORKLOAD.n_frames / result.latency
+        )
+    results_loaded = ResultCollection.fromdicts(results.todicts())
+    assert results_loaded == results
+    # Stages already benchmarked are skipped
+    assert performance.evaluate(include_stages=stages, results=results) is results
+    assert len(results) == 2
+
+
+def test_performance_unknown_stage():
+    benchmark = performance.PerformanceBenchmark(WORKLOAD, isolate=False)
+    with pytest.raises(ValueError):
+        benchmark.evaluate("analyze_everything")
@@ -15,6 +15,25 @@ from deeplabcut.pose_estimation_tensorflow.lib import crossvalutils
 
 BEST_GRAPH = [14, 15, 16, 11, 22, 31, 61, 7, 59, 62, 64]
 BEST_GRAPH_MONTBLANC = [1, 0, 2, 5, 4, 3]
+TRIMOUSE_CFG = {
+    "individuals": ["mickey", "minnie", "bianca"],
+    "uniquebodyparts": [],
+    "multianimalbodyparts": [
+        "snout",
+        "leftear",
+        "rightear",
+        "shoulder",
+        "spine1",
+        "spine2",
+        "spine3",
+        "spine4",
+        "tailbase",
+        "tail1",
+        "tail2",
+        "tailend",
+    ],
+}
+TRIMOUSE_INFERENCE_CFG = {"topktoretain": 3, "pcutoff": 0.1, "pafthreshold": 0.1}
 
 
 def test_get_n_best_paf_graphs(evaluation_data_and_metadata):
@@ -48,27 +67,8 @@ def test_get_n_best_paf_graphs_montblanc(evaluation_data_and_metadata_montblanc)
 
 def test_benchmark_paf_graphs(evaluation_data_and_metadata):
     data, _ = evaluation_data_and_metadata
-    cfg = {
-        "individuals": ["mickey", "minnie", "bianca"],
-        "uniquebodyparts": [],
-        "multianimalbodyparts": [
-            "snout",
-            "leftear",
-            "rightear",
-            "shoulder",
-            "spine1",
-            "spine2",
-            "spine3",
-            "spine4",
-            "tailbase",
-            "tail1",
-            "tail2",
-            "tailend",
-        ],
-    }
-    inference_cfg = {"topktoretain": 3, "pcutoff": 0.1, "pafthreshold": 0.1}
     results = crossvalutils._benchmark_paf_graphs(
-        cfg, inference_cfg, data, [BEST_GRAPH]
+        TRIMOUSE_CFG, TRIMOUSE_INFERENCE_CFG, data, [BEST_GRAPH]
     )
     all_scores = results[0]
     assert len(all_scores) == 1
@@ -78,6 +78,47 @@ def test_benchmark_paf_graphs(evaluation_data_and_metadata):
     assert np.isclose(purity, 0.98, atol=1e-2)
 
 
+def test_benchmark_paf_graphs_parallel(evaluation_data_and_metadata):
+    data, metadata = evaluation_data_and_metadata
+    params = crossvalutils._set_up_evaluation(data)
+    paf_inds, _ = crossvalutils._get_n_best_paf_graphs(
+        data, metadata, params["paf_graph"], n_graphs=4
+    )
+    split_inds = [metadata["data"]["trainIndices"], metadata["data"]["testIndices"]]
+    results = [
+        crossvalutils._benchmark_paf_graphs(
+            TRIMOUSE_CFG,
+            TRIMOUSE_INFERENCE_CFG,
+            dict(data),
+            paf_inds,
+            split_inds=split_inds,
+            **kwargs,
+        )
+        for kwargs in (
+            dict(),
+            dict(n_processes=2, start_method="spawn"),
+            dict(patience=1),
+        )
+    ]
+    serial, parallel, early = results
+    assert len(serial[0]) == len(parallel[0]) == len(paf_inds)
+    # Early stopping only evaluates the smallest graphs
+    assert 2 <= len(early[0]) <= len(paf_inds)
+    for other in (parallel, early):
+        for (scores, paf), (scores_, paf_) in zip(serial[0], other[0]):
+            assert paf == paf_
+            np.testing.assert_array_equal(scores, scores_)
+        for metrics, metrics_ in zip(serial[2], other[2]):
+            for split, split_ in zip(metrics, metrics_):
+                assert split["mAP"] == split_["mAP"]
+        for (assemblies, *_), (assemblies_, *_) in zip(serial[3], other[3]):
+            assert assemblies.keys() == assemblies_.keys()
+            for k, animals in assemblies.items():
+                np.testing.assert_array_equal(
+                    [a.data for a in animals], [a.data for a in assemblies_[k]]
+                )
+
+
 def test_benchmark_paf_graphs_montblanc(evaluation_data_and_metadata_montblanc):
     data, metadata = evaluation_data_and_metadata_montblanc
     cfg = {
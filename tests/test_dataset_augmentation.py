@@ -8,10 +8,18 @@
 #
 # Licensed under GNU Lesser General Public License v3.0
 #
+import pickle
+
 import imgaug.augmenters as iaa
 import numpy as np
 import pytest
-from deeplabcut.pose_estimation_tensorflow.datasets import augmentation
+from skimage.io import imsave
+from deeplabcut.pose_estimation_tensorflow import default_config
+from deeplabcut.pose_estimation_tensorflow.datasets import (
+    augmentation,
+    Batch,
+    ImgaugPoseDataset,
+)
 
 
 @pytest.mark.parametrize(
@@ -106,3 +114,40 @@ def test_keypoint_horizontal_flip(
         temp[:, pair] = temp[:, pair[::-1]]
     keypoints_unaug = temp.reshape((-1, 2))
     np.testing.assert_allclose(keypoints_unaug, keypoints_flipped)
+
+
+def test_imgaug_dataset_pipeline_reuse(tmp_path):
+    rng = np.random.default_rng(0)
+    data = []
+    for i in range(3):
+        imsave(tmp_path / f"img{i}.png", rng.integers(0, 256, (60, 80, 3), np.uint8))
+        data.append(
+            dict(
+                image=(f"img{i}.png",),
+                size=np.array([3, 60, 80]),
+                joints=np.c_[np.arange(2), rng.uniform(10, 50, (2, 2))],
+            )
+        )
+    with open(tmp_path / "data.pickle", "wb") as file:
+        pickle.dump(data, file)
+    cfg = dict(
+        default_config.cfg,
+        project_path=str(tmp_path),
+        dataset="data.pickle",
+        all_joints_names=["a", "b"],
+        num_joints=2,
+        batch_size=2,
+        pos_dist_thresh=17,
+        min_input_size=16,
+    )
+    dataset = ImgaugPoseDataset(cfg)
+    pipeline = dataset.get_augmentation_pipeline(48, 64)
+    assert dataset.get_augmentation_pipeline(48, 64) is pipeline
+    # The augmenters independent of the size are shared across sizes
+    assert dataset.get_augmentation_pipeline(40, 56)[0] is pipeline[0]
+    for _ in range(5):
+        batch = dataset.next_batch()
+        inputs = batch[Batch.inputs]
+        assert inputs.ndim == 4 and inputs.shape[0] == 2 and inputs.shape[3] == 3
+        assert inputs.dtype == np.float64
+        assert batch[Batch.part_score_targets].shape[0] == 2
@@ -0,0 +1,120 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import multiprocessing
+import pickle
+
+import numpy as np
+import pytest
+from skimage.io import imsave
+from deeplabcut.pose_estimation_tensorflow import default_config
+from deeplabcut.pose_estimation_tensorflow.datasets import (
+    Batch,
+    ParallelBatchLoader,
+    PoseDatasetFactory,
+)
+
+
+requires_fork = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Datasets registered in tests are only known to forked workers.",
+)
+
+
+@PoseDatasetFactory.register("random-test")
+class RandomDataset:
+    def __init__(self, cfg):
+        self.cfg = cfg
+
+    def next_batch(self):
+        if self.cfg.get("fail"):
+            raise ValueError("Broken dataset")
+        # Sizes vary across batches, as with augmentation
+        size = np.random.randint(8, 64)
+        return {
+            Batch.inputs: np.random.rand(1, size, size, 3),
+            Batch.part_score_targets: np.random.rand(1, size, 4).astype(np.float32),
+            Batch.data_item: None,
+        }
+
+
+def _load(n_batches, **kwargs):
+    cfg = {"dataset_type": "random-test", "fail": kwargs.pop("fail", False)}
+    batches = []
+    with ParallelBatchLoader(cfg, start_method="fork", **kwargs) as loader:
+        for _ in range(n_batches):
+            batch = loader.next_batch()
+            batches.append({key: array.copy() for key, array in batch.items()})
+    return batches
+
+
+@requires_fork
+def test_parallel_batch_loader_ordered():
+    batches = _load(12, n_workers=3, ordered=True, seed=0)
+    assert all(
+        set(batch) == {Batch.inputs, Batch.part_score_targets} for batch in batches
+    )
+    assert batches[0][Batch.inputs].dtype == np.float64
+    assert batches[0][Batch.part_score_targets].dtype == np.float32
+    # Workers draw different batches, but the same sequence from the same seed
+    inputs = [batch[Batch.inputs] for batch in batches]
+    assert not any(
+        a.shape == b.shape and np.allclose(a, b) for a, b in zip(inputs, inputs[1:])
+    )
+    for batch, batch_ in zip(batches, _load(12, n_workers=3, ordered=True, seed=0)):
+        np.testing.assert_array_equal(batch[Batch.inputs], batch_[Batch.inputs])
+
+
+@requires_fork
+def test_parallel_batch_loader_unordered():
+    batches = _load(10, n_workers=2, n_buffers=1)
+    assert len(batches) == 10
+
+
+@requires_fork
+def test_parallel_batch_loader_worker_error():
+    with pytest.raises(RuntimeError, match="Broken dataset"):
+        _load(1, n_workers=2, fail=True)
+
+
+def test_parallel_batch_loader_spawn(tmp_path):
+    # Datasets of the package are known to workers started with the default method
+    rng = np.random.default_rng(0)
+    data = []
+    for i in range(4):
+        imsave(tmp_path / f"img{i}.png", rng.integers(0, 256, (60, 80, 3), np.uint8))
+        data.append(
+            dict(
+                image=(f"img{i}.png",),
+                size=np.array([3, 60, 80]),
+                joints=np.c_[np.arange(2), rng.uniform(10, 50, (2, 2))],
+            )
+        )
+    with open(tmp_path / "data.pickle", "wb") as file:
+        pickle.dump(data, file)
+    cfg = dict(
+        default_config.cfg,
+        dataset_type="imgaug",
+        project_path=str(tmp_path),
+        dataset="data.pickle",
+        all_joints_names=["a", "b"],
+        num_joints=2,
+        batch_size=2,
+        pos_dist_thresh=17,
+        min_input_size=16,
+    )
+    with ParallelBatchLoader(cfg, n_workers=2, ordered=True, seed=0) as loader:
+        for _ in range(4):
+            batch = loader.next_batch()
+            inputs = batch[Batch.inputs]
+            assert inputs.ndim == 4 and inputs.shape[0] == 2 and inputs.shape[3] == 3
+            assert inputs.dtype == np.float64
+            assert batch[Batch.part_score_targets].shape[0] == 2
+            assert Batch.data_item not in batch
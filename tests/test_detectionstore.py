@@ -0,0 +1,104 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import numpy as np
+import pytest
+from deeplabcut.pose_estimation_tensorflow.lib import inferenceutils
+from deeplabcut.pose_estimation_tensorflow.lib.detectionstore import (
+    DetectionStore,
+    DetectionStoreWriter,
+    is_store,
+)
+from deeplabcut.refine_training_dataset.outlier_frames import (
+    find_outliers_in_raw_detections,
+)
+
+
+@pytest.fixture()
+def video_detections(synthetic_detections):
+    data, kwargs = synthetic_detections
+    frames = [v for k, v in data.items() if k != "metadata"]
+    # Leave a gap in frame indices to mimic frames that could not be read
+    inds = [i for i in range(len(frames) + 1) if i != 7]
+    video_data = {"metadata": data["metadata"]}
+    for ind, frame in zip(inds, frames):
+        video_data["frame" + str(ind).zfill(2)] = frame
+    return video_data, kwargs
+
+
+@pytest.fixture()
+def store(tmp_path, video_detections):
+    data, _ = video_detections
+    path = str(tmp_path / "videoDLC_full.detections")
+    writer = DetectionStoreWriter(path, chunksize=6)
+    for key, value in data.items():
+        writer[key] = value
+    assert not is_store(path)
+    writer.close()
+    assert is_store(path)
+    return DetectionStore.open(path)
+
+
+def test_store_roundtrip(store, video_detections):
+    data, _ = video_detections
+    assert list(store) == list(data)
+    assert store["metadata"] == data["metadata"]
+    assert isinstance(store.columns["xy"], np.memmap)
+    for key, frame in data.items():
+        if key == "metadata":
+            continue
+        stored = store[key]
+        for name in ("coordinates", "confidence"):
+            arrays = frame[name][0] if name == "coordinates" else frame[name]
+            stored_arrays = stored[name][0] if name == "coordinates" else stored[name]
+            for arr, stored_arr in zip(arrays, stored_arrays):
+                assert arr.dtype == stored_arr.dtype
+                np.testing.assert_array_equal(arr, stored_arr)
+        assert stored["costs"].keys() == frame["costs"].keys()
+        for k, costs in frame["costs"].items():
+            for name, arr in costs.items():
+                np.testing.assert_array_equal(arr, stored["costs"][k][name])
+
+
+def test_store_writer_rejects_unordered_frames(tmp_path, video_detections):
+    data, _ = video_detections
+    writer = DetectionStoreWriter(str(tmp_path / "test_full.detections"))
+    writer["metadata"] = data["metadata"]
+    writer["frame10"] = data["frame10"]
+    with pytest.raises(ValueError):
+        writer["frame09"] = data["frame09"]
+
+
+@pytest.mark.parametrize("kept_keypoints", [None, [3, 0, 1]])
+def test_find_outliers_in_store(store, video_detections, kept_keypoints):
+    data, _ = video_detections
+    candidates, outliers = find_outliers_in_raw_detections(
+        dict(data), threshold=0.2, kept_keypoints=kept_keypoints
+    )
+    candidates_store, outliers_store = find_outliers_in_raw_detections(
+        store, threshold=0.2, kept_keypoints=kept_keypoints
+    )
+    assert candidates_store == candidates
+    assert outliers_store.keys() == outliers.keys()
+    for ind, arr in outliers.items():
+        np.testing.assert_array_equal(outliers_store[ind], arr)
+
+
+@pytest.mark.parametrize("n_processes", [1, 2])
+def test_assembler_with_store(store, video_detections, n_processes):
+    data, kwargs = video_detections
+    ass_ref = inferenceutils.ArrayAssembler(data, **kwargs)
+    ass_ref.assemble(chunk_size=0)
+    ass = inferenceutils.ArrayAssembler(store, **kwargs)
+    ass.assemble(n_processes=n_processes)
+    assert ass.assemblies.keys() == ass_ref.assemblies.keys()
+    for ind, assemblies in ass_ref.assemblies.items():
+        for assembly, assembly_ref in zip(ass.assemblies[ind], assemblies):
+            np.testing.assert_array_equal(assembly.data, assembly_ref.data)
@@ -0,0 +1,125 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import copy
+
+import numpy as np
+import pytest
+
+torch = pytest.importorskip("torch")
+from deeplabcut.pose_tracking_pytorch import inference
+
+
+N_KPTS, FEATURE_DIM, N_FRAMES = 3, 8, 5
+
+
+class StubModel(torch.nn.Module):
+    def __init__(self):
+        super().__init__()
+        self.linear = torch.nn.Linear(N_KPTS * FEATURE_DIM, 4)
+        self.n_calls = 0
+
+    def forward(self, x):
+        self.n_calls += 1
+        return self.linear(x.flatten(1))
+
+
+@pytest.fixture
+def model():
+    torch.manual_seed(0)
+    return StubModel()
+
+
+@pytest.fixture
+def dlctrans(tmp_path, monkeypatch, model):
+    monkeypatch.setattr(inference, "build_dlc_transformer", lambda *args: model)
+    checkpoint = str(tmp_path / "dlctrans.pth")
+    torch.save(
+        {
+            "feature_dim": FEATURE_DIM,
+            "num_kpts": N_KPTS,
+            "state_dict": model.state_dict(),
+        },
+        checkpoint,
+    )
+    return inference.DLCTrans(checkpoint, device="cpu", batch_size=2)
+
+
+@pytest.fixture
+def feature_dict():
+    rng = np.random.default_rng(0)
+    feature_dict = dict()
+    for frame in range(N_FRAMES):
+        # Animals are queried by their coordinates, the first being the closest
+        coordinates = (
+            rng.uniform(0, 100, (N_KPTS, 2)) + 200 * np.arange(3)[:, None, None]
+        )
+        feature_dict[f"frame{frame}"] = {
+            "features": rng.normal(size=(3, N_KPTS, FEATURE_DIM)),
+            "coordinates": coordinates,
+        }
+    return feature_dict
+
+
+def _queries(feature_dict):
+    return [
+        (feature_dict[f"frame{frame}"]["coordinates"][0], frame)
+        for frame in range(N_FRAMES)
+    ]
+
+
+def test_embed_keypoints_cache(dlctrans, model, feature_dict):
+    queries = _queries(feature_dict)
+    embeddings = dlctrans.embed_keypoints(queries, 1, feature_dict)
+    assert embeddings.shape == (N_FRAMES, 4)
+    assert embeddings.dtype == np.float32
+    assert model.n_calls == 3  # Batches of 2
+    features = [feature_dict[f"frame{i}"]["features"][0] for i in range(N_FRAMES)]
+    np.testing.assert_allclose(embeddings, dlctrans.embed(features))
+
+    # Cached embeddings skip the forward pass
+    n_calls = model.n_calls
+    embeddings_ = dlctrans.embed_keypoints(queries[::-1], 1, feature_dict)
+    assert model.n_calls == n_calls
+    np.testing.assert_array_equal(embeddings_, embeddings[::-1])
+    units = dlctrans.embed_keypoints(queries, 1, feature_dict, normalize=True)
+    assert model.n_calls == n_calls
+    np.testing.assert_allclose(np.linalg.norm(units, axis=1), 1, rtol=1e-6)
+    np.testing.assert_allclose(
+        dlctrans.similarity(units, units, normalized=True),
+        dlctrans.similarity(embeddings, embeddings),
+        atol=1e-6,
+    )
+
+    dlctrans.clear_cache()
+    dlctrans.embed_keypoints(queries[:1], 1, feature_dict)
+    assert model.n_calls == n_calls + 1
+
+
+def test_dlctrans_call(dlctrans, model, feature_dict):
+    query_a, query_b = _queries(feature_dict)[:2]
+    dist, vec_a, vec_b = dlctrans(
+        query_a, query_b, 1, feature_dict, return_features=True
+    )
+    embeddings = dlctrans.embed_keypoints([query_a, query_b], 1, feature_dict)
+    assert dist.shape == (1,)
+    assert dist.item() == dlctrans.similarity(embeddings[:1], embeddings[1:])[0, 0]
+    np.testing.assert_array_equal(vec_a.numpy(), embeddings[:1])
+    np.testing.assert_array_equal(vec_b.numpy(), embeddings[1:])
+
+    # Close to the former float64 computation
+    model64 = copy.deepcopy(model).double()
+    with torch.no_grad():
+        vecs = [
+            model64(torch.from_numpy(feature_dict[f"frame{i}"]["features"][:1]))
+            for i in range(2)
+        ]
+        dist64 = torch.nn.CosineSimilarity(dim=1, eps=1e-6)(*vecs).item()
+    assert dist.item() == pytest.approx(dist64, abs=1e-5)
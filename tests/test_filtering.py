@@ -0,0 +1,143 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import numpy as np
+import pytest
+from deeplabcut.post_processing import filtering
+from deeplabcut.refine_training_dataset.outlier_frames import (
+    FitSARIMAXModel,
+    fit_sarimax_models,
+)
+from scipy.interpolate import CubicSpline
+
+
+def spline_interp_reference(data, max_gap=0):
+    # Column-by-column, gap-by-gap interpolation
+    temp = data.copy()
+    valid = ~np.isnan(temp)
+    x = np.arange(data.shape[0])
+    for i in range(data.shape[1]):
+        mask = valid[:, i]
+        if np.sum(mask) > 3:
+            y = CubicSpline(x[mask], temp[mask, i])(x)
+            if max_gap > 0:
+                inds = np.flatnonzero(np.r_[True, np.diff(mask), True])
+                count = np.diff(inds)
+                inds = inds[:-1]
+                to_fill = np.ones_like(mask)
+                for ind, n, is_nan in zip(inds, count, ~mask[inds]):
+                    if is_nan and n > max_gap:
+                        to_fill[ind : ind + n] = False
+                y[~to_fill] = np.nan
+            y[y == 0] = np.nan
+            temp[:, i] = y
+    return temp
+
+
+def kalman_smooth_reference(z, q, r):
+    # Textbook Kalman filter and RTS smoother, one column at a time
+    F = np.array([[1.0, 1.0], [0.0, 1.0]])
+    Q = q * np.array([[0.25, 0.5], [0.5, 1.0]])
+    H = np.array([[1.0, 0.0]])
+    m, P = np.zeros(2), np.eye(2) * 1e8
+    ms, Ps, mps, Pps = [], [], [], []
+    for z_ in z:
+        m, P = F @ m, F @ P @ F.T + Q
+        mps.append(m)
+        Pps.append(P)
+        if not np.isnan(z_):
+            K = P @ H.T / (H @ P @ H.T + r)
+            m = m + (K * (z_ - H @ m)).ravel()
+            P = (np.eye(2) - K @ H) @ P
+        ms.append(m)
+        Ps.append(P)
+    out = [ms[-1]]
+    for t in range(len(z) - 2, -1, -1):
+        G = Ps[t] @ F.T @ np.linalg.inv(Pps[t + 1])
+        out.append(ms[t] + G @ (out[-1] - mps[t + 1]))
+    return np.array(out[::-1])[:, 0]
+
+
+@pytest.fixture()
+def trajectories():
+    rng = np.random.default_rng(0)
+    data = np.cumsum(rng.normal(0, 2, size=(150, 8)), axis=0) + 100
+    missing = np.repeat(rng.random((150, 4)) < 0.2, 2, axis=1)
+    missing[40:60, :2] = True
+    missing[:10, 4:6] = True
+    missing[:, 6] |= rng.random(150) < 0.3  # Unpaired coordinate
+    data[missing] = np.nan
+    return data
+
+
+@pytest.mark.parametrize("max_gap", [0, 1, 5])
+def test_columnwise_spline_interp(trajectories, max_gap):
+    trajectories[:, -1] = np.nan  # Too few points to fit a spline
+    trajectories[:3, -1] = 1
+    np.testing.assert_allclose(
+        filtering.columnwise_spline_interp(trajectories, max_gap),
+        spline_interp_reference(trajectories, max_gap),
+    )
+
+
+def test_columnwise_kalman_smooth(trajectories):
+    smoothed = filtering.columnwise_kalman_smooth(trajectories, 1.5, 3)
+    assert smoothed.shape == trajectories.shape
+    for col, data in zip(smoothed.T, trajectories.T):
+        expected = kalman_smooth_reference(data, 1.5**2, 3**2)
+        observed = np.flatnonzero(~np.isnan(data))
+        span = slice(observed[0], observed[-1] + 1)
+        np.testing.assert_allclose(col[span], expected[span], rtol=1e-6)
+        assert np.isnan(col[: observed[0]]).all()
+        assert np.isnan(col[observed[-1] + 1 :]).all()
+
+
+def test_columnwise_kalman_smooth_denoises():
+    rng = np.random.default_rng(1)
+    truth = (
+        np.linspace(0, 100, 500)[:, np.newaxis]
+        + np.sin(np.arange(500) / 20)[:, np.newaxis]
+    )
+    noisy = truth + rng.normal(0, 3, truth.shape)
+    smoothed = filtering.columnwise_kalman_smooth(noisy, 0.1, 3)
+    assert np.abs(smoothed - truth).mean() < 0.5 * np.abs(noisy - truth).mean()
+
+
+@pytest.mark.parametrize(
+    "window_size, n_processes, start_method",
+    [(None, 1, None), (None, 2, None), (40, 2, None), (None, 2, "spawn")],
+)
+def test_fit_sarimax_models(window_size, n_processes, start_method):
+    rng = np.random.default_rng(0)
+    series = np.cumsum(rng.normal(size=(100, 3)), axis=0)
+    p = rng.random(series.shape)
+    mean, conf_int = fit_sarimax_models(
+        series,
+        p,
+        0.1,
+        0.01,
+        1,
+        0,
+        window_size=window_size,
+        n_processes=n_processes,
+        start_method=start_method,
+    )
+    assert mean.shape == series.shape
+    assert conf_int.shape == (*series.shape, 2)
+    if window_size is None:
+        for i in range(series.shape[1]):
+            mean_, conf_int_ = FitSARIMAXModel(series[:, i], p[:, i], 0.1, 0.01, 1, 0)
+            np.testing.assert_allclose(mean[:, i], mean_)
+            np.testing.assert_allclose(conf_int[:, i], conf_int_)
+    else:
+        # The first window is fitted on its own
+        mean_, _ = FitSARIMAXModel(series[:40, 0], p[:40, 0], 0.1, 0.01, 1, 0)
+        np.testing.assert_allclose(mean[:40, 0], mean_)
+        assert np.isfinite(mean).all()
@@ -0,0 +1,140 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import os
+import numpy as np
+import pytest
+from skimage.io import imread, imsave
+from deeplabcut.pose_estimation_tensorflow.datasets.pose_base import BasePoseDataset
+from deeplabcut.pose_estimation_tensorflow.datasets.utils import DataItem
+from deeplabcut.utils.image_cache import DecodedImageCache
+
+
+@pytest.fixture()
+def image_paths(tmp_path):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i, shape in enumerate([(20, 30), (24, 16), (20, 30), (20, 30), (24, 16)]):
+        path = str(tmp_path / f"img{i}.png")
+        imsave(path, rng.integers(0, 256, (*shape, 3), dtype=np.uint8))
+        paths.append(path)
+    return paths
+
+
+def test_decoded_image_cache(tmp_path, image_paths):
+    cache = DecodedImageCache(image_paths)
+    cache_path = str(tmp_path / "images.cache")
+    memmapped = DecodedImageCache(image_paths, cache_path)
+    assert os.path.isfile(cache_path)
+    assert len(cache) == len(memmapped) == len(image_paths)
+    assert cache.shapes == memmapped.shapes
+    for image, image_memmapped in zip(cache, memmapped):
+        np.testing.assert_equal(image, image_memmapped)
+        assert not image_memmapped.flags.writeable
+
+
+def test_decoded_image_cache_reuse(tmp_path, image_paths, monkeypatch):
+    cache_path = str(tmp_path / "images.cache")
+    reference = DecodedImageCache(image_paths, cache_path)
+    reference = [image.copy() for image in reference]
+    decoded = []
+    monkeypatch.setattr(
+        DecodedImageCache,
+        "_read",
+        lambda self, path: decoded.append(path) or np.zeros((20, 30, 3), np.uint8),
+    )
+    _ = DecodedImageCache(image_paths, cache_path)
+    assert not decoded
+    # Only the modified image is decoded again
+    stat = os.stat(image_paths[3])
+    os.utime(image_paths[3], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    cache = DecodedImageCache(image_paths, cache_path)
+    assert decoded == [image_paths[3]]
+    for i, image in enumerate(cache):
+        if i == 3:
+            assert not image.any()
+        else:
+            np.testing.assert_equal(image, reference[i])
+
+
+def test_decoded_image_cache_batches(image_paths):
+    cache = DecodedImageCache(image_paths)
+    batches = []
+    for frames, inds in cache.batches(2):
+        assert frames.shape[0] == 2
+        for frame, ind in zip(frames, inds):
+            np.testing.assert_equal(frame, cache[ind])
+        assert not frames[len(inds) :].any()
+        batches.append(inds)
+    assert batches == [[0, 2], [3], [1, 4]]
+
+
+class ImageDataset(BasePoseDataset):
+    def load_dataset(self):
+        ...
+
+    def next_batch(self):
+        ...
+
+
+def test_pose_dataset_image_cache(tmp_path, image_paths):
+    cfg = {
+        "project_path": str(tmp_path),
+        "snapshot_prefix": str(tmp_path / "snapshot"),
+    }
+    dataset = ImageDataset(cfg)
+    dataset.data = []
+    # Images labeled several times are only cached once
+    for path in image_paths + image_paths[:2]:
+        item = DataItem()
+        item.im_path = os.path.basename(path)
+        dataset.data.append(item)
+    dataset.cache_images()
+    assert os.path.isfile(tmp_path / "decoded_images.dat")
+    assert len(dataset._image_cache) == len(image_paths)
+    for i, item in enumerate(dataset.data):
+        image = imread(os.path.join(tmp_path, item.im_path))
+        np.testing.assert_equal(dataset.read_image(i), image)
+
+
+def test_predict_samples_reads_cached_images(monkeypatch, tmp_path, image_paths):
+    import imgaug.augmenters as iaa
+    from deeplabcut.pose_estimation_tensorflow.core import (
+        evaluate_multianimal,
+        predict_multianimal,
+    )
+
+    images = DecodedImageCache(image_paths, str(tmp_path / "images.cache"))
+    pipeline = iaa.Sequential([iaa.Resize({"height": 12, "width": 10})])
+    batches = []
+
+    def predict(dlc_cfg, frames, sess, inputs, outputs, peaks_gt):
+        batches.append((frames.copy(), peaks_gt))
+        return [
+            {"coordinates": [[np.ones((1, 2))]], "costs": {}, "frame": frame.copy()}
+            for frame in frames
+        ]
+
+    monkeypatch.setattr(predict_multianimal, "predict_batched_peaks_and_costs", predict)
+    # Samples only hold the ground truth, the last item being the peak indices
+    samples = {i: (None, None, None, None, np.zeros((1, 4))) for i in (0, 1, 3, 4)}
+    preds = evaluate_multianimal._predict_samples(
+        samples, images, pipeline, {"batch_size": 3}, None, None, None
+    )
+    assert sorted(preds) == [0, 1, 3, 4]
+    # Images are grouped by size, and the last batches padded with zeros
+    assert len(batches) == 2
+    for frames, peaks_gt in batches:
+        assert frames.shape == (3, 12, 10, 3)
+        np.testing.assert_array_equal(frames[2], 0)
+        np.testing.assert_array_equal(peaks_gt[:, 0], [0, 1])
+    for ind, pred in preds.items():
+        expected = evaluate_multianimal._resize(images[ind], pipeline)
+        np.testing.assert_array_equal(pred["frame"], expected)
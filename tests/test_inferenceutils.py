@@ -8,6 +8,7 @@
 #
 # Licensed under GNU Lesser General Public License v3.0
 #
+import multiprocessing
 import numpy as np
 import os
 import pickle
@@ -293,6 +294,129 @@ def test_assembler_with_identity(tmpdir_factory, real_assemblies):
     ass.to_pickle(str(output_name).replace("h5", "pickle"))
 
 
+def _assert_same_assemblies(assemblies1, assemblies2):
+    assert assemblies1.keys() == assemblies2.keys()
+    for ind, assemblies in assemblies1.items():
+        assert len(assemblies) == len(assemblies2[ind])
+        for ass1, ass2 in zip(assemblies, assemblies2[ind]):
+            np.testing.assert_equal(ass1.data, ass2.data)
+            assert ass1._affinity == ass2._affinity
+            assert ass1._idx == ass2._idx
+            assert [link.idx for link in ass1._links] == [
+                link.idx for link in ass2._links
+            ]
+
+
+@pytest.mark.parametrize(
+    "filename, n_multibodyparts, greedy, window_size, add_discarded",
+    [
+        ("trimouse_full.pickle", 12, False, 0, False),
+        ("trimouse_full.pickle", 12, True, 1, False),
+        ("trimouse_full.pickle", 12, False, 2, True),
+        ("montblanc_full.pickle", 4, False, 0, False),
+        ("montblanc_full.pickle", 4, True, 0, True),
+    ],
+)
+def test_array_assembler_parity(
+    filename, n_multibodyparts, greedy, window_size, add_discarded
+):
+    with open(os.path.join(TEST_DATA_DIR, filename), "rb") as file:
+        data = pickle.load(file)
+    kwargs = dict(
+        max_n_individuals=3,
+        n_multibodyparts=n_multibodyparts,
+        greedy=greedy,
+        window_size=window_size,
+        add_discarded=add_discarded,
+    )
+    ass_ref = inferenceutils.Assembler(data, **kwargs)
+    ass = inferenceutils.ArrayAssembler(data, **kwargs)
+    ass_ref.assemble(chunk_size=0)
+    ass.assemble(chunk_size=0)
+    _assert_same_assemblies(ass.assemblies, ass_ref.assemblies)
+    assert ass.unique.keys() == ass_ref.unique.keys()
+    for ind, unique in ass_ref.unique.items():
+        np.testing.assert_equal(ass.unique[ind], unique)
+
+
+@pytest.mark.parametrize("greedy", [False, True])
+def test_array_assembler_parity_synthetic(synthetic_detections, greedy):
+    data, kwargs = synthetic_detections
+    ass_ref = inferenceutils.Assembler(data, greedy=greedy, **kwargs)
+    ass = inferenceutils.ArrayAssembler(data, greedy=greedy, **kwargs)
+    ass_ref.assemble(chunk_size=0)
+    ass.assemble(chunk_size=0)
+    assert ass.assemblies and ass.unique
+    _assert_same_assemblies(ass.assemblies, ass_ref.assemblies)
+
+
+@pytest.mark.parametrize(
+    "start_method, window_size", [("fork", 0), ("fork", 1), ("spawn", 1)]
+)
+def test_assembler_parallel(synthetic_detections, start_method, window_size):
+    if start_method not in multiprocessing.get_all_start_methods():
+        pytest.skip(f"The {start_method} start method is unavailable.")
+    data, kwargs = synthetic_detections
+    ass_serial = inferenceutils.ArrayAssembler(data, window_size=window_size, **kwargs)
+    ass_serial.assemble(chunk_size=0)
+    ass = inferenceutils.ArrayAssembler(data, window_size=window_size, **kwargs)
+    ass.assemble(n_processes=2, start_method=start_method)
+    # The temporal KD-trees at the seam between both frame ranges are only
+    # approximated, so the frames relying on them may be assembled differently.
+    n_frames = len(ass.metadata["imnames"])
+    seam = range(n_frames // 2, n_frames // 2 + window_size)
+    _assert_same_assemblies(
+        {i: a for i, a in ass.assemblies.items() if i not in seam},
+        {i: a for i, a in ass_serial.assemblies.items() if i not in seam},
+    )
+    assert ass.unique.keys() == ass_serial.unique.keys()
+    for ind, unique in ass_serial.unique.items():
+        np.testing.assert_equal(ass.unique[ind], unique)
+
+
+def test_assembler_parallel_default_spawn(synthetic_detections, monkeypatch):
+    if "spawn" not in multiprocessing.get_all_start_methods():
+        pytest.skip("The spawn start method is unavailable.")
+    get_context = multiprocessing.get_context
+    contexts = []
+
+    def get_spawn_context(method=None):
+        # Platforms spawning processes by default
+        contexts.append(get_context(method or "spawn"))
+        return contexts[-1]
+
+    monkeypatch.setattr(
+        inferenceutils.multiprocessing, "get_context", get_spawn_context
+    )
+    monkeypatch.setattr(
+        inferenceutils.multiprocessing, "get_start_method", lambda *_: "spawn"
+    )
+    data, kwargs = synthetic_detections
+    ass_serial = inferenceutils.ArrayAssembler(data, **kwargs)
+    ass_serial.assemble(chunk_size=0)
+    ass = inferenceutils.ArrayAssembler(data, **kwargs)
+    ass.assemble(n_processes=2)
+    assert [context.get_start_method() for context in contexts] == ["spawn"]
+    _assert_same_assemblies(ass.assemblies, ass_serial.assemblies)
+
+
+def test_assembler_parallel_without_shared_memory(synthetic_detections, monkeypatch):
+    # Before Python 3.8, detections cannot be shared with worker processes
+    monkeypatch.setattr(inferenceutils, "_shared_memory_available", lambda: False)
+    monkeypatch.setattr(
+        inferenceutils.multiprocessing,
+        "get_context",
+        lambda *_: pytest.fail("No worker process should be started."),
+    )
+    data, kwargs = synthetic_detections
+    ass_serial = inferenceutils.ArrayAssembler(data, **kwargs)
+    ass_serial.assemble(chunk_size=0)
+    ass = inferenceutils.ArrayAssembler(data, **kwargs)
+    with pytest.warns(UserWarning, match="Python 3.8"):
+        ass.assemble(n_processes=2)
+    _assert_same_assemblies(ass.assemblies, ass_serial.assemblies)
+
+
 def test_assembler_calibration(real_assemblies):
     with open(os.path.join(TEST_DATA_DIR, "trimouse_full.pickle"), "rb") as file:
         data = pickle.load(file)
@@ -0,0 +1,144 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import cv2
+import numpy as np
+import pytest
+from deeplabcut.utils import make_labeled_video
+from deeplabcut.utils.make_labeled_video import _LabelDrawer
+from deeplabcut.utils.video_processor import VideoProcessorCV
+from skimage.draw import disk, line_aa
+
+
+SHAPE = (48, 64)
+N_FRAMES = 20
+
+
+def draw_reference(
+    image,
+    index,
+    x,
+    y,
+    likelihood,
+    pcutoff,
+    colors,
+    dotsize,
+    trailpoints,
+    segments,
+    segment_color,
+):
+    # Frame-by-frame, point-by-point drawing, as previously done in CreateVideo
+    ny, nx = SHAPE
+    with np.errstate(invalid="ignore"):
+        for i, j in segments:
+            if np.all(likelihood[[i, j], index] > pcutoff) and not (
+                np.any(np.isnan(x[[i, j], index])) or np.any(np.isnan(y[[i, j], index]))
+            ):
+                rr, cc, _ = line_aa(
+                    int(np.clip(y[i, index], 0, ny - 1)),
+                    int(np.clip(x[i, index], 0, nx - 1)),
+                    int(np.clip(y[j, index], 1, ny - 1)),
+                    int(np.clip(x[j, index], 1, nx - 1)),
+                )
+                image[rr, cc] = segment_color
+        for ind, color in enumerate(colors):
+            if likelihood[ind, index] > pcutoff:
+                if trailpoints > 0:
+                    for k in range(1, min(trailpoints, index + 1)):
+                        rr, cc = disk(
+                            (y[ind, index - k], x[ind, index - k]), dotsize, shape=SHAPE
+                        )
+                        image[rr, cc] = color
+                rr, cc = disk((y[ind, index], x[ind, index]), dotsize, shape=SHAPE)
+                image[rr, cc] = color
+    return image
+
+
+@pytest.fixture()
+def keypoints():
+    rng = np.random.default_rng(0)
+    n_points = 6
+    # Some keypoints lie outside the frame, others are missing
+    x = rng.uniform(-10, SHAPE[1] + 10, size=(n_points, N_FRAMES))
+    y = rng.uniform(-10, SHAPE[0] + 10, size=(n_points, N_FRAMES))
+    x[rng.random(x.shape) < 0.1] = np.nan
+    likelihood = rng.random((n_points, N_FRAMES))
+    colors = rng.integers(0, 255, size=(n_points, 3), dtype=np.uint8)
+    return x, y, likelihood, colors
+
+
+@pytest.mark.parametrize("dotsize", [1, 2.5, 5])
+@pytest.mark.parametrize("trailpoints", [0, 4])
+@pytest.mark.parametrize("segments", [None, [(0, 1), (1, 3), (4, 5)]])
+def test_label_drawer(keypoints, dotsize, trailpoints, segments):
+    x, y, likelihood, colors = keypoints
+    segment_color = np.array([255, 0, 0], dtype=np.uint8)
+    drawer = _LabelDrawer(
+        x,
+        y,
+        likelihood,
+        0.3,
+        np.arange(len(x)),
+        colors,
+        dotsize,
+        trailpoints,
+        SHAPE,
+        segments,
+        segment_color,
+    )
+    subset = drawer.subset(12, N_FRAMES)
+    for index in range(N_FRAMES):
+        image = np.zeros(SHAPE + (3,), dtype=np.uint8)
+        expected = draw_reference(
+            image.copy(),
+            index,
+            x,
+            y,
+            likelihood,
+            0.3,
+            colors,
+            dotsize,
+            trailpoints,
+            segments or [],
+            segment_color,
+        )
+        np.testing.assert_array_equal(drawer.draw(image.copy(), index), expected)
+        if index >= 12:
+            np.testing.assert_array_equal(subset.draw(image.copy(), index), expected)
+
+
+def test_video_processor_seek(tmp_path):
+    video_path = str(tmp_path / "synthetic.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    for i in range(N_FRAMES):
+        writer.write(np.full((48, 64, 3), 10 * i, dtype=np.uint8))
+    writer.release()
+    clip = VideoProcessorCV(video_path)
+    frames = [clip.load_frame() for _ in range(N_FRAMES)]
+    clip.seek(13)
+    assert clip.counter() == 13
+    np.testing.assert_array_equal(clip.load_frame(), frames[13])
+    clip.close()
+
+
+@pytest.mark.parametrize("n_frames", [20, 250])
+def test_splits_frames(tmp_path, monkeypatch, n_frames):
+    video = str(tmp_path / "video.avi")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 30, SHAPE[::-1])
+    for _ in range(n_frames):
+        writer.write(np.zeros((*SHAPE, 3), dtype=np.uint8))
+    writer.release()
+
+    monkeypatch.setattr(make_labeled_video.shutil, "which", lambda _: "ffmpeg")
+    assert make_labeled_video._splits_frames([video], 4, True) == (n_frames >= 200)
+    assert not make_labeled_video._splits_frames([video], 1, True)
+    assert not make_labeled_video._splits_frames([video], 4, False)
+    monkeypatch.setattr(make_labeled_video.shutil, "which", lambda _: None)
+    assert not make_labeled_video._splits_frames([video], 4, True)
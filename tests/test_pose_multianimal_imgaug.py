@@ -14,7 +14,7 @@ import pytest
 from conftest import TEST_DATA_DIR
 from deeplabcut.pose_estimation_tensorflow.datasets import (
     Batch,
-    pose_multianimal_imgaug,
+    pose_base,
     PoseDatasetFactory,
 )
 from deeplabcut.utils import read_plainconfig
@@ -24,7 +24,7 @@ def mock_imread(path, mode):
     return (np.random.rand(400, 400, 3) * 255).astype(np.uint8)
 
 
-pose_multianimal_imgaug.imread = mock_imread
+pose_base.imread = mock_imread
 
 
 @pytest.fixture()
@@ -113,3 +113,127 @@ def test_get_targetmaps(ma_dataset, num_idchannel):
 def test_batching(ma_dataset):
     for _ in range(10):
         batch = ma_dataset.next_batch()
+
+
+def compute_target_maps_reference(cfg, joint_id, coords, data_item, size, scale):
+    # Former dense implementation of compute_target_part_scoremap_numpy, over the
+    # whole grid and one keypoint/limb at a time (score, locref and PAF maps only)
+    stride = cfg["stride"]
+    half_stride = stride // 2
+    dist_thresh = float(cfg["pos_dist_thresh"] * scale)
+    num_idchannel = cfg.get("num_idchannel", 0)
+    num_joints = cfg["num_joints"]
+    scmap = np.zeros((*size, num_joints + num_idchannel))
+    locref_map = np.zeros((*size, num_joints * 2))
+    locref_scale = 1.0 / cfg["locref_stdev"]
+    partaffinityfield_map = np.zeros((*size, cfg["num_limbs"] * 2))
+
+    height, width = size
+    grid = np.mgrid[:height, :width].transpose((1, 2, 0))
+    xx = np.expand_dims(grid[..., 1], axis=2)
+    yy = np.expand_dims(grid[..., 0], axis=2)
+    coords_sm = np.round((coords - half_stride) / stride).astype(int)
+    mins = np.round(np.maximum(coords_sm - dist_thresh - 1, 0)).astype(int)
+    maxs = np.round(
+        np.minimum(coords_sm + dist_thresh + 1, [width - 1, height - 1])
+    ).astype(int)
+    dx = coords[:, 0] - xx * stride - half_stride
+    dy = coords[:, 1] - yy * stride - half_stride
+    mask = (
+        (dx**2 + dy**2 <= dist_thresh**2)
+        & (xx >= mins[:, 0])
+        & (xx <= maxs[:, 0])
+        & (yy >= mins[:, 1])
+        & (yy <= maxs[:, 1])
+    )
+    for n, ind in enumerate(np.concatenate(joint_id).tolist()):
+        mask_ = mask[..., n]
+        scmap[mask_, ind] = 1
+        locref_map[mask_, ind * 2 + 0] = dx[mask_, n] * locref_scale
+        locref_map[mask_, ind * 2 + 1] = dy[mask_, n] * locref_scale
+
+    offset = 0
+    for i, person_id in enumerate(data_item.joints):
+        if person_id < num_idchannel:
+            n_joints = joint_id[i].size
+            if n_joints:
+                inds = np.arange(n_joints) + offset
+                scmap[mask[..., inds].any(axis=2), person_id + num_joints] = 1
+            offset += n_joints
+
+    offset = 0
+    y, x = np.rollaxis(grid * stride + half_stride, 2)
+    for joint_ids in joint_id:
+        joint_ids = joint_ids.tolist()
+        if len(joint_ids) >= 2:
+            for l, (bp1, bp2) in enumerate(cfg["partaffinityfield_graph"]):
+                if bp1 not in joint_ids or bp2 not in joint_ids:
+                    continue
+                j_x, j_y = coords[joint_ids.index(bp1) + offset]
+                linkedj_x, linkedj_y = coords[joint_ids.index(bp2) + offset]
+                dist = np.sqrt((linkedj_x - j_x) ** 2 + (linkedj_y - j_y) ** 2)
+                if dist > 0:
+                    Dx = (linkedj_x - j_x) / dist
+                    Dy = (linkedj_y - j_y) / dist
+                    d1 = [Dx * j_x + Dy * j_y, Dx * linkedj_x + Dy * linkedj_y]
+                    d2mid = j_y * Dx - j_x * Dy
+                    distance_along = Dx * x + Dy * y
+                    distance_across = (
+                        ((y * Dx - x * Dy) - d2mid) * 1.0 / cfg["pafwidth"] * scale
+                    )
+                    mask_ = (
+                        (distance_along >= min(d1))
+                        & (distance_along <= max(d1))
+                        & (np.abs(distance_across) <= 1)
+                    )
+                    temp = 1 - np.abs(distance_across[mask_])
+                    partaffinityfield_map[mask_, l * 2 + 0] = Dx * temp
+                    partaffinityfield_map[mask_, l * 2 + 1] = Dy * temp
+        offset += len(joint_ids)
+    return scmap, locref_map, partaffinityfield_map
+
+
+@pytest.mark.parametrize("num_idchannel", [0, 3])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_compute_target_part_scoremap(ma_dataset, num_idchannel, dtype):
+    ma_dataset.cfg["num_idchannel"] = num_idchannel
+    ma_dataset.batch_size = 8
+    _, joint_ids, batch_joints, inds_visible, data_items = ma_dataset.get_batch()
+    target_size, sm_size = ma_dataset.calc_target_and_scoremap_sizes()
+    scale = np.mean(target_size / ma_dataset.default_size)
+    for joint_id, joints, visible, data_item in zip(
+        joint_ids, batch_joints, inds_visible, data_items
+    ):
+        coords = joints[visible].astype(dtype)
+        maps = ma_dataset.compute_target_part_scoremap_numpy(
+            joint_id, coords, data_item, sm_size, scale
+        )
+        maps_ref = compute_target_maps_reference(
+            ma_dataset.cfg, joint_id, coords, data_item, sm_size, scale
+        )
+        assert all(map_.dtype == np.float32 for map_ in maps)
+        for map_, map_ref in zip(maps[::2], maps_ref):
+            np.testing.assert_array_equal(map_, map_ref.astype(np.float32))
+
+
+def test_compute_target_part_scoremap_present_joints(ma_dataset):
+    ma_dataset.cfg["weigh_only_present_joints"] = True
+    _, joint_ids, batch_joints, inds_visible, data_items = ma_dataset.get_batch()
+    _, sm_size = ma_dataset.calc_target_and_scoremap_sizes()
+    joint_id = joint_ids[0]
+    coords = batch_joints[0][inds_visible[0]]
+    (
+        scmap,
+        weights,
+        locref_map,
+        locref_mask,
+        paf_map,
+        paf_mask,
+    ) = ma_dataset.compute_target_part_scoremap_numpy(
+        joint_id, coords, data_items[0], sm_size, 1
+    )
+    present = np.isin(np.arange(scmap.shape[2]), np.concatenate(joint_id))
+    np.testing.assert_equal(weights, np.broadcast_to(present, weights.shape))
+    num_joints = ma_dataset.cfg["num_joints"]
+    np.testing.assert_equal(locref_mask, np.repeat(scmap[..., :num_joints], 2, axis=2))
+    assert np.all(paf_mask[paf_map != 0] == 1)
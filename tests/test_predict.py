@@ -0,0 +1,188 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import cv2
+import numpy as np
+import pandas as pd
+import pytest
+from types import SimpleNamespace
+from deeplabcut.pose_estimation_tensorflow.core import predict
+
+
+class FakeSession:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_setup_cached_pose_prediction(monkeypatch, tmp_path):
+    builds = []
+
+    def setup(cfg, allow_growth=False):
+        builds.append(cfg["batch_size"])
+        return FakeSession(), "inputs", ["outputs"]
+
+    monkeypatch.setitem(predict._SETUP_FUNCS, "numpy", setup)
+    monkeypatch.setattr(predict, "_session_cache", {})
+    cfg = {"init_weights": str(tmp_path / "snapshot-100"), "batch_size": 4}
+    sess, inputs, outputs = predict.setup_cached_pose_prediction(cfg)
+    assert predict.setup_cached_pose_prediction(dict(cfg))[0] is sess
+    assert builds == [4]
+    # Any change to the config or setup arguments requires a new network
+    sess2 = predict.setup_cached_pose_prediction(dict(cfg, batch_size=8))[0]
+    sess3 = predict.setup_cached_pose_prediction(cfg, allow_growth=True)[0]
+    assert builds == [4, 8, 4]
+    with pytest.raises(ValueError):
+        predict.setup_cached_pose_prediction(cfg, mode="torch")
+
+    predict.clear_session_cache(sess2)
+    assert sess2.closed and not sess.closed
+    assert len(predict._session_cache) == 2
+    predict.clear_session_cache()
+    assert sess.closed and sess3.closed
+    assert not predict._session_cache
+
+
+class FakeGPUSession(FakeSession):
+    """Mimic the GPU readout: (y, x, confidence) rows for each frame and joint."""
+
+    def run(self, outputs, feed_dict):
+        batch = next(iter(feed_dict.values()))
+        pose = np.stack(
+            [batch.mean(axis=(1, 2, 3)), np.arange(len(batch)), np.ones(len(batch))],
+            axis=1,
+        )
+        return np.repeat(pose, 2, axis=0)
+
+
+@pytest.fixture
+def estimator_setup(monkeypatch, tmp_path):
+    from deeplabcut.pose_estimation_tensorflow import predict_videos
+
+    builds = []
+
+    def setup(cfg, allow_growth=False):
+        builds.append(cfg["batch_size"])
+        return FakeGPUSession(), "inputs", ["outputs"]
+
+    cfg = {
+        "TrainingFraction": [0.95],
+        "batch_size": 4,
+        "cropping": False,
+        "iteration": 0,
+    }
+    dlc_cfg = {
+        "init_weights": str(tmp_path / "snapshot-100"),
+        "dataset_type": "imgaug",
+        "all_joints_names": ["head", "tail"],
+    }
+    monkeypatch.setitem(predict._SETUP_FUNCS, "gpu", setup)
+    monkeypatch.setattr(predict, "_session_cache", {})
+    monkeypatch.setattr(predict_videos.auxiliaryfunctions, "read_config", lambda _: cfg)
+    monkeypatch.setattr(
+        predict_videos, "_load_test_config", lambda *args: dict(dlc_cfg)
+    )
+    monkeypatch.setattr(
+        predict_videos.auxiliaryfunctions,
+        "get_scorer_name",
+        lambda *args, **kwargs: ("DLC_scorer", "DLC_scorer_legacy"),
+    )
+    estimator = predict_videos.PoseEstimator(
+        "config.yaml", batchsize=3, use_openvino=None
+    )
+    yield estimator, builds
+    predict.clear_session_cache()
+
+
+def test_pose_estimator_predict(estimator_setup):
+    estimator, builds = estimator_setup
+    assert estimator.mode == "gpu"
+    frames = np.arange(5)[:, None, None, None] * np.ones((5, 8, 6, 3))
+    poses = estimator.predict(frames)
+    assert poses.shape == (5, 6)
+    # x, y and likelihood columns, for both body parts
+    np.testing.assert_array_equal(poses[:, 0], [0, 1, 2, 0, 1])
+    np.testing.assert_array_equal(poses[:, 1], frames.mean(axis=(1, 2, 3)))
+    np.testing.assert_array_equal(poses[:, [2, 5]], 1)
+    np.testing.assert_array_equal(poses[:, :3], poses[:, 3:])
+    assert estimator.predict(frames[0]).shape == (1, 6)
+
+
+def test_pose_estimator_reuses_session(estimator_setup, tmp_path):
+    estimator, builds = estimator_setup
+    directory = tmp_path / "frames"
+    directory.mkdir()
+    for i in range(4):
+        cv2.imwrite(str(directory / f"img{i}.png"), np.full((8, 6, 3), i, np.uint8))
+    estimator.analyze_time_lapse_frames(str(directory), n_decoders=0)
+    assert builds == [3]
+    df = pd.read_hdf(directory / "framesDLC_scorer.h5")
+    assert df.shape == (4, 6)
+    np.testing.assert_allclose(df.iloc[:, 1], np.arange(4))
+
+
+def test_analyze_videos_writes_data(monkeypatch, estimator_setup, tmp_path):
+    from deeplabcut.pose_estimation_tensorflow import predict_videos
+
+    def getposeNP(frames, dlc_cfg, sess, inputs, outputs):
+        pose = np.zeros((len(frames), 6))
+        pose[:, 0] = frames.mean(axis=(1, 2, 3))
+        return pose
+
+    monkeypatch.setitem(
+        predict._SETUP_FUNCS, "numpy", lambda cfg, allow_growth=False: (None,) * 3
+    )
+    monkeypatch.setattr(predict, "getposeNP", getposeNP)
+    video = str(tmp_path / "vid.avi")
+    writer = cv2.VideoWriter(video, cv2.VideoWriter_fourcc(*"MJPG"), 30, (16, 12))
+    for i in range(5):
+        writer.write(np.full((12, 16, 3), 50 * i, np.uint8))
+    writer.release()
+    scorer = predict_videos.analyze_videos(
+        "config.yaml",
+        [video],
+        batchsize=2,
+        TFGPUinference=False,
+        use_openvino=None,
+        cache_session=True,
+    )
+    assert scorer == "DLC_scorer"
+    df = pd.read_hdf(tmp_path / "vidDLC_scorer.h5")
+    assert df.shape == (5, 6)
+    np.testing.assert_allclose(df.iloc[:, 0], 50 * np.arange(5), atol=5)
+
+
+def test_openvino_session_run():
+    from deeplabcut.pose_estimation_tensorflow.core.openvino.session import (
+        OpenVINOSession,
+    )
+
+    class FakeQueue:
+        def set_callback(self, callback):
+            self.callback = callback
+
+        def start_async(self, inputs, inp_id):
+            inp = next(iter(inputs.values()))
+            request = SimpleNamespace(results={"pose": np.full((1, 2, 3), inp.max())})
+            self.callback(request, inp_id)
+
+        def wait_all(self):
+            pass
+
+    sess = OpenVINOSession.__new__(OpenVINOSession)
+    sess.net = SimpleNamespace(outputs=[SimpleNamespace(shape=[1, 2, 3])])
+    sess.infer_queue = FakeQueue()
+    sess._input_size = (8, 6)
+    inp = np.arange(3)[:, None, None, None] * np.ones((3, 8, 6, 3))
+    pose = sess.run("pose", {"inputs": inp})
+    assert pose.shape == (6, 3)
+    np.testing.assert_array_equal(pose[:, 0], [0, 0, 1, 1, 2, 2])
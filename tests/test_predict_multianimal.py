@@ -9,6 +9,7 @@
 # Licensed under GNU Lesser General Public License v3.0
 #
 import numpy as np
+import pytest
 import tensorflow as tf
 from deeplabcut.pose_estimation_tensorflow.core import predict_multianimal
 
@@ -93,3 +94,127 @@ def test_compute_peaks_and_costs_no_graph(model_outputs):
         stride=STRIDE,
     )[0]
     assert "costs" not in preds
+
+
+def compute_edge_costs_reference(
+    pafs, peak_inds_in_batch, graph, paf_inds, n_bodyparts, n_points=10, n_decimals=3
+):
+    # Per-sample, per-edge construction of the cost matrices, as previously done
+    h, w = pafs.shape[1:3]
+    peak_inds_in_batch[:, 1] = np.clip(peak_inds_in_batch[:, 1], 0, h - 1)
+    peak_inds_in_batch[:, 2] = np.clip(peak_inds_in_batch[:, 2], 0, w - 1)
+    n_samples = pafs.shape[0]
+    all_costs = []
+    for i in range(n_samples):
+        peak_inds = peak_inds_in_batch[peak_inds_in_batch[:, 0] == i, 1:]
+        costs = dict()
+        for k, (s, t) in zip(paf_inds, graph):
+            peaks_s = peak_inds[peak_inds[:, 2] == s, :2]
+            peaks_t = peak_inds[peak_inds[:, 2] == t, :2]
+            m1 = np.zeros((len(peaks_s), len(peaks_t)), dtype=np.float32)
+            dist = np.zeros_like(m1)
+            for n, peak_s in enumerate(peaks_s):
+                for m, peak_t in enumerate(peaks_t):
+                    length = np.float32(np.linalg.norm(peak_t - peak_s))
+                    length += np.spacing(1, dtype=np.float32)
+                    xy = np.linspace(peak_s, peak_t, n_points, dtype=np.int32)
+                    y = pafs[i, xy[:, 0], xy[:, 1], k]
+                    integ = np.trapz(y, xy[:, ::-1], axis=0)
+                    m1[n, m] = np.float32(np.linalg.norm(integ)) / length
+                    dist[n, m] = length
+            if not m1.size:
+                m1 = dist = np.zeros((0, 0), dtype=np.float32)
+            costs[k] = {
+                "m1": np.round(m1, n_decimals),
+                "distance": np.round(dist, n_decimals),
+            }
+        all_costs.append(costs)
+    return all_costs
+
+
+@pytest.fixture()
+def random_outputs():
+    rng = np.random.default_rng(0)
+    n_samples, h, w, n_bodyparts, n_id_channels = 5, 20, 24, 6, 2
+    scmaps = rng.random((n_samples, h, w, n_bodyparts + n_id_channels))
+    locrefs = rng.normal(size=(n_samples, h, w, n_bodyparts + n_id_channels, 2))
+    graph = [[0, 1], [1, 2], [2, 3], [0, 4], [4, 5], [3, 5]]
+    pafs = rng.normal(size=(n_samples, h, w, len(graph) + 2, 2))
+    peak_inds = np.argwhere(scmaps[..., :n_bodyparts] > 0.97).astype(np.int32)
+    # No peaks in the third sample, and none of the last bodypart in the second
+    peak_inds = peak_inds[peak_inds[:, 0] != 2]
+    peak_inds = peak_inds[(peak_inds[:, 0] != 1) | (peak_inds[:, 3] != 5)]
+    # Peaks are not necessarily sorted
+    peak_inds = peak_inds[rng.permutation(len(peak_inds))]
+    return scmaps, locrefs, pafs, peak_inds, graph, n_id_channels
+
+
+def test_compute_edge_costs(random_outputs):
+    _, _, pafs, peak_inds, graph, _ = random_outputs
+    paf_inds = [0, 2, 3, 4, 5, 7]
+    costs = predict_multianimal.compute_edge_costs(
+        pafs, peak_inds.copy(), graph, paf_inds, 6
+    )
+    costs_ref = compute_edge_costs_reference(pafs, peak_inds, graph, paf_inds, 6)
+    assert len(costs) == len(costs_ref)
+    for sample_costs, sample_costs_ref in zip(costs, costs_ref):
+        assert list(sample_costs) == paf_inds
+        for k, costs_ref_k in sample_costs_ref.items():
+            for key in ("m1", "distance"):
+                np.testing.assert_allclose(
+                    sample_costs[k][key], costs_ref_k[key], atol=1e-3
+                )
+
+    compact = predict_multianimal.compute_edge_costs(
+        pafs, peak_inds, graph, paf_inds, 6, compact=True
+    )
+    for i, k, (s, t), m1, dist in zip(
+        compact["sample"],
+        compact["edge"],
+        compact["peaks"],
+        compact["m1"],
+        compact["distance"],
+    ):
+        assert peak_inds[s, 0] == peak_inds[t, 0] == i
+        edge = graph[paf_inds.index(k)]
+        assert [peak_inds[s, 3], peak_inds[t, 3]] == edge
+        # Position of the peaks among those of the same sample and bodypart
+        inds_s = np.flatnonzero((peak_inds[:, 0] == i) & (peak_inds[:, 3] == edge[0]))
+        inds_t = np.flatnonzero((peak_inds[:, 0] == i) & (peak_inds[:, 3] == edge[1]))
+        n, m = np.flatnonzero(inds_s == s)[0], np.flatnonzero(inds_t == t)[0]
+        assert costs[i][k]["m1"][n, m] == m1
+        assert costs[i][k]["distance"][n, m] == dist
+
+
+def test_compute_edge_costs_no_edges(random_outputs):
+    _, _, pafs, peak_inds, graph, _ = random_outputs
+    peak_inds = peak_inds[peak_inds[:, 3] == 0]
+    costs = predict_multianimal.compute_edge_costs(
+        pafs, peak_inds, graph, range(len(graph)), 6
+    )
+    assert costs == [dict() for _ in range(len(pafs))]
+    compact = predict_multianimal.compute_edge_costs(
+        pafs, peak_inds, graph, range(len(graph)), 6, compact=True
+    )
+    assert all(len(v) == 0 for v in compact.values())
+
+
+def test_compute_peaks_and_costs_grouping(random_outputs):
+    scmaps, locrefs, pafs, peak_inds, graph, n_id_channels = random_outputs
+    args = scmaps, locrefs, pafs, peak_inds, graph, range(len(graph)), STRIDE
+    preds = predict_multianimal.compute_peaks_and_costs(*args, n_id_channels)
+    compact = predict_multianimal.compute_peaks_and_costs(
+        *args, n_id_channels, compact=True
+    )
+    assert len(preds) == len(scmaps)
+    for i, pred in enumerate(preds):
+        assert len(pred["coordinates"][0]) == len(pred["identity"]) == 6
+        for j in range(6):
+            idx = np.flatnonzero((peak_inds[:, 0] == i) & (peak_inds[:, 3] == j))
+            np.testing.assert_equal(
+                pred["coordinates"][0][j], compact["coordinates"][idx]
+            )
+            np.testing.assert_equal(pred["confidence"][j], compact["confidence"][idx])
+            np.testing.assert_equal(pred["identity"][j], compact["identity"][idx])
+            assert pred["identity"][j].shape == (len(idx), n_id_channels)
+        assert len(pred["costs"]) == len(graph)
@@ -0,0 +1,88 @@
+#
+# DeepLabCut Toolbox (deeplabcut.org)
+# © A. & M.W. Mathis Labs
+# https://github.com/DeepLabCut/DeepLabCut
+#
+# Please see AUTHORS for contributors.
+# https://github.com/DeepLabCut/DeepLabCut/blob/master/AUTHORS
+#
+# Licensed under GNU Lesser General Public License v3.0
+#
+import os
+import pytest
+from deeplabcut.pose_estimation_tensorflow import predict_videos, scheduler
+from deeplabcut.utils import auxiliaryfunctions
+
+
+class FakeEstimator:
+    instances = []
+
+    def __init__(self, config, **kwargs):
+        self.kwargs = kwargs
+        self.videos = []
+        self.closed = False
+        FakeEstimator.instances.append(self)
+
+    def analyze_videos(self, videos, **kwargs):
+        if "broken" in videos[0]:
+            raise ValueError("Corrupted video")
+        self.videos.extend(videos)
+        if "silent" not in videos[0]:
+            with open(os.path.splitext(videos[0])[0] + "DLC_scorer.h5", "w"):
+                pass
+        return "DLC_scorer"
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture()
+def project(tmp_path, monkeypatch):
+    config = str(tmp_path / "config.yaml")
+    auxiliaryfunctions.write_config(config, {"project_path": str(tmp_path)})
+    videos = []
+    for name, size in [
+        ("small", 10),
+        ("large", 30),
+        ("broken", 5),
+        ("medium", 20),
+        ("silent", 15),
+    ]:
+        video = tmp_path / f"{name}.avi"
+        video.write_bytes(b"0" * size)
+        videos.append(str(video))
+    FakeEstimator.instances.clear()
+    monkeypatch.setattr(predict_videos, "PoseEstimator", FakeEstimator)
+    return config, videos
+
+
+def test_schedule_video_analysis(project, tmp_path):
+    config, videos = project
+    report = scheduler.schedule_video_analysis(config, videos, batchsize=4)
+    # A single network, set up once and released at the end
+    (estimator,) = FakeEstimator.instances
+    assert estimator.kwargs["batchsize"] == 4
+    assert estimator.closed
+    assert estimator.videos == [videos[1], videos[3], videos[4], videos[0]]
+    assert list(report.index) == videos
+    assert list(report["status"]) == ["done", "done", "failed", "done", "failed"]
+    assert "Corrupted video" in report.loc[videos[2], "error"]
+    # Videos without results are not done, even if no error was raised
+    assert "wrote no output" in report.loc[videos[4], "error"]
+    assert report.loc[videos[0], "output"] == str(tmp_path / "smallDLC_scorer.h5")
+    assert (tmp_path / "analysis-status" / "report_analyze_videos.csv").exists()
+    for video, status in report["status"].items():
+        path = scheduler.status_file(tmp_path / "analysis-status", video)
+        assert scheduler.read_status(path)["status"] == status
+
+    # Only the failed videos, and those whose output is gone, are analyzed again
+    os.remove(tmp_path / "mediumDLC_scorer.h5")
+    report = scheduler.schedule_video_analysis(config, videos, n_processes=1)
+    assert FakeEstimator.instances[-1].videos == [videos[3], videos[4]]
+    assert list(report["status"]) == ["done", "done", "failed", "done", "failed"]
+
+
+def test_schedule_video_analysis_unknown_task(project):
+    config, videos = project
+    with pytest.raises(ValueError):
+        scheduler.schedule_video_analysis(config, videos, task="train_network")
@@ -8,6 +8,7 @@
 #
 # Licensed under GNU Lesser General Public License v3.0
 #
+import networkx as nx
 import numpy as np
 import pandas as pd
 import pytest
@@ -36,14 +37,14 @@ def make_fake_tracklets():
     return tracklet, tracklet_single
 
 
-@pytest.fixture()
-def fake_stitcher():
+@pytest.fixture(params=["sparse", "networkx"])
+def fake_stitcher(request):
     inds = np.arange(TRACKLET_LEN)
     data = np.random.rand(inds.size, N_DETS, 3)
     track = Tracklet(data, inds)
     idx = np.linspace(0, inds.size, N_TRACKLETS + 1, dtype=int)
     tracklets = TrackletStitcher.split_tracklet(track, idx[1:-1])
-    return TrackletStitcher(tracklets, n_tracks=2)
+    return TrackletStitcher(tracklets, n_tracks=2, backend=request.param)
 
 
 @pytest.mark.parametrize("tracklet", make_fake_tracklets())
@@ -156,6 +157,110 @@ def test_stitcher(tmpdir_factory, fake_stitcher):
         fake_stitcher.stitch(add_back_residuals=True)
 
 
+def test_stitcher_wrong_backend():
+    with pytest.raises(ValueError):
+        _ = TrackletStitcher([fake_tracklet()], n_tracks=2, backend="unknown")
+
+
+def make_random_walk_tracklets(seed, n_frames, n_tracks, n_cuts):
+    # Noisy tracks of several animals, randomly cut into tracklets
+    rng = np.random.default_rng(seed)
+    tracklets = []
+    for _ in range(n_tracks):
+        xy = np.cumsum(rng.normal(size=(n_frames, 1, 2)), axis=0)
+        data = np.concatenate((xy, np.ones((n_frames, 1, 1))), axis=2)
+        track = Tracklet(data, np.arange(n_frames))
+        cuts = np.sort(rng.choice(np.arange(1, n_frames), n_cuts, replace=False))
+        tracklets.extend(TrackletStitcher.split_tracklet(track, cuts))
+    return tracklets
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stitcher_backends(seed):
+    n_tracks = 3
+    tracklets = make_random_walk_tracklets(seed, 300, n_tracks, 15)
+    stitchers = []
+    for backend in ("networkx", "sparse"):
+        stitcher = TrackletStitcher(tracklets, n_tracks=n_tracks, backend=backend)
+        stitcher.build_graph(max_gap=20)
+        stitcher.stitch()
+        stitchers.append(stitcher)
+    stitcher_nx, stitcher_sp = stitchers
+    assert nx.utils.graphs_equal(stitcher_nx.G, stitcher_sp.G)
+    cost_nx, cost_sp = (
+        nx.cost_of_flow(stitcher.G, stitcher.flow) for stitcher in stitchers
+    )
+    assert cost_nx == cost_sp
+    assert len(stitcher_nx.tracks) == len(stitcher_sp.tracks) == n_tracks
+
+
+@pytest.mark.parametrize("backend", ["networkx", "sparse"])
+@pytest.mark.parametrize("weight_func", [None, TrackletStitcher.calculate_edge_weight])
+def test_stitcher_nan_centroids(backend, weight_func):
+    tracklets = make_random_walk_tracklets(0, 300, 2, 15)
+    # Zero likelihood in the last frame of a tracklet makes its centroid NaN
+    tracklets[0].data[-1, :, 2] = 0
+    stitcher = TrackletStitcher(tracklets, n_tracks=2, backend=backend)
+    with pytest.raises(ValueError, match="tracklet centroids contain no NaN"):
+        stitcher.build_graph(max_gap=20, weight_func=weight_func)
+
+
+@pytest.mark.parametrize(
+    "n_processes, start_method", [(1, None), (2, None), (2, "spawn")]
+)
+def test_stitcher_windowed(n_processes, start_method):
+    n_tracks = 3
+    tracklets = make_random_walk_tracklets(0, 2000, n_tracks, 40)
+    stitcher = TrackletStitcher(tracklets, n_tracks=n_tracks)
+    stitcher.build_graph()
+    stitcher.stitch()
+    stitcher_win = TrackletStitcher(tracklets, n_tracks=n_tracks)
+    stitcher_win.stitch_windowed(
+        400, n_processes=n_processes, start_method=start_method
+    )
+    assert len(stitcher_win.tracks) == n_tracks
+    assert sum(map(len, stitcher_win.tracks)) == sum(map(len, stitcher.tracks))
+    # Same tracks, possibly in a different order
+    tracks = sorted(stitcher.tracks, key=lambda t: t.xy[0, 0, 0])
+    tracks_win = sorted(stitcher_win.tracks, key=lambda t: t.xy[0, 0, 0])
+    for track, track_win in zip(tracks, tracks_win):
+        np.testing.assert_equal(track.inds, track_win.inds)
+        np.testing.assert_equal(track.data, track_win.data)
+
+    with pytest.raises(ValueError):
+        stitcher_win.stitch_windowed(400, overlap=400)
+
+
+def test_stitcher_windowed_serial_fallback():
+    n_tracks = 2
+    tracklets = make_random_walk_tracklets(0, 1000, n_tracks, 40)
+    stitcher = TrackletStitcher(tracklets, n_tracks=n_tracks)
+    stitcher.stitch_windowed(400)
+    # A lambda cannot be pickled for spawned workers
+    stitcher_lambda = TrackletStitcher(tracklets, n_tracks=n_tracks)
+    with pytest.warns(UserWarning, match="stitched serially"):
+        stitcher_lambda.stitch_windowed(
+            400,
+            weight_func=lambda t1, t2: t1.distance_to(t2),
+            n_processes=2,
+            start_method="spawn",
+        )
+    for track, track_lambda in zip(stitcher.tracks, stitcher_lambda.tracks):
+        np.testing.assert_equal(track.data, track_lambda.data)
+
+
+def test_stitcher_windowed_failing_window(monkeypatch):
+    def stitch(self, add_back_residuals=True):
+        raise ValueError("No feasible flow")
+
+    tracklets = make_random_walk_tracklets(0, 1000, 2, 40)
+    stitcher = TrackletStitcher(tracklets, n_tracks=2)
+    monkeypatch.setattr(TrackletStitcher, "stitch", stitch)
+    with pytest.warns(UserWarning, match="No feasible flow"):
+        stitcher.stitch_windowed(400)
+    assert not stitcher.paths
+
+
 def test_stitcher_plot(fake_stitcher):
     fake_stitcher.build_graph(max_gap=1)
     fake_stitcher.draw_graph(with_weights=True)
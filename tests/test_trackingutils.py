@@ -63,11 +63,70 @@ def test_sort_ellipse():
     assert all(np.array_equal(tracklets[n][0], pose) for n, pose in enumerate(poses))
 
 
-def test_tracking_ellipse(real_assemblies, real_tracklets):
+def make_random_walk_poses(seed, n_frames=100, n_animals=4, n_bodyparts=8):
+    # Varying numbers of animals per frame, with missing keypoints
+    rng = np.random.default_rng(seed)
+    centers = np.cumsum(rng.normal(0, 3, (n_frames, n_animals, 2)), axis=0)
+    xy = centers[:, :, np.newaxis] + rng.normal(0, 10, (n_bodyparts, 2))
+    xy[rng.random(xy.shape[:-1]) < 0.2] = np.nan
+    n_dets = rng.integers(1, n_animals + 1, n_frames)
+    return [xy[i, rng.permutation(n_animals)[:n]] for i, n in enumerate(n_dets)]
+
+
+def test_ellipse_fitter_batch():
+    fitter = trackingutils.EllipseFitter()
+    poses = np.stack(make_random_walk_poses(0, 5, 1)).squeeze(axis=1)
+    poses[0, 2:] = np.nan
+    params = fitter.fit_batch(poses)
+    assert np.isnan(params[0]).all()
+    for pose, params_ in zip(poses[1:], params[1:]):
+        np.testing.assert_allclose(fitter.fit(pose).parameters, params_)
+
+
+def test_ellipse_similarity_matrix():
+    rng = np.random.default_rng(0)
+    params = rng.random((4, 5))
+    params_ref = rng.random((3, 5))
+    mat = trackingutils.calc_similarity_matrix(params, params_ref)
+    for i, j in np.ndindex(mat.shape):
+        sim = trackingutils.Ellipse(*params[i]).calc_similarity_with(
+            trackingutils.Ellipse(*params_ref[j])
+        )
+        assert np.isclose(mat[i, j], sim)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("max_age, min_hits", [(1, 1), (5, 3)])
+def test_batched_sort_ellipse(seed, max_age, min_hits):
+    mot = trackingutils.SORTEllipse(max_age, min_hits, 0.6)
+    mot_batched = trackingutils.BatchedSORTEllipse(max_age, min_hits, 0.6)
+    for poses in make_random_walk_poses(seed):
+        trackers = mot.track(poses)
+        trackers_batched = mot_batched.track(poses)
+        np.testing.assert_allclose(trackers, trackers_batched)
+        np.testing.assert_equal(trackers[:, -2:], trackers_batched[:, -2:])
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("max_age, min_hits", [(1, 1), (5, 3)])
+def test_batched_sort_skeleton(seed, max_age, min_hits):
+    mot = trackingutils.SORTSkeleton(8, max_age, min_hits)
+    mot_batched = trackingutils.BatchedSORTSkeleton(8, max_age, min_hits)
+    for poses in make_random_walk_poses(seed):
+        trackers = mot.track(poses.copy())
+        trackers_batched = mot_batched.track(poses)
+        np.testing.assert_allclose(trackers, trackers_batched, rtol=1e-6)
+        np.testing.assert_equal(trackers[:, -2:], trackers_batched[:, -2:])
+
+
+@pytest.mark.parametrize(
+    "sort", [trackingutils.SORTEllipse, trackingutils.BatchedSORTEllipse]
+)
+def test_tracking_ellipse(real_assemblies, real_tracklets, sort):
     tracklets_ref = real_tracklets.copy()
     _ = tracklets_ref.pop("header", None)
     tracklets = dict()
-    mot_tracker = trackingutils.SORTEllipse(1, 1, 0.6)
+    mot_tracker = sort(1, 1, 0.6)
     for ind, assemblies in real_assemblies.items():
         animals = np.stack([ass.data for ass in assemblies])
         trackers = mot_tracker.track(animals[..., :2])
@@ -113,15 +172,19 @@ def test_tracking_box(real_assemblies, real_tracklets):
     )
 
 
+@pytest.mark.parametrize(
+    "sort", [trackingutils.SORTEllipse, trackingutils.BatchedSORTEllipse]
+)
 def test_tracking_montblanc(
     real_assemblies_montblanc,
     real_tracklets_montblanc,
+    sort,
 ):
     tracklets_ref = real_tracklets_montblanc.copy()
     _ = tracklets_ref.pop("header", None)
     tracklets = dict()
     tracklets["single"] = real_assemblies_montblanc[1]
-    mot_tracker = trackingutils.SORTEllipse(1, 1, 0.6)
+    mot_tracker = sort(1, 1, 0.6)
     for ind, assemblies in real_assemblies_montblanc[0].items():
         animals = np.stack([ass.data for ass in assemblies])
         trackers = mot_tracker.track(animals[..., :2])
@@ -8,10 +8,15 @@
 #
 # Licensed under GNU Lesser General Public License v3.0
 #
+import os
+
+import cv2
 import numpy as np
 import pandas as pd
 import pytest
+import yaml
 from deeplabcut.pose_estimation_3d import triangulation
+from deeplabcut.utils import auxiliaryfunctions
 
 
 @pytest.fixture(scope="session")
@@ -55,3 +60,171 @@ def test_undistort_views(n_view_pairs, is_multi, stereo_params):
     assert len(dfs) == n_view_pairs
     assert all(len(pair) == 2 for pair in dfs)
     assert len(dfs[0][0].columns.levels) == (4 if is_multi else 3)
+
+
+def _make_rig(n_cameras, rng):
+    camera_matrix = np.array([[800.0, 0, 320], [0, 800, 240], [0, 0, 1]])
+    projections = [np.eye(3, 4)]
+    stereo_params = dict()
+    for i in range(2, n_cameras + 1):
+        angle = 2 * np.pi * (i - 1) / n_cameras
+        rvec = np.array([0, angle, 0])
+        R, _ = cv2.Rodrigues(rvec)
+        T = (np.eye(3) - R) @ np.array([0, 0, 10.0])  # Cameras around (0, 0, 10)
+        E = np.cross(np.eye(3), T) @ R
+        F = np.linalg.inv(camera_matrix).T @ E @ np.linalg.inv(camera_matrix)
+        stereo_params[f"camera-1-camera-{i}"] = {
+            "cameraMatrix1": camera_matrix,
+            "cameraMatrix2": camera_matrix,
+            "distCoeffs1": np.zeros((1, 5)),
+            "distCoeffs2": np.zeros((1, 5)),
+            "R": R,
+            "T": T[:, None],
+            "F": F,
+            "P1": camera_matrix @ np.eye(3, 4),
+            "P2": camera_matrix @ np.c_[R, T],
+        }
+        projections.append(np.c_[R, T])
+    return camera_matrix, np.stack(projections), stereo_params
+
+
+def _project(xyz, projection):
+    xyzw = np.c_[xyz.reshape((-1, 3)), np.ones(xyz[..., 0].size)]
+    xy = xyzw @ projection.T
+    return (xy[:, :2] / xy[:, 2:]).reshape((*xyz.shape[:-1], 2))
+
+
+def test_triangulate_points():
+    rng = np.random.default_rng(0)
+    _, projections, _ = _make_rig(6, rng)
+    xyz = rng.normal([0, 0, 10], 1, size=(50, 3, 4, 3))
+    points = np.stack([_project(xyz, p) for p in projections])
+    np.testing.assert_allclose(
+        triangulation.triangulate_points(points, projections), xyz, atol=1e-8
+    )
+
+    # Same solution as OpenCV from two views
+    xyz_cv = cv2.triangulatePoints(
+        projections[0],
+        projections[1],
+        points[0].reshape((-1, 2)).T,
+        points[1].reshape((-1, 2)).T,
+    )
+    xyz_cv = (xyz_cv[:3] / xyz_cv[3]).T.reshape(xyz.shape)
+    xyz_2 = triangulation.triangulate_points(points[:2], projections[:2])
+    np.testing.assert_allclose(xyz_2, xyz_cv, atol=1e-6)
+
+    # Missing and zero-confidence views are ignored
+    weights = rng.uniform(0.5, 1, points.shape[:-1])
+    points[0, 0] = np.nan
+    points[1, :, 0] += 100
+    weights[1, :, 0] = 0
+    weights[2:, 1] = 0
+    xyz_w = triangulation.triangulate_points(points, projections, weights)
+    np.testing.assert_allclose(xyz_w[[0, *range(2, 50)]], xyz[[0, *range(2, 50)]])
+    np.testing.assert_allclose(xyz_w[1, 1:], xyz[1, 1:])
+    assert np.isnan(xyz_w[1, 0]).all()  # Only seen from the first view
+    xyz_w = triangulation.triangulate_points(points, projections, weights, 6)
+    assert np.isnan(xyz_w[:, 0]).all()
+
+
+@pytest.mark.parametrize(
+    "is_multi, window_size", [(False, None), (True, None), (True, 5)]
+)
+def test_triangulate_multiview(tmp_path, is_multi, window_size):
+    rng = np.random.default_rng(1)
+    n_cameras, n_frames = 4, 25
+    camera_matrix, projections, stereo_params = _make_rig(n_cameras, rng)
+    cam_names = [f"camera-{i}" for i in range(1, n_cameras + 1)]
+    os.makedirs(tmp_path / "camera_matrix")
+    auxiliaryfunctions.write_pickle(
+        str(tmp_path / "camera_matrix" / "stereo_params.pickle"), stereo_params
+    )
+    config = str(tmp_path / "config.yaml")
+    with open(config, "w") as f:
+        yaml.dump(
+            {
+                "project_path": str(tmp_path),
+                "camera_names": cam_names,
+                "pcutoff": 0.4,
+                "scorername_3d": "DLC_3D",
+            },
+            f,
+        )
+
+    individuals = ["mus1", "mus2", "mus3"] if is_multi else ["single"]
+    bodyparts = ["snout", "leftear", "rightear", "tailbase"]
+    # Animals stand apart, and move around a little
+    xyz = rng.normal(0, 0.2, size=(n_frames, len(individuals), len(bodyparts), 3))
+    xyz += np.array([[-2, 0, 10], [0, 0, 12], [2, 0, 10]])[: len(individuals), None]
+    data_files = []
+    for i, (cam, projection) in enumerate(zip(cam_names, projections)):
+        xy = _project(xyz, camera_matrix @ projection)
+        likelihood = rng.uniform(0.5, 1, xy.shape[:-1])
+        likelihood[:, :, 0] = 0.1 if i == 1 else likelihood[:, :, 0]
+        xy[:, :, 0] += 50 if i == 1 else 0  # Wrong, but unlikely detections
+        if is_multi and i == 2:
+            xy = xy[:, [1, 2, 0]]  # Identities are not the same across views
+            likelihood = likelihood[:, [1, 2, 0]]
+        if window_size and i == 3:
+            xy[10:] = xy[10:, [1, 0, 2]]  # Identities swapped midway
+            likelihood[10:] = likelihood[10:, [1, 0, 2]]
+        data = np.concatenate((xy, likelihood[..., None]), axis=-1)
+        if is_multi:
+            columns = pd.MultiIndex.from_product(
+                [[f"DLC_{cam}"], individuals, bodyparts, ["x", "y", "likelihood"]],
+                names=["scorer", "individuals", "bodyparts", "coords"],
+            )
+        else:
+            columns = pd.MultiIndex.from_product(
+                [[f"DLC_{cam}"], bodyparts, ["x", "y", "likelihood"]],
+                names=["scorer", "bodyparts", "coords"],
+            )
+        filename = str(tmp_path / f"video-{cam}DLC.h5")
+        df = pd.DataFrame(data.reshape((n_frames, -1)), columns=columns)
+        df.to_hdf(filename, "df_with_missing", format="table", mode="w")
+        data_files.append(filename)
+
+    output_filename = str(tmp_path / "video_DLC_3D.h5")
+    metadata = triangulation.triangulate_multiview(
+        config, data_files, output_filename, chunksize=10, window_size=window_size
+    )
+    df_3d = pd.read_hdf(output_filename)
+    assert len(df_3d) == n_frames
+    assert df_3d.columns.names == (
+        ["scorer", "individuals", "bodyparts", "coords"]
+        if is_multi
+        else ["scorer", "bodyparts", "coords"]
+    )
+    np.testing.assert_allclose(
+        df_3d.to_numpy().reshape(xyz.shape), xyz, rtol=1e-6, atol=1e-6
+    )
+    assert metadata["scorer_name"] == {cam: f"DLC_{cam}" for cam in cam_names}
+    if is_multi:
+        matching = metadata["individuals_matching"]
+        assert len(matching["camera-2"]) == (5 if window_size else 1)
+        assert (matching["camera-3"] == ["mus3", "mus1", "mus2"]).all(axis=None)
+        if window_size:
+            assert (matching["camera-4"].loc[:5] == individuals).all(axis=None)
+            assert (matching["camera-4"].loc[10:] == ["mus2", "mus1", "mus3"]).all(
+                axis=None
+            )
+
+
+def test_reorder_individuals():
+    columns = pd.MultiIndex.from_product(
+        [["DLC"], ["a", "b", "c"], ["nose"], ["x", "y", "likelihood"]],
+        names=["scorer", "individuals", "bodyparts", "coords"],
+    )
+    data = np.repeat(np.arange(3.0), 3)[None] + np.arange(0, 100, 10)[:, None]
+    df = pd.DataFrame(data, columns=columns, index=range(2, 12))
+    assignments = np.array([[0, 1, 2], [2, 0, 1]])
+    starts = np.array([2, 7])
+    reordered = triangulation._reorder_individuals(
+        df, ["a", "b", "c"], assignments, starts
+    )
+    assert reordered.columns.equals(df.columns)
+    np.testing.assert_array_equal(reordered.iloc[:5], df.iloc[:5])
+    np.testing.assert_array_equal(
+        reordered.iloc[5:], df.iloc[5:].loc[:, pd.IndexSlice[:, ["c", "a", "b"]]]
+    )
@@ -8,10 +8,19 @@
 #
 # Licensed under GNU Lesser General Public License v3.0
 #
+import cv2
+import numpy as np
 import os
 import pytest
 from conftest import TEST_DATA_DIR
-from deeplabcut.utils.auxfun_videos import VideoWriter
+from deeplabcut.utils.auxfun_videos import (
+    BatchPrefetcher,
+    ImageBatchLoader,
+    VideoReader,
+    VideoWriter,
+    imread,
+    read_image_rgb,
+)
 
 
 POS_FRAMES = 1  # Equivalent to cv2.CAP_PROP_POS_FRAMES
@@ -22,6 +31,17 @@ def video_clip():
     return VideoWriter(os.path.join(TEST_DATA_DIR, "vid.avi"))
 
 
+@pytest.fixture()
+def synthetic_video(tmp_path):
+    video_path = str(tmp_path / "synthetic.avi")
+    writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), 30, (64, 48))
+    rng = np.random.default_rng(0)
+    for _ in range(23):
+        writer.write(rng.integers(0, 255, size=(48, 64, 3), dtype=np.uint8))
+    writer.release()
+    return video_path
+
+
 def test_reader_wrong_inputs(tmp_path):
     with pytest.raises(ValueError):
         VideoWriter(str(tmp_path))
@@ -73,6 +93,59 @@ def test_reader_set_frame(video_clip):
     assert int(video_clip.video.get(POS_FRAMES)) == 0
 
 
+def read_all_frames(video_path):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(frame[..., ::-1])
+    cap.release()
+    return frames
+
+
+def test_reader_build_index(synthetic_video):
+    reader = VideoReader(synthetic_video)
+    keyframes = reader.build_index()
+    assert os.path.isfile(reader.index_path)
+    assert keyframes[0] == 0
+    assert np.all(np.diff(keyframes) > 0)
+    # A valid index is loaded rather than rebuilt
+    np.testing.assert_array_equal(VideoReader(synthetic_video).build_index(), keyframes)
+
+
+@pytest.mark.parametrize("keyframes", [None, [0], [0, 7, 15]])
+def test_reader_get_frames(synthetic_video, keyframes):
+    expected = read_all_frames(synthetic_video)
+    reader = VideoReader(synthetic_video)
+    if keyframes is not None:
+        # Emulate a long-GOP video
+        reader._keyframes = np.asarray(keyframes)
+    inds = [20, 3, 3, 9, 0, 22, 8, 30]
+    frames = reader.get_frames(inds)
+    assert frames[-1] is None
+    for ind, frame in zip(inds[:-1], frames[:-1]):
+        np.testing.assert_array_equal(frame, expected[ind])
+    np.testing.assert_array_equal(reader.get_frame(5), expected[5])
+    with pytest.raises(ValueError):
+        reader.get_frame(-1)
+
+
+def test_reader_get_frames_cache(synthetic_video):
+    reader = VideoReader(synthetic_video, cache_size=48 * 64 * 3 * 2 / 1e6)
+    frame = reader.get_frame(4)
+    assert not frame.flags.writeable
+    assert reader.get_frame(4) is frame
+    reader.get_frames([10, 12])
+    assert list(reader._cache) == [10, 12]
+    reader.clear_cache()
+    assert not reader._cache
+    reader.cache_size = 0
+    reader.get_frames([1, 2])
+    assert not reader._cache
+
+
 @pytest.mark.parametrize("shrink, crop", [(1, False), (1, True), (2, False), (2, True)])
 def test_reader_read_frame(video_clip, shrink, crop):
     if crop:
@@ -133,3 +206,86 @@ def test_writer_rescale(tmp_path, video_clip, target_height):
     # Verify the aspect ratio is preserved
     ar = video_clip.height / target_height
     assert vid.width == pytest.approx(video_clip.width // ar, abs=1)
+
+
+@pytest.mark.parametrize(
+    "batch_size, queue_size, n_decoders",
+    [(1, 0, 1), (4, 0, 1), (4, 2, 1), (5, 1, 2), (8, 3, 3)],
+)
+def test_batch_prefetcher(synthetic_video, batch_size, queue_size, n_decoders):
+    cap = cv2.VideoCapture(synthetic_video)
+    expected = []
+    while True:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        expected.append(frame[10:40, 5:50, ::-1])
+    n_frames = len(expected)
+    captures = [cv2.VideoCapture(synthetic_video) for _ in range(n_decoders)]
+    prefetcher = BatchPrefetcher(
+        captures, n_frames, batch_size, (30, 45), (5, 50, 10, 40), queue_size
+    )
+    seen = []
+    for frames, inds in prefetcher:
+        assert frames.shape == (batch_size, 30, 45, 3)
+        assert 0 < len(inds) <= batch_size
+        for frame, ind in zip(frames, inds):
+            np.testing.assert_array_equal(frame, expected[ind])
+        seen.extend(inds)
+    assert sorted(seen) == list(range(n_frames))
+
+
+def test_batch_prefetcher_early_exit(synthetic_video):
+    prefetcher = BatchPrefetcher(
+        [cv2.VideoCapture(synthetic_video)], 23, 2, (48, 64), queue_size=1
+    )
+    for n, _ in enumerate(prefetcher):
+        if n == 2:
+            break
+    with pytest.raises(ValueError):
+        BatchPrefetcher([], 23, 2, (48, 64))
+
+
+@pytest.fixture()
+def image_folder(tmp_path):
+    # Images of mixed sizes, gray and RGBA, and a corrupted file
+    rng = np.random.default_rng(0)
+    shapes = [(48, 64, 3), (48, 64), (32, 40, 3), (48, 64, 4)]
+    paths = []
+    for i in range(23):
+        image = rng.integers(0, 255, size=shapes[i % 7 % 4], dtype=np.uint8)
+        path = str(tmp_path / f"img{i:03d}.png")
+        cv2.imwrite(path, image)
+        paths.append(path)
+    with open(paths[9], "w") as f:
+        f.write("not an image")
+    return paths
+
+
+def test_read_image_rgb(image_folder):
+    for path in image_folder[:9]:
+        np.testing.assert_array_equal(read_image_rgb(path), imread(path))
+
+
+@pytest.mark.parametrize(
+    "batch_size, n_workers, window, start",
+    [(1, 0, None, 0), (4, 0, None, 0), (4, 2, None, 3), (5, 3, 6, 0), (8, 4, 6, 2)],
+)
+def test_image_batch_loader(image_folder, batch_size, n_workers, window, start):
+    crop = 5, 40, 10, 30
+    loader = ImageBatchLoader(
+        image_folder, batch_size, crop, n_workers, window=window, start=start
+    )
+    seen = []
+    with pytest.warns(UserWarning, match="img009"):
+        for frames, inds in loader:
+            assert frames.shape[0] == batch_size
+            assert 0 < len(inds) <= batch_size
+            assert inds == sorted(inds)
+            if window:  # Batches never straddle windows
+                assert len({(ind - start) // window for ind in inds}) == 1
+            for frame, ind in zip(frames, inds):
+                expected = imread(image_folder[ind])[10:30, 5:40]
+                np.testing.assert_array_equal(frame, expected)
+            seen.extend(inds)
+    assert sorted(seen) == [i for i in range(start, len(image_folder)) if i != 9]